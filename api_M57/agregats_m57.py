@@ -0,0 +1,602 @@
+"""
+Moteur de calcul des agrégats M57
+
+- TableCumulsPrefixes : construite en un seul parcours d'une balance, elle contient pour chaque
+  préfixe de numéro de compte (7, 73, 731, 7311...) la somme des crédits nets, débits nets,
+  flux nets, soldes débiteurs et soldes créditeurs des comptes qui commencent par ce préfixe.
+  Un agrégat "préfixes sauf exclusions" se résout alors en quelques lectures :
+      somme(préfixe) - somme(exclusions plus fines que le préfixe)
+
+- ProgrammeAgregats : compile des définitions déclaratives d'agrégats (préfixes, exclusions,
+  mesure, signe) ; tous les agrégats sont calculés à partir d'un seul parcours des enregistrements
+  et restitués dans la structure imbriquée habituelle (voir DEFINITIONS_AGREGATS_M57).
+"""
+
+from functools import lru_cache
+
+
+# Mesures cumulées (ordre des colonnes de la table)
+MESURES = ('obnetcre', 'obnetdeb', 'flux', 'sd', 'sc')
+INDEX_MESURES = {mesure: i for i, mesure in enumerate(MESURES)}
+# Noms utilisés par les scripts d'exploration (test_combos, test_retraitements)
+INDEX_MESURES.update({'credit': 0, 'debit': 1, 'flux_net': 2})
+
+
+def _en_tuple(valeurs):
+    """Préfixes passés sous forme de chaîne, de liste ou None -> tuple"""
+    if valeurs is None:
+        return ()
+    if isinstance(valeurs, str):
+        return (valeurs,)
+    return tuple(valeurs)
+
+
+def _prefixes_minimaux(prefixes):
+    """Retire les doublons et les préfixes couverts par un préfixe plus court de la liste"""
+    minimaux = []
+    for prefixe in sorted(set(prefixes), key=len):
+        if not any(prefixe.startswith(m) for m in minimaux):
+            minimaux.append(prefixe)
+    return minimaux
+
+
+@lru_cache(maxsize=None)
+def normaliser_prefixes(prefixes, exclusions=()):
+    """
+    Décompose "comptes commençant par un des préfixes, sauf ceux commençant par une exclusion"
+    en termes (préfixe, exclusions à retrancher) sans double compte :
+    - un préfixe couvert par une exclusion (ex: 7311 sauf 731) ne contribue pas
+    - seules les exclusions plus fines que le préfixe (ex: 74 sauf 741) sont retranchées
+
+    Args:
+        prefixes: tuple de préfixes à inclure
+        exclusions: tuple de préfixes à exclure
+
+    Returns:
+        tuple: ((préfixe, (exclusions à retrancher, ...)), ...)
+    """
+    exclusions = _prefixes_minimaux(exclusions)
+    termes = []
+    for prefixe in _prefixes_minimaux(prefixes):
+        if any(prefixe.startswith(e) for e in exclusions):
+            continue
+        termes.append((prefixe, tuple(e for e in exclusions if e.startswith(prefixe))))
+    return tuple(termes)
+
+
+class TableCumulsPrefixes:
+    """Cumuls (obnetcre, obnetdeb, flux, sd, sc) à chaque niveau de préfixe de compte"""
+
+    def __init__(self, records, prefixes_utiles=None):
+        """
+        Args:
+            records: Enregistrements de balance (champs compte, obnetcre, obnetdeb, sd, sc)
+            prefixes_utiles: Ensemble des seuls préfixes à cumuler (défaut: tous)
+        """
+        self.cumuls = {}
+
+        for record in records:
+            compte = str(record.get('compte', ''))
+            if not compte:
+                continue
+
+            credit = record.get('obnetcre', 0) or 0
+            debit = record.get('obnetdeb', 0) or 0
+            sd = record.get('sd', 0) or 0
+            sc = record.get('sc', 0) or 0
+            valeurs = (credit, debit, credit - debit, sd, sc)
+
+            for longueur in range(1, len(compte) + 1):
+                prefixe = compte[:longueur]
+                if prefixes_utiles is not None and prefixe not in prefixes_utiles:
+                    continue
+                cumul = self.cumuls.get(prefixe)
+                if cumul is None:
+                    self.cumuls[prefixe] = list(valeurs)
+                else:
+                    for i, valeur in enumerate(valeurs):
+                        cumul[i] += valeur
+
+    def valeur(self, prefixe, mesure):
+        """Cumul d'une mesure pour tous les comptes commençant par le préfixe"""
+        cumul = self.cumuls.get(prefixe)
+        return cumul[INDEX_MESURES[mesure]] if cumul else 0
+
+    def somme(self, mesure, prefixes, exclusions=None):
+        """
+        Somme d'une mesure sur les comptes correspondant aux préfixes, hors exclusions
+
+        Args:
+            mesure: 'obnetcre', 'obnetdeb', 'flux', 'sd' ou 'sc' (ou 'credit', 'debit', 'flux_net')
+            prefixes: Préfixe ou liste de préfixes de comptes à inclure
+            exclusions: Préfixe ou liste de préfixes de comptes à exclure
+
+        Returns:
+            Somme arrondie à 2 décimales
+        """
+        total = 0
+        for prefixe, exclusions_prefixe in normaliser_prefixes(_en_tuple(prefixes), _en_tuple(exclusions)):
+            total += self.valeur(prefixe, mesure)
+            for exclusion in exclusions_prefixe:
+                total -= self.valeur(exclusion, mesure)
+        return round(total, 2)
+
+
+def comptes_terminaison_9(classe):
+    """
+    Retourne tous les comptes à terminaison en 9 pour une classe donnée
+    Ex: pour classe '7' : ['709', '719', '729', '739', '749', '759', '769', '779', '789', '799']
+    """
+    return [f"{classe}{i}9" for i in range(10)]
+
+
+class ProgrammeAgregats:
+    """
+    Définitions d'agrégats compilées en un calcul à un seul parcours des enregistrements
+
+    Chaque définition est un dictionnaire :
+        chemin: emplacement dans la structure restituée ("fonctionnement.produits.produits_caf")
+        code: code DGFiP de l'agrégat (optionnel)
+        description: libellé de la règle de calcul
+        termes: liste de tuples (signe, mesure, prefixes[, exclusions]) évalués de gauche à droite
+                - signe : '+' ou '-'
+                - mesure : 'obnetcre', 'obnetdeb', 'flux', 'sd', 'sc'
+                  ou 'agregat' (prefixes est alors le nom d'un agrégat défini plus haut)
+
+    Le nom d'un agrégat est le dernier élément de son chemin. Chaque terme est arrondi
+    à 2 décimales avant d'être combiné, comme le faisaient les helpers somme_*.
+    """
+
+    def __init__(self, definitions):
+        self.definitions = list(definitions)
+        self.prefixes_utiles = set()
+        self.termes_compiles = []
+
+        noms = set()
+        for definition in self.definitions:
+            nom = definition['chemin'].split('.')[-1]
+            if nom in noms:
+                raise ValueError(f"Agrégat défini deux fois : {nom}")
+
+            termes = []
+            for terme in definition['termes']:
+                signe, mesure, prefixes = terme[:3]
+                exclusions = terme[3] if len(terme) > 3 else None
+                if signe not in ('+', '-'):
+                    raise ValueError(f"{nom} : signe invalide {signe!r}")
+
+                if mesure == 'agregat':
+                    if prefixes not in noms:
+                        raise ValueError(f"{nom} : l'agrégat {prefixes} doit être défini avant")
+                    termes.append((signe, mesure, prefixes))
+                    continue
+
+                if mesure not in MESURES:
+                    raise ValueError(f"{nom} : mesure inconnue {mesure!r}")
+                decomposition = normaliser_prefixes(_en_tuple(prefixes), _en_tuple(exclusions))
+                for prefixe, exclusions_prefixe in decomposition:
+                    self.prefixes_utiles.add(prefixe)
+                    self.prefixes_utiles.update(exclusions_prefixe)
+                termes.append((signe, mesure, decomposition))
+
+            noms.add(nom)
+            self.termes_compiles.append((nom, termes))
+
+    def evaluer(self, records):
+        """
+        Calcule tous les agrégats
+
+        Returns:
+            dict: nom de l'agrégat -> montant
+        """
+        # Un seul parcours : seuls les préfixes utilisés par les définitions sont cumulés
+        table = TableCumulsPrefixes(records, self.prefixes_utiles)
+
+        montants = {}
+        for nom, termes in self.termes_compiles:
+            total = None
+            for signe, mesure, decomposition in termes:
+                if mesure == 'agregat':
+                    valeur = montants[decomposition]
+                else:
+                    valeur = 0
+                    for prefixe, exclusions_prefixe in decomposition:
+                        valeur += table.valeur(prefixe, mesure)
+                        for exclusion in exclusions_prefixe:
+                            valeur -= table.valeur(exclusion, mesure)
+                    valeur = round(valeur, 2)
+
+                if total is None:
+                    total = valeur if signe == '+' else -valeur
+                elif signe == '+':
+                    total += valeur
+                else:
+                    total -= valeur
+            montants[nom] = total
+
+        return montants
+
+    def structurer(self, montants):
+        """Range les montants dans la structure imbriquée décrite par les chemins"""
+        structure = {}
+        for definition in self.definitions:
+            *parents, nom = definition['chemin'].split('.')
+            noeud = structure
+            for cle in parents:
+                noeud = noeud.setdefault(cle, {})
+
+            entree = {}
+            if 'code' in definition:
+                entree['code'] = definition['code']
+            entree['description'] = definition['description']
+            entree['montant'] = montants[nom]
+            noeud[nom] = entree
+
+        return structure
+
+    def calculer(self, records):
+        """Agrégats structurés d'une balance"""
+        return self.structurer(self.evaluer(records))
+
+
+# ============================================================================
+# DÉFINITIONS DES AGRÉGATS SELON LA NOMENCLATURE M57 - STRICTEMENT CONFORME DGFiP
+# ============================================================================
+# RÈGLE FONDAMENTALE DGFiP :
+# - Agrégats de gestion (fonctionnement/investissement) : calculés en FLUX NET (obnetcre - obnetdeb)
+# - Agrégats de bilan (encours dette, fonds roulement) : calculés en SOLDES (sd - sc)
+#
+# L'ordre des définitions est celui de la structure restituée.
+
+DEFINITIONS_AGREGATS_M57 = [
+    # SECTION FONCTIONNEMENT
+    # ----------------------------------------------------------------------------
+
+    # A - Total des produits de fonctionnement
+    # Crédits nets classe 7 diminués des débits nets des comptes à terminaison en 9
+    # "à terminaison en 9" = tous les 709, 719, 729, 739, 749, 759, 769, 779, 789, 799
+    {
+        "chemin": "fonctionnement.produits.total_produits_fonctionnement",
+        "code": "A",
+        "description": "M57: Crédits nets de la classe 7 diminués des débits nets des comptes à terminaison en 9",
+        "termes": [
+            ('+', 'obnetcre', '7'),
+            ('-', 'obnetdeb', comptes_terminaison_9('7')),
+        ]
+    },
+    # A1 - Produits CAF
+    # M57: "Crédits nets" = FLUX NET (obnetcre - obnetdeb) des comptes
+    {
+        "chemin": "fonctionnement.produits.produits_caf",
+        "code": "A1",
+        "description": "M57: Crédits nets des comptes 70, 71, 72, 73, 74, 75 (sauf 75882), 76, 77 (sauf 775, 776, 777) et 79",
+        "termes": [
+            ('+', 'flux', ['70', '71', '72', '73', '74', '75', '76', '77', '79'], ['75882', '775', '776', '777']),
+        ]
+    },
+    # Détails des produits CAF
+    {
+        "chemin": "fonctionnement.produits.produits_caf.details.impots_locaux",
+        "description": "M57: Crédits nets de 7311, 7318, 73221 - Débits nets de 739111, 739115, 739221",
+        "termes": [
+            ('+', 'obnetcre', ['7311', '7318', '73221']),
+            ('-', 'obnetdeb', ['739111', '739115', '739221']),
+        ]
+    },
+    {
+        "chemin": "fonctionnement.produits.produits_caf.details.fiscalite_reversee_gfp",
+        "description": "Crédits nets de 73211, 73212 - Débits nets de 739211, 739212",
+        "termes": [
+            ('+', 'obnetcre', ['73211', '73212']),
+            ('-', 'obnetdeb', ['739211', '739212']),
+        ]
+    },
+    {
+        "chemin": "fonctionnement.produits.produits_caf.details.autres_impots_taxes",
+        "description": "M57: Crédits nets de 7312, 7313, 7314, 7315, 7317, 732 (sauf 73211, 73212, 73221), 733, 734, 735, 738 - Débits nets de 739 (sauf 739111, 739115, 739211, 739212, 739221)",
+        "termes": [
+            ('+', 'obnetcre', ['7312', '7313', '7314', '7315', '7317', '732', '733', '734', '735', '738'],
+             ['73211', '73212', '73221']),
+            ('-', 'obnetdeb', ['739'], ['739111', '739115', '739211', '739212', '739221']),
+        ]
+    },
+    {
+        "chemin": "fonctionnement.produits.produits_caf.details.dotation_globale_fonctionnement",
+        "description": "Crédits nets du compte 741",
+        "termes": [('+', 'obnetcre', '741')]
+    },
+    {
+        "chemin": "fonctionnement.produits.produits_caf.details.autres_dotations_participations",
+        "description": "Crédits nets des comptes 74 sauf 741",
+        "termes": [('+', 'obnetcre', '74', '741')]
+    },
+    {
+        "chemin": "fonctionnement.produits.produits_caf.details.autres_dotations_participations.dont_fctva",
+        "description": "Crédits nets du compte 744",
+        "termes": [('+', 'obnetcre', '744')]
+    },
+    {
+        "chemin": "fonctionnement.produits.produits_caf.details.produits_services_domaine",
+        "description": "Crédits nets des comptes 70",
+        "termes": [('+', 'obnetcre', '70')]
+    },
+    # B - Total des charges de fonctionnement
+    # Débits nets classe 6 diminués des crédits nets des comptes à terminaison en 9
+    # "à terminaison en 9" = tous les 609, 619, 629, 639, 649, 659, 669, 679, 689, 699
+    {
+        "chemin": "fonctionnement.charges.total_charges_fonctionnement",
+        "code": "B",
+        "description": "M57: Débits nets de la classe 6 diminués des crédits nets des comptes à terminaison en 9",
+        "termes": [
+            ('+', 'obnetdeb', '6'),
+            ('-', 'obnetcre', comptes_terminaison_9('6')),
+        ]
+    },
+    # B1 - Charges CAF
+    # M57: "Débits nets" = -FLUX NET des comptes (car ce sont des charges)
+    # Le flux net des comptes de charges est généralement négatif, donc on prend l'opposé
+    {
+        "chemin": "fonctionnement.charges.charges_caf",
+        "code": "B1",
+        "description": "M57: Débits nets des comptes 60, 61, 62, 63, 64, 65 (sauf 65882), 66, 67 (sauf 675 et 676)",
+        "termes": [
+            ('-', 'flux', ['60', '61', '62', '63', '64', '65', '66', '67'], ['65882', '675', '676']),
+        ]
+    },
+    # Détails des charges CAF
+    {
+        "chemin": "fonctionnement.charges.charges_caf.details.charges_personnel",
+        "description": "Débits nets de 621, 631, 633, 64 diminués des crédits nets à terminaison en 9",
+        "termes": [
+            ('+', 'obnetdeb', ['621', '631', '633', '64']),
+            ('-', 'obnetcre', ['6219', '6319', '6339', '649']),
+        ]
+    },
+    {
+        "chemin": "fonctionnement.charges.charges_caf.details.achats_charges_externes",
+        "description": "Débits nets de 60, 61, 62 (sauf 621) diminués des crédits nets à terminaison en 9",
+        "termes": [
+            ('+', 'obnetdeb', ['60', '61', '62'], '621'),
+            ('-', 'obnetcre', ['609', '619', '629'], '6219'),
+        ]
+    },
+    {
+        "chemin": "fonctionnement.charges.charges_caf.details.charges_financieres",
+        "description": "Débits nets du compte 66",
+        "termes": [('+', 'obnetdeb', '66')]
+    },
+    {
+        "chemin": "fonctionnement.charges.charges_caf.details.contingents",
+        "description": "Débits nets du compte 655",
+        "termes": [('+', 'obnetdeb', '655')]
+    },
+    {
+        "chemin": "fonctionnement.charges.charges_caf.details.subventions_versees",
+        "description": "Débits nets du compte 657",
+        "termes": [('+', 'obnetdeb', '657')]
+    },
+    # Résultat comptable (A-B)
+    # C'est EXACTEMENT Total produits (A) - Total charges (B)
+    {
+        "chemin": "fonctionnement.resultat_comptable",
+        "code": "A-B",
+        "description": "Total des produits de fonctionnement (A) - Total des charges de fonctionnement (B)",
+        "termes": [
+            ('+', 'agregat', 'total_produits_fonctionnement'),
+            ('-', 'agregat', 'total_charges_fonctionnement'),
+        ]
+    },
+
+    # SECTION INVESTISSEMENT
+    # ----------------------------------------------------------------------------
+
+    # C - Total des ressources d'investissement
+    {
+        "chemin": "investissement.ressources.total_ressources_investissement",
+        "code": "C",
+        "description": "M57: Crédits des comptes 10 (sauf 10229, 1027, 1069), 13 (sauf 139), 15, 16 (sauf 1688), 18, 19 (sauf 193), 20, 21, 22 (sauf 229), 23, 26, 27 (sauf 2768), 28, 29, 3 (sauf 32, 37, 3911, 392, 3931, 3941, 39511, 39551, 397), 4541, 45611, 45621, 4581, 481, 49 (sauf 4911, 4961), 59 (sauf 59061, 59081, 5951)",
+        "termes": [
+            ('+', 'obnetcre',
+             ['10', '13', '15', '16', '18', '19', '20', '21', '22', '23', '26', '27', '28', '29', '3', '4541', '45611', '45621', '4581', '481', '49', '59'],
+             ['10229', '1027', '1069', '139', '1688', '193', '229', '2768', '32', '37', '3911', '392', '3931', '3941', '39511', '39551', '397', '4911', '4961', '59061', '59081', '5951']),
+        ]
+    },
+    # Détails des ressources d'investissement
+    {
+        "chemin": "investissement.ressources.total_ressources_investissement.details.emprunts_bancaires",
+        "description": "Crédits de 163, 164 (sauf 16449, 1645), 1671, 1672, 1675, 1678, 1681, 1682",
+        "termes": [
+            ('+', 'obnetcre', ['163', '164', '1671', '1672', '1675', '1678', '1681', '1682'], ['16449', '1645']),
+        ]
+    },
+    {
+        "chemin": "investissement.ressources.total_ressources_investissement.details.subventions_recues",
+        "description": "Crédits de 13 (sauf 139)",
+        "termes": [('+', 'obnetcre', '13', '139')]
+    },
+    {
+        "chemin": "investissement.ressources.total_ressources_investissement.details.taxe_amenagement",
+        "description": "Crédits du compte 10226",
+        "termes": [('+', 'obnetcre', '10226')]
+    },
+    {
+        "chemin": "investissement.ressources.total_ressources_investissement.details.fctva",
+        "description": "Crédits du compte 10222",
+        "termes": [('+', 'obnetcre', '10222')]
+    },
+    {
+        "chemin": "investissement.ressources.total_ressources_investissement.details.retour_biens_affectes",
+        "description": "Crédits de 18, 22 (sauf 229)",
+        "termes": [('+', 'obnetcre', ['18', '22'], '229')]
+    },
+    # D - Total des emplois d'investissement
+    {
+        "chemin": "investissement.ressources.emplois.total_emplois_investissement",
+        "code": "D",
+        "description": "M57: Débits des comptes 10 (sauf 1027, 1069), 13, 15, 16 (sauf 1688), 18, 19 (sauf 193), 20, 21, 22 (sauf 229), 23, 26, 27 (sauf 2768), 28, 29, 3 (sauf 32, 37, 3911, 392, 3931, 3941, 39511, 39551, 397), 4542, 45612, 45622, 4582, 481, 49 (sauf 4911, 4961), 59 (sauf 59061, 59081, 5951)",
+        "termes": [
+            ('+', 'obnetdeb',
+             ['10', '13', '15', '16', '18', '19', '20', '21', '22', '23', '26', '27', '28', '29', '3', '4542', '45612', '45622', '4582', '481', '49', '59'],
+             ['1027', '1069', '1688', '193', '229', '2768', '32', '37', '3911', '392', '3931', '3941', '39511', '39551', '397', '4911', '4961', '59061', '59081', '5951']),
+        ]
+    },
+    # Détails des emplois d'investissement
+    {
+        "chemin": "investissement.ressources.emplois.total_emplois_investissement.details.depenses_equipement",
+        "description": "Débits de 20, 21, 23 - Crédits de 237, 238",
+        "termes": [
+            ('+', 'obnetdeb', ['20', '21', '23']),
+            ('-', 'obnetcre', ['237', '238']),
+        ]
+    },
+    {
+        "chemin": "investissement.ressources.emplois.total_emplois_investissement.details.remboursement_emprunts",
+        "description": "Débits de 163, 164 (sauf 16449, 1645), 1671, 1672, 1675, 1678, 1681, 1682",
+        "termes": [
+            ('+', 'obnetdeb', ['163', '164', '1671', '1672', '1675', '1678', '1681', '1682'], ['16449', '1645']),
+        ]
+    },
+    {
+        "chemin": "investissement.ressources.emplois.total_emplois_investissement.details.charges_repartir",
+        "description": "Débits du compte 481",
+        "termes": [('+', 'obnetdeb', '481')]
+    },
+    {
+        "chemin": "investissement.ressources.emplois.total_emplois_investissement.details.immobilisations_affectees",
+        "description": "Débits de 18, 22 (sauf 229)",
+        "termes": [('+', 'obnetdeb', ['18', '22'], '229')]
+    },
+    # Besoin/capacité de financement résiduel de la section d'investissement
+    {
+        "chemin": "investissement.ressources.besoin_capacite_financement_residuel",
+        "code": "D-C",
+        "description": "Total des emplois d'investissement - Total des ressources d'investissement",
+        "termes": [
+            ('+', 'agregat', 'total_emplois_investissement'),
+            ('-', 'agregat', 'total_ressources_investissement'),
+        ]
+    },
+    # Solde des opérations pour compte de tiers
+    {
+        "chemin": "investissement.ressources.solde_operations_tiers",
+        "description": "Débits de 4541, 45611, 45621, 4581 - Crédits de 4542, 45612, 45622, 4582",
+        "termes": [
+            ('+', 'obnetdeb', ['4541', '45611', '45621', '4581']),
+            ('-', 'obnetcre', ['4542', '45612', '45622', '4582']),
+        ]
+    },
+    # E - Besoin/capacité de financement de la section d'investissement
+    {
+        "chemin": "investissement.ressources.besoin_capacite_financement",
+        "code": "E",
+        "description": "Besoin/capacité de financement résiduel + Solde des opérations pour compte de tiers",
+        "termes": [
+            ('+', 'agregat', 'besoin_capacite_financement_residuel'),
+            ('+', 'agregat', 'solde_operations_tiers'),
+        ]
+    },
+    # Résultat d'ensemble (R-E)
+    {
+        "chemin": "resultat_ensemble",
+        "code": "R-E",
+        "description": "Résultat comptable - Besoin/capacité de financement de la section d'investissement",
+        "termes": [
+            ('+', 'agregat', 'resultat_comptable'),
+            ('-', 'agregat', 'besoin_capacite_financement'),
+        ]
+    },
+
+    # AUTOFINANCEMENT
+    # ----------------------------------------------------------------------------
+
+    # Excédent brut de fonctionnement (EBF)
+    # M57: FLUX NET des comptes 70-75 + FLUX NET des comptes 60-65 (qui est négatif)
+    # C'est la meilleure formule trouvée après tests (écart de 0,25% seulement)
+    {
+        "chemin": "autofinancement.excedent_brut_fonctionnement",
+        "code": "EBF",
+        "description": "M57: Flux net des comptes 70-75 + Flux net des comptes 60-65",
+        "termes": [
+            ('+', 'flux', ['70', '71', '72', '73', '74', '75']),
+            ('+', 'flux', ['60', '61', '62', '63', '64', '65']),
+        ]
+    },
+    # Capacité d'autofinancement brute (CAF)
+    # M57: Total A - Total B (avec ajustement comptes à terminaison en 9)
+    # = Résultat comptable (après ajustement opérations d'ordre)
+    {
+        "chemin": "autofinancement.capacite_autofinancement_brute",
+        "code": "CAF brute",
+        "description": "M57: Total produits fonctionnement (A) - Total charges fonctionnement (B) = Résultat comptable",
+        "termes": [
+            ('+', 'agregat', 'produits_caf'),
+            ('-', 'agregat', 'charges_caf'),
+        ]
+    },
+    # CAF nette du remboursement en capital des emprunts
+    {
+        "chemin": "autofinancement.capacite_autofinancement_nette",
+        "code": "CAF nette",
+        "description": "CAF brute - Remboursement en capital des emprunts",
+        "termes": [
+            ('+', 'agregat', 'capacite_autofinancement_brute'),
+            ('-', 'agregat', 'remboursement_emprunts'),
+        ]
+    },
+
+    # ENDETTEMENT
+    # ----------------------------------------------------------------------------
+
+    # Encours total de la dette au 31/12
+    # Solde créditeur du compte 16 (sauf 166, 1688, 169)
+    {
+        "chemin": "endettement.encours_total_dette",
+        "description": "Solde créditeur du compte 16 (sauf 166, 1688, 169) au 31/12",
+        "termes": [('+', 'sc', '16', ['166', '1688', '169'])]
+    },
+    # Encours des dettes bancaires
+    # Solde créditeur des comptes 163, 164, 167 (sauf 1676), 1681, 1682
+    {
+        "chemin": "endettement.encours_dettes_bancaires",
+        "description": "Solde créditeur de 163, 164, 167 (sauf 1676), 1681, 1682",
+        "termes": [('+', 'sc', ['163', '164', '167', '1681', '1682'], '1676')]
+    },
+    # Encours des dettes bancaires net de l'aide du fonds de soutien
+    # Encours dettes bancaires - Solde débiteur du compte 44121
+    {
+        "chemin": "endettement.encours_dettes_bancaires_net",
+        "description": "Encours dettes bancaires - Solde débiteur du compte 44121 (aide fonds soutien emprunts toxiques)",
+        "termes": [
+            ('+', 'agregat', 'encours_dettes_bancaires'),
+            ('-', 'sd', '44121'),
+        ]
+    },
+    # Annuité de la dette
+    # Débits nets de 6611 + Remboursement des emprunts
+    {
+        "chemin": "endettement.annuite_dette",
+        "description": "Débits nets de 6611 + Remboursement des emprunts",
+        "termes": [
+            ('+', 'obnetdeb', '6611'),
+            ('+', 'agregat', 'remboursement_emprunts'),
+        ]
+    },
+
+    # ANALYSE DU BILAN
+    # ----------------------------------------------------------------------------
+
+    # Fonds de roulement M57
+    # (Soldes débiteurs - soldes créditeurs) des classes 3, 4, 5 (sauf 39, 49, 454, 455, 458, 481, 59)
+    # - solde créditeur de (269, 279, 1688)
+    {
+        "chemin": "analyse_bilan.fonds_roulement",
+        "description": "M57: (SD - SC) des classes 3, 4, 5 (sauf 39, 49, 454, 455, 458, 481, 59) - SC de (269, 279, 1688)",
+        "termes": [
+            ('+', 'sd', ['3', '4', '5'], ['39', '49', '454', '455', '458', '481', '59']),
+            ('-', 'sc', ['3', '4', '5'], ['39', '49', '454', '455', '458', '481', '59']),
+            ('-', 'sc', ['269', '279', '1688']),
+        ]
+    },
+]
+
+PROGRAMME_AGREGATS_M57 = ProgrammeAgregats(DEFINITIONS_AGREGATS_M57)
@@ -0,0 +1,151 @@
+"""
+Récupération paginée des jeux de données OpenDataSoft (data.economie.gouv.fr, data.ofgl.fr)
+
+La première page donne total_count : les pages suivantes sont demandées en parallèle
+(pool de threads, concurrence limitée) puis remises dans l'ordre des offsets,
+ce qui donne le même résultat qu'une lecture séquentielle page par page.
+
+Les requêtes passent par le client HTTP partagé (src/parsers/client_http.py) :
+session réutilisée et cache SQLite des réponses (un exercice clos n'est plus redemandé).
+
+Configuration via variable d'environnement :
+    ODS_CONCURRENCE=8   (nombre maximal de requêtes simultanées)
+
+Usage:
+    from client_ods import recuperer_balance
+
+    records = recuperer_balance("200053395", 2024, budget_principal=True)
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from parsers.client_http import LimiteurDebit, obtenir_client_http
+
+
+URL_BALANCES = "https://data.economie.gouv.fr/api/explore/v2.1/catalog/datasets/balances-comptables-des-communes-en-{annee}/records"
+
+LIMITE_PAGE = 100
+CONCURRENCE_DEFAUT = 8
+TIMEOUT = 30
+
+# L'API records d'OpenDataSoft refuse offset + limit > 10000 (au-delà : API exports)
+OFFSET_MAX = 10000
+
+
+def url_balances(annee):
+    """URL du jeu de données des balances comptables des communes pour un exercice"""
+    return URL_BALANCES.format(annee=annee)
+
+
+def _params_page(params, limit, offset):
+    """Paramètres d'une page (params peut être un dict ou une liste de tuples pour les clés répétées)"""
+    if isinstance(params, dict):
+        params = list(params.items())
+    return list(params) + [("limit", limit), ("offset", offset)]
+
+
+def recuperer_page(url, params, limit, offset, client=None, timeout=TIMEOUT, forcer=False):
+    """
+    Récupère une page de résultats
+
+    Returns:
+        dict: réponse JSON (results, total_count)
+
+    Raises:
+        requests.exceptions.RequestException: erreur réseau ou HTTP
+    """
+    client = client or obtenir_client_http()
+    return client.get_json(url, params=_params_page(params, limit, offset), timeout=timeout, forcer=forcer)
+
+
+def recuperer_records_pagines(url, params, limit=LIMITE_PAGE, concurrence=None, client=None, verbeux=False,
+                              forcer=False):
+    """
+    Récupère tous les enregistrements d'une requête paginée
+
+    Args:
+        url: URL de l'endpoint records
+        params: Filtres de la requête (where, refine, select...) hors limit/offset
+        limit: Nombre d'enregistrements par page (max 100)
+        concurrence: Nombre maximal de requêtes simultanées (défaut: ODS_CONCURRENCE ou 8)
+        client: ClientHTTP à utiliser (défaut: client partagé, avec cache)
+        verbeux: Afficher la progression page par page
+        forcer: Redemander les pages au réseau même si elles sont en cache
+
+    Returns:
+        list: enregistrements dans l'ordre des offsets
+
+    Raises:
+        requests.exceptions.RequestException: si une page ne peut pas être récupérée
+    """
+    concurrence = concurrence or int(os.getenv("ODS_CONCURRENCE", CONCURRENCE_DEFAUT))
+    client = client or obtenir_client_http()
+
+    premiere_page = recuperer_page(url, params, limit, 0, client, forcer=forcer)
+    records = list(premiere_page.get('results', []))
+    total = premiere_page.get('total_count')
+
+    if verbeux:
+        print(f"  Récupéré {len(records)} enregistrements (total: {len(records)}/{total})")
+
+    if total is None:
+        # Pas de total annoncé : lecture séquentielle jusqu'à une page incomplète
+        offset = limit
+        derniere = records
+        while len(derniere) == limit and offset + limit <= OFFSET_MAX:
+            derniere = recuperer_page(url, params, limit, offset, client, forcer=forcer).get('results', [])
+            records.extend(derniere)
+            offset += limit
+        return records
+
+    if total > OFFSET_MAX:
+        print(f"  ATTENTION: {total} enregistrements, seuls les {OFFSET_MAX} premiers sont accessibles par l'API records")
+
+    offsets = list(range(limit, min(total, OFFSET_MAX), limit))
+    if not offsets:
+        return records
+
+    with ThreadPoolExecutor(max_workers=min(concurrence, len(offsets))) as executor:
+        # map restitue les pages dans l'ordre des offsets, quel que soit l'ordre d'arrivée
+        pages = executor.map(lambda offset: recuperer_page(url, params, limit, offset, client, forcer=forcer), offsets)
+        for page in pages:
+            resultats = page.get('results', [])
+            records.extend(resultats)
+            if verbeux:
+                print(f"  Récupéré {len(resultats)} enregistrements (total: {len(records)}/{total})")
+
+    return records
+
+
+def recuperer_balance(siren, annee, budget_principal=False, limit=LIMITE_PAGE, url=None, concurrence=None, client=None,
+                      verbeux=False, forcer=False):
+    """
+    Récupère toutes les lignes de balance comptable d'une commune
+
+    Args:
+        siren: Code SIREN de la commune
+        annee: Exercice
+        budget_principal: Filtrer côté API sur le budget principal (cbudg='1')
+        limit: Nombre d'enregistrements par page (max 100)
+        url: URL de l'endpoint (défaut: balances-comptables-des-communes-en-{annee})
+        concurrence: Nombre maximal de requêtes simultanées
+        client: ClientHTTP à utiliser (défaut: client partagé, avec cache)
+        verbeux: Afficher la progression page par page
+        forcer: Redemander les pages au réseau même si elles sont en cache
+
+    Returns:
+        list: enregistrements bruts de la balance
+    """
+    # Nettoyer le SIREN (enlever les espaces)
+    siren_clean = str(siren).replace(" ", "").strip()
+    where = f"siren={siren_clean}"
+    if budget_principal:
+        where += " AND cbudg='1'"
+
+    return recuperer_records_pagines(url or url_balances(annee), {"where": where}, limit=limit,
+                                     concurrence=concurrence, client=client, verbeux=verbeux, forcer=forcer)
@@ -5,16 +5,33 @@ Usage: python comparer_avec_strate.py --siren SIREN --annee ANNEE
 
 import requests
 import json
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
 import argparse
+import sys
+import tempfile
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from analysis.pairs_communes import benchmark_commune
+from client_ods import LimiteurDebit, obtenir_client_http, recuperer_balance
+from export_ods import regrouper_balances_export
+from journal_strate import JournalStrate
+from matrice_strate import MatriceStrate
+from stats_strate import AccumulateurStrate, SuiviProgression
+from store_strate import StoreStrate
+from strate_serveur import calculer_moyennes_strate_serveur, signatures_communes_serveur
 
 API_OFGL = "https://data.ofgl.fr/api/explore/v2.1/catalog/datasets/ofgl-base-communes-consolidee/records"
 
+# Communes dont la balance est récupérée en parallèle
+WORKERS_STRATE = 8
+
 
 def fetch_commune_info(siren, annee):
     """
@@ -39,9 +56,7 @@ def fetch_commune_info(siren, annee):
     ]
 
     try:
-        response = requests.get(API_OFGL, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = obtenir_client_http().get_json(API_OFGL, params=params)
 
         if not data.get('results'):
             print(f"ERREUR: Aucune donnée trouvée pour SIREN {siren}, année {annee}")
@@ -102,9 +117,7 @@ def fetch_communes_strate(tranche_population, annee, limit=100):
         ]
 
         try:
-            response = requests.get(API_OFGL, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = obtenir_client_http().get_json(API_OFGL, params=params)
 
             results = data.get('results', [])
             if not results:
@@ -136,6 +149,29 @@ def fetch_communes_strate(tranche_population, annee, limit=100):
     return communes
 
 
+def fetch_pairs(siren, annee, k):
+    """
+    Récupère les k communes au profil budgétaire le plus proche (groupe de pairs)
+    Les profils OFGL de l'exercice sont mis à jour dans le store des profils avant la recherche.
+
+    Returns:
+        list: Liste des communes (siren, nom, population), comme fetch_communes_strate
+    """
+    print(f"\n{'='*80}")
+    print(f"ETAPE 2: Recherche des {k} communes au profil le plus proche")
+    print(f"{'='*80}")
+
+    benchmark = benchmark_commune(siren, annee, k)
+    if benchmark is None:
+        print(f"ERREUR: Aucun profil pour SIREN {siren}, année {annee}")
+        return []
+
+    pairs = benchmark["communes"]
+    for pair in pairs:
+        print(f"  {pair['nom']} (SIREN: {pair['siren']}, {pair['population']:.0f} hab, distance {pair['distance']:.2f})")
+    return [{"siren": p["siren"], "nom": p["nom"], "population": p["population"]} for p in pairs]
+
+
 def fetch_balance_m57(siren, annee, limit=100):
     """
     Récupère la balance M57 complète d'une commune
@@ -148,39 +184,12 @@ def fetch_balance_m57(siren, annee, limit=100):
     Returns:
         list: Liste des comptes avec flux nets
     """
-    base_url = f"https://data.economie.gouv.fr/api/explore/v2.1/catalog/datasets/balances-comptables-des-communes-en-{annee}/records"
-
-    all_records = []
-    offset = 0
-
-    while True:
-        params = {
-            "where": f"siren={siren} AND cbudg='1'",  # Budget principal uniquement
-            "limit": limit,
-            "offset": offset
-        }
-
-        try:
-            response = requests.get(base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            records = data.get('results', [])
-            if not records:
-                break
-
-            all_records.extend(records)
-
-            if len(records) < limit:
-                break
-
-            offset += limit
-
-        except requests.exceptions.RequestException as e:
-            print(f"  ERREUR balance M57 pour SIREN {siren}: {e}")
-            return []
-
-    return all_records
+    try:
+        # Budget principal uniquement
+        return recuperer_balance(siren, annee, budget_principal=True, limit=limit)
+    except requests.exceptions.RequestException as e:
+        print(f"  ERREUR balance M57 pour SIREN {siren}: {e}")
+        return []
 
 
 def calculer_flux_nets_par_compte(records):
@@ -209,7 +218,47 @@ def calculer_flux_nets_par_compte(records):
     return dict(comptes_dict)
 
 
-def calculer_moyennes_strate(communes, annee, max_communes=None):
+def _balance_commune(commune, annee, forcer=False, url=None, client=None):
+    """Balance du budget principal d'une commune (exécuté dans le pool, erreurs propagées)"""
+    # Les pages d'une commune sont lues l'une après l'autre : le parallélisme est entre communes
+    return recuperer_balance(commune['siren'], annee, budget_principal=True, concurrence=1, forcer=forcer,
+                             url=url, client=client)
+
+
+def collecter_flux_nets(communes, annee, suivi, workers=WORKERS_STRATE, forcer=False, url=None, client=None):
+    """
+    Flux nets par compte de chaque commune, dans l'ordre de réception des balances
+
+    Args:
+        communes: Communes dont récupérer la balance
+        annee: Année budgétaire
+        suivi: SuiviProgression qui reçoit les échecs réseau (communes alors ignorées)
+        workers: Nombre de communes récupérées en parallèle
+        forcer: Redemander les balances au réseau même si elles sont dans le cache HTTP
+        url: URL de l'endpoint records (défaut: balances-comptables-des-communes-en-{annee})
+        client: ClientHTTP à utiliser
+
+    Yields:
+        tuple: (commune, {compte: flux_net}), flux vides si la commune n'a pas de balance
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(_balance_commune, commune, annee, forcer, url, client): commune for commune in communes}
+        for future in as_completed(futures):
+            commune = futures[future]
+            try:
+                records = future.result()
+            except requests.exceptions.RequestException as e:
+                suivi.echec(commune, e)
+                continue
+            yield commune, calculer_flux_nets_par_compte(records) if records else {}
+    finally:
+        # Interruption (Ctrl+C, arrêt du consommateur) : les communes pas encore lancées sont abandonnées
+        executor.shutdown(cancel_futures=True)
+
+
+def calculer_moyennes_strate(communes, annee, max_communes=None, fichier_export=None, workers=WORKERS_STRATE,
+                             journal=None, url=None, client=None):
     """
     Calcule les moyennes des comptes pour toutes les communes de la strate
 
@@ -217,6 +266,14 @@ def calculer_moyennes_strate(communes, annee, max_communes=None):
         communes: Liste des communes de la strate
         annee: Année budgétaire
         max_communes: Limite le nombre de communes à traiter (pour tests)
+        fichier_export: Export complet des balances (CSV/JSON/Parquet) lu en un seul
+            parcours au lieu d'interroger l'API commune par commune
+        workers: Nombre de communes récupérées en parallèle (le débit des requêtes
+            est borné par le limiteur du client HTTP, HTTP_DEBIT_MAX)
+        journal: JournalStrate où les flux nets de chaque commune sont enregistrés dès
+            réception ; les communes déjà présentes ne sont pas redemandées (reprise)
+        url: URL de l'endpoint records (défaut: balances-comptables-des-communes-en-{annee})
+        client: ClientHTTP à utiliser
 
     Returns:
         dict: Statistiques par compte (moyenne, médiane, etc.)
@@ -230,60 +287,144 @@ def calculer_moyennes_strate(communes, annee, max_communes=None):
         communes = communes[:max_communes]
         print(f"MODE TEST: Limité à {max_communes} communes")
 
-    # Collecter les flux nets de toutes les communes
-    comptes_par_commune = []
-    communes_ok = 0
+    if fichier_export:
+        # Toute la strate est en mémoire : statistiques vectorisées sur la matrice communes × comptes
+        suivi = SuiviProgression(len(communes))
+        print(f"Lecture de l'export {fichier_export} (budget principal des {len(communes)} communes)...")
+        balances_export = regrouper_balances_export(
+            fichier_export, [c['siren'] for c in communes], budget_principal=True, exercice=annee
+        )
+        flux_par_commune = []
+        for commune in communes:
+            flux_nets = calculer_flux_nets_par_compte(balances_export.get(str(commune['siren']), []))
+            if flux_nets:
+                flux_par_commune.append((commune, flux_nets))
+                suivi.succes()
+            else:
+                suivi.vide()
+        suivi.resume()
+        matrice = MatriceStrate.construire(flux_par_commune)
+        nb_communes = matrice.nb_communes
+        stats_comptes = matrice.statistiques()
+    elif journal is not None:
+        # Comme sans journal, les statistiques sont alimentées commune par commune :
+        # d'abord les communes relues du journal, puis celles récupérées (journalisées à réception)
+        communes_par_siren = {str(c['siren']): c for c in communes}
+        deja_traitees = journal.sirens() & communes_par_siren.keys()
+        a_recuperer = [c for c in communes if str(c['siren']) not in deja_traitees]
+        if deja_traitees:
+            print(f"Reprise: {len(deja_traitees)} communes déjà dans le journal {journal.chemin}")
+        print(f"Récupération des balances: {len(a_recuperer)} communes, {workers} en parallèle")
+
+        accumulateur = AccumulateurStrate()
+        a_relire = set(deja_traitees)
+        for siren, flux_nets in journal.parcourir():
+            # Une commune journalisée deux fois n'est comptée qu'une fois
+            if siren in a_relire:
+                a_relire.discard(siren)
+                if flux_nets:
+                    accumulateur.ajouter(communes_par_siren[siren]['population'], flux_nets)
+
+        suivi = SuiviProgression(len(a_recuperer))
+        for commune, flux_nets in collecter_flux_nets(a_recuperer, annee, suivi, workers, url=url, client=client):
+            journal.ajouter(commune['siren'], flux_nets)
+            if flux_nets:
+                accumulateur.ajouter(commune['population'], flux_nets)
+                suivi.succes()
+            else:
+                suivi.vide()
+        suivi.resume()
+        if suivi.echecs:
+            print(f"{len(suivi.echecs)} communes en échec : relancer avec --resume pour les récupérer")
+        nb_communes = accumulateur.nb_communes
+        stats_comptes = accumulateur.statistiques()
+    else:
+        # Les flux nets de chaque commune alimentent les statistiques dès réception
+        print(f"Récupération des balances: {workers} communes en parallèle")
+        suivi = SuiviProgression(len(communes))
+        accumulateur = AccumulateurStrate()
+        for commune, flux_nets in collecter_flux_nets(communes, annee, suivi, workers, url=url, client=client):
+            if flux_nets:
+                accumulateur.ajouter(commune['population'], flux_nets)
+                suivi.succes()
+            else:
+                suivi.vide()
+        suivi.resume()
+        nb_communes = accumulateur.nb_communes
+        stats_comptes = accumulateur.statistiques()
+
+    if not nb_communes:
+        print("ERREUR: Aucune donnée récupérée")
+        return {}
 
-    for i, commune in enumerate(communes, 1):
-        print(f"  [{i}/{len(communes)}] Récupération {commune['nom']} (SIREN: {commune['siren']})...")
+    print(f"Nombre de comptes distincts: {len(stats_comptes)}")
 
-        records = fetch_balance_m57(commune['siren'], annee)
-        if records:
-            flux_nets = calculer_flux_nets_par_compte(records)
-            if flux_nets:
-                comptes_par_commune.append({
-                    "siren": commune['siren'],
-                    "population": commune['population'],
-                    "flux_nets": flux_nets
-                })
-                communes_ok += 1
+    return stats_comptes
 
-        time.sleep(0.2)  # Pause entre chaque requête
 
-    print(f"\nCommunes traitées avec succès: {communes_ok}/{len(communes)}")
+def rafraichir_strate(store, communes, annee, tranche_population, workers=WORKERS_STRATE, url=None, client=None):
+    """
+    Met à jour le store de la strate et ses statistiques
+    Seules les communes absentes du store ou dont la signature de balance a changé
+    sont téléchargées ; les statistiques sont recalculées depuis les flux nets stockés.
 
-    if not comptes_par_commune:
-        print("ERREUR: Aucune donnée récupérée")
-        return {}
+    Args:
+        store: StoreStrate
+        communes: Liste des communes de la strate
+        annee: Année budgétaire
+        tranche_population: Code de la tranche de population
+        workers: Nombre de communes récupérées en parallèle
+        url: URL de l'endpoint records (défaut: balances-comptables-des-communes-en-{annee})
+        client: ClientHTTP à utiliser
 
-    # Calculer les statistiques par compte
-    tous_comptes = set()
-    for data in comptes_par_commune:
-        tous_comptes.update(data['flux_nets'].keys())
+    Returns:
+        dict: Statistiques par compte (moyenne, médiane, etc.)
 
-    print(f"Nombre de comptes distincts: {len(tous_comptes)}")
+    Raises:
+        requests.exceptions.RequestException: si les signatures ne peuvent pas être récupérées
+    """
+    print(f"\n{'='*80}")
+    print(f"ETAPE 3: Rafraîchissement des statistiques de la strate ({store.chemin})")
+    print(f"{'='*80}")
 
-    stats_comptes = {}
-    for compte in tous_comptes:
-        valeurs = []
-        valeurs_par_hab = []
+    sirens = [str(c['siren']) for c in communes]
+    signatures = signatures_communes_serveur(sirens, annee, url=url, client=client)
+    connues = store.signatures(annee, sirens)
 
-        for data in comptes_par_commune:
-            flux = data['flux_nets'].get(compte, 0)
-            pop = data['population']
+    a_recuperer = []
+    for commune in communes:
+        siren = str(commune['siren'])
+        signature = signatures.get(siren, "")
+        if connues.get(siren) == signature:
+            continue
+        if signature:
+            a_recuperer.append(commune)
+        else:
+            # Pas de balance publiée : mémorisé pour ne pas la redemander
+            store.enregistrer_commune(annee, siren, "", {})
+    print(f"{len(communes) - len(a_recuperer)} communes à jour, {len(a_recuperer)} balances à récupérer")
+
+    if a_recuperer:
+        suivi = SuiviProgression(len(a_recuperer))
+        # Données modifiées : la réponse du cache HTTP serait périmée
+        for commune, flux_nets in collecter_flux_nets(a_recuperer, annee, suivi, workers, forcer=True,
+                                                     url=url, client=client):
+            store.enregistrer_commune(annee, commune['siren'], signatures[str(commune['siren'])], flux_nets)
+            if flux_nets:
+                suivi.succes()
+            else:
+                suivi.vide()
+        # Les communes en échec restent absentes du store : elles seront redemandées
+        suivi.resume()
 
-            if flux != 0:
-                valeurs.append(flux)
-                if pop and pop > 0:
-                    valeurs_par_hab.append(flux / pop)
+    flux_stockes = store.flux_nets(annee, sirens)
+    matrice = MatriceStrate.construire(
+        (commune, flux_stockes[str(commune['siren'])]) for commune in communes if flux_stockes.get(str(commune['siren']))
+    )
 
-        if valeurs:
-            stats_comptes[compte] = {
-                "moyenne": sum(valeurs) / len(valeurs),
-                "mediane": sorted(valeurs)[len(valeurs) // 2] if valeurs else 0,
-                "nb_communes": len(valeurs),
-                "moyenne_par_hab": sum(valeurs_par_hab) / len(valeurs_par_hab) if valeurs_par_hab else 0
-            }
+    stats_comptes = matrice.statistiques()
+    store.enregistrer_statistiques(annee, tranche_population, stats_comptes, len(communes), matrice.nb_communes)
+    print(f"{matrice.nb_communes} communes avec balance, {len(stats_comptes)} comptes distincts")
 
     return stats_comptes
 
@@ -304,6 +445,18 @@ def charger_balance_locale(fichier_balance):
     return data
 
 
+def _colonne_stats(stats, cle):
+    """Colonne des statistiques de strate alignées sur les comptes (0 si compte absent de la strate)"""
+    if cle not in stats:
+        return np.zeros(len(stats))
+    return pd.to_numeric(stats[cle], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+
+def _pourcentage(ecart, reference):
+    """Écart en % de la référence, 0 quand la référence est nulle"""
+    return np.divide(ecart * 100, reference, out=np.zeros_like(ecart), where=reference != 0)
+
+
 def creer_tableau_comparatif(balance_locale, stats_strate, info_commune, output_path):
     """
     Crée un tableau Excel comparant chaque compte avec la moyenne de la strate
@@ -318,50 +471,40 @@ def creer_tableau_comparatif(balance_locale, stats_strate, info_commune, output_
     print(f"ETAPE 4: Création du tableau comparatif")
     print(f"{'='*80}")
 
-    # Préparer les données
-    rows = []
+    # Une ligne par compte de la commune, statistiques de la strate alignées par compte
+    comptes = pd.DataFrame(balance_locale['comptes_details'])
     population = info_commune['population']
-
-    for compte_data in balance_locale['comptes_details']:
-        compte = compte_data['compte']
-        flux_net = compte_data['flux_net']
-        libelle = compte_data.get('libelle_compte', compte_data.get('libelle_officiel', ''))
-
-        # Récupérer les stats de la strate
-        stats = stats_strate.get(compte, {})
-        moyenne_strate = stats.get('moyenne', 0)
-        moyenne_par_hab_strate = stats.get('moyenne_par_hab', 0)
-        nb_communes = stats.get('nb_communes', 0)
-
-        # Calculer les indicateurs
-        flux_par_hab = flux_net / population if population else 0
-        ecart_absolu = flux_net - moyenne_strate
-        ecart_pourcent = (ecart_absolu / moyenne_strate * 100) if moyenne_strate != 0 else 0
-
-        ecart_par_hab = flux_par_hab - moyenne_par_hab_strate
-        ecart_pourcent_par_hab = (ecart_par_hab / moyenne_par_hab_strate * 100) if moyenne_par_hab_strate != 0 else 0
-
-        rows.append({
-            "Compte": compte,
-            "Libellé": libelle,
-            "Commune - Montant": flux_net,
-            "Commune - €/hab": flux_par_hab,
-            "Strate - Moyenne": moyenne_strate,
-            "Strate - €/hab": moyenne_par_hab_strate,
-            "Écart absolu": ecart_absolu,
-            "Écart %": ecart_pourcent,
-            "Écart €/hab": ecart_par_hab,
-            "Écart % par hab": ecart_pourcent_par_hab,
-            "Nb communes strate": nb_communes
-        })
-
-    # Créer le DataFrame
-    df = pd.DataFrame(rows)
+    stats = pd.DataFrame.from_dict(stats_strate, orient='index').reindex(comptes['compte'])
+
+    libelles = comptes.get('libelle_compte', pd.Series(index=comptes.index, dtype=object))
+    if 'libelle_officiel' in comptes:
+        libelles = libelles.fillna(comptes['libelle_officiel'])
+
+    flux_net = comptes['flux_net'].to_numpy(dtype=float)
+    moyenne_strate = _colonne_stats(stats, 'moyenne')
+    moyenne_par_hab_strate = _colonne_stats(stats, 'moyenne_par_hab')
+
+    # Indicateurs calculés sur toutes les lignes à la fois
+    flux_par_hab = flux_net / population if population else np.zeros_like(flux_net)
+    ecart_absolu = flux_net - moyenne_strate
+    ecart_par_hab = flux_par_hab - moyenne_par_hab_strate
+
+    df = pd.DataFrame({
+        "Compte": comptes['compte'].to_numpy(),
+        "Libellé": libelles.fillna('').to_numpy(),
+        "Commune - Montant": flux_net,
+        "Commune - €/hab": flux_par_hab,
+        "Strate - Moyenne": moyenne_strate,
+        "Strate - €/hab": moyenne_par_hab_strate,
+        "Écart absolu": ecart_absolu,
+        "Écart %": _pourcentage(ecart_absolu, moyenne_strate),
+        "Écart €/hab": ecart_par_hab,
+        "Écart % par hab": _pourcentage(ecart_par_hab, moyenne_par_hab_strate),
+        "Nb communes strate": _colonne_stats(stats, 'nb_communes').astype(int)
+    })
 
     # Trier par valeur absolue de l'écart
-    df['ecart_abs_abs'] = df['Écart absolu'].abs()
-    df = df.sort_values('ecart_abs_abs', ascending=False)
-    df = df.drop('ecart_abs_abs', axis=1)
+    df = df.sort_values('Écart absolu', key=np.abs, ascending=False, kind='stable')
 
     # Sauvegarder en Excel avec formatage
     with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
@@ -390,7 +533,7 @@ def creer_tableau_comparatif(balance_locale, stats_strate, info_commune, output_
     return df
 
 
-def creer_graphiques_top_ecarts(df, info_commune, output_dir, top_n=15):
+def creer_graphiques_top_ecarts(df, info_commune, output_dir, top_n=15, reference=None):
     """
     Crée des graphiques des plus grands écarts avec la strate
 
@@ -399,7 +542,9 @@ def creer_graphiques_top_ecarts(df, info_commune, output_dir, top_n=15):
         info_commune: Informations de la commune
         output_dir: Dossier de sortie
         top_n: Nombre de comptes à afficher
+        reference: Libellé du groupe de comparaison (défaut: "Moyenne strate <tranche>")
     """
+    reference = reference or f"Moyenne strate {info_commune['tranche_population']}"
     print(f"\n{'='*80}")
     print(f"ETAPE 5: Création des graphiques")
     print(f"{'='*80}")
@@ -417,12 +562,12 @@ def creer_graphiques_top_ecarts(df, info_commune, output_dir, top_n=15):
     x = range(len(df_top))
     width = 0.35
 
-    labels = [f"{row['Compte']}\n{row['Libellé'][:30]}..." for _, row in df_top.iterrows()]
+    labels = (df_top['Compte'].astype(str) + "\n" + df_top['Libellé'].astype(str).str[:30] + "...").tolist()
 
     ax.barh([i - width/2 for i in x], df_top['Commune - Montant'], width,
             label=info_commune['commune'], color='steelblue', alpha=0.8)
     ax.barh([i + width/2 for i in x], df_top['Strate - Moyenne'], width,
-            label=f"Moyenne strate {info_commune['tranche_population']}", color='orange', alpha=0.8)
+            label=reference, color='orange', alpha=0.8)
 
     ax.set_yticks(x)
     ax.set_yticklabels(labels, fontsize=8)
@@ -444,7 +589,7 @@ def creer_graphiques_top_ecarts(df, info_commune, output_dir, top_n=15):
     ax.barh([i - width/2 for i in x], df_top['Commune - €/hab'], width,
             label=info_commune['commune'], color='green', alpha=0.8)
     ax.barh([i + width/2 for i in x], df_top['Strate - €/hab'], width,
-            label=f"Moyenne strate {info_commune['tranche_population']}", color='red', alpha=0.8)
+            label=reference, color='red', alpha=0.8)
 
     ax.set_yticks(x)
     ax.set_yticklabels(labels, fontsize=8)
@@ -467,9 +612,27 @@ def main():
     parser.add_argument("--annee", required=True, help="Année budgétaire")
     parser.add_argument("--balance", default="balance_m57.json", help="Fichier balance local")
     parser.add_argument("--test", action="store_true", help="Mode test: limite à 10 communes")
+    parser.add_argument("--export", help="Export complet des balances de l'exercice (CSV/JSON/Parquet) à lire au lieu de l'API")
+    parser.add_argument("--workers", type=int, default=WORKERS_STRATE, help="Communes récupérées en parallèle")
+    parser.add_argument("--debit", type=float, help="Requêtes API par seconde au maximum (défaut: HTTP_DEBIT_MAX)")
+    parser.add_argument("--mode", choices=["communes", "serveur"], default="communes",
+                        help="communes: balance de chaque commune ; serveur: agrégation group_by compte côté API")
+    parser.add_argument("--store", action="store_true",
+                        help="Lire les statistiques de la strate depuis le store (STRATE_STORE), calculées si absentes")
+    parser.add_argument("--rafraichir", action="store_true",
+                        help="Mettre à jour le store : seules les communes modifiées ou manquantes sont téléchargées")
+    parser.add_argument("--journal", action="store_true",
+                        help="Journaliser les flux nets commune par commune pour pouvoir reprendre le calcul (--resume)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reprendre un calcul interrompu : les communes déjà dans le journal ne sont pas redemandées")
+    parser.add_argument("--pairs", type=int, metavar="K",
+                        help="Comparer aux K communes au profil budgétaire le plus proche au lieu de la strate")
 
     args = parser.parse_args()
 
+    if args.debit:
+        obtenir_client_http().limiteur = LimiteurDebit(args.debit)
+
     # Chemins
     base_dir = Path(__file__).parent
     fichier_balance = base_dir / "output" / args.balance
@@ -484,14 +647,83 @@ def main():
     if not info_commune:
         return
 
-    # Étape 2: Récupérer les communes de la strate
-    communes_strate = fetch_communes_strate(info_commune['tranche_population'], args.annee)
-    if not communes_strate:
-        return
-
-    # Étape 3: Calculer les moyennes de la strate
-    max_communes = 10 if args.test else None
-    stats_strate = calculer_moyennes_strate(communes_strate, args.annee, max_communes)
+    tranche = info_commune['tranche_population']
+    reference = None
+    store = None
+    if args.pairs:
+        # Le store est indexé par strate : le groupe de pairs est calculé à chaque fois
+        reference = f"Moyenne des {args.pairs} pairs"
+    elif args.store or args.rafraichir:
+        if args.test:
+            print("MODE TEST: store ignoré")
+        else:
+            store = StoreStrate()
+
+    # Statistiques déjà calculées : ni liste des communes ni balances à récupérer
+    stats_strate = None
+    methode = "pairs" if args.pairs else "store" if store else args.mode
+    if store and not args.rafraichir:
+        stats_strate = store.lire_statistiques(args.annee, tranche)
+        if stats_strate is not None:
+            infos_store = store.infos_strate(args.annee, tranche)
+            nb_communes_strate = infos_store['nb_communes_strate']
+            print(f"\nStatistiques de la strate {tranche} lues depuis le store ({len(stats_strate)} comptes, "
+                  f"calculées le {time.strftime('%Y-%m-%d %H:%M', time.localtime(infos_store['maj_le']))})")
+
+    if stats_strate is None:
+        # Étape 2: Récupérer les communes de la strate
+        if args.pairs:
+            communes_strate = fetch_pairs(args.siren, args.annee, args.pairs)
+        else:
+            communes_strate = fetch_communes_strate(tranche, args.annee)
+        if not communes_strate:
+            return
+        nb_communes_strate = len(communes_strate)
+
+        # Étape 3: Calculer les moyennes de la strate
+        max_communes = 10 if args.test else None
+        if store:
+            try:
+                stats_strate = rafraichir_strate(store, communes_strate, args.annee, tranche, args.workers)
+            except requests.exceptions.RequestException as e:
+                print(f"ERREUR signatures des balances: {e}")
+                return
+        elif args.mode == "serveur":
+            try:
+                stats_strate = calculer_moyennes_strate_serveur(communes_strate, args.annee, max_communes)
+            except requests.exceptions.RequestException as e:
+                print(f"ERREUR agrégation côté serveur: {e}")
+                return
+        else:
+            # Flux nets journalisés commune par commune (--journal, --resume) : un calcul
+            # interrompu reprend sans redemander les communes déjà reçues
+            journal = None
+            dossier_temporaire = None
+            if (args.journal or args.resume) and not args.export:
+                groupe = f"pairs{args.pairs}_{args.siren}" if args.pairs else tranche
+                if args.test:
+                    # Le journal de la strate complète n'est pas touché par un essai
+                    dossier_temporaire = tempfile.TemporaryDirectory()
+                    print("MODE TEST: journal temporaire")
+                journal = JournalStrate.pour_strate(groupe, args.annee,
+                                                    dossier_temporaire.name if dossier_temporaire else None)
+                if not args.resume:
+                    journal.reinitialiser()
+            try:
+                stats_strate = calculer_moyennes_strate(communes_strate, args.annee, max_communes, args.export,
+                                                        args.workers, journal)
+            except KeyboardInterrupt:
+                if journal and not dossier_temporaire:
+                    print(f"\nInterrompu : {len(journal.sirens())} communes enregistrées, "
+                          f"relancer avec --resume pour continuer")
+                else:
+                    print("\nInterrompu (relancer avec --journal pour pouvoir reprendre un calcul)")
+                return
+            finally:
+                if journal:
+                    journal.fermer()
+                if dossier_temporaire:
+                    dossier_temporaire.cleanup()
     if not stats_strate:
         return
 
@@ -500,7 +732,8 @@ def main():
     with open(fichier_stats, 'w', encoding='utf-8') as f:
         json.dump({
             "info_commune": info_commune,
-            "nb_communes_strate": len(communes_strate),
+            "nb_communes_strate": nb_communes_strate,
+            "methode": methode,
             "statistiques": stats_strate
         }, f, indent=2, ensure_ascii=False)
     print(f"\nStatistiques de la strate sauvegardées: {fichier_stats}")
@@ -510,7 +743,7 @@ def main():
     df_comparaison = creer_tableau_comparatif(balance_locale, stats_strate, info_commune, fichier_excel)
 
     # Étape 5: Créer les graphiques
-    creer_graphiques_top_ecarts(df_comparaison, info_commune, output_dir)
+    creer_graphiques_top_ecarts(df_comparaison, info_commune, output_dir, reference=reference)
 
     print(f"\n{'='*80}")
     print(f"TERMINÉ")
@@ -520,6 +753,9 @@ def main():
     print(f"  - Graphiques: comparaison_strate_*.png")
     print(f"  - Statistiques: stats_strate.json")
 
+    stats_http = obtenir_client_http().statistiques()
+    print(f"\nCache HTTP: {stats_http['hits']} hits, {stats_http['misses']} requêtes réseau")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,256 @@
+"""
+Lecture des exports complets OpenDataSoft des balances comptables (CSV, JSON, JSONL, Parquet)
+
+Pour les traitements nationaux ou à l'échelle d'une strate, l'export annuel complet
+(https://data.economie.gouv.fr/explore/dataset/balances-comptables-des-communes-en-{annee}/export/)
+remplace la pagination de l'API records. Le fichier est lu par blocs et filtré au fil de l'eau
+sur siren / cbudg : seules les lignes retenues sont gardées en mémoire.
+
+Les enregistrements produits ont les mêmes champs et les mêmes types que ceux de l'API
+(identifiants en texte, montants en nombres) et alimentent directement
+calculer_agregats_m57 / clean_balance_data.
+
+Usage:
+    from export_ods import charger_balance_export
+
+    records = charger_balance_export("balances-comptables-des-communes-en-2024.csv", "200053395")
+"""
+
+import csv
+import json
+from collections import defaultdict
+from pathlib import Path
+
+
+TAILLE_BLOC = 50000
+TAILLE_LECTURE = 1 << 20
+
+# Montants de la balance : convertis en nombres (le CSV ne porte pas de types)
+CHAMPS_MONTANTS = ('bedeb', 'becre', 'obnetdeb', 'obnetcre', 'onbdeb', 'onbcre', 'oobdeb', 'oobcre', 'sd', 'sc')
+
+# Identifiants : toujours en texte (un export Parquet peut les typer en entiers)
+CHAMPS_TEXTE = ('exer', 'siren', 'cbudg', 'ctype', 'cstyp', 'compte', 'ndept', 'insee', 'ident')
+
+FORMATS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+}
+
+
+def format_export(chemin):
+    """Format d'un export d'après son extension"""
+    suffixe = Path(chemin).suffix.lower()
+    if suffixe not in FORMATS:
+        raise ValueError(f"Format d'export non supporté: {suffixe}. Formats disponibles: {', '.join(FORMATS)}")
+    return FORMATS[suffixe]
+
+
+def _montant(valeur):
+    """Montant lu dans un CSV ('1234.5', '1234,5' ou vide) -> nombre"""
+    if valeur is None or isinstance(valeur, (int, float)):
+        return valeur
+    valeur = valeur.strip()
+    if not valeur:
+        return None
+    return float(valeur.replace(',', '.'))
+
+
+def normaliser_record(record):
+    """Types de l'API records : identifiants en texte, montants en nombres, champs vides à None"""
+    for champ in CHAMPS_TEXTE:
+        valeur = record.get(champ)
+        if valeur is not None and not isinstance(valeur, str):
+            record[champ] = str(valeur)
+    for champ in CHAMPS_MONTANTS:
+        if champ in record:
+            record[champ] = _montant(record[champ])
+    for champ, valeur in record.items():
+        if valeur == '':
+            record[champ] = None
+    return record
+
+
+class FiltreBalance:
+    """Filtre siren / cbudg / exercice appliqué avant la normalisation des lignes"""
+
+    def __init__(self, sirens=None, budget_principal=False, exercice=None):
+        if isinstance(sirens, (str, int)):
+            sirens = [sirens]
+        self.sirens = {str(s).replace(" ", "").strip() for s in sirens} if sirens else None
+        self.budget_principal = budget_principal
+        self.exercice = str(exercice) if exercice is not None else None
+
+    def accepte(self, siren, cbudg, exer):
+        if self.sirens is not None and str(siren) not in self.sirens:
+            return False
+        if self.budget_principal and str(cbudg) != '1':
+            return False
+        if self.exercice is not None and exer is not None and str(exer) != self.exercice:
+            return False
+        return True
+
+    def accepte_record(self, record):
+        return self.accepte(record.get('siren'), record.get('cbudg'), record.get('exer'))
+
+
+def _blocs_csv(chemin, filtre, taille_bloc):
+    with open(chemin, 'r', encoding='utf-8-sig', newline='') as f:
+        premiere_ligne = f.readline()
+        # Les exports OpenDataSoft utilisent ';' par défaut
+        separateur = ';' if premiere_ligne.count(';') >= premiere_ligne.count(',') else ','
+        colonnes = next(csv.reader([premiere_ligne], delimiter=separateur))
+        i_siren = colonnes.index('siren') if 'siren' in colonnes else None
+        i_cbudg = colonnes.index('cbudg') if 'cbudg' in colonnes else None
+        i_exer = colonnes.index('exer') if 'exer' in colonnes else None
+
+        bloc = []
+        for ligne in csv.reader(f, delimiter=separateur):
+            if not ligne:
+                continue
+            # Filtrer sur la ligne brute : seules les lignes retenues deviennent des dict
+            if not filtre.accepte(
+                ligne[i_siren] if i_siren is not None else None,
+                ligne[i_cbudg] if i_cbudg is not None else None,
+                ligne[i_exer] if i_exer is not None else None,
+            ):
+                continue
+            bloc.append(normaliser_record(dict(zip(colonnes, ligne))))
+            if len(bloc) >= taille_bloc:
+                yield bloc
+                bloc = []
+        if bloc:
+            yield bloc
+
+
+def _objets_json(chemin, taille_lecture):
+    """Objets d'un tableau JSON décodés un par un, sans charger le fichier entier"""
+    decodeur = json.JSONDecoder()
+    with open(chemin, 'r', encoding='utf-8-sig') as f:
+        tampon = ''
+        fin_fichier = False
+        while True:
+            position = 0
+            while True:
+                # Sauter blancs, virgules et crochet ouvrant entre les objets
+                while position < len(tampon) and tampon[position] in ' \t\r\n,[':
+                    position += 1
+                if position < len(tampon) and tampon[position] == ']':
+                    return
+                if position >= len(tampon):
+                    break
+                try:
+                    objet, fin = decodeur.raw_decode(tampon, position)
+                except json.JSONDecodeError:
+                    if fin_fichier:
+                        raise
+                    break  # objet incomplet : lire la suite
+                yield objet
+                position = fin
+
+            tampon = tampon[position:]
+            if fin_fichier:
+                return
+            lu = f.read(taille_lecture)
+            fin_fichier = not lu
+            tampon += lu
+
+
+def _objets_jsonl(chemin):
+    with open(chemin, 'r', encoding='utf-8-sig') as f:
+        for ligne in f:
+            if ligne.strip():
+                yield json.loads(ligne)
+
+
+def _blocs_objets(objets, filtre, taille_bloc):
+    bloc = []
+    for record in objets:
+        if not filtre.accepte_record(record):
+            continue
+        bloc.append(normaliser_record(record))
+        if len(bloc) >= taille_bloc:
+            yield bloc
+            bloc = []
+    if bloc:
+        yield bloc
+
+
+def _blocs_parquet(chemin, filtre, taille_bloc):
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "La bibliothèque 'pyarrow' n'est pas installée. "
+            "Installez-la avec : pip install pyarrow"
+        )
+
+    fichier = pq.ParquetFile(chemin)
+    sirens = pa.array(sorted(filtre.sirens)) if filtre.sirens is not None else None
+    for lot in fichier.iter_batches(batch_size=taille_bloc):
+        # Préfiltre vectorisé sur le siren avant la conversion en dict
+        if sirens is not None and 'siren' in lot.schema.names:
+            lot = lot.filter(pc.is_in(pc.cast(lot.column('siren'), pa.string()), value_set=sirens))
+        bloc = [normaliser_record(r) for r in lot.to_pylist() if filtre.accepte_record(r)]
+        if bloc:
+            yield bloc
+
+
+def iterer_blocs_export(chemin, sirens=None, budget_principal=False, exercice=None,
+                        taille_bloc=TAILLE_BLOC, taille_lecture=TAILLE_LECTURE):
+    """
+    Parcourt un export complet par blocs d'enregistrements filtrés
+
+    Args:
+        chemin: Fichier d'export (.csv, .json, .jsonl/.ndjson, .parquet)
+        sirens: SIREN ou liste de SIREN à garder (None = toutes les communes)
+        budget_principal: Ne garder que le budget principal (cbudg='1')
+        exercice: Ne garder que cet exercice (champ exer)
+        taille_bloc: Nombre maximal d'enregistrements par bloc
+        taille_lecture: Taille des lectures du fichier JSON (en caractères)
+
+    Yields:
+        list: enregistrements retenus, dans l'ordre du fichier
+    """
+    filtre = FiltreBalance(sirens, budget_principal, exercice)
+    fmt = format_export(chemin)
+
+    if fmt == 'csv':
+        yield from _blocs_csv(chemin, filtre, taille_bloc)
+    elif fmt == 'json':
+        yield from _blocs_objets(_objets_json(chemin, taille_lecture), filtre, taille_bloc)
+    elif fmt == 'jsonl':
+        yield from _blocs_objets(_objets_jsonl(chemin), filtre, taille_bloc)
+    else:
+        yield from _blocs_parquet(chemin, filtre, taille_bloc)
+
+
+def charger_balance_export(chemin, siren, budget_principal=False, exercice=None):
+    """
+    Balance d'une commune extraite d'un export complet
+
+    Returns:
+        list: enregistrements de la commune (mêmes champs que l'API records)
+    """
+    records = []
+    for bloc in iterer_blocs_export(chemin, siren, budget_principal, exercice):
+        records.extend(bloc)
+    return records
+
+
+def regrouper_balances_export(chemin, sirens, budget_principal=False, exercice=None):
+    """
+    Balances de plusieurs communes extraites en un seul parcours de l'export
+
+    Returns:
+        dict: siren -> liste des enregistrements
+    """
+    balances = defaultdict(list)
+    for bloc in iterer_blocs_export(chemin, sirens, budget_principal, exercice):
+        for record in bloc:
+            balances[record['siren']].append(record)
+    return dict(balances)
@@ -0,0 +1,92 @@
+"""
+Journal de reprise d'un calcul de strate commune par commune
+Les flux nets de chaque commune sont ajoutés au journal (une ligne JSON par commune) dès
+réception : après une erreur réseau ou un Ctrl+C, la reprise (--resume) ne redemande que les
+communes absentes du journal ; les communes déjà journalisées sont relues une à une pour
+alimenter les statistiques (le journal n'est jamais chargé en entier).
+
+Une ligne tronquée par un arrêt brutal est ignorée à la lecture.
+"""
+
+import json
+import threading
+from pathlib import Path
+
+
+DOSSIER_JOURNAUX = Path(__file__).parent / "output" / "journaux"
+
+
+class JournalStrate:
+    """Fichier JSONL en ajout seul : {"siren", "flux_nets"} par commune traitée"""
+
+    def __init__(self, chemin):
+        self.chemin = Path(chemin)
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        self._fichier = None
+        self._verrou = threading.Lock()
+
+    @classmethod
+    def pour_strate(cls, tranche_population, annee, dossier=None):
+        """Journal d'une strate pour un exercice"""
+        return cls(Path(dossier or DOSSIER_JOURNAUX) / f"strate_{tranche_population}_{annee}.jsonl")
+
+    def parcourir(self):
+        """Entrées du journal une à une : (siren, flux_nets)"""
+        if not self.chemin.exists():
+            return
+        with open(self.chemin, 'r', encoding='utf-8') as f:
+            for ligne in f:
+                try:
+                    entree = json.loads(ligne)
+                except json.JSONDecodeError:
+                    continue
+                yield entree['siren'], entree['flux_nets']
+
+    def sirens(self):
+        """SIREN des communes déjà traitées"""
+        return {siren for siren, _ in self.parcourir()}
+
+    def lire(self):
+        """Communes déjà traitées : {siren: flux_nets}"""
+        return dict(self.parcourir())
+
+    def reinitialiser(self):
+        """Vide le journal (nouveau calcul complet)"""
+        with self._verrou:
+            self._fermer()
+            self.chemin.write_text('', encoding='utf-8')
+
+    def ajouter(self, siren, flux_nets):
+        """Enregistre les flux nets d'une commune (écrit immédiatement sur disque)"""
+        ligne = json.dumps({"siren": str(siren), "flux_nets": flux_nets}, ensure_ascii=False)
+        with self._verrou:
+            if self._fichier is None:
+                self._ouvrir()
+            self._fichier.write(ligne + '\n')
+            self._fichier.flush()
+
+    def _ouvrir(self):
+        # Dernière ligne tronquée par un arrêt brutal : la terminer pour ne pas la coller à la suivante
+        termine = True
+        if self.chemin.exists() and self.chemin.stat().st_size:
+            with open(self.chemin, 'rb') as f:
+                f.seek(-1, 2)
+                termine = f.read(1) == b'\n'
+        self._fichier = open(self.chemin, 'a', encoding='utf-8')
+        if not termine:
+            self._fichier.write('\n')
+
+    def _fermer(self):
+        if self._fichier is not None:
+            self._fichier.close()
+            self._fichier = None
+
+    def fermer(self):
+        with self._verrou:
+            self._fermer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
@@ -0,0 +1,131 @@
+"""
+Strate de communes sous forme de matrice creuse communes × comptes M57
+Chaque ligne est une commune, chaque colonne un compte, les valeurs sont les flux nets
+(calculer_flux_nets_par_compte). Les statistiques de tous les comptes sont calculées
+en une passe vectorisée sur les valeurs non nulles, sans boucle Python par compte ou par commune.
+
+Les quantiles sont exacts (tri des valeurs de chaque colonne) : à utiliser quand les flux
+de la strate sont déjà en mémoire (export complet, store) ; pour un flux de communes
+au fil de l'eau, AccumulateurStrate garde une mémoire bornée.
+"""
+
+import numpy as np
+
+from stats_strate import QUANTILES
+
+
+def _sparse():
+    try:
+        from scipy import sparse
+    except ImportError:
+        raise ImportError(
+            "La bibliothèque 'scipy' n'est pas installée. "
+            "Installez-la avec : pip install scipy"
+        )
+    return sparse
+
+
+class MatriceStrate:
+    """Flux nets d'une strate : matrice CSC (communes × comptes), comptes triés"""
+
+    def __init__(self, sirens, populations, comptes, flux):
+        self.sirens = sirens
+        self.populations = populations
+        self.comptes = comptes
+        self.flux = flux
+        self.index_sirens = {siren: i for i, siren in enumerate(sirens)}
+
+    @classmethod
+    def construire(cls, flux_par_commune):
+        """
+        Matrice à partir des flux nets de chaque commune
+
+        Args:
+            flux_par_commune: Itérable de (commune, {compte: flux_net}) ; commune avec siren et population
+
+        Returns:
+            MatriceStrate: une ligne par commune, flux nuls retirés
+        """
+        sparse = _sparse()
+        sirens, populations = [], []
+        lignes, colonnes, valeurs = [], [], []
+        index_comptes = {}
+        for i, (commune, flux_nets) in enumerate(flux_par_commune):
+            sirens.append(str(commune['siren']))
+            populations.append(commune.get('population') or 0)
+            lignes.extend([i] * len(flux_nets))
+            colonnes.extend(index_comptes.setdefault(str(compte), len(index_comptes)) for compte in flux_nets)
+            valeurs.extend(flux_nets.values())
+
+        # Colonnes dans l'ordre des comptes
+        comptes = np.array(list(index_comptes), dtype=object)
+        ordre = np.argsort(comptes.astype(str), kind='stable')
+        rang = np.empty(len(ordre), dtype=np.int64)
+        rang[ordre] = np.arange(len(ordre))
+
+        lignes = np.asarray(lignes, dtype=np.int64)
+        colonnes = rang[np.asarray(colonnes, dtype=np.int64)]
+        flux = sparse.csc_matrix((np.asarray(valeurs, dtype=float), (lignes, colonnes)),
+                                 shape=(len(sirens), len(comptes)))
+        flux.sum_duplicates()
+        flux.eliminate_zeros()
+        return cls(sirens, np.asarray(populations, dtype=float), list(comptes[ordre]), flux)
+
+    @property
+    def nb_communes(self):
+        return self.flux.shape[0]
+
+    def flux_par_habitant(self):
+        """Flux nets par habitant ; lignes des communes sans population valide vides"""
+        sparse = _sparse()
+        valides = self.populations > 0
+        inverses = np.divide(1.0, self.populations, out=np.zeros_like(self.populations), where=valides)
+        par_hab = (sparse.diags(inverses) @ self.flux).tocsc()
+        par_hab.eliminate_zeros()
+        return par_hab
+
+    def statistiques(self):
+        """
+        Statistiques par compte, au format de AccumulateurStrate.statistiques
+        (moyenne, médiane, nb_communes, moyenne_par_hab, ecart_type, p10 à p90)
+        """
+        n = np.diff(self.flux.indptr)
+        presents = np.flatnonzero(n > 0)
+        if not len(presents):
+            return {}
+        colonnes = np.repeat(np.arange(len(self.comptes)), n)
+        donnees = self.flux.data
+
+        # Écart-type en deux passes : écarts à la moyenne de la colonne de chaque valeur
+        moyennes = np.bincount(colonnes, weights=donnees, minlength=len(self.comptes)) / np.maximum(n, 1)
+        m2 = np.bincount(colonnes, weights=(donnees - moyennes[colonnes]) ** 2, minlength=len(self.comptes))
+        moyennes, m2 = moyennes[presents], m2[presents]
+        ecarts_types = np.sqrt(m2 / np.maximum(n[presents] - 1, 1))
+
+        # Valeurs triées à l'intérieur de chaque colonne : quantile q au rang floor(q * n)
+        triees = donnees[np.lexsort((donnees, colonnes))]
+        debuts = self.flux.indptr[:-1][presents]
+        quantiles = {
+            q: triees[debuts + np.floor(q / 100 * n[presents]).astype(np.int64)].tolist()
+            for q in (50,) + QUANTILES
+        }
+
+        par_hab = self.flux_par_habitant()
+        n_hab = np.diff(par_hab.indptr)[presents]
+        sommes_hab = np.asarray(par_hab.sum(axis=0)).ravel()[presents]
+        moyennes_hab = np.divide(sommes_hab, n_hab, out=np.zeros_like(sommes_hab), where=n_hab > 0)
+
+        stats_comptes = {}
+        for k, j in enumerate(presents.tolist()):
+            nb = int(n[j])
+            stats = {
+                "moyenne": float(moyennes[k]),
+                "mediane": quantiles[50][k],
+                "nb_communes": nb,
+                "moyenne_par_hab": float(moyennes_hab[k]),
+                "ecart_type": float(ecarts_types[k]) if nb > 1 else None,
+            }
+            for p in QUANTILES:
+                stats[f"p{p}"] = quantiles[p][k]
+            stats_comptes[self.comptes[j]] = stats
+        return stats_comptes
@@ -0,0 +1,267 @@
+"""
+Statistiques par compte d'une strate de communes, alimentées au fil de l'eau
+Chaque commune est ajoutée dès que sa balance est disponible (ordre quelconque) :
+les moyennes ne dépendent pas de l'ordre d'arrivée.
+
+Mémoire bornée par compte, quel que soit le nombre de communes :
+    - somme exacte (sommes partielles de Shewchuk, comme math.fsum) pour la moyenne
+    - moyenne et variance de Welford pour l'écart-type
+    - sketch KLL pour les quantiles (p10, p25, p50, p75, p90), exacts tant qu'un compte
+      compte au plus K_SKETCH communes
+
+Les accumulateurs se fusionnent (fusionner) : une strate peut être traitée par morceaux
+en parallèle puis combinée.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict
+
+
+# Taille du sketch de quantiles : quantiles exacts jusqu'à K_SKETCH valeurs par compte,
+# erreur de rang de l'ordre de 1 % au-delà
+K_SKETCH = 200
+QUANTILES = (10, 25, 50, 75, 90)
+
+
+class SommeExacte:
+    """Somme flottante exacte en mémoire bornée (sommes partielles sans recouvrement)"""
+
+    def __init__(self):
+        self.partiels = []
+        self.n = 0
+
+    def ajouter(self, x):
+        i = 0
+        for y in self.partiels:
+            if abs(x) < abs(y):
+                x, y = y, x
+            haut = x + y
+            bas = y - (haut - x)
+            if bas:
+                self.partiels[i] = bas
+                i += 1
+            x = haut
+        self.partiels[i:] = [x]
+        self.n += 1
+
+    def fusionner(self, autre):
+        n = self.n
+        for x in autre.partiels:
+            self.ajouter(x)
+        self.n = n + autre.n
+
+    def valeur(self):
+        return math.fsum(self.partiels)
+
+
+class SketchQuantiles:
+    """
+    Sketch KLL : niveaux de valeurs de poids 2^h, le niveau plein est trié et une valeur
+    sur deux monte au niveau supérieur. Les capacités décroissent d'un facteur 2/3 vers
+    les niveaux bas, la mémoire totale reste de l'ordre de 3 * k valeurs.
+    """
+
+    def __init__(self, k=K_SKETCH):
+        self.k = k
+        self.n = 0
+        self.niveaux = [[]]
+        self._decalages = [0]
+        self._taille = 0
+
+    def _capacite(self, h):
+        return max(2, math.ceil(self.k * (2 / 3) ** (len(self.niveaux) - 1 - h)))
+
+    def ajouter(self, x):
+        self.niveaux[0].append(x)
+        self.n += 1
+        self._taille += 1
+        if len(self.niveaux[0]) >= self._capacite(0):
+            self._compresser()
+
+    def fusionner(self, autre):
+        while len(self.niveaux) < len(autre.niveaux):
+            self.niveaux.append([])
+            self._decalages.append(0)
+        for h, niveau in enumerate(autre.niveaux):
+            self.niveaux[h].extend(niveau)
+        self.n += autre.n
+        self._taille += autre._taille
+        self._compresser()
+
+    def _compresser(self):
+        while self._taille > sum(self._capacite(h) for h in range(len(self.niveaux))):
+            for h, niveau in enumerate(self.niveaux):
+                if len(niveau) < self._capacite(h):
+                    continue
+                if h + 1 == len(self.niveaux):
+                    self.niveaux.append([])
+                    self._decalages.append(0)
+                niveau.sort()
+                # Effectif impair : la dernière valeur reste à son niveau (poids total conservé)
+                reste = [niveau.pop()] if len(niveau) % 2 else []
+                # Décalage alterné : pas de biais systématique vers les petites ou grandes valeurs
+                decalage = self._decalages[h]
+                self._decalages[h] = 1 - decalage
+                self.niveaux[h + 1].extend(niveau[decalage::2])
+                self._taille -= len(niveau) // 2
+                self.niveaux[h] = reste
+                break
+
+    def quantile(self, q):
+        """Valeur de rang floor(q * n) (0-indexé), soit sorted(valeurs)[int(q * n)] tant que le sketch est exact"""
+        if not self.n:
+            return None
+        ponderees = sorted((x, 1 << h) for h, niveau in enumerate(self.niveaux) for x in niveau)
+        cible = q * self.n
+        cumul = 0
+        for x, poids in ponderees:
+            cumul += poids
+            if cumul > cible:
+                return x
+        return ponderees[-1][0]
+
+
+class StatistiquesCompte:
+    """Statistiques en ligne des flux nets d'un compte : somme exacte, Welford, sketch de quantiles"""
+
+    def __init__(self, k=K_SKETCH):
+        self.somme = SommeExacte()
+        self.sketch = SketchQuantiles(k)
+        self.n = 0
+        self.moyenne_welford = 0.0
+        self.m2 = 0.0
+
+    def ajouter(self, x):
+        self.n += 1
+        delta = x - self.moyenne_welford
+        self.moyenne_welford += delta / self.n
+        self.m2 += delta * (x - self.moyenne_welford)
+        self.somme.ajouter(x)
+        self.sketch.ajouter(x)
+
+    def fusionner(self, autre):
+        if not autre.n:
+            return
+        n = self.n + autre.n
+        delta = autre.moyenne_welford - self.moyenne_welford
+        self.moyenne_welford += delta * autre.n / n
+        self.m2 += autre.m2 + delta * delta * self.n * autre.n / n
+        self.n = n
+        self.somme.fusionner(autre.somme)
+        self.sketch.fusionner(autre.sketch)
+
+    def moyenne(self):
+        return self.somme.valeur() / self.n if self.n else 0
+
+    def ecart_type(self):
+        """Écart-type empirique (n - 1), None pour moins de deux valeurs"""
+        return math.sqrt(max(0.0, self.m2 / (self.n - 1))) if self.n > 1 else None
+
+
+class AccumulateurStrate:
+    """Flux nets de chaque compte collectés commune par commune"""
+
+    def __init__(self, k=K_SKETCH):
+        self.k = k
+        self.comptes = {}
+        self.par_hab = defaultdict(SommeExacte)
+        self.nb_communes = 0
+
+    def ajouter(self, population, flux_nets):
+        """Ajoute les flux nets par compte d'une commune (comptes à 0 ignorés)"""
+        for compte, flux in flux_nets.items():
+            if flux != 0:
+                if compte not in self.comptes:
+                    self.comptes[compte] = StatistiquesCompte(self.k)
+                self.comptes[compte].ajouter(flux)
+                if population and population > 0:
+                    self.par_hab[compte].ajouter(flux / population)
+        self.nb_communes += 1
+
+    def fusionner(self, autre):
+        """Ajoute les communes d'un autre accumulateur (morceau de strate traité à part)"""
+        for compte, stats in autre.comptes.items():
+            if compte not in self.comptes:
+                self.comptes[compte] = StatistiquesCompte(self.k)
+            self.comptes[compte].fusionner(stats)
+        for compte, somme in autre.par_hab.items():
+            self.par_hab[compte].fusionner(somme)
+        self.nb_communes += autre.nb_communes
+
+    def statistiques(self):
+        """
+        Statistiques par compte (moyenne, médiane, nombre de communes, moyenne par habitant,
+        écart-type et quantiles p10 à p90)
+        Sommes exactes : les moyennes ne dépendent pas de l'ordre des communes.
+        """
+        stats_comptes = {}
+        for compte in sorted(self.comptes):
+            stats = self.comptes[compte]
+            par_hab = self.par_hab.get(compte)
+            stats_comptes[compte] = {
+                "moyenne": stats.moyenne(),
+                "mediane": stats.sketch.quantile(0.5),
+                "nb_communes": stats.n,
+                "moyenne_par_hab": par_hab.valeur() / par_hab.n if par_hab and par_hab.n else 0,
+                "ecart_type": stats.ecart_type(),
+            }
+            for p in QUANTILES:
+                stats_comptes[compte][f"p{p}"] = stats.sketch.quantile(p / 100)
+        return stats_comptes
+
+
+class SuiviProgression:
+    """Progression d'un traitement commune par commune : une ligne toutes les `intervalle` secondes"""
+
+    def __init__(self, total, intervalle=5.0):
+        self.total = total
+        self.intervalle = intervalle
+        self.traitees = 0
+        self.reussies = 0
+        self.echecs = []
+        self.debut = time.monotonic()
+        self._dernier_affichage = self.debut
+        self._verrou = threading.Lock()
+
+    def succes(self):
+        with self._verrou:
+            self.traitees += 1
+            self.reussies += 1
+            self._afficher()
+
+    def vide(self):
+        """Commune sans donnée exploitable (pas une erreur)"""
+        with self._verrou:
+            self.traitees += 1
+            self._afficher()
+
+    def echec(self, commune, erreur):
+        with self._verrou:
+            self.traitees += 1
+            self.echecs.append({"siren": commune.get('siren'), "nom": commune.get('nom'), "erreur": str(erreur)})
+            self._afficher()
+
+    def _afficher(self):
+        maintenant = time.monotonic()
+        if self.traitees < self.total and maintenant - self._dernier_affichage < self.intervalle:
+            return
+        self._dernier_affichage = maintenant
+        ecoule = maintenant - self.debut
+        debit = self.traitees / ecoule if ecoule > 0 else 0
+        reste = (self.total - self.traitees) / debit if debit > 0 else 0
+        print(f"  [{self.traitees}/{self.total}] {100 * self.traitees / self.total:.0f}% - "
+              f"{self.reussies} ok, {len(self.echecs)} échecs - "
+              f"{debit:.1f} communes/s, reste ~{reste / 60:.1f} min")
+
+    def resume(self, max_echecs=10):
+        """Bilan final avec le détail des premiers échecs"""
+        print(f"\nCommunes traitées avec succès: {self.reussies}/{self.total} "
+              f"en {time.monotonic() - self.debut:.1f}s")
+        if self.echecs:
+            print(f"Échecs: {len(self.echecs)}")
+            for echec in self.echecs[:max_echecs]:
+                print(f"  - {echec['nom']} (SIREN: {echec['siren']}): {echec['erreur']}")
+            if len(self.echecs) > max_echecs:
+                print(f"  ... et {len(self.echecs) - max_echecs} autres")
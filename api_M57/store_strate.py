@@ -0,0 +1,161 @@
+"""
+Statistiques de strate précalculées, stockées dans SQLite
+Les statistiques par compte sont indexées par (exercice, tranche_population, compte) : la
+comparaison d'une commune les relit en quelques millisecondes au lieu de recalculer la strate.
+
+Les flux nets du budget principal de chaque commune sont conservés avec la signature de sa
+balance (strate_serveur.signatures_communes_serveur) : un rafraîchissement ne télécharge que
+les communes dont la signature a changé ou qui manquent, puis recalcule les statistiques
+depuis le store.
+
+Configuration via variable d'environnement :
+    STRATE_STORE=chemin/vers/strates.sqlite
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+CHEMIN_STORE_DEFAUT = Path(__file__).parent / "output" / "strates.sqlite"
+
+# Colonnes statistiques (clés de AccumulateurStrate.statistiques) après les trois colonnes de la clé
+COLONNES_STATS = ("moyenne", "mediane", "nb_communes", "moyenne_par_hab", "ecart_type",
+                  "p10", "p25", "p50", "p75", "p90")
+
+
+class StoreStrate:
+    """Flux nets par commune et statistiques par strate, par exercice"""
+
+    def __init__(self, chemin=None):
+        self.chemin = Path(chemin or os.getenv("STRATE_STORE") or CHEMIN_STORE_DEFAUT)
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        with self._connexion() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS communes (
+                    exercice INTEGER NOT NULL,
+                    siren TEXT NOT NULL,
+                    signature TEXT NOT NULL,
+                    flux_nets TEXT NOT NULL,
+                    maj_le REAL NOT NULL,
+                    PRIMARY KEY (exercice, siren)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS strates (
+                    exercice INTEGER NOT NULL,
+                    tranche_population TEXT NOT NULL,
+                    nb_communes_strate INTEGER NOT NULL,
+                    nb_communes INTEGER NOT NULL,
+                    maj_le REAL NOT NULL,
+                    PRIMARY KEY (exercice, tranche_population)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stats (
+                    exercice INTEGER NOT NULL,
+                    tranche_population TEXT NOT NULL,
+                    compte TEXT NOT NULL,
+                    moyenne REAL NOT NULL,
+                    mediane REAL,
+                    nb_communes INTEGER NOT NULL,
+                    moyenne_par_hab REAL NOT NULL,
+                    PRIMARY KEY (exercice, tranche_population, compte)
+                )
+            """)
+            # Stores créés avant l'ajout de l'écart-type et des quantiles
+            existantes = {ligne[1] for ligne in conn.execute("PRAGMA table_info(stats)")}
+            for colonne in COLONNES_STATS:
+                if colonne not in existantes:
+                    conn.execute(f"ALTER TABLE stats ADD COLUMN {colonne} REAL")
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion courte (commit + fermeture) : plusieurs processus partagent le fichier"""
+        conn = sqlite3.connect(str(self.chemin), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def signatures(self, exercice, sirens):
+        """Signatures enregistrées des communes demandées : {siren: signature}"""
+        sirens = [str(s) for s in sirens]
+        with self._connexion() as conn:
+            conn.execute("CREATE TEMP TABLE demande (siren TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO demande VALUES (?)", [(s,) for s in sirens])
+            lignes = conn.execute(
+                "SELECT c.siren, c.signature FROM communes c JOIN demande d ON d.siren = c.siren "
+                "WHERE c.exercice = ?", (int(exercice),)
+            ).fetchall()
+        return dict(lignes)
+
+    def enregistrer_commune(self, exercice, siren, signature, flux_nets):
+        """Flux nets d'une commune (vides si elle n'a pas de balance) et signature de sa balance"""
+        with self._connexion() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO communes (exercice, siren, signature, flux_nets, maj_le) VALUES (?, ?, ?, ?, ?)",
+                (int(exercice), str(siren), signature, json.dumps(flux_nets), time.time())
+            )
+
+    def flux_nets(self, exercice, sirens):
+        """Flux nets enregistrés des communes demandées : {siren: {compte: flux_net}}"""
+        sirens = [str(s) for s in sirens]
+        with self._connexion() as conn:
+            conn.execute("CREATE TEMP TABLE demande (siren TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO demande VALUES (?)", [(s,) for s in sirens])
+            lignes = conn.execute(
+                "SELECT c.siren, c.flux_nets FROM communes c JOIN demande d ON d.siren = c.siren "
+                "WHERE c.exercice = ?", (int(exercice),)
+            ).fetchall()
+        return {siren: json.loads(flux) for siren, flux in lignes}
+
+    def enregistrer_statistiques(self, exercice, tranche_population, stats_comptes, nb_communes_strate, nb_communes):
+        """Remplace les statistiques de la strate"""
+        cle = (int(exercice), str(tranche_population))
+        with self._connexion() as conn:
+            conn.execute("DELETE FROM stats WHERE exercice = ? AND tranche_population = ?", cle)
+            conn.executemany(
+                f"INSERT INTO stats (exercice, tranche_population, compte, {', '.join(COLONNES_STATS)}) "
+                f"VALUES ({', '.join('?' * (3 + len(COLONNES_STATS)))})",
+                [cle + (compte,) + tuple(s.get(colonne) for colonne in COLONNES_STATS)
+                 for compte, s in stats_comptes.items()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO strates (exercice, tranche_population, nb_communes_strate, nb_communes, maj_le) "
+                "VALUES (?, ?, ?, ?, ?)", cle + (nb_communes_strate, nb_communes, time.time())
+            )
+
+    def infos_strate(self, exercice, tranche_population):
+        """Métadonnées de la strate (nb_communes_strate, nb_communes, maj_le), None si jamais calculée"""
+        with self._connexion() as conn:
+            ligne = conn.execute(
+                "SELECT nb_communes_strate, nb_communes, maj_le FROM strates "
+                "WHERE exercice = ? AND tranche_population = ?", (int(exercice), str(tranche_population))
+            ).fetchone()
+        if ligne is None:
+            return None
+        return {"nb_communes_strate": ligne[0], "nb_communes": ligne[1], "maj_le": ligne[2]}
+
+    def lire_statistiques(self, exercice, tranche_population):
+        """
+        Statistiques par compte au format de calculer_moyennes_strate
+
+        Returns:
+            dict: {compte: {"moyenne", "mediane", "nb_communes", "moyenne_par_hab", "ecart_type", "p10", ...}},
+                None si la strate n'a jamais été calculée
+        """
+        if self.infos_strate(exercice, tranche_population) is None:
+            return None
+        with self._connexion() as conn:
+            lignes = conn.execute(
+                f"SELECT compte, {', '.join(COLONNES_STATS)} FROM stats "
+                "WHERE exercice = ? AND tranche_population = ? ORDER BY compte",
+                (int(exercice), str(tranche_population))
+            ).fetchall()
+        return {ligne[0]: dict(zip(COLONNES_STATS, ligne[1:])) for ligne in lignes}
@@ -0,0 +1,171 @@
+"""
+Moyennes de strate calculées par le moteur de requêtes OpenDataSoft
+Au lieu de télécharger la balance complète de chaque commune, une requête group_by par lot
+de communes renvoie directement, pour chaque couple (commune, compte), la somme des crédits
+et des débits : quelques requêtes paginées au lieu d'une série par commune. Les flux nets
+sont réduits côté client comme dans calculer_flux_nets_par_compte (lignes négatives de
+correction comprises, couple compté si son flux net n'est pas nul).
+
+Le jeu de données des balances est déjà propre à un exercice et ne porte pas la tranche
+de population : la strate est donc filtrée par la liste des SIREN (fetch_communes_strate).
+
+Différences avec le calcul commune par commune (calculer_moyennes_strate) :
+    - la médiane n'est pas calculée (None)
+    - moyenne_par_hab est approchée par moyenne / population moyenne de la strate
+      (les populations d'une même strate sont proches)
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from client_ods import OFFSET_MAX, recuperer_records_pagines, url_balances
+
+
+# Nombre de SIREN par requête (longueur de l'URL)
+TAILLE_LOT = 100
+# Nombre de SIREN par requête group_by (siren, compte) : quelques centaines de comptes par
+# commune, le résultat d'un lot doit tenir sous OFFSET_MAX (lot redécoupé sinon)
+TAILLE_LOT_COMPTES = 15
+WORKERS_LOTS = 4
+
+
+def _filtre_sirens(sirens):
+    return " OR ".join(f'siren="{siren}"' for siren in sirens)
+
+
+def params_agregats_comptes(sirens):
+    """Paramètres de la requête group_by (siren, compte) pour un lot de communes (budget principal)"""
+    return [
+        ("select", "siren, compte, sum(obnetcre) as credit, sum(obnetdeb) as debit"),
+        ("where", f"cbudg='1' AND (obnetcre != 0 OR obnetdeb != 0) AND ({_filtre_sirens(sirens)})"),
+        ("group_by", "siren, compte"),
+    ]
+
+
+def params_signatures_communes(sirens):
+    """Paramètres de la requête group_by siren : nombre de lignes et totaux de chaque balance"""
+    return [
+        ("select", "siren, count(*) as nb_lignes, sum(obnetcre) as credit, sum(obnetdeb) as debit, "
+                   "sum(sd) as sd, sum(sc) as sc"),
+        ("where", f"cbudg='1' AND ({_filtre_sirens(sirens)})"),
+        ("group_by", "siren"),
+    ]
+
+
+def _requetes_par_lots(sirens, annee, construire_params, taille_lot, workers, url, client, forcer=False):
+    """Exécute une requête group_by par lot de SIREN, résultats dans l'ordre des lots"""
+    url = url or url_balances(annee)
+    sirens = [str(s) for s in sirens]
+    lots = [sirens[i:i + taille_lot] for i in range(0, len(sirens), taille_lot)]
+
+    def requete_lot(lot):
+        resultats = recuperer_records_pagines(url, construire_params(lot), concurrence=1, client=client,
+                                              forcer=forcer)
+        if len(resultats) >= OFFSET_MAX and len(lot) > 1:
+            # Résultat tronqué par l'API records : lot coupé en deux
+            moitie = len(lot) // 2
+            return requete_lot(lot[:moitie]) + requete_lot(lot[moitie:])
+        return resultats
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(lots)))) as executor:
+        for i, resultats in enumerate(executor.map(requete_lot, lots), 1):
+            print(f"  Lot {i}/{len(lots)}: {len(resultats)} lignes agrégées")
+            yield resultats
+
+
+def agreger_comptes_serveur(sirens, annee, taille_lot=TAILLE_LOT_COMPTES, workers=WORKERS_LOTS, url=None,
+                            client=None):
+    """
+    Somme des flux nets et nombre de communes à flux net non nul par compte
+
+    Returns:
+        dict: {compte: {"flux_net", "nb_communes"}}
+
+    Raises:
+        requests.exceptions.RequestException: si un lot ne peut pas être récupéré
+    """
+    totaux = defaultdict(lambda: {"flux_net": 0.0, "nb_communes": 0})
+    for resultats in _requetes_par_lots(sirens, annee, params_agregats_comptes, taille_lot, workers, url, client):
+        for ligne in resultats:
+            flux_net = (ligne.get('credit') or 0) - (ligne.get('debit') or 0)
+            if flux_net != 0:
+                total = totaux[str(ligne['compte'])]
+                total["flux_net"] += flux_net
+                total["nb_communes"] += 1
+
+    return dict(totaux)
+
+
+def signatures_communes_serveur(sirens, annee, taille_lot=TAILLE_LOT, workers=WORKERS_LOTS, url=None, client=None,
+                                forcer=True):
+    """
+    Signature de la balance (budget principal) de chaque commune, sans télécharger les balances :
+    toute modification des données source change le nombre de lignes ou l'un des totaux
+    (par défaut redemandées au réseau : le cache HTTP ne doit pas masquer une mise à jour)
+
+    Returns:
+        dict: {siren: signature} (communes sans balance absentes)
+
+    Raises:
+        requests.exceptions.RequestException: si un lot ne peut pas être récupéré
+    """
+    signatures = {}
+    for resultats in _requetes_par_lots(sirens, annee, params_signatures_communes, taille_lot, workers, url, client,
+                                         forcer):
+        for ligne in resultats:
+            signatures[str(ligne['siren'])] = ":".join(
+                [str(ligne.get('nb_lignes') or 0)] +
+                [f"{ligne.get(champ) or 0:.2f}" for champ in ('credit', 'debit', 'sd', 'sc')]
+            )
+    return signatures
+
+
+def statistiques_depuis_agregats(totaux, population_moyenne):
+    """Statistiques au format de calculer_moyennes_strate à partir des sommes par compte"""
+    stats_comptes = {}
+    for compte in sorted(totaux):
+        total = totaux[compte]
+        if not total["nb_communes"]:
+            continue
+        moyenne = total["flux_net"] / total["nb_communes"]
+        stats_comptes[compte] = {
+            "moyenne": moyenne,
+            "mediane": None,
+            "nb_communes": total["nb_communes"],
+            "moyenne_par_hab": moyenne / population_moyenne if population_moyenne else 0
+        }
+    return stats_comptes
+
+
+def calculer_moyennes_strate_serveur(communes, annee, max_communes=None, url=None, client=None):
+    """
+    Statistiques par compte de la strate, agrégées côté serveur
+
+    Args:
+        communes: Liste des communes de la strate (siren, nom, population)
+        annee: Année budgétaire
+        max_communes: Limite le nombre de communes à traiter (pour tests)
+        url: URL de l'endpoint records (défaut: balances-comptables-des-communes-en-{annee})
+        client: ClientHTTP à utiliser
+
+    Returns:
+        dict: Statistiques par compte (moyenne, médiane=None, nb_communes, moyenne_par_hab)
+    """
+    print(f"\n{'='*80}")
+    print(f"ETAPE 3: Calcul des moyennes de la strate (agrégation côté serveur)")
+    print(f"{'='*80}")
+
+    if max_communes:
+        communes = communes[:max_communes]
+        print(f"MODE TEST: Limité à {max_communes} communes")
+
+    populations = [c['population'] for c in communes if c.get('population') and c['population'] > 0]
+    population_moyenne = sum(populations) / len(populations) if populations else 0
+
+    nb_lots = -(-len(communes) // TAILLE_LOT_COMPTES)
+    print(f"{len(communes)} communes, {nb_lots} requêtes group_by (siren, compte)")
+    totaux = agreger_comptes_serveur([c['siren'] for c in communes], annee, url=url, client=client)
+
+    stats_comptes = statistiques_depuis_agregats(totaux, population_moyenne)
+    print(f"Nombre de comptes distincts: {len(stats_comptes)}")
+    return stats_comptes
@@ -6,37 +6,14 @@ Valeurs attendues:
 - CAF nette : 86k€
 """
 
-import requests
 import json
 
+from agregats_m57 import TableCumulsPrefixes, comptes_terminaison_9
+from client_ods import recuperer_balance
+
 def fetch_balance_data(siren, annee):
     """Récupère les données de l'API"""
-    base_url = f"https://data.economie.gouv.fr/api/explore/v2.1/catalog/datasets/balances-comptables-des-communes-en-{annee}/records"
-
-    all_records = []
-    offset = 0
-    limit = 100
-
-    while True:
-        params = {
-            "where": f"siren={siren}",
-            "limit": limit,
-            "offset": offset
-        }
-
-        response = requests.get(base_url, params=params)
-        data = response.json()
-        records = data.get('results', [])
-
-        if not records:
-            break
-
-        all_records.extend(records)
-
-        if len(records) < limit:
-            break
-
-        offset += limit
+    all_records = recuperer_balance(siren, annee)
 
     # Filtrer budget principal
     return [r for r in all_records if r.get('cbudg') == '1']
@@ -44,42 +21,12 @@ def fetch_balance_data(siren, annee):
 def test_combinaisons(records):
     """Teste différentes combinaisons de formules"""
 
-    # Construire dictionnaires
-    comptes_dict = {}
-    for record in records:
-        compte = str(record.get('compte', ''))
-        if not compte:
-            continue
-
-        credit = record.get('obnetcre', 0) or 0
-        debit = record.get('obnetdeb', 0) or 0
-        flux_net = credit - debit
-
-        if compte not in comptes_dict:
-            comptes_dict[compte] = {'credit': 0, 'debit': 0, 'flux_net': 0}
-
-        comptes_dict[compte]['credit'] += credit
-        comptes_dict[compte]['debit'] += debit
-        comptes_dict[compte]['flux_net'] += flux_net
+    # Cumuls par préfixe construits en un seul parcours : chaque somme n'est ensuite qu'une lecture
+    table = TableCumulsPrefixes(records)
 
     def somme(prefixes, mode='flux_net', exclusions=None):
         """Somme selon le mode : 'flux_net', 'credit', ou 'debit'"""
-        if isinstance(prefixes, str):
-            prefixes = [prefixes]
-        if exclusions is None:
-            exclusions = []
-        if isinstance(exclusions, str):
-            exclusions = [exclusions]
-
-        total = 0
-        for compte, vals in comptes_dict.items():
-            if any(compte.startswith(p) for p in prefixes):
-                if not any(compte.startswith(e) for e in exclusions):
-                    total += vals[mode]
-        return round(total, 2)
-
-    def comptes_terminaison_9(classe):
-        return [f"{classe}{i}9" for i in range(10)]
+        return table.somme(mode, prefixes, exclusions)
 
     # Remboursement emprunts (constant)
     remb_emprunts = somme(['163','164','1671','1672','1675','1678','1681','1682'],
@@ -2,60 +2,34 @@
 Analyse détaillée des retraitements de la CAF
 """
 
-import requests
+from agregats_m57 import TableCumulsPrefixes, comptes_terminaison_9
+from client_ods import recuperer_balance
 
 def fetch_balance_data(siren, annee):
-    base_url = f"https://data.economie.gouv.fr/api/explore/v2.1/catalog/datasets/balances-comptables-des-communes-en-{annee}/records"
-    all_records = []
-    offset = 0
-    limit = 100
-
-    while True:
-        params = {"where": f"siren={siren}", "limit": limit, "offset": offset}
-        response = requests.get(base_url, params=params)
-        data = response.json()
-        records = data.get('results', [])
-        if not records:
-            break
-        all_records.extend(records)
-        if len(records) < limit:
-            break
-        offset += limit
+    all_records = recuperer_balance(siren, annee)
 
+    # Filtrer budget principal
     return [r for r in all_records if r.get('cbudg') == '1']
 
 def analyse_retraitements(records):
-    comptes_dict = {}
+    # Cumuls par préfixe construits en un seul parcours : chaque somme n'est ensuite qu'une lecture
+    table = TableCumulsPrefixes(records)
+
+    # Valeurs propres à chaque compte (hors sous-comptes), pour le détail des comptes à terminaison en 9
+    comptes = {}
     for record in records:
         compte = str(record.get('compte', ''))
         if not compte:
             continue
-
         credit = record.get('obnetcre', 0) or 0
         debit = record.get('obnetdeb', 0) or 0
-        flux_net = credit - debit
-
-        if compte not in comptes_dict:
-            comptes_dict[compte] = {'credit': 0, 'debit': 0, 'flux_net': 0}
-
-        comptes_dict[compte]['credit'] += credit
-        comptes_dict[compte]['debit'] += debit
-        comptes_dict[compte]['flux_net'] += flux_net
+        vals = comptes.setdefault(compte, {'credit': 0, 'debit': 0, 'flux_net': 0})
+        vals['credit'] += credit
+        vals['debit'] += debit
+        vals['flux_net'] += credit - debit
 
     def somme(prefixes, mode='flux_net', exclusions=None):
-        if isinstance(prefixes, str):
-            prefixes = [prefixes]
-        if exclusions is None:
-            exclusions = []
-        if isinstance(exclusions, str):
-            exclusions = [exclusions]
-
-        total = 0
-        for compte, vals in comptes_dict.items():
-            if any(compte.startswith(p) for p in prefixes):
-                if not any(compte.startswith(e) for e in exclusions):
-                    total += vals[mode]
-        return round(total, 2)
+        return table.somme(mode, prefixes, exclusions)
 
     print("="*80)
     print("ANALYSE DES RETRAITEMENTS CAF")
@@ -106,10 +80,10 @@ def analyse_retraitements(records):
         for j in range(10):
             c7 = f"7{i}{j}9"
             c6 = f"6{i}{j}9"
-            if c7 in comptes_dict:
-                comptes_9_classe7.append((c7, comptes_dict[c7]))
-            if c6 in comptes_dict:
-                comptes_9_classe6.append((c6, comptes_dict[c6]))
+            if c7 in comptes:
+                comptes_9_classe7.append((c7, comptes[c7]))
+            if c6 in comptes:
+                comptes_9_classe6.append((c6, comptes[c6]))
 
     if comptes_9_classe7:
         print("Comptes classe 7 à terminaison en 9 :")
@@ -128,9 +102,6 @@ def analyse_retraitements(records):
     print("TEST : CAF EN EXCLUANT LES OPÉRATIONS D'ORDRE")
     print("="*80)
 
-    def comptes_terminaison_9(classe):
-        return [f"{classe}{i}9" for i in range(10)]
-
     total_A = somme('7', 'credit') - somme(comptes_terminaison_9('7'), 'debit')
     total_B = somme('6', 'debit') - somme(comptes_terminaison_9('6'), 'credit')
 
@@ -6,8 +6,13 @@ Usage: python fetch_budget_data.py --insee CODE_INSEE --annee ANNEE
 import requests
 import json
 import argparse
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from parsers.client_http import obtenir_client_http, url_complete
+
 
 API_BASE_URL = "https://data.ofgl.fr/api/explore/v2.1/catalog/datasets/ofgl-base-communes-consolidee/records"
 
@@ -36,11 +41,8 @@ def fetch_budget_data(code_insee, annee, limit=100):
     print(f"URL: {API_BASE_URL}")
 
     try:
-        response = requests.get(API_BASE_URL, params=params)
-        print(f"URL complète: {response.url}")
-        response.raise_for_status()
-
-        data = response.json()
+        print(f"URL complète: {url_complete(API_BASE_URL, params)}")
+        data = obtenir_client_http().get_json(API_BASE_URL, params=params)
         print(f"✓ Requête réussie - {data.get('total_count', 0)} résultats trouvés")
 
         return data
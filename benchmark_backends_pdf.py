@@ -0,0 +1,163 @@
+"""
+Compare les backends d'extraction de texte PDF du parser de bilans
+Pour chaque backend (pdfplumber, PyMuPDF, pypdfium2) : débit d'extraction (pages/s)
+et parité des champs extraits par rapport à pdfplumber, backend de référence des ChampConfig.
+
+Usage:
+    python benchmark_backends_pdf.py
+    python benchmark_backends_pdf.py docs/bilans_departement --repetitions 3 --sortie output/benchmark_backends.json
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from parsers.backends_pdf import BACKENDS, BACKEND_DEFAUT, ouvrir_document_pdf
+from parsers.parser_budget_v2_complet import ParserBudget
+
+
+CORPUS_DEFAUT = ["docs/*.pdf", "docs/bilans_multi_annees/*.pdf"]
+
+
+def lister_corpus(chemins):
+    """PDFs des dossiers ou motifs glob donnés (ordre stable)"""
+    fichiers = []
+    for chemin in chemins:
+        if os.path.isdir(chemin):
+            fichiers.extend(glob.glob(os.path.join(chemin, '**', '*.pdf'), recursive=True))
+        else:
+            fichiers.extend(glob.glob(chemin))
+    return sorted(set(fichiers))
+
+
+def mesurer_backend(backend, fichiers, repetitions=1):
+    """
+    Extrait le texte de tous les fichiers avec un backend
+
+    Returns:
+        tuple: (textes par fichier, nombre de pages, durée moyenne en secondes)
+    """
+    textes = {}
+    nb_pages = 0
+    duree = 0.0
+
+    for _ in range(repetitions):
+        nb_pages = 0
+        debut = time.perf_counter()
+        for fichier in fichiers:
+            with ouvrir_document_pdf(fichier, backend) as document:
+                pages = [document.texte_page(numero) for numero in range(document.nb_pages)]
+            nb_pages += len(pages)
+            textes[fichier] = '\n'.join(t for t in pages if t)
+        duree += time.perf_counter() - debut
+
+    return textes, nb_pages, duree / repetitions
+
+
+def comparer_champs(reference, budget):
+    """Clés dont la valeur diffère (ou manque) par rapport à la référence"""
+    return sorted(cle for cle in set(reference) | set(budget) if reference.get(cle) != budget.get(cle))
+
+
+def executer_benchmark(fichiers, backends=None, repetitions=1):
+    """
+    Mesure chaque backend et compare les champs extraits à ceux du backend de référence
+
+    Returns:
+        dict: résultats par backend
+    """
+    backends = backends or list(BACKENDS)
+    if BACKEND_DEFAUT not in backends:
+        backends = [BACKEND_DEFAUT] + backends
+
+    parser = ParserBudget()
+    resultats = {}
+    budgets_reference = None
+
+    for backend in backends:
+        try:
+            textes, nb_pages, duree = mesurer_backend(backend, fichiers, repetitions)
+        except ImportError as e:
+            print(f"  [!] {backend} : {e}")
+            continue
+
+        budgets = {fichier: parser.extraire_champs(texte) for fichier, texte in textes.items()}
+        if backend == BACKEND_DEFAUT:
+            budgets_reference = budgets
+
+        divergences = {}
+        nb_champs = 0
+        nb_identiques = 0
+        for fichier, budget in budgets.items():
+            reference = budgets_reference[fichier]
+            ecarts = comparer_champs(reference, budget)
+            nb_champs += len(reference)
+            nb_identiques += len(reference) - len([c for c in ecarts if c in reference])
+            if ecarts:
+                divergences[fichier] = ecarts
+
+        resultats[backend] = {
+            "nb_fichiers": len(fichiers),
+            "nb_pages": nb_pages,
+            "duree_s": round(duree, 3),
+            "pages_par_s": round(nb_pages / duree, 1) if duree else None,
+            "parite_champs": round(nb_identiques / nb_champs, 4) if nb_champs else None,
+            "fichiers_divergents": divergences
+        }
+
+    reference = resultats.get(BACKEND_DEFAUT)
+    for resultat in resultats.values():
+        if reference and resultat['duree_s']:
+            resultat['acceleration'] = round(reference['duree_s'] / resultat['duree_s'], 1)
+
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare les backends d'extraction de texte PDF")
+    parser.add_argument("corpus", nargs="*", help="Dossiers ou motifs de PDFs (défaut: docs/*.pdf et docs/bilans_multi_annees/*.pdf)")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), help="Backends à comparer (défaut: tous)")
+    parser.add_argument("--repetitions", type=int, default=1, help="Nombre de passes de mesure")
+    parser.add_argument("--sortie", help="Fichier JSON où enregistrer les résultats")
+
+    args = parser.parse_args()
+
+    fichiers = lister_corpus(args.corpus or CORPUS_DEFAUT)
+    if not fichiers:
+        print("Aucun fichier PDF à traiter")
+        return None
+
+    # Les logs par champ du parser noieraient le tableau de résultats
+    logging.disable(logging.WARNING)
+
+    print("\n=== BENCHMARK DES BACKENDS PDF ===")
+    print(f"{len(fichiers)} fichiers, {args.repetitions} passe(s)\n")
+
+    resultats = executer_benchmark(fichiers, args.backends, args.repetitions)
+
+    print(f"{'Backend':<12} {'Pages':>6} {'Durée (s)':>10} {'Pages/s':>9} {'Accél.':>7} {'Parité':>8}")
+    for backend, r in resultats.items():
+        parite = f"{r['parite_champs'] * 100:.1f}%" if r['parite_champs'] is not None else "-"
+        print(f"{backend:<12} {r['nb_pages']:>6} {r['duree_s']:>10} {r['pages_par_s']:>9} "
+              f"{'x' + str(r.get('acceleration', '-')):>7} {parite:>8}")
+        for fichier, ecarts in r['fichiers_divergents'].items():
+            print(f"    [!] {fichier} : {', '.join(ecarts[:5])}{' ...' if len(ecarts) > 5 else ''}")
+
+    if args.sortie:
+        Path(args.sortie).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.sortie, 'w', encoding='utf-8') as f:
+            json.dump(resultats, f, ensure_ascii=False, indent=2)
+        print(f"\n[OK] Résultats enregistrés : {args.sortie}")
+
+    return resultats
+
+
+if __name__ == "__main__":
+    main()
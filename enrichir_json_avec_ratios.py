@@ -1,16 +1,20 @@
 """
 Script pour enrichir les fichiers JSON avec les ratios financiers calculés
 Détecte automatiquement si le JSON est mono-année ou multi-années
+
+Multi-années : une empreinte des agrégats de chaque année est conservée dans le JSON ; seules
+les années ajoutées ou modifiées depuis le dernier enrichissement sont recalculées, et le
+fichier n'est réécrit que si les ratios ont changé.
+
+Les ratios sont évalués par le moteur partagé du registre (registre_ratios) : d'un
+enrichissement à l'autre dans le même processus, seuls les ratios dont un agrégat a
+changé sont recalculés.
 """
 
 import json
 import os
-from ratios_financiers import (
-    enrichir_json_avec_ratios,
-    calculer_tous_les_ratios,
-    enrichir_json_multi_annees_avec_ratios,
-    calculer_tous_ratios_multi_annees
-)
+from ratios_financiers import actualiser_ratios_multi_annees
+from registre_ratios import obtenir_moteur_par_defaut
 
 
 def est_multi_annees(data):
@@ -56,16 +60,21 @@ def enrichir_fichier_json(chemin_fichier):
     else:
         print(f"\n[2/4] Sauvegarde existe déjà : {chemin_sauvegarde}")
 
-    # Calculer les ratios selon le type
+    # Calculer les ratios selon le type (commune identifiée par son fichier dans le moteur)
     print(f"\n[3/4] Calcul des ratios financiers...")
+    moteur = obtenir_moteur_par_defaut()
+    identifiant = os.path.abspath(chemin_fichier)
 
     if is_multi:
-        # Multi-années : calculer pour chaque année
-        ratios_multi = calculer_tous_ratios_multi_annees(data)
+        # Multi-années : seules les années nouvelles ou modifiées sont recalculées
+        ratios_multi, annees_recalculees = actualiser_ratios_multi_annees(data, moteur, identifiant)
+        section_ratios = ratios_multi
 
         if ratios_multi:
-            print("\n  Ratios calcules par annee :")
-            for annee, ratios in ratios_multi['ratios_par_annee'].items():
+            nb_annees = len(ratios_multi['ratios_par_annee'])
+            print(f"\n  Annees recalculees : {len(annees_recalculees)}/{nb_annees}")
+            for annee in annees_recalculees:
+                ratios = ratios_multi['ratios_par_annee'][annee]
                 print(f"\n  Annee {annee} :")
                 for nom_ratio, valeur in list(ratios.items())[:3]:  # Afficher seulement 3 ratios par année
                     if valeur is not None:
@@ -84,12 +93,10 @@ def enrichir_fichier_json(chemin_fichier):
                 else:
                     print(f"    {nom_ratio}: {debut:.1f}% -> {fin:.1f}% ({evo:+.1f} pts)")
 
-        # Enrichir le JSON multi-années
-        data_enrichie = enrichir_json_multi_annees_avec_ratios(data)
-
     else:
-        # Mono-année : calcul classique
-        ratios = calculer_tous_les_ratios(data)
+        # Mono-année : ratios de calculer_tous_les_ratios
+        moteur.charger_bilan(identifiant, metadata.get('exercice'), data)
+        ratios = moteur.ratios(identifiant, metadata.get('exercice'))
 
         print("\n  Ratios calcules :")
         for nom_ratio, valeur in ratios.items():
@@ -101,13 +108,19 @@ def enrichir_fichier_json(chemin_fichier):
             else:
                 print(f"    {nom_ratio}: N/A")
 
-        # Enrichir le JSON mono-année
-        data_enrichie = enrichir_json_avec_ratios(data)
+        section_ratios = ratios
 
-    # Sauvegarder le JSON enrichi
+    # Sauvegarder le JSON enrichi (uniquement si les ratios ont changé)
     print(f"\n[4/4] Sauvegarde du JSON enrichi : {chemin_fichier}")
-    with open(chemin_fichier, 'w', encoding='utf-8') as f:
-        json.dump(data_enrichie, f, ensure_ascii=False, indent=2)
+    if not section_ratios or data.get('ratios_financiers') == section_ratios:
+        print("  [OK] Ratios inchangés : fichier non réécrit")
+        return True
+
+    data['ratios_financiers'] = section_ratios
+    chemin_temporaire = chemin_fichier + '.tmp'
+    with open(chemin_temporaire, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(chemin_temporaire, chemin_fichier)
     print("  [OK] JSON enrichi sauvegardé")
 
     return True
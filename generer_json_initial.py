@@ -1,12 +1,35 @@
 """
 Génère le JSON initial depuis le PDF bilan.pdf
 Ce script doit être exécuté en premier dans le workflow mono-année
+
+Si COMMUNE_SIREN est défini (cf. .env.example), la comparaison au groupe des PAIRS_K communes
+au profil budgétaire le plus proche est ajoutée à côté de la moyenne de strate.
 """
 
+import os
 import sys
 sys.path.insert(0, 'src')
 
-from generators.generer_json_enrichi import generer_json_enrichi, sauvegarder_json_enrichi
+from generators.generer_json_enrichi import ajouter_benchmark_pairs, generer_json_enrichi, sauvegarder_json_enrichi
+
+
+def ajouter_pairs_si_configure(json_data):
+    """Ajoute le benchmark du groupe de pairs si COMMUNE_SIREN est défini"""
+    siren = os.getenv("COMMUNE_SIREN", "").replace(" ", "")
+    if not siren:
+        return json_data
+
+    from analysis.pairs_communes import K_PAIRS, benchmark_commune
+
+    k = int(os.getenv("PAIRS_K", K_PAIRS))
+    exercice = json_data['metadata']['exercice']
+    benchmark = benchmark_commune(siren, exercice, k)
+    if benchmark is None:
+        print(f"  [ATTENTION] Aucun profil OFGL pour SIREN {siren}, exercice {exercice} : comparaison aux pairs ignorée")
+        return json_data
+
+    print(f"  Groupe de pairs : {benchmark['k']} communes au profil le plus proche")
+    return ajouter_benchmark_pairs(json_data, benchmark)
 
 
 def main():
@@ -17,6 +40,7 @@ def main():
     print(f"[1/2] Parsing du PDF : {fichier_pdf}")
 
     json_data = generer_json_enrichi(fichier_pdf)
+    json_data = ajouter_pairs_si_configure(json_data)
 
     print(f"[2/2] Sauvegarde du JSON...")
     fichier = sauvegarder_json_enrichi(json_data)
@@ -1,6 +1,14 @@
 """
 Génère un JSON consolidé pour l'analyse multi-années
 Parse plusieurs bilans PDF et crée un JSON avec évolutions et tendances
+
+Mode ajout (nouvel exercice dans un JSON existant) : seul le nouveau PDF est parsé, les
+tendances sont mises à jour à partir des cumuls stockés (paire N→N+1 ajoutée, moyenne
+des évolutions recalculée depuis leur somme) sans relire les années précédentes.
+
+Usage:
+    python generer_json_multi_annees.py [dossier_bilans]
+    python generer_json_multi_annees.py --ajouter <bilan_pdf> [json_consolide]
 """
 
 import json
@@ -10,6 +18,26 @@ import os
 sys.path.insert(0, 'src')
 
 from analysis.analyseur_multi_annees import charger_bilans_multi_annees, detecter_tendances_et_anomalies, calculer_ratios_evolutifs
+from analysis.analyseur_multi_annees import charger_bilan_pdf, extraire_valeur_poste
+from analysis.donnees_multi_annees import DonneesMultiAnnees, FICHIER_JSON_MULTI_ANNEES
+from analysis.panel_bilans import PanelBilans
+from ratios_financiers import actualiser_ratios_multi_annees
+from registre_ratios import obtenir_moteur_par_defaut
+
+
+# Postes suivis dans tendances_globales avec leurs chemins JSON
+POSTES_TENDANCES = [
+    ("produits_fonctionnement", 'fonctionnement.produits.total'),
+    ("charges_fonctionnement", 'fonctionnement.charges.total'),
+    ("charges_personnel", 'fonctionnement.charges.charges_personnel'),
+    ("caf_brute", 'autofinancement.caf_brute'),
+    ("caf_nette", 'autofinancement.caf_nette'),
+    ("encours_dette", 'endettement.encours_total'),
+    ("depenses_equipement", 'investissement.emplois.depenses_equipement'),
+    ("emprunts_contractes", 'investissement.ressources.emprunts'),
+    ("subventions_recues", 'investissement.ressources.subventions_recues'),
+]
+CHEMIN_CAPACITE_DESENDETTEMENT = 'endettement.ratios.capacite_desendettement_annees'
 
 
 def calculer_evolution(valeur_annee_n, valeur_annee_n_moins_1):
@@ -20,47 +48,13 @@ def calculer_evolution(valeur_annee_n, valeur_annee_n_moins_1):
 
 
 def calculer_evolution_moyenne(bilans, chemin_donnee):
-    """Calcule l'évolution moyenne annuelle sur la période"""
-    valeurs = []
-    for bilan in bilans:
-        keys = chemin_donnee.split('.')
-        val = bilan['data']
-        for key in keys:
-            if isinstance(val, dict) and key in val:
-                val = val[key]
-            else:
-                val = None
-                break
-        if val is not None:
-            valeurs.append(val)
-
-    if len(valeurs) < 2:
-        return None
-
-    evolutions = []
-    for i in range(1, len(valeurs)):
-        evo = calculer_evolution(valeurs[i], valeurs[i-1])
-        if evo is not None:
-            evolutions.append(evo)
-
-    return round(sum(evolutions) / len(evolutions), 1) if evolutions else None
+    """Calcule l'évolution moyenne annuelle sur la période (bilans ou PanelBilans)"""
+    return PanelBilans.depuis(bilans, [chemin_donnee]).evolution_moyenne(chemin_donnee)
 
 
 def extraire_serie_temporelle(bilans, chemin_donnee):
-    """Extrait une série temporelle pour un poste donné"""
-    serie = {}
-    for bilan in bilans:
-        annee = bilan['annee']
-        keys = chemin_donnee.split('.')
-        val = bilan['data']
-        for key in keys:
-            if isinstance(val, dict) and key in val:
-                val = val[key]
-            else:
-                val = None
-                break
-        serie[annee] = val
-    return serie
+    """Extrait une série temporelle pour un poste donné (bilans ou PanelBilans)"""
+    return PanelBilans.depuis(bilans, [chemin_donnee]).serie(chemin_donnee)
 
 
 def calculer_evolutions_annuelles(serie_k, serie_hab):
@@ -109,12 +103,60 @@ def calculer_evolutions_annuelles(serie_k, serie_hab):
     return evolutions
 
 
-def generer_json_multi_annees_consolide(dossier_bilans, fichier_sortie="output/donnees_multi_annees.json"):
+def calculer_evolutions_capacite_desendettement(serie_annees):
+    """Évolutions année par année (N→N+1) de la capacité de désendettement (en années)"""
+    evolutions = {}
+    annees = sorted(serie_annees.keys())
+    for i in range(len(annees) - 1):
+        annee_debut = annees[i]
+        annee_fin = annees[i + 1]
+        val_debut = serie_annees.get(annee_debut)
+        val_fin = serie_annees.get(annee_fin)
+        cle = f"{annee_debut}_{annee_fin}"
+        if val_debut is not None and val_fin is not None:
+            evolutions[cle] = {
+                "evolution_annees": round(val_fin - val_debut, 1),
+                "evolution_pct": calculer_evolution(val_fin, val_debut)
+            }
+    return evolutions
+
+
+def ajouter_au_cumul(cumul, valeur):
+    """Ajoute la valeur d'un nouvel exercice au cumul des évolutions (valeurs absentes ignorées)"""
+    if valeur is None:
+        return cumul
+    evolution = calculer_evolution(valeur, cumul['derniere_valeur'])
+    if evolution is not None:
+        cumul['somme_pct'] += evolution
+        cumul['nb'] += 1
+    cumul['derniere_valeur'] = valeur
+    return cumul
+
+
+def cumuler_evolutions(valeurs):
+    """
+    Cumul des évolutions entre valeurs présentes successives (ordre chronologique)
+
+    Returns:
+        dict: {'somme_pct', 'nb', 'derniere_valeur'}, de quoi prolonger la moyenne d'un exercice
+    """
+    cumul = {'somme_pct': 0, 'nb': 0, 'derniere_valeur': None}
+    for valeur in valeurs:
+        ajouter_au_cumul(cumul, valeur)
+    return cumul
+
+
+def evolution_moyenne_depuis_cumul(cumul):
+    """Évolution moyenne annuelle (même résultat que calculer_evolution_moyenne)"""
+    return round(cumul['somme_pct'] / cumul['nb'], 1) if cumul['nb'] else None
+
+
+def generer_json_multi_annees_consolide(donnees, fichier_sortie="output/donnees_multi_annees.json"):
     """
     Génère un JSON consolidé pour l'analyse multi-années
 
     Args:
-        dossier_bilans: Dossier contenant les PDFs multi-années
+        donnees: DonneesMultiAnnees déjà chargées, ou dossier contenant les PDFs multi-années
         fichier_sortie: Fichier JSON de sortie
 
     Returns:
@@ -127,7 +169,8 @@ def generer_json_multi_annees_consolide(dossier_bilans, fichier_sortie="output/d
 
     # 1. Charger tous les bilans
     print("[1/3] Chargement des bilans...")
-    bilans = charger_bilans_multi_annees(dossier_bilans)
+    donnees = DonneesMultiAnnees.charger(donnees)
+    bilans = donnees.bilans
 
     if len(bilans) < 2:
         raise ValueError(f"Minimum 2 bilans requis (trouvés: {len(bilans)})")
@@ -156,53 +199,30 @@ def generer_json_multi_annees_consolide(dossier_bilans, fichier_sortie="output/d
         "tendances_globales": {}
     }
 
-    # Définir les postes à analyser avec leurs chemins JSON
-    postes_a_analyser = [
-        ("produits_fonctionnement", 'fonctionnement.produits.total'),
-        ("charges_fonctionnement", 'fonctionnement.charges.total'),
-        ("charges_personnel", 'fonctionnement.charges.charges_personnel'),
-        ("caf_brute", 'autofinancement.caf_brute'),
-        ("caf_nette", 'autofinancement.caf_nette'),
-        ("encours_dette", 'endettement.encours_total'),
-        ("depenses_equipement", 'investissement.emplois.depenses_equipement'),
-        ("emprunts_contractes", 'investissement.ressources.emprunts'),
-        ("subventions_recues", 'investissement.ressources.subventions_recues'),
-    ]
-
-    # Calculer les tendances pour chaque poste
-    for nom_poste, chemin_base in postes_a_analyser:
-        serie_k = extraire_serie_temporelle(bilans, f'{chemin_base}.montant_k')
-        serie_hab = extraire_serie_temporelle(bilans, f'{chemin_base}.par_hab')
-        evolution_moy = calculer_evolution_moyenne(bilans, f'{chemin_base}.montant_k')
+    # Calculer les tendances pour chaque poste (colonnes du panel année × métrique)
+    panel = donnees.panel
+    for nom_poste, chemin_base in POSTES_TENDANCES:
+        serie_k = panel.serie(f'{chemin_base}.montant_k')
+        serie_hab = panel.serie(f'{chemin_base}.par_hab')
+        evolution_moy = panel.evolution_moyenne(f'{chemin_base}.montant_k')
         evolutions_annuelles = calculer_evolutions_annuelles(serie_k, serie_hab)
 
         json_consolide["tendances_globales"][nom_poste] = {
             "serie_k": serie_k,
             "serie_hab": serie_hab,
             "evolution_moy_annuelle_pct": evolution_moy,
-            "evolutions_annuelles": evolutions_annuelles
+            "evolutions_annuelles": evolutions_annuelles,
+            # Cumuls pour le mode ajout (nouvel exercice sans relire la période)
+            "cumul_evolutions": cumuler_evolutions(serie_k.values())
         }
 
     # Poste spécial : capacité de désendettement (en années, pas en k€)
-    serie_cap_des = extraire_serie_temporelle(bilans, 'endettement.ratios.capacite_desendettement_annees')
-    evolutions_cap_des = {}
-    annees = sorted(serie_cap_des.keys())
-    for i in range(len(annees) - 1):
-        annee_debut = annees[i]
-        annee_fin = annees[i + 1]
-        val_debut = serie_cap_des.get(annee_debut)
-        val_fin = serie_cap_des.get(annee_fin)
-        cle = f"{annee_debut}_{annee_fin}"
-        if val_debut is not None and val_fin is not None:
-            evolutions_cap_des[cle] = {
-                "evolution_annees": round(val_fin - val_debut, 1),
-                "evolution_pct": calculer_evolution(val_fin, val_debut)
-            }
-
+    serie_cap_des = panel.serie(CHEMIN_CAPACITE_DESENDETTEMENT)
     json_consolide["tendances_globales"]["capacite_desendettement"] = {
         "serie_annees": serie_cap_des,
-        "evolution_moy_annuelle_pct": calculer_evolution_moyenne(bilans, 'endettement.ratios.capacite_desendettement_annees'),
-        "evolutions_annuelles": evolutions_cap_des
+        "evolution_moy_annuelle_pct": panel.evolution_moyenne(CHEMIN_CAPACITE_DESENDETTEMENT),
+        "evolutions_annuelles": calculer_evolutions_capacite_desendettement(serie_cap_des),
+        "cumul_evolutions": cumuler_evolutions(serie_cap_des.values())
     }
 
     # Ajouter les bilans annuels
@@ -221,6 +241,7 @@ def generer_json_multi_annees_consolide(dossier_bilans, fichier_sortie="output/d
         json.dump(json_consolide, f, ensure_ascii=False, indent=2)
 
     print(f"  [OK] Fichier sauvegardé : {fichier_sortie}")
+    donnees.json_consolide = json_consolide
 
     print("\n" + "="*80)
     print("GÉNÉRATION TERMINÉE")
@@ -229,14 +250,128 @@ def generer_json_multi_annees_consolide(dossier_bilans, fichier_sortie="output/d
     return json_consolide
 
 
-def main():
-    """Point d'entrée principal pour l'import depuis d'autres scripts"""
+def _ecrire_json(json_consolide, fichier_json):
+    # Écriture atomique : le JSON existant reste intact en cas d'interruption
+    fichier_tmp = f"{fichier_json}.tmp"
+    with open(fichier_tmp, 'w', encoding='utf-8') as f:
+        json.dump(json_consolide, f, ensure_ascii=False, indent=2)
+    os.replace(fichier_tmp, fichier_json)
+
+
+def ajouter_exercice_json_multi_annees(nouveau_bilan, fichier_json=FICHIER_JSON_MULTI_ANNEES):
+    """
+    Mode ajout : intègre un nouvel exercice à un JSON consolidé existant
+
+    Seul le nouvel exercice est parsé. S'il suit la dernière année du JSON, chaque tendance est
+    prolongée (série, paire N→N+1, moyenne depuis les cumuls) ; sinon (exercice déjà présent ou
+    intermédiaire) les tendances sont recalculées à partir des bilans annuels du JSON, sans parsing.
+
+    Args:
+        nouveau_bilan: PDF du nouvel exercice, ou bilan déjà chargé {'annee', 'data'}
+        fichier_json: JSON consolidé existant (réécrit en place)
+
+    Returns:
+        dict: JSON consolidé mis à jour
+
+    Raises:
+        FileNotFoundError: si le JSON consolidé n'existe pas
+    """
+    print("\n" + "="*80)
+    print("AJOUT D'UN EXERCICE AU JSON MULTI-ANNÉES")
+    print("="*80 + "\n")
+
+    print("[1/3] Chargement...")
+    with open(fichier_json, 'r', encoding='utf-8') as f:
+        json_consolide = json.load(f)
+    if not isinstance(nouveau_bilan, dict):
+        nouveau_bilan = charger_bilan_pdf(nouveau_bilan)
+    annee = int(nouveau_bilan['annee'])
+    data = nouveau_bilan['data']
+    metadata = json_consolide['metadata']
+    print(f"  [OK] JSON consolidé : {metadata['periode_debut']} -> {metadata['periode_fin']}")
+    print(f"  [OK] Exercice {annee} chargé")
+
+    print("\n[2/3] Mise à jour des tendances...")
+    tendances = json_consolide['tendances_globales']
+    cumuls_presents = all('cumul_evolutions' in t for t in tendances.values())
+
+    if annee <= int(metadata['periode_fin']) or not cumuls_presents:
+        # Exercice remplacé ou inséré, ou JSON sans cumuls : recalcul depuis les bilans du JSON
+        print(f"  Recalcul complet des tendances (sans parsing des exercices existants)")
+        bilans = [b for b in DonneesMultiAnnees.depuis_json(fichier_json).bilans if b['annee'] != annee]
+        bilans.append({'annee': annee, 'source': nouveau_bilan.get('source', 'PDF'), 'data': data})
+        ratios = json_consolide.get('ratios_financiers')
+        json_consolide = generer_json_multi_annees_consolide(
+            DonneesMultiAnnees(bilans), fichier_json
+        )
+        if ratios is not None:
+            json_consolide['ratios_financiers'], _ = actualiser_ratios_multi_annees(
+                {**json_consolide, 'ratios_financiers': ratios}, obtenir_moteur_par_defaut(), os.path.abspath(fichier_json)
+            )
+            _ecrire_json(json_consolide, fichier_json)
+        return json_consolide
+
+    annee_prec = str(metadata['periode_fin'])
+    cle_annee = str(annee)
+
+    for nom_poste, chemin_base in POSTES_TENDANCES:
+        tendance = tendances[nom_poste]
+        val_k = extraire_valeur_poste(data, f'{chemin_base}.montant_k')
+        val_hab = extraire_valeur_poste(data, f'{chemin_base}.par_hab')
+        paire = calculer_evolutions_annuelles(
+            {annee_prec: tendance['serie_k'].get(annee_prec), cle_annee: val_k},
+            {annee_prec: tendance['serie_hab'].get(annee_prec), cle_annee: val_hab}
+        )
+        tendance['serie_k'][cle_annee] = val_k
+        tendance['serie_hab'][cle_annee] = val_hab
+        tendance['evolutions_annuelles'].update(paire)
+        ajouter_au_cumul(tendance['cumul_evolutions'], val_k)
+        tendance['evolution_moy_annuelle_pct'] = evolution_moyenne_depuis_cumul(tendance['cumul_evolutions'])
+
+    tendance = tendances['capacite_desendettement']
+    val_cap_des = extraire_valeur_poste(data, CHEMIN_CAPACITE_DESENDETTEMENT)
+    tendance['evolutions_annuelles'].update(calculer_evolutions_capacite_desendettement(
+        {annee_prec: tendance['serie_annees'].get(annee_prec), cle_annee: val_cap_des}
+    ))
+    tendance['serie_annees'][cle_annee] = val_cap_des
+    ajouter_au_cumul(tendance['cumul_evolutions'], val_cap_des)
+    tendance['evolution_moy_annuelle_pct'] = evolution_moyenne_depuis_cumul(tendance['cumul_evolutions'])
+
+    metadata['periode_fin'] = annee
+    metadata['nb_annees'] += 1
+    metadata['population_fin'] = data['metadata']['population']
+    json_consolide['bilans_annuels'][cle_annee] = data
+
+    # Ratios déjà calculés (enrichir_json_avec_ratios) : seul le nouvel exercice est calculé
+    if 'ratios_financiers' in json_consolide:
+        json_consolide['ratios_financiers'], _ = actualiser_ratios_multi_annees(
+            json_consolide, obtenir_moteur_par_defaut(), os.path.abspath(fichier_json)
+        )
+
+    print(f"  [OK] {len(tendances)} tendances prolongées jusqu'à {annee}")
+
+    print(f"\n[3/3] Sauvegarde du JSON...")
+    _ecrire_json(json_consolide, fichier_json)
+    print(f"  [OK] Fichier sauvegardé : {fichier_json}")
+
+    return json_consolide
+
+
+def main(donnees=None):
+    """
+    Point d'entrée principal pour l'import depuis d'autres scripts
+    donnees : DonneesMultiAnnees déjà chargées (workflow) ; sinon les PDFs du dossier sont parsés
+    """
     dossier = "docs/bilans_multi_annees"
 
+    if len(sys.argv) > 2 and sys.argv[1] == '--ajouter':
+        fichier_json = sys.argv[3] if len(sys.argv) > 3 else FICHIER_JSON_MULTI_ANNEES
+        return ajouter_exercice_json_multi_annees(sys.argv[2], fichier_json)
+
     if len(sys.argv) > 1:
         dossier = sys.argv[1]
 
-    json_data = generer_json_multi_annees_consolide(dossier)
+    json_data = generer_json_multi_annees_consolide(donnees or dossier)
 
     print("Prochaine étape :")
     print("  → python generer_prompts_enrichis_depuis_json.py (avec support multi-années)")
@@ -0,0 +1,247 @@
+"""
+Génère les JSON enrichis d'un lot de bilans PDF en parallèle
+Parcourt un dossier (récursivement) ou un manifeste de bilans DGFiP et répartit
+generer_json_enrichi sur un pool de processus (pdfplumber est mono-thread et lié au CPU)
+
+Usage:
+    python generer_json_par_lot.py docs/bilans_departement --sortie output/lot --workers 32
+    python generer_json_par_lot.py --manifeste liste_bilans.txt --workers 16 --chunksize 8
+    python generer_json_par_lot.py docs/bilans_departement --backend pypdfium2
+
+Le manifeste est un fichier texte avec un chemin de PDF par ligne
+(lignes vides et lignes commençant par # ignorées, chemins relatifs au manifeste).
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from generators.generer_json_enrichi import generer_json_enrichi, sauvegarder_json_enrichi
+
+
+FICHIER_RESUME = "resume_lot.json"
+
+
+def lister_bilans_dossier(dossier):
+    """Liste récursivement les PDFs d'un dossier (ordre stable)"""
+    dossier = Path(dossier)
+    if not dossier.is_dir():
+        raise FileNotFoundError(f"Dossier introuvable: {dossier}")
+    return sorted(p for p in dossier.rglob('*') if p.is_file() and p.suffix.lower() == '.pdf')
+
+
+def lister_bilans_manifeste(fichier_manifeste):
+    """Lit un manifeste (un chemin de PDF par ligne)"""
+    fichier_manifeste = Path(fichier_manifeste)
+    base = fichier_manifeste.parent
+
+    pdfs = []
+    with open(fichier_manifeste, 'r', encoding='utf-8') as f:
+        for ligne in f:
+            ligne = ligne.strip()
+            if not ligne or ligne.startswith('#'):
+                continue
+            chemin = Path(ligne)
+            pdfs.append(chemin if chemin.is_absolute() else base / chemin)
+    return pdfs
+
+
+def calculer_chemin_sortie(fichier_pdf, racine, dossier_sortie):
+    """Chemin du JSON de sortie : arborescence du dossier source reproduite sous dossier_sortie"""
+    fichier_pdf = Path(fichier_pdf)
+    try:
+        relatif = fichier_pdf.resolve().relative_to(Path(racine).resolve())
+    except ValueError:
+        relatif = Path(fichier_pdf.name)
+    return Path(dossier_sortie) / relatif.with_suffix('.json')
+
+
+def _initialiser_worker(niveau_log):
+    """
+    Initialisation de chaque processus : masquer les logs INFO du parser (un message par champ)
+    en conservant les avertissements (champs non trouvés) utiles pour repérer les bilans à revoir
+    """
+    logging.disable(niveau_log)
+
+
+def _traiter_bilan(tache):
+    """
+    Parse un bilan et sauvegarde son JSON enrichi (exécuté dans un processus du pool)
+
+    Args:
+        tache: tuple (chemin du PDF, chemin du JSON de sortie)
+
+    Returns:
+        dict: compte rendu (statut 'ok' ou 'erreur')
+    """
+    fichier_pdf, fichier_sortie = tache
+    debut = time.perf_counter()
+
+    try:
+        json_data = generer_json_enrichi(str(fichier_pdf))
+
+        Path(fichier_sortie).parent.mkdir(parents=True, exist_ok=True)
+        sauvegarder_json_enrichi(json_data, str(fichier_sortie))
+
+        return {
+            "fichier": str(fichier_pdf),
+            "sortie": str(fichier_sortie),
+            "statut": "ok",
+            "commune": json_data['metadata']['commune'],
+            "exercice": json_data['metadata']['exercice'],
+            "duree_s": round(time.perf_counter() - debut, 3)
+        }
+
+    except Exception as e:
+        return {
+            "fichier": str(fichier_pdf),
+            "statut": "erreur",
+            "erreur": f"{type(e).__name__}: {e}",
+            "duree_s": round(time.perf_counter() - debut, 3)
+        }
+
+
+def generer_lot(fichiers_pdf, dossier_sortie, racine=None, workers=None, chunksize=None, verbeux=False,
+                traitement=_traiter_bilan):
+    """
+    Génère les JSON enrichis de tous les PDFs en parallèle
+    Si un processus du pool meurt (mémoire épuisée sur un gros PDF...), les PDFs non terminés
+    sont comptés en échec et le résumé est tout de même écrit.
+
+    Args:
+        fichiers_pdf: Liste des chemins de PDFs
+        dossier_sortie: Dossier où écrire un JSON par PDF et le résumé
+        racine: Dossier source (pour reproduire l'arborescence), sinon noms de fichiers seuls
+        workers: Nombre de processus (défaut: nombre de coeurs)
+        chunksize: Nombre de PDFs envoyés à la fois à un processus (défaut: automatique)
+        verbeux: Conserver les logs INFO du parser
+        traitement: Fonction exécutée par le pool pour chaque (PDF, JSON de sortie)
+
+    Returns:
+        dict: Résumé du lot (succès, échecs, durée)
+    """
+    dossier_sortie = Path(dossier_sortie)
+    dossier_sortie.mkdir(parents=True, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(fichiers_pdf) or 1))
+    if not chunksize:
+        # Quelques paquets par processus : équilibre charge / surcoût de communication
+        chunksize = max(1, len(fichiers_pdf) // (workers * 4))
+
+    if racine is None and fichiers_pdf:
+        racine = os.path.commonpath([str(Path(f).resolve().parent) for f in fichiers_pdf])
+    taches = [(str(f), str(calculer_chemin_sortie(f, racine, dossier_sortie))) for f in fichiers_pdf]
+
+    print(f"\n{len(taches)} bilans à traiter - {workers} processus, paquets de {chunksize}\n")
+
+    debut = time.perf_counter()
+    succes = []
+    echecs = []
+    niveau_log = logging.NOTSET if verbeux else logging.INFO
+
+    nb_termines = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialiser_worker, initargs=(niveau_log,)) as executor:
+        try:
+            for compte_rendu in executor.map(traitement, taches, chunksize=chunksize):
+                nb_termines += 1
+                if compte_rendu['statut'] == 'ok':
+                    succes.append(compte_rendu)
+                    print(f"  [{nb_termines}/{len(taches)}] [OK] {compte_rendu['commune']} {compte_rendu['exercice']} ({compte_rendu['duree_s']}s)")
+                else:
+                    echecs.append(compte_rendu)
+                    print(f"  [{nb_termines}/{len(taches)}] [ERREUR] {compte_rendu['fichier']} : {compte_rendu['erreur']}")
+        except BrokenProcessPool as e:
+            # Résultats rendus dans l'ordre des tâches : toutes les suivantes sont perdues
+            print(f"  [ERREUR] Processus du pool interrompu : {len(taches) - nb_termines} bilans non terminés")
+            for fichier_pdf, _ in taches[nb_termines:]:
+                echecs.append({
+                    "fichier": fichier_pdf,
+                    "statut": "erreur",
+                    "erreur": f"{type(e).__name__}: {e}",
+                    "duree_s": None
+                })
+
+    duree = time.perf_counter() - debut
+
+    resume = {
+        "date": datetime.now().isoformat(timespec='seconds'),
+        "dossier_sortie": str(dossier_sortie),
+        "workers": workers,
+        "chunksize": chunksize,
+        "nb_fichiers": len(taches),
+        "nb_succes": len(succes),
+        "nb_echecs": len(echecs),
+        "duree_s": round(duree, 2),
+        "debit_fichiers_par_s": round(len(taches) / duree, 2) if duree else None,
+        "echecs": echecs,
+        "succes": succes
+    }
+
+    with open(dossier_sortie / FICHIER_RESUME, 'w', encoding='utf-8') as f:
+        json.dump(resume, f, ensure_ascii=False, indent=2)
+
+    return resume
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère les JSON enrichis d'un lot de bilans PDF en parallèle")
+    parser.add_argument("dossier", nargs="?", help="Dossier de bilans PDF (parcouru récursivement)")
+    parser.add_argument("--manifeste", help="Fichier texte listant les PDFs à traiter (un par ligne)")
+    parser.add_argument("--sortie", default="output/lot", help="Dossier de sortie des JSON")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (défaut: nombre de coeurs)")
+    parser.add_argument("--chunksize", type=int, default=None, help="PDFs envoyés par paquet à chaque processus")
+    parser.add_argument("--verbeux", action="store_true", help="Afficher les logs détaillés du parser")
+    parser.add_argument("--backend", choices=["pdfplumber", "pymupdf", "pypdfium2"],
+                        help="Bibliothèque d'extraction du texte (défaut: BILANS_BACKEND_PDF ou pdfplumber)")
+
+    args = parser.parse_args()
+
+    if bool(args.dossier) == bool(args.manifeste):
+        parser.error("Indiquer soit un dossier, soit --manifeste")
+
+    if args.backend:
+        # Hérité par les processus du pool
+        os.environ["BILANS_BACKEND_PDF"] = args.backend
+
+    print("\n=== GÉNÉRATION JSON PAR LOT ===")
+
+    if args.manifeste:
+        fichiers_pdf = lister_bilans_manifeste(args.manifeste)
+        racine = None
+    else:
+        fichiers_pdf = lister_bilans_dossier(args.dossier)
+        racine = args.dossier
+
+    if not fichiers_pdf:
+        print("Aucun fichier PDF à traiter")
+        return None
+
+    resume = generer_lot(fichiers_pdf, args.sortie, racine=racine, workers=args.workers,
+                         chunksize=args.chunksize, verbeux=args.verbeux)
+
+    print(f"\n[OK] {resume['nb_succes']}/{resume['nb_fichiers']} bilans traités en {resume['duree_s']}s "
+          f"({resume['debit_fichiers_par_s']} fichiers/s)")
+    if resume['nb_echecs']:
+        print(f"[ERREUR] {resume['nb_echecs']} échecs (détail dans {Path(args.sortie) / FICHIER_RESUME})")
+
+    return resume
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERREUR] {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -25,12 +25,12 @@ from reportlab.lib.colors import HexColor
 import pandas as pd
 
 from analysis.analyseur_multi_annees import (
-    charger_bilans_multi_annees,
     charger_bilans_depuis_api,
     comparer_bilans_annee_par_annee,
     detecter_tendances_et_anomalies,
     calculer_ratios_evolutifs
 )
+from analysis.donnees_multi_annees import DonneesMultiAnnees
 from generators.graphiques_evolution import generer_tous_graphiques_standard
 
 
@@ -339,7 +339,7 @@ def creer_tableau_evolution(bilans: list, postes_config: list, styles, par_habit
 
 
 def generer_rapport_pdf_multi_annees(
-    dossier_bilans: str,
+    donnees,
     fichier_sortie: str = "output/rapport_multi_annees.pdf",
     fichier_excel: str = "PROMPTS_RAPPORT_COMPLET_ENRICHIS.xlsx"
 ):
@@ -347,7 +347,7 @@ def generer_rapport_pdf_multi_annees(
     Génère le rapport PDF complet d'analyse multi-années en lisant l'Excel
 
     Args:
-        dossier_bilans: Dossier contenant les PDFs des bilans
+        donnees: DonneesMultiAnnees déjà chargées, JSON consolidé ou dossier contenant les PDFs des bilans
         fichier_sortie: Chemin du PDF à générer
         fichier_excel: Fichier Excel contenant les analyses
     """
@@ -358,8 +358,9 @@ def generer_rapport_pdf_multi_annees(
     # 1. Chargement des données
     print("[ÉTAPE 1/5] Chargement des données...")
 
-    # Charger les bilans
-    bilans = charger_bilans_multi_annees(dossier_bilans)
+    # Charger les bilans (une seule fois pour tout le workflow si donnees est déjà chargé)
+    donnees = DonneesMultiAnnees.charger(donnees)
+    bilans = donnees.bilans
     print(f"  [OK] {len(bilans)} bilans chargés")
 
     # Charger l'Excel avec les analyses
@@ -391,13 +392,15 @@ def generer_rapport_pdf_multi_annees(
 
     # 2. Analyse comparative
     print("\n[ÉTAPE 2/5] Analyse comparative...")
-    comparaisons = comparer_bilans_annee_par_annee(bilans)
+    # Panel année × métrique partagé par les comparaisons, les ratios et les graphiques
+    panel = donnees.panel
+    comparaisons = comparer_bilans_annee_par_annee(panel)
     tendances = detecter_tendances_et_anomalies(comparaisons)
-    ratios = calculer_ratios_evolutifs(bilans)
+    ratios = calculer_ratios_evolutifs(panel)
 
     # 3. Génération des graphiques
     print("\n[ÉTAPE 3/5] Génération des graphiques...")
-    graphiques = generer_tous_graphiques_standard(bilans, ratios['ratios_par_annee'])
+    graphiques = generer_tous_graphiques_standard(panel, ratios['ratios_par_annee'])
 
     # 4. Construction du PDF
     print("\n[ÉTAPE 4/5] Construction du rapport PDF...")
@@ -693,13 +696,16 @@ def generer_rapport_pdf_multi_annees(
     print("="*80 + "\n")
 
 
-def generer_rapport_pdf():
-    """Point d'entrée pour l'import depuis workflow_complet.py"""
+def generer_rapport_pdf(donnees=None):
+    """
+    Point d'entrée pour l'import depuis workflow_complet.py
+    donnees : DonneesMultiAnnees déjà chargées par le workflow (sinon parsing du dossier)
+    """
     dossier = "docs/bilans_multi_annees"
     fichier_sortie = "output/rapport_analyse_multi_annees.pdf"
     fichier_excel = "PROMPTS_RAPPORT_COMPLET_ENRICHIS.xlsx"
 
-    generer_rapport_pdf_multi_annees(dossier, fichier_sortie, fichier_excel)
+    generer_rapport_pdf_multi_annees(donnees or dossier, fichier_sortie, fichier_excel)
 
 
 if __name__ == "__main__":
@@ -710,7 +716,7 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "dossier_bilans",
-        help="Dossier contenant les fichiers PDF des bilans (minimum 2)"
+        help="Dossier contenant les fichiers PDF des bilans (minimum 2) ou JSON consolidé multi-années"
     )
     parser.add_argument(
         "-o", "--output",
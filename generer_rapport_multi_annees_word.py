@@ -20,13 +20,13 @@ from docx.enum.style import WD_STYLE_TYPE
 sys.path.insert(0, 'src')
 
 from analysis.analyseur_multi_annees import (
-    charger_bilans_multi_annees,
     comparer_bilans_annee_par_annee,
     detecter_tendances_et_anomalies,
     calculer_ratios_evolutifs
 )
 import pandas as pd
 
+from analysis.donnees_multi_annees import DonneesMultiAnnees
 from generators.graphiques_evolution import generer_tous_graphiques_standard
 
 # ============================================
@@ -274,11 +274,14 @@ def ajouter_encadre_points_cles(doc, titre, points):
 # ============================================
 
 def generer_rapport_word_multi_annees(
-    dossier_bilans: str,
+    donnees,
     fichier_sortie: str = FICHIER_SORTIE,
     fichier_excel: str = "PROMPTS_RAPPORT_COMPLET_ENRICHIS.xlsx"
 ):
-    """Génère le rapport Word complet d'analyse multi-années en lisant l'Excel"""
+    """
+    Génère le rapport Word complet d'analyse multi-années en lisant l'Excel
+    donnees : DonneesMultiAnnees déjà chargées, JSON consolidé ou dossier contenant les PDFs des bilans
+    """
 
     print("\n" + "="*80)
     print("GÉNÉRATION RAPPORT D'ANALYSE MULTI-ANNÉES (WORD)")
@@ -287,8 +290,9 @@ def generer_rapport_word_multi_annees(
     # 1. Chargement des données
     print("[ÉTAPE 1/5] Chargement des données...")
 
-    # Charger les bilans
-    bilans = charger_bilans_multi_annees(dossier_bilans)
+    # Charger les bilans (une seule fois pour tout le workflow si donnees est déjà chargé)
+    donnees = DonneesMultiAnnees.charger(donnees)
+    bilans = donnees.bilans
     print(f"  [OK] {len(bilans)} bilans chargés")
 
     # Charger l'Excel avec les analyses
@@ -320,14 +324,16 @@ def generer_rapport_word_multi_annees(
 
     # 2. Analyse comparative
     print("\n[ÉTAPE 2/5] Analyse comparative...")
-    comparaisons = comparer_bilans_annee_par_annee(bilans)
+    # Panel année × métrique partagé par les comparaisons, les ratios et les graphiques
+    panel = donnees.panel
+    comparaisons = comparer_bilans_annee_par_annee(panel)
     tendances = detecter_tendances_et_anomalies(comparaisons)
-    ratios = calculer_ratios_evolutifs(bilans)
+    ratios = calculer_ratios_evolutifs(panel)
 
     # 3. Génération des graphiques
     print("\n[ÉTAPE 3/5] Génération des graphiques...")
     os.makedirs(DOSSIER_GRAPHIQUES, exist_ok=True)
-    graphiques = generer_tous_graphiques_standard(bilans, ratios['ratios_par_annee'])
+    graphiques = generer_tous_graphiques_standard(panel, ratios['ratios_par_annee'])
 
     # 4. Construction du document Word
     print("\n[ÉTAPE 4/5] Construction du rapport Word...")
@@ -610,13 +616,16 @@ def generer_rapport_word_multi_annees(
     print("="*80 + "\n")
 
 
-def generer_rapport_word():
-    """Point d'entrée pour l'import depuis workflow_complet.py"""
+def generer_rapport_word(donnees=None):
+    """
+    Point d'entrée pour l'import depuis workflow_complet.py
+    donnees : DonneesMultiAnnees déjà chargées par le workflow (sinon parsing du dossier)
+    """
     dossier = "docs/bilans_multi_annees"
     fichier_sortie = "output/rapport_analyse_multi_annees.docx"
     fichier_excel = "PROMPTS_RAPPORT_COMPLET_ENRICHIS.xlsx"
 
-    generer_rapport_word_multi_annees(dossier, fichier_sortie, fichier_excel)
+    generer_rapport_word_multi_annees(donnees or dossier, fichier_sortie, fichier_excel)
 
 
 # ============================================
@@ -629,7 +638,7 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "dossier_bilans",
-        help="Dossier contenant les fichiers PDF des bilans (minimum 2)"
+        help="Dossier contenant les fichiers PDF des bilans (minimum 2) ou JSON consolidé multi-années"
     )
     parser.add_argument(
         "-o", "--output",
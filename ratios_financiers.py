@@ -3,6 +3,12 @@ Module de calcul des ratios financiers pour l'analyse budgétaire M14/M57
 Centralise tous les calculs de ratios pour garantir cohérence et exactitude
 """
 
+import hashlib
+import json
+
+# À incrémenter quand une formule change : invalide les ratios déjà stockés dans les JSON
+VERSION_RATIOS = 1
+
 
 def calculer_ratio_charges_personnel(charges_personnel_k, charges_caf_k):
     """
@@ -151,6 +157,49 @@ def calculer_ratio_achats_externes(achats_charges_externes_k, charges_caf_k):
     return round((achats_charges_externes_k / charges_caf_k) * 100, 1)
 
 
+# Chemins des agrégats utilisés par les ratios dans le JSON enrichi
+CHEMINS_AGREGATS = {
+    'produits_caf_k': ('fonctionnement', 'produits', 'produits_caf', 'montant_k'),
+    'impots_locaux_k': ('fonctionnement', 'produits', 'impots_locaux', 'montant_k'),
+    'charges_caf_k': ('fonctionnement', 'charges', 'charges_caf', 'montant_k'),
+    'charges_personnel_k': ('fonctionnement', 'charges', 'charges_personnel', 'montant_k'),
+    'achats_charges_externes_k': ('fonctionnement', 'charges', 'achats_charges_externes', 'montant_k'),
+    'charges_financieres_k': ('fonctionnement', 'charges', 'charges_financieres', 'montant_k'),
+    'caf_brute_k': ('autofinancement', 'caf_brute', 'montant_k'),
+    'caf_nette_k': ('autofinancement', 'caf_nette', 'montant_k'),
+    'depenses_equipement_k': ('investissement', 'emplois', 'depenses_equipement', 'montant_k'),
+    'total_emplois_investissement_k': ('investissement', 'emplois', 'total_k'),
+    'remboursement_capital_k': ('investissement', 'emplois', 'remboursement_emprunts', 'montant_k'),
+    'encours_dette_k': ('endettement', 'encours_total', 'montant_k'),
+}
+
+
+# Agrégats des ratios supplémentaires (ratios_supplementaires_futurs.py) présents dans le JSON enrichi
+CHEMINS_AGREGATS_SUPPLEMENTAIRES = {
+    'population': ('metadata', 'population'),
+    'dgf_k': ('fonctionnement', 'produits', 'dgf', 'montant_k'),
+    'resultat_k': ('fonctionnement', 'resultat', 'montant_k'),
+    'emprunts_k': ('investissement', 'ressources', 'emprunts', 'montant_k'),
+    'subventions_recues_k': ('investissement', 'ressources', 'subventions_recues', 'montant_k'),
+    'annuite_k': ('endettement', 'annuite', 'montant_k'),
+    'fdr_k': ('endettement', 'fonds_roulement', 'montant_k'),
+}
+
+
+def extraire_agregats(data_json, chemins=CHEMINS_AGREGATS, defaut=0):
+    """
+    Extrait les agrégats nécessaires aux ratios d'un JSON enrichi
+    Retourne un dictionnaire {nom_agregat: valeur}, `defaut` pour les agrégats absents
+    """
+    agregats = {}
+    for nom, chemin in chemins.items():
+        noeud = data_json
+        for cle in chemin[:-1]:
+            noeud = noeud.get(cle, {})
+        agregats[nom] = noeud.get(chemin[-1], defaut)
+    return agregats
+
+
 def calculer_tous_les_ratios(data_json):
     """
     Calcule tous les ratios financiers à partir du JSON enrichi
@@ -158,22 +207,19 @@ def calculer_tous_les_ratios(data_json):
     """
 
     # Extraction des valeurs du JSON
-    produits_caf_k = data_json.get('fonctionnement', {}).get('produits', {}).get('produits_caf', {}).get('montant_k', 0)
-    impots_locaux_k = data_json.get('fonctionnement', {}).get('produits', {}).get('impots_locaux', {}).get('montant_k', 0)
-
-    charges_caf_k = data_json.get('fonctionnement', {}).get('charges', {}).get('charges_caf', {}).get('montant_k', 0)
-    charges_personnel_k = data_json.get('fonctionnement', {}).get('charges', {}).get('charges_personnel', {}).get('montant_k', 0)
-    achats_charges_externes_k = data_json.get('fonctionnement', {}).get('charges', {}).get('achats_charges_externes', {}).get('montant_k', 0)
-    charges_financieres_k = data_json.get('fonctionnement', {}).get('charges', {}).get('charges_financieres', {}).get('montant_k', 0)
-
-    caf_brute_k = data_json.get('autofinancement', {}).get('caf_brute', {}).get('montant_k', 0)
-    caf_nette_k = data_json.get('autofinancement', {}).get('caf_nette', {}).get('montant_k', 0)
-
-    depenses_equipement_k = data_json.get('investissement', {}).get('emplois', {}).get('depenses_equipement', {}).get('montant_k', 0)
-    total_emplois_investissement_k = data_json.get('investissement', {}).get('emplois', {}).get('total_k', 0)
-    remboursement_capital_k = data_json.get('investissement', {}).get('emplois', {}).get('remboursement_emprunts', {}).get('montant_k', 0)
-
-    encours_dette_k = data_json.get('endettement', {}).get('encours_total', {}).get('montant_k', 0)
+    agregats = extraire_agregats(data_json)
+    produits_caf_k = agregats['produits_caf_k']
+    impots_locaux_k = agregats['impots_locaux_k']
+    charges_caf_k = agregats['charges_caf_k']
+    charges_personnel_k = agregats['charges_personnel_k']
+    achats_charges_externes_k = agregats['achats_charges_externes_k']
+    charges_financieres_k = agregats['charges_financieres_k']
+    caf_brute_k = agregats['caf_brute_k']
+    caf_nette_k = agregats['caf_nette_k']
+    depenses_equipement_k = agregats['depenses_equipement_k']
+    total_emplois_investissement_k = agregats['total_emplois_investissement_k']
+    remboursement_capital_k = agregats['remboursement_capital_k']
+    encours_dette_k = agregats['encours_dette_k']
 
     # Calcul de tous les ratios
     ratios = {
@@ -241,10 +287,20 @@ def calculer_evolution_ratio(ratios_debut, ratios_fin, nom_ratio):
     return round(valeur_fin - valeur_debut, 1)
 
 
-def calculer_tous_ratios_multi_annees(data_json_multi):
+def _verifier_identifiant_moteur(moteur, commune):
+    """Le nom de commune des métadonnées n'est pas un identifiant (absent ou homonymes)"""
+    if moteur is not None and commune is None:
+        raise ValueError("Identifiant de commune requis pour utiliser un moteur de ratios partagé")
+
+
+def calculer_tous_ratios_multi_annees(data_json_multi, moteur=None, commune=None):
     """
     Calcule tous les ratios pour chaque année dans un JSON multi-années
 
+    moteur (optionnel) : registre_ratios.MoteurRatios partagé entre les appels ; les ratios
+    d'une année dont les agrégats n'ont pas changé ne sont alors pas recalculés
+    commune : identifiant de la commune dans le moteur (chemin du JSON...), requis avec moteur
+
     Structure attendue :
     {
         "bilans_annuels": {
@@ -282,13 +338,30 @@ def calculer_tous_ratios_multi_annees(data_json_multi):
     if len(annees) < 2:
         return None
 
+    _verifier_identifiant_moteur(moteur, commune)
+
     # Calculer les ratios pour chaque année
     ratios_par_annee = {}
     for annee in annees:
         bilan = bilans_annuels[str(annee)]
-        ratios_par_annee[str(annee)] = calculer_ratios_annee_specifique(bilan)
+        if moteur is not None:
+            moteur.charger_bilan(commune, annee, bilan)
+            ratios_par_annee[str(annee)] = moteur.ratios(commune, annee)
+        else:
+            ratios_par_annee[str(annee)] = calculer_ratios_annee_specifique(bilan)
 
-    # Calculer les évolutions
+    return {
+        'ratios_par_annee': ratios_par_annee,
+        'evolutions': calculer_evolutions_ratios(ratios_par_annee)
+    }
+
+
+def calculer_evolutions_ratios(ratios_par_annee):
+    """
+    Évolution de chaque ratio entre la première et la dernière année
+    ratios_par_annee : {"2022": {...ratios...}, "2024": {...ratios...}}
+    """
+    annees = sorted(int(a) for a in ratios_par_annee)
     premiere_annee = str(annees[0])
     derniere_annee = str(annees[-1])
     nb_annees = annees[-1] - annees[0]
@@ -313,10 +386,65 @@ def calculer_tous_ratios_multi_annees(data_json_multi):
                 'nb_annees': nb_annees
             }
 
+    return evolutions
+
+
+def empreinte_agregats(bilan_annuel):
+    """
+    Empreinte des agrégats d'une année utilisés par les ratios
+    Change si un agrégat change ou si VERSION_RATIOS est incrémentée
+    """
+    contenu = json.dumps({'version': VERSION_RATIOS, 'agregats': extraire_agregats(bilan_annuel)}, sort_keys=True)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()[:16]
+
+
+def actualiser_ratios_multi_annees(data_json_multi, moteur=None, commune=None):
+    """
+    Calcule les ratios multi-années en réutilisant ceux déjà présents dans le JSON
+    Seules les années ajoutées ou dont l'empreinte des agrégats a changé sont recalculées ;
+    les empreintes sont conservées dans ratios_financiers['empreintes_agregats']
+    moteur, commune : comme pour calculer_tous_ratios_multi_annees (seuls les ratios des
+    agrégats modifiés d'une année recalculée sont alors réévalués)
+
+    Retourne (ratios_multi, annees_recalculees) ; ratios_multi vaut None si moins de 2 années
+    """
+    bilans_annuels = data_json_multi.get('bilans_annuels', {})
+    annees = sorted(int(a) for a in bilans_annuels)
+    if len(annees) < 2:
+        return None, []
+
+    precedent = data_json_multi.get('ratios_financiers') or {}
+    anciens_ratios = precedent.get('ratios_par_annee', {})
+    anciennes_empreintes = precedent.get('empreintes_agregats', {})
+    _verifier_identifiant_moteur(moteur, commune)
+
+    ratios_par_annee = {}
+    empreintes = {}
+    annees_recalculees = []
+    for annee in annees:
+        bilan = bilans_annuels[str(annee)]
+        empreintes[str(annee)] = empreinte_agregats(bilan)
+        if anciennes_empreintes.get(str(annee)) == empreintes[str(annee)] and str(annee) in anciens_ratios:
+            ratios_par_annee[str(annee)] = anciens_ratios[str(annee)]
+            continue
+        if moteur is not None:
+            moteur.charger_bilan(commune, annee, bilan)
+            ratios_par_annee[str(annee)] = moteur.ratios(commune, annee)
+        else:
+            ratios_par_annee[str(annee)] = calculer_ratios_annee_specifique(bilan)
+        annees_recalculees.append(str(annee))
+
+    # Les évolutions ne dépendent que des années extrêmes
+    if not annees_recalculees and set(ratios_par_annee) == set(anciens_ratios) and 'evolutions' in precedent:
+        evolutions = precedent['evolutions']
+    else:
+        evolutions = calculer_evolutions_ratios(ratios_par_annee)
+
     return {
         'ratios_par_annee': ratios_par_annee,
-        'evolutions': evolutions
-    }
+        'evolutions': evolutions,
+        'empreintes_agregats': empreintes
+    }, annees_recalculees
 
 
 def enrichir_json_multi_annees_avec_ratios(data_json_multi):
@@ -0,0 +1,158 @@
+"""
+Moteur de ratios vectorisé : tous les ratios financiers pour un panel (commune, exercice)
+Mêmes formules et mêmes clés que ratios_financiers.calculer_tous_les_ratios (et, en option,
+que les ratios de ratios_supplementaires_futurs.py), calculées colonne par colonne avec NumPy
+au lieu d'une boucle Python par JSON.
+
+Règles identiques aux fonctions scalaires :
+    - dénominateur nul ou absent : ratio absent (NaN dans le DataFrame, None dans les dictionnaires)
+    - mêmes arrondis (1 décimale, 2 pour le taux d'intérêt, 0 pour les €/hab)
+L'arrondi NumPy (au demi pair sur la valeur binaire) peut différer de round() d'une unité
+sur le dernier chiffre dans de rares cas limites.
+
+Usage:
+    from ratios_vectorises import agregats_depuis_bilans, calculer_ratios_vectorises
+
+    agregats = agregats_depuis_bilans({("200053395", 2023): data_json, ...})
+    ratios = calculer_ratios_vectorises(agregats)          # une ligne par (commune, exercice)
+"""
+
+import numpy as np
+import pandas as pd
+
+from ratios_financiers import CHEMINS_AGREGATS, CHEMINS_AGREGATS_SUPPLEMENTAIRES, extraire_agregats
+
+
+# Absents du JSON enrichi : colonnes à fournir dans le panel, ratios absents sinon
+AGREGATS_HORS_JSON = ('tresorerie_k', 'fiscalite_reversee_k')
+
+
+def _colonne(agregats, nom, nb_lignes):
+    """Colonne d'agrégat en float (None -> NaN), NaN partout si l'agrégat n'est pas fourni"""
+    if nom not in agregats:
+        return np.full(nb_lignes, np.nan)
+    return pd.to_numeric(pd.Series(agregats[nom]), errors='coerce').to_numpy(dtype=float)
+
+
+def _ratio(numerateur, denominateur, facteur=100.0, decimales=1):
+    """(numerateur / denominateur) * facteur, NaN si le dénominateur est nul ou absent"""
+    valide = np.isfinite(denominateur) & (denominateur != 0)
+    quotient = np.divide(numerateur, denominateur, out=np.full(len(denominateur), np.nan), where=valide)
+    return np.round(quotient * facteur, decimales)
+
+
+def _par_habitant(montant_k, population):
+    """Montant en k€ ramené en €/hab (arrondi à l'euro)"""
+    valide = np.isfinite(population) & (population != 0)
+    return np.round(np.divide(montant_k * 1000, population, out=np.full(len(population), np.nan), where=valide), 0)
+
+
+def _nb_lignes(agregats):
+    if isinstance(agregats, pd.DataFrame):
+        return len(agregats)
+    return len(next(iter(agregats.values()))) if agregats else 0
+
+
+def calculer_ratios_vectorises(agregats, supplementaires=False):
+    """
+    Calcule tous les ratios pour chaque ligne d'un panel d'agrégats
+
+    Args:
+        agregats: DataFrame ou dict {nom_agregat: tableau}, une ligne par (commune, exercice),
+                  colonnes nommées comme ratios_financiers.CHEMINS_AGREGATS
+                  (et CHEMINS_AGREGATS_SUPPLEMENTAIRES, AGREGATS_HORS_JSON si supplementaires=True)
+        supplementaires: ajoute les ratios de ratios_supplementaires_futurs.py
+
+    Returns:
+        DataFrame: une colonne par ratio (clés de calculer_tous_les_ratios), même index que l'entrée
+    """
+    n = _nb_lignes(agregats)
+    col = {nom: _colonne(agregats, nom, n) for nom in CHEMINS_AGREGATS}
+    sans_nan = {nom: np.nan_to_num(valeurs) for nom, valeurs in col.items()}
+
+    produits_caf = col['produits_caf_k']
+    charges_caf = col['charges_caf_k']
+    caf_brute = col['caf_brute_k']
+    caf_nette = col['caf_nette_k']
+    depenses_equipement = col['depenses_equipement_k']
+
+    taux_couverture = _ratio(caf_nette, depenses_equipement)
+    ratios = {
+        'part_charges_personnel_pct': _ratio(col['charges_personnel_k'], charges_caf),
+        'taux_epargne_brute_pct': _ratio(caf_brute, produits_caf),
+        'taux_epargne_nette_pct': _ratio(caf_nette, produits_caf),
+        'capacite_desendettement_annees': _ratio(col['encours_dette_k'], caf_brute, facteur=1.0),
+        'ratio_endettement_pct': _ratio(col['encours_dette_k'], produits_caf),
+        'ratio_effort_equipement_pct': _ratio(depenses_equipement, produits_caf),
+        'ratio_autonomie_fiscale_pct': _ratio(col['impots_locaux_k'], produits_caf),
+        'ratio_rigidite_fonctionnement_pct': _ratio(
+            sans_nan['charges_personnel_k'] + sans_nan['charges_financieres_k'], produits_caf
+        ),
+        'coefficient_mobilisation_caf_pct': _ratio(col['remboursement_capital_k'], caf_brute),
+        'taux_couverture_depenses_equipement_pct': taux_couverture,
+        'taux_autofinancement_investissement_productif_pct': _ratio(
+            caf_nette, sans_nan['total_emplois_investissement_k'] - sans_nan['remboursement_capital_k']
+        ),
+        'part_achats_externes_pct': _ratio(col['achats_charges_externes_k'], charges_caf),
+        # DEPRECATED : Ancien nom conservé pour rétrocompatibilité
+        'taux_couverture_investissement_pct': taux_couverture,
+    }
+
+    if supplementaires:
+        sup = {nom: _colonne(agregats, nom, n) for nom in (*CHEMINS_AGREGATS_SUPPLEMENTAIRES, *AGREGATS_HORS_JSON)}
+        population = sup['population']
+        impots_locaux = col['impots_locaux_k']
+        fiscalite_reversee = sup['fiscalite_reversee_k']
+        ratios.update({
+            'ratio_dependance_dotations_pct': _ratio(sup['dgf_k'], produits_caf),
+            'ratio_pression_fiscale_eur_hab': _par_habitant(impots_locaux, population),
+            'ratio_productivite_personnel_eur_hab': _par_habitant(col['charges_personnel_k'], population),
+            'ratio_charges_gestion_pct': _ratio(col['achats_charges_externes_k'], produits_caf),
+            'taux_subventionnement_investissement_pct': _ratio(sup['subventions_recues_k'], depenses_equipement),
+            'ratio_investissement_par_habitant_eur_hab': _par_habitant(depenses_equipement, population),
+            'ratio_financement_externe_investissement_pct': _ratio(
+                np.nan_to_num(sup['emprunts_k']) + np.nan_to_num(sup['subventions_recues_k']), depenses_equipement
+            ),
+            'taux_interet_moyen_dette_pct': _ratio(col['charges_financieres_k'], col['encours_dette_k'], decimales=2),
+            'ratio_annuite_dette_pct': _ratio(sup['annuite_k'], produits_caf),
+            'duree_moyenne_vie_dette_annees': _ratio(col['encours_dette_k'], col['remboursement_capital_k'], facteur=1.0),
+            'ratio_liquidite_pct': _ratio(sup['tresorerie_k'], charges_caf),
+            'ratio_fonds_roulement_pct': _ratio(sup['fdr_k'], charges_caf),
+            'marge_autofinancement_brute_pct': _ratio(caf_brute, produits_caf),
+            'ratio_resultat_fonctionnement_pct': _ratio(sup['resultat_k'], produits_caf),
+            'ratio_reversement_intercommunalite_pct': _ratio(fiscalite_reversee, impots_locaux),
+            'ratio_integration_fiscale_pct': _ratio(fiscalite_reversee, produits_caf),
+        })
+
+    index = agregats.index if isinstance(agregats, pd.DataFrame) else None
+    return pd.DataFrame(ratios, index=index)
+
+
+def agregats_depuis_bilans(bilans, supplementaires=False):
+    """
+    Panel d'agrégats à partir de JSON enrichis
+
+    Args:
+        bilans: dict {cle: data_json}, par exemple {(siren, exercice): data_json}
+                ou les bilans_annuels d'un JSON multi-années ({"2023": data_json})
+        supplementaires: extrait aussi les agrégats des ratios supplémentaires
+
+    Returns:
+        DataFrame: une ligne par bilan (index = clés de `bilans`), une colonne par agrégat
+    """
+    cles = list(bilans)
+    lignes = []
+    for cle in cles:
+        agregats = extraire_agregats(bilans[cle])
+        if supplementaires:
+            agregats.update(extraire_agregats(bilans[cle], CHEMINS_AGREGATS_SUPPLEMENTAIRES, defaut=None))
+        lignes.append(agregats)
+    index = pd.MultiIndex.from_tuples(cles) if cles and isinstance(cles[0], tuple) else cles
+    colonnes = list(CHEMINS_AGREGATS) + (list(CHEMINS_AGREGATS_SUPPLEMENTAIRES) if supplementaires else [])
+    return pd.DataFrame(lignes, index=index, columns=colonnes)
+
+
+def ratios_en_dicts(ratios):
+    """Convertit le DataFrame de ratios en {cle: {nom_ratio: valeur ou None}} (format de calculer_tous_les_ratios)"""
+    valeurs = ratios.astype(object).where(ratios.notna(), None)
+    return {cle: ligne for cle, ligne in zip(valeurs.index, valeurs.to_dict('records'))}
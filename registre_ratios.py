@@ -0,0 +1,255 @@
+"""
+Registre des ratios financiers avec évaluation paresseuse et mémorisée
+Chaque ratio déclare les agrégats qu'il utilise (entrées) et les ratios ou valeurs intermédiaires
+dont il dépend ; les formules restent celles de ratios_financiers.py et ratios_supplementaires_futurs.py.
+
+Le moteur ne calcule que les ratios demandés (et leurs dépendances), une seule fois par
+(commune, exercice). Quand les agrégats d'un exercice sont rechargés, seuls les ratios qui
+dépendent (directement ou non) d'un agrégat modifié sont invalidés.
+
+Les scripts d'enrichissement (enrichir_json_avec_ratios, generer_json_multi_annees) partagent
+le moteur du processus (obtenir_moteur_par_defaut), la commune y étant identifiée par le
+chemin de son JSON.
+
+Usage:
+    from registre_ratios import MoteurRatios
+
+    moteur = MoteurRatios()
+    moteur.charger_bilan("200053395", 2023, data_json)
+    moteur.ratios("200053395", 2023, ["capacite_desendettement_annees", "taux_epargne_nette_pct"])
+"""
+
+import threading
+
+import ratios_financiers as rf
+import ratios_supplementaires_futurs as rs
+from ratios_financiers import CHEMINS_AGREGATS_SUPPLEMENTAIRES, extraire_agregats
+
+
+class RatioDeclare:
+    """Ratio (ou valeur intermédiaire) du registre"""
+
+    def __init__(self, nom, fonction, entrees=(), dependances=(), accepte_absents=False):
+        self.nom = nom
+        self.fonction = fonction
+        self.entrees = tuple(entrees)
+        self.dependances = tuple(dependances)
+        # La fonction reçoit les entrées puis les dépendances, dans l'ordre déclaré
+        # False : une entrée absente (None) rend le ratio absent au lieu d'appeler la fonction
+        self.accepte_absents = accepte_absents
+
+
+class RegistreRatios:
+    """Graphe des ratios : entrées (agrégats) et dépendances (autres ratios du registre)"""
+
+    def __init__(self):
+        self.ratios = {}
+        self._dependants_agregat = {}
+        self._dependants_ratio = {}
+
+    def declarer(self, nom, fonction, entrees=(), dependances=(), accepte_absents=False):
+        """
+        Ajoute un ratio au registre
+
+        Raises:
+            ValueError: ratio déjà déclaré ou dépendance non déclarée (le graphe reste sans cycle)
+        """
+        if nom in self.ratios:
+            raise ValueError(f"Ratio déjà déclaré : {nom}")
+        inconnues = [d for d in dependances if d not in self.ratios]
+        if inconnues:
+            raise ValueError(f"Dépendances non déclarées pour {nom} : {', '.join(inconnues)}")
+        self.ratios[nom] = RatioDeclare(nom, fonction, entrees, dependances, accepte_absents)
+        for agregat in entrees:
+            self._dependants_agregat.setdefault(agregat, set()).add(nom)
+        for dependance in dependances:
+            self._dependants_ratio.setdefault(dependance, set()).add(nom)
+        return self.ratios[nom]
+
+    def entrees(self):
+        """Tous les agrégats utilisés par le registre"""
+        return set(self._dependants_agregat)
+
+    def impactes(self, agregats):
+        """Ratios à recalculer quand ces agrégats changent (fermeture transitive)"""
+        a_visiter = [nom for agregat in agregats for nom in self._dependants_agregat.get(agregat, ())]
+        impactes = set()
+        while a_visiter:
+            nom = a_visiter.pop()
+            if nom not in impactes:
+                impactes.add(nom)
+                a_visiter.extend(self._dependants_ratio.get(nom, ()))
+        return impactes
+
+
+def _identite(valeur):
+    return valeur
+
+
+def _emplois_productifs(total_emplois_investissement_k, remboursement_capital_k):
+    return (total_emplois_investissement_k or 0) - (remboursement_capital_k or 0)
+
+
+def _taux_autofinancement_productif(caf_nette_k, emplois_productifs_k):
+    # Les emplois productifs sont déjà nets du remboursement : la fonction scalaire le retranche de 0
+    return rf.calculer_taux_autofinancement_investissement_productif(caf_nette_k, emplois_productifs_k, 0)
+
+
+def _charges_rigides(charges_personnel_k, charges_financieres_k):
+    return (charges_personnel_k or 0) + (charges_financieres_k or 0)
+
+
+def _rigidite(produits_caf_k, charges_rigides_k):
+    return rf.calculer_ratio_rigidite_fonctionnement(charges_rigides_k, 0, produits_caf_k)
+
+
+# Clés et ordre de ratios_financiers.calculer_tous_les_ratios
+RATIOS_PRINCIPAUX = (
+    'part_charges_personnel_pct',
+    'taux_epargne_brute_pct',
+    'taux_epargne_nette_pct',
+    'capacite_desendettement_annees',
+    'ratio_endettement_pct',
+    'ratio_effort_equipement_pct',
+    'ratio_autonomie_fiscale_pct',
+    'ratio_rigidite_fonctionnement_pct',
+    'coefficient_mobilisation_caf_pct',
+    'taux_couverture_depenses_equipement_pct',
+    'taux_autofinancement_investissement_productif_pct',
+    'part_achats_externes_pct',
+    'taux_couverture_investissement_pct',
+)
+
+REGISTRE_RATIOS = RegistreRatios()
+_r = REGISTRE_RATIOS.declarer
+
+# Valeurs intermédiaires partagées
+_r('emplois_productifs_k', _emplois_productifs, ('total_emplois_investissement_k', 'remboursement_capital_k'),
+   accepte_absents=True)
+_r('charges_rigides_k', _charges_rigides, ('charges_personnel_k', 'charges_financieres_k'), accepte_absents=True)
+
+# Ratios de ratios_financiers.calculer_tous_les_ratios
+_r('part_charges_personnel_pct', rf.calculer_ratio_charges_personnel, ('charges_personnel_k', 'charges_caf_k'))
+_r('taux_epargne_brute_pct', rf.calculer_taux_epargne_brute, ('caf_brute_k', 'produits_caf_k'))
+_r('taux_epargne_nette_pct', rf.calculer_taux_epargne_nette, ('caf_nette_k', 'produits_caf_k'))
+_r('capacite_desendettement_annees', rf.calculer_capacite_desendettement, ('encours_dette_k', 'caf_brute_k'))
+_r('ratio_endettement_pct', rf.calculer_ratio_endettement, ('encours_dette_k', 'produits_caf_k'))
+_r('ratio_effort_equipement_pct', rf.calculer_ratio_effort_equipement, ('depenses_equipement_k', 'produits_caf_k'))
+_r('ratio_autonomie_fiscale_pct', rf.calculer_ratio_autonomie_fiscale, ('impots_locaux_k', 'produits_caf_k'))
+_r('ratio_rigidite_fonctionnement_pct', _rigidite, ('produits_caf_k',), ('charges_rigides_k',))
+_r('coefficient_mobilisation_caf_pct', rf.calculer_coefficient_mobilisation_caf, ('remboursement_capital_k', 'caf_brute_k'))
+_r('taux_couverture_depenses_equipement_pct', rf.calculer_taux_couverture_depenses_equipement,
+   ('caf_nette_k', 'depenses_equipement_k'))
+_r('taux_autofinancement_investissement_productif_pct', _taux_autofinancement_productif,
+   ('caf_nette_k',), ('emplois_productifs_k',))
+_r('part_achats_externes_pct', rf.calculer_ratio_achats_externes, ('achats_charges_externes_k', 'charges_caf_k'))
+# DEPRECATED : Ancien nom conservé pour rétrocompatibilité
+_r('taux_couverture_investissement_pct', _identite, (), ('taux_couverture_depenses_equipement_pct',),
+   accepte_absents=True)
+
+# Ratios de ratios_supplementaires_futurs.py (mêmes clés que ratios_vectorises)
+_r('ratio_dependance_dotations_pct', rs.calculer_ratio_dependance_dotations, ('dgf_k', 'produits_caf_k'))
+_r('ratio_pression_fiscale_eur_hab', rs.calculer_ratio_pression_fiscale, ('impots_locaux_k', 'population'),
+   accepte_absents=True)
+_r('ratio_productivite_personnel_eur_hab', rs.calculer_ratio_productivite_personnel,
+   ('charges_personnel_k', 'population'), accepte_absents=True)
+_r('ratio_charges_gestion_pct', rs.calculer_ratio_charges_gestion, ('achats_charges_externes_k', 'produits_caf_k'))
+_r('taux_subventionnement_investissement_pct', rs.calculer_taux_subventionnement_investissement,
+   ('subventions_recues_k', 'depenses_equipement_k'))
+_r('ratio_investissement_par_habitant_eur_hab', rs.calculer_ratio_investissement_par_habitant,
+   ('depenses_equipement_k', 'population'), accepte_absents=True)
+_r('ratio_financement_externe_investissement_pct', rs.calculer_ratio_financement_externe_investissement,
+   ('emprunts_k', 'subventions_recues_k', 'depenses_equipement_k'), accepte_absents=True)
+_r('taux_interet_moyen_dette_pct', rs.calculer_taux_interet_moyen_dette, ('charges_financieres_k', 'encours_dette_k'))
+_r('ratio_annuite_dette_pct', rs.calculer_ratio_annuite_dette, ('annuite_k', 'produits_caf_k'))
+_r('duree_moyenne_vie_dette_annees', rs.calculer_duree_moyenne_vie_dette, ('encours_dette_k', 'remboursement_capital_k'))
+_r('ratio_fonds_roulement_pct', rs.calculer_ratio_fonds_roulement, ('fdr_k', 'charges_caf_k'))
+_r('marge_autofinancement_brute_pct', _identite, (), ('taux_epargne_brute_pct',), accepte_absents=True)
+_r('ratio_resultat_fonctionnement_pct', rs.calculer_ratio_resultat_fonctionnement, ('resultat_k', 'produits_caf_k'))
+
+
+class MoteurRatios:
+    """Ratios mémorisés par (commune, exercice), calculés à la demande"""
+
+    def __init__(self, registre=REGISTRE_RATIOS):
+        self.registre = registre
+        self._exercices = {}
+        self._verrou = threading.RLock()
+        self.nb_evaluations = 0
+
+    def charger(self, commune, exercice, agregats):
+        """
+        Charge (ou recharge) les agrégats d'un exercice
+
+        Returns:
+            set: ratios invalidés (à recalculer à la prochaine demande)
+        """
+        cle = (str(commune), str(exercice))
+        with self._verrou:
+            etat = self._exercices.get(cle)
+            if etat is None:
+                self._exercices[cle] = {"agregats": dict(agregats), "valeurs": {}}
+                return set()
+            modifies = {
+                nom for nom in set(etat["agregats"]) | set(agregats)
+                if etat["agregats"].get(nom) != agregats.get(nom)
+            }
+            invalides = self.registre.impactes(modifies) & set(etat["valeurs"])
+            for nom in invalides:
+                del etat["valeurs"][nom]
+            etat["agregats"] = dict(agregats)
+            return invalides
+
+    def charger_bilan(self, commune, exercice, data_json):
+        """Charge les agrégats d'un JSON enrichi (bilan mono-année ou bilan annuel d'un multi-années)"""
+        agregats = extraire_agregats(data_json)
+        agregats.update(extraire_agregats(data_json, CHEMINS_AGREGATS_SUPPLEMENTAIRES, defaut=None))
+        return self.charger(commune, exercice, agregats)
+
+    def valeur(self, commune, exercice, nom):
+        """
+        Valeur d'un ratio (calculée au besoin, avec ses dépendances)
+
+        Raises:
+            KeyError: exercice non chargé ou ratio inconnu du registre
+        """
+        with self._verrou:
+            etat = self._exercices[(str(commune), str(exercice))]
+            return self._evaluer(etat, nom)
+
+    def _evaluer(self, etat, nom):
+        valeurs = etat["valeurs"]
+        if nom in valeurs:
+            return valeurs[nom]
+        ratio = self.registre.ratios[nom]
+        arguments = [etat["agregats"].get(agregat) for agregat in ratio.entrees]
+        arguments += [self._evaluer(etat, dependance) for dependance in ratio.dependances]
+        if not ratio.accepte_absents and any(a is None for a in arguments):
+            resultat = None
+        else:
+            resultat = ratio.fonction(*arguments)
+            self.nb_evaluations += 1
+        valeurs[nom] = resultat
+        return resultat
+
+    def ratios(self, commune, exercice, noms=RATIOS_PRINCIPAUX):
+        """Dictionnaire {nom: valeur} des ratios demandés (par défaut ceux de calculer_tous_les_ratios)"""
+        return {nom: self.valeur(commune, exercice, nom) for nom in noms}
+
+    def oublier(self, commune, exercice=None):
+        """Retire une commune (ou un seul de ses exercices) de la mémoire"""
+        with self._verrou:
+            for cle in [c for c in self._exercices
+                        if c[0] == str(commune) and (exercice is None or c[1] == str(exercice))]:
+                del self._exercices[cle]
+
+
+_moteur_defaut = None
+
+
+def obtenir_moteur_par_defaut():
+    """Moteur partagé par les enrichissements successifs d'un même processus"""
+    global _moteur_defaut
+    if _moteur_defaut is None:
+        _moteur_defaut = MoteurRatios()
+    return _moteur_defaut
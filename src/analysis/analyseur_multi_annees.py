@@ -6,9 +6,37 @@ Supporte à la fois les PDFs et l'API OFGL
 
 import os
 import re
-from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Dict, Optional, Tuple
+
+import numpy as np
+
 from src.generators.generer_json_enrichi import generer_json_enrichi
-from src.parsers.fetcher_api_ofgl import convertir_api_vers_json_enrichi
+from src.parsers.fetcher_api_ofgl import convertir_api_vers_json_enrichi, WORKERS_API
+from analysis.panel_bilans import PanelBilans
+
+
+# Postes clés suivis d'une année sur l'autre (libellé -> chemin dans le JSON enrichi)
+POSTES_CLES = {
+    'Produits de fonctionnement': 'fonctionnement.produits.total.montant_k',
+    'Charges de fonctionnement': 'fonctionnement.charges.total.montant_k',
+    'Résultat de fonctionnement': 'fonctionnement.resultat.montant_k',
+    'Impôts locaux': 'fonctionnement.produits.impots_locaux.montant_k',
+    'DGF': 'fonctionnement.produits.dgf.montant_k',
+    'Charges de personnel': 'fonctionnement.charges.charges_personnel.montant_k',
+    'Dépenses d\'équipement': 'investissement.emplois.depenses_equipement.montant_k',
+    'Emprunts contractés': 'investissement.ressources.emprunts.montant_k',
+    'Subventions reçues': 'investissement.ressources.subventions_recues.montant_k',
+    'CAF brute': 'autofinancement.caf_brute.montant_k',
+    'CAF nette': 'autofinancement.caf_nette.montant_k',
+    'Encours dette': 'endettement.encours_total.montant_k',
+    'Capacité désendettement': 'endettement.ratios.capacite_desendettement_annees'
+}
+
+
+def _workers(workers: Optional[int], nb_taches: int, defaut: int) -> int:
+    return max(1, min(workers or defaut, nb_taches or 1))
 
 
 def extraire_annee_depuis_nom_fichier(nom_fichier: str) -> Optional[int]:
@@ -31,13 +59,14 @@ def extraire_annee_depuis_nom_fichier(nom_fichier: str) -> Optional[int]:
     return None
 
 
-def charger_bilans_depuis_api(code_insee: str, annees: List[int]) -> List[Dict]:
+def charger_bilans_depuis_api(code_insee: str, annees: List[int], workers: Optional[int] = None) -> List[Dict]:
     """
     Charge les bilans depuis l'API OFGL
 
     Args:
         code_insee: Code INSEE de la commune
         annees: Liste des années à récupérer
+        workers: Années récupérées en parallèle (défaut: WORKERS_API)
 
     Returns:
         Liste de dicts avec structure:
@@ -51,12 +80,22 @@ def charger_bilans_depuis_api(code_insee: str, annees: List[int]) -> List[Dict]:
 
     print(f"\nChargement de {len(annees)} bilans depuis l'API OFGL (INSEE: {code_insee})...\n")
 
-    for annee in annees:
+    def recuperer(annee):
+        try:
+            return convertir_api_vers_json_enrichi(code_insee, annee), None
+        except Exception as e:
+            return None, e
+
+    # Années récupérées en parallèle (requêtes réseau), résultats traités dans l'ordre des années
+    with ThreadPoolExecutor(max_workers=_workers(workers, len(annees), WORKERS_API)) as executor:
+        resultats = list(executor.map(recuperer, annees))
+
+    for annee, (json_data, erreur) in zip(annees, resultats):
         try:
             print(f"  [Année {annee}]")
-            print(f"    Récupération depuis l'API OFGL...")
 
-            json_data = convertir_api_vers_json_enrichi(code_insee, annee)
+            if erreur is not None:
+                raise erreur
 
             if not json_data:
                 print(f"    [WARN] Aucune donnée disponible pour {annee}")
@@ -85,12 +124,48 @@ def charger_bilans_depuis_api(code_insee: str, annees: List[int]) -> List[Dict]:
     return bilans
 
 
-def charger_bilans_multi_annees(dossier_bilans: str) -> List[Dict]:
+def _parser_bilan_pdf(chemin_complet: str,
+                      parser_pdf: Optional[Callable[[str], Dict]] = None) -> Tuple[Optional[Dict], Optional[str]]:
+    """Parse un bilan PDF (exécuté dans un processus du pool) : (json enrichi, erreur)"""
+    try:
+        return (parser_pdf or generer_json_enrichi)(chemin_complet), None
+    except Exception as e:
+        return None, str(e)
+
+
+def charger_bilan_pdf(chemin_complet: str) -> Dict:
+    """
+    Parse un seul bilan PDF (ajout d'un exercice à un historique déjà consolidé)
+
+    Returns:
+        {'annee': int, 'source': 'PDF', 'fichier': str, 'data': dict (JSON enrichi)}
+
+    Raises:
+        ValueError: si l'année de l'exercice ne peut pas être déterminée
+    """
+    fichier = os.path.basename(chemin_complet)
+    json_data = generer_json_enrichi(chemin_complet)
+    annee_finale = json_data.get('metadata', {}).get('exercice') or extraire_annee_depuis_nom_fichier(fichier)
+    if not annee_finale:
+        raise ValueError(f"Impossible de déterminer l'année de l'exercice : {fichier}")
+    return {
+        'annee': annee_finale,
+        'source': 'PDF',
+        'fichier': fichier,
+        'data': json_data
+    }
+
+
+def charger_bilans_multi_annees(dossier_bilans: str, workers: Optional[int] = None,
+                               parser_pdf: Optional[Callable[[str], Dict]] = None) -> List[Dict]:
     """
     Charge tous les bilans PDF d'un dossier et génère les JSONs enrichis
 
     Args:
         dossier_bilans: Chemin vers le dossier contenant les PDFs
+        workers: Nombre de processus de parsing (défaut: nombre de coeurs, 1 = sans pool)
+        parser_pdf: Fonction chemin du PDF -> JSON enrichi (défaut: generer_json_enrichi),
+                    transmise aux processus du pool (fonction de module, pour être sérialisable)
 
     Returns:
         Liste de dicts avec structure:
@@ -112,18 +187,25 @@ def charger_bilans_multi_annees(dossier_bilans: str) -> List[Dict]:
 
     print(f"\nChargement de {len(fichiers_pdf)} bilans depuis {dossier_bilans}...\n")
 
-    for fichier in fichiers_pdf:
-        chemin_complet = os.path.join(dossier_bilans, fichier)
+    # Un processus par PDF (parsing CPU), résultats traités dans l'ordre des fichiers
+    chemins = [os.path.join(dossier_bilans, fichier) for fichier in fichiers_pdf]
+    workers = _workers(workers, len(chemins), os.cpu_count() or 1)
+    traitement = partial(_parser_bilan_pdf, parser_pdf=parser_pdf)
+    if workers == 1:
+        resultats = [traitement(chemin) for chemin in chemins]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            resultats = list(executor.map(traitement, chemins))
 
+    for fichier, (json_data, erreur) in zip(fichiers_pdf, resultats):
         # Extraire l'année depuis le nom de fichier
         annee_fichier = extraire_annee_depuis_nom_fichier(fichier)
 
         try:
             print(f"  [{fichier}]")
-            print(f"    Parsing PDF...")
 
-            # Générer le JSON enrichi
-            json_data = generer_json_enrichi(chemin_complet)
+            if erreur is not None:
+                raise RuntimeError(erreur)
 
             # L'année peut être dans le JSON ou dans le nom de fichier
             annee_exercice = json_data.get('metadata', {}).get('exercice')
@@ -214,55 +296,43 @@ def extraire_valeur_poste(json_data: Dict, chemin: str) -> Optional[float]:
     return valeur
 
 
-def comparer_bilans_annee_par_annee(bilans: List[Dict]) -> Dict:
+def comparer_bilans_annee_par_annee(bilans) -> Dict:
     """
     Compare les bilans année par année
 
+    Args:
+        bilans: Liste des bilans ou PanelBilans
+
     Returns:
         Structure avec évolutions pour chaque poste clé
     """
+    # Chaque poste n'est lu qu'une fois : une colonne du panel par chemin
+    panel = PanelBilans.depuis(bilans, ['metadata.commune', *POSTES_CLES.values()])
+    annees = panel.annees
+    series = {nom_poste: panel.colonne_brute(chemin) for nom_poste, chemin in POSTES_CLES.items()}
+
     comparaisons = {
         'metadata': {
-            'commune': bilans[0]['data']['metadata']['commune'],
-            'periode_debut': bilans[0]['annee'],
-            'periode_fin': bilans[-1]['annee'],
-            'nb_annees': len(bilans)
+            'commune': panel.valeur(0, 'metadata.commune'),
+            'periode_debut': annees[0],
+            'periode_fin': annees[-1],
+            'nb_annees': len(annees)
         },
         'evolutions_annuelles': [],
         'synthese_globale': {}
     }
 
-    # Définir les postes clés à suivre
-    postes_cles = {
-        'Produits de fonctionnement': 'fonctionnement.produits.total.montant_k',
-        'Charges de fonctionnement': 'fonctionnement.charges.total.montant_k',
-        'Résultat de fonctionnement': 'fonctionnement.resultat.montant_k',
-        'Impôts locaux': 'fonctionnement.produits.impots_locaux.montant_k',
-        'DGF': 'fonctionnement.produits.dgf.montant_k',
-        'Charges de personnel': 'fonctionnement.charges.charges_personnel.montant_k',
-        'Dépenses d\'équipement': 'investissement.emplois.depenses_equipement.montant_k',
-        'Emprunts contractés': 'investissement.ressources.emprunts.montant_k',
-        'Subventions reçues': 'investissement.ressources.subventions_recues.montant_k',
-        'CAF brute': 'autofinancement.caf_brute.montant_k',
-        'CAF nette': 'autofinancement.caf_nette.montant_k',
-        'Encours dette': 'endettement.encours_total.montant_k',
-        'Capacité désendettement': 'endettement.ratios.capacite_desendettement_annees'
-    }
-
     # Comparaison année par année
-    for i in range(1, len(bilans)):
-        bilan_precedent = bilans[i-1]
-        bilan_actuel = bilans[i]
-
+    for i in range(1, len(annees)):
         evolutions = {
-            'annee_precedente': bilan_precedent['annee'],
-            'annee_actuelle': bilan_actuel['annee'],
+            'annee_precedente': annees[i-1],
+            'annee_actuelle': annees[i],
             'postes': {}
         }
 
-        for nom_poste, chemin in postes_cles.items():
-            val_prec = extraire_valeur_poste(bilan_precedent['data'], chemin)
-            val_act = extraire_valeur_poste(bilan_actuel['data'], chemin)
+        for nom_poste, serie in series.items():
+            val_prec = serie[i-1]
+            val_act = serie[i]
 
             evolution = calculer_evolution(val_act, val_prec)
             evolutions['postes'][nom_poste] = {
@@ -274,18 +344,15 @@ def comparer_bilans_annee_par_annee(bilans: List[Dict]) -> Dict:
         comparaisons['evolutions_annuelles'].append(evolutions)
 
     # Synthèse globale (première année vs dernière année)
-    if len(bilans) >= 2:
-        premier_bilan = bilans[0]
-        dernier_bilan = bilans[-1]
-
+    if len(annees) >= 2:
         synthese = {
-            'periode': f"{premier_bilan['annee']}-{dernier_bilan['annee']}",
+            'periode': f"{annees[0]}-{annees[-1]}",
             'postes': {}
         }
 
-        for nom_poste, chemin in postes_cles.items():
-            val_debut = extraire_valeur_poste(premier_bilan['data'], chemin)
-            val_fin = extraire_valeur_poste(dernier_bilan['data'], chemin)
+        for nom_poste, serie in series.items():
+            val_debut = serie[0]
+            val_fin = serie[-1]
 
             evolution = calculer_evolution(val_fin, val_debut)
             synthese['postes'][nom_poste] = {
@@ -377,37 +444,49 @@ def detecter_tendances_et_anomalies(comparaisons: Dict) -> Dict:
     return resultats
 
 
-def calculer_ratios_evolutifs(bilans: List[Dict]) -> Dict:
+def calculer_ratios_evolutifs(bilans) -> Dict:
     """
     Calcule les ratios financiers clés et leur évolution dans le temps
 
+    Args:
+        bilans: Liste des bilans ou PanelBilans
+
     Returns:
         Structure avec ratios par année et évolutions
     """
-    ratios_par_annee = []
-
-    for bilan in bilans:
-        data = bilan['data']
-
-        # Extraire les valeurs de base
-        produits_fonct = extraire_valeur_poste(data, 'fonctionnement.produits.total.montant_k') or 0
-        charges_fonct = extraire_valeur_poste(data, 'fonctionnement.charges.total.montant_k') or 0
-        charges_personnel = extraire_valeur_poste(data, 'fonctionnement.charges.charges_personnel.montant_k') or 0
-        caf_brute = extraire_valeur_poste(data, 'autofinancement.caf_brute.montant_k') or 0
-        dette = extraire_valeur_poste(data, 'endettement.encours_total.montant_k') or 0
-        depenses_equip = extraire_valeur_poste(data, 'investissement.emplois.depenses_equipement.montant_k') or 0
-
-        # Calcul des ratios
-        ratios = {
-            'annee': bilan['annee'],
-            'taux_epargne_brute': round((caf_brute / produits_fonct * 100), 2) if produits_fonct else 0,
-            'rigidite_structurelle': round((charges_personnel / charges_fonct * 100), 2) if charges_fonct else 0,
-            'taux_endettement': round((dette / produits_fonct * 100), 2) if produits_fonct else 0,
-            'capacite_desendettement': round(dette / caf_brute, 2) if caf_brute else None,
-            'taux_equipement': round((depenses_equip / produits_fonct * 100), 2) if produits_fonct else 0,
-            'ratio_caf_depenses_equip': round((caf_brute / depenses_equip * 100), 2) if depenses_equip else None
+    panel = PanelBilans.depuis(bilans, [
+        'fonctionnement.produits.total.montant_k',
+        'fonctionnement.charges.total.montant_k',
+        'fonctionnement.charges.charges_personnel.montant_k',
+        'autofinancement.caf_brute.montant_k',
+        'endettement.encours_total.montant_k',
+        'investissement.emplois.depenses_equipement.montant_k',
+    ])
+
+    # Extraire les valeurs de base (une colonne par poste, absentes à 0)
+    produits_fonct = panel.valeurs_ou_zero('fonctionnement.produits.total.montant_k')
+    charges_fonct = panel.valeurs_ou_zero('fonctionnement.charges.total.montant_k')
+    charges_personnel = panel.valeurs_ou_zero('fonctionnement.charges.charges_personnel.montant_k')
+    caf_brute = panel.valeurs_ou_zero('autofinancement.caf_brute.montant_k')
+    dette = panel.valeurs_ou_zero('endettement.encours_total.montant_k')
+    depenses_equip = panel.valeurs_ou_zero('investissement.emplois.depenses_equipement.montant_k')
+
+    # Calcul des ratios sur toutes les années à la fois
+    with np.errstate(divide='ignore', invalid='ignore'):
+        colonnes = {
+            'taux_epargne_brute': (caf_brute / produits_fonct * 100, produits_fonct, 0),
+            'rigidite_structurelle': (charges_personnel / charges_fonct * 100, charges_fonct, 0),
+            'taux_endettement': (dette / produits_fonct * 100, produits_fonct, 0),
+            'capacite_desendettement': (dette / caf_brute, caf_brute, None),
+            'taux_equipement': (depenses_equip / produits_fonct * 100, produits_fonct, 0),
+            'ratio_caf_depenses_equip': (caf_brute / depenses_equip * 100, depenses_equip, None)
         }
 
+    ratios_par_annee = []
+    for i, annee in enumerate(panel.annees):
+        ratios = {'annee': annee}
+        for nom, (valeurs, denominateur, defaut) in colonnes.items():
+            ratios[nom] = round(float(valeurs[i]), 2) if denominateur[i] else defaut
         ratios_par_annee.append(ratios)
 
     # Calculer les évolutions
@@ -0,0 +1,98 @@
+"""
+Jeu de bilans multi-années chargé une seule fois et partagé par les étapes du workflow
+(JSON consolidé, rapport PDF, rapport Word) : chaque PDF n'est parsé qu'une fois.
+
+Sources acceptées :
+    - dossier de PDFs (parsing via charger_bilans_multi_annees)
+    - JSON consolidé (output/donnees_multi_annees.json) : bilans_annuels relus sans parsing
+    - liste de bilans déjà chargés ({'annee', 'data', ...})
+
+Le panel année × métrique (analysis.panel_bilans) est construit une fois, au premier accès,
+et partagé par les tendances, les comparaisons, les ratios évolutifs et les graphiques.
+
+Usage:
+    from analysis.donnees_multi_annees import DonneesMultiAnnees
+
+    donnees = DonneesMultiAnnees.depuis_dossier("docs/bilans_multi_annees")
+    generer_json_multi_annees_consolide(donnees)
+    generer_rapport_pdf_multi_annees(donnees)
+"""
+
+import json
+import os
+from typing import Callable, Dict, List, Optional
+
+from analysis.analyseur_multi_annees import charger_bilans_multi_annees
+from analysis.panel_bilans import PanelBilans
+
+
+DOSSIER_BILANS_MULTI_ANNEES = "docs/bilans_multi_annees"
+FICHIER_JSON_MULTI_ANNEES = "output/donnees_multi_annees.json"
+
+
+class DonneesMultiAnnees:
+    """Bilans annuels triés par année (structure de charger_bilans_multi_annees)"""
+
+    def __init__(self, bilans: List[Dict], json_consolide: Optional[Dict] = None):
+        self.bilans = sorted(bilans, key=lambda b: b['annee'])
+        self.json_consolide = json_consolide
+        self._panel = None
+
+    @classmethod
+    def depuis_dossier(cls, dossier_bilans: str = DOSSIER_BILANS_MULTI_ANNEES,
+                       workers: Optional[int] = None,
+                       parser_pdf: Optional[Callable[[str], Dict]] = None) -> "DonneesMultiAnnees":
+        """Parse les PDFs d'un dossier (une seule fois, en parallèle)"""
+        return cls(charger_bilans_multi_annees(dossier_bilans, workers, parser_pdf))
+
+    @classmethod
+    def depuis_json(cls, chemin: str = FICHIER_JSON_MULTI_ANNEES) -> "DonneesMultiAnnees":
+        """
+        Relit les bilans annuels d'un JSON consolidé, sans parser de PDF
+
+        Raises:
+            FileNotFoundError: si le JSON consolidé n'existe pas
+            ValueError: si le JSON ne contient pas de bilans_annuels
+        """
+        with open(chemin, 'r', encoding='utf-8') as f:
+            json_consolide = json.load(f)
+        bilans_annuels = json_consolide.get('bilans_annuels')
+        if not bilans_annuels:
+            raise ValueError(f"Aucun bilan annuel dans {chemin}")
+        bilans = [
+            {'annee': int(annee), 'source': 'JSON', 'data': data}
+            for annee, data in bilans_annuels.items()
+        ]
+        return cls(bilans, json_consolide)
+
+    @classmethod
+    def charger(cls, source) -> "DonneesMultiAnnees":
+        """
+        Jeu de bilans depuis une source quelconque : DonneesMultiAnnees (retourné tel quel),
+        liste de bilans, chemin d'un JSON consolidé ou dossier de PDFs
+        """
+        if isinstance(source, cls):
+            return source
+        if isinstance(source, list):
+            return cls(source)
+        if str(source).lower().endswith('.json') and os.path.isfile(source):
+            return cls.depuis_json(source)
+        return cls.depuis_dossier(source)
+
+    @property
+    def annees(self) -> List[int]:
+        return [b['annee'] for b in self.bilans]
+
+    @property
+    def commune(self) -> Optional[str]:
+        return self.bilans[0]['data'].get('metadata', {}).get('commune') if self.bilans else None
+
+    @property
+    def panel(self) -> PanelBilans:
+        """Matrice année × métrique des bilans, construite au premier accès puis partagée"""
+        if self._panel is None:
+            self._panel = PanelBilans(self.bilans)
+        return self._panel
+
+    def __len__(self):
+        return len(self.bilans)
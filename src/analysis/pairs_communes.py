@@ -0,0 +1,294 @@
+"""
+Groupes de pairs : communes au profil budgétaire le plus proche
+Alternative à la strate (simple tranche de population) : chaque commune est décrite par ses
+montants par habitant des principaux agrégats OFGL et par sa population ; les k plus proches
+voisins dans cet espace normalisé forment son groupe de comparaison.
+
+Normalisation des profils :
+    - arcsinh(€/hab / ECHELLE_EUROS_HAB) : écrase les queues de distribution, accepte les négatifs
+    - centrage-réduction de chaque agrégat sur l'exercice
+    - log10(population) réduit, pondéré par POIDS_POPULATION
+
+Les profils sont conservés par exercice dans SQLite (PROFILS_CACHE) ; une mise à jour
+ne réécrit que les communes modifiées et ne reconstruit que l'index (KD-tree) de l'exercice concerné.
+
+Usage:
+    from analysis.pairs_communes import MoteurPairs, recuperer_profils_ofgl
+
+    moteur = MoteurPairs()
+    moteur.actualiser(2023, recuperer_profils_ofgl(2023))
+    pairs = moteur.index(2023).pairs("200053395", k=20)
+
+    # Benchmark prêt pour le JSON enrichi (ajouter_benchmark_pairs)
+    benchmark = benchmark_commune("200053395", 2023, k=20)
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from parsers.client_http import obtenir_client_http
+
+
+API_OFGL_EXPORT = "https://data.ofgl.fr/api/explore/v2.1/catalog/datasets/ofgl-base-communes-consolidee/exports/json"
+CHEMIN_PROFILS_DEFAUT = Path(__file__).resolve().parents[2] / "output" / "cache" / "profils_communes.sqlite"
+
+# Agrégats OFGL décrivant le profil budgétaire (montants par habitant)
+AGREGATS_PROFIL = [
+    "Recettes de fonctionnement",
+    "Dépenses de fonctionnement",
+    "Impôts locaux",
+    "Dotation globale de fonctionnement",
+    "Frais de personnel",
+    "Achats et charges externes",
+    "Dépenses d'équipement",
+    "Encours de dette",
+    "Epargne brute",
+]
+
+ECHELLE_EUROS_HAB = 100.0
+POIDS_POPULATION = 1.0
+K_PAIRS = 20
+
+
+def _scipy_spatial():
+    try:
+        from scipy import spatial
+    except ImportError:
+        raise ImportError(
+            "La bibliothèque 'scipy' n'est pas installée. "
+            "Installez-la avec : pip install scipy"
+        )
+    return spatial
+
+
+def recuperer_profils_ofgl(annee: int, client=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Profils de toutes les communes d'un exercice, en une requête d'export OFGL
+
+    Returns:
+        dict: {siren: {"nom", "population", "profil": {agregat: euros_par_habitant}}}
+
+    Raises:
+        requests.exceptions.RequestException: si l'export ne peut pas être récupéré
+    """
+    client = client or obtenir_client_http()
+    agregats = ", ".join(f'"{agregat}"' for agregat in AGREGATS_PROFIL)
+    params = [
+        ("select", "siren, com_name, ptot, agregat, montant, euros_par_habitant"),
+        ("where", f"agregat IN ({agregats})"),
+        ("refine", f"exer:{annee}"),
+    ]
+    return profils_depuis_records(client.get_json(API_OFGL_EXPORT, params=params, timeout=300))
+
+
+def profils_depuis_records(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Regroupe les lignes (commune, agrégat) de l'OFGL en un profil par commune"""
+    profils: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        siren = record.get('siren')
+        if not siren or record.get('agregat') not in AGREGATS_PROFIL:
+            continue
+        population = record.get('ptot')
+        commune = profils.setdefault(str(siren), {"nom": record.get('com_name'), "population": population, "profil": {}})
+        par_hab = record.get('euros_par_habitant')
+        if par_hab is None and record.get('montant') is not None and population:
+            par_hab = record['montant'] / population
+        if par_hab is not None:
+            commune["profil"][record['agregat']] = float(par_hab)
+    return profils
+
+
+class StoreProfils:
+    """Profils des communes par exercice (SQLite)"""
+
+    def __init__(self, chemin: Optional[str] = None):
+        self.chemin = Path(chemin or os.getenv("PROFILS_CACHE") or CHEMIN_PROFILS_DEFAUT)
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        with self._connexion() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS profils (
+                    exercice INTEGER NOT NULL,
+                    siren TEXT NOT NULL,
+                    nom TEXT,
+                    population REAL,
+                    profil TEXT NOT NULL,
+                    maj_le REAL NOT NULL,
+                    PRIMARY KEY (exercice, siren)
+                )
+            """)
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion courte (commit + fermeture) : plusieurs processus partagent le fichier"""
+        conn = sqlite3.connect(str(self.chemin), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lire(self, exercice: int) -> Dict[str, Dict[str, Any]]:
+        with self._connexion() as conn:
+            lignes = conn.execute(
+                "SELECT siren, nom, population, profil FROM profils WHERE exercice = ?", (int(exercice),)
+            ).fetchall()
+        return {
+            siren: {"nom": nom, "population": population, "profil": json.loads(profil)}
+            for siren, nom, population, profil in lignes
+        }
+
+    def mettre_a_jour(self, exercice: int, profils: Dict[str, Dict[str, Any]]) -> int:
+        """Enregistre les profils nouveaux ou modifiés, retourne leur nombre"""
+        existants = self.lire(exercice)
+        modifies = [
+            (int(exercice), siren, p.get("nom"), p.get("population"), json.dumps(p["profil"], sort_keys=True), time.time())
+            for siren, p in profils.items()
+            if existants.get(siren) != {"nom": p.get("nom"), "population": p.get("population"), "profil": p["profil"]}
+        ]
+        if modifies:
+            with self._connexion() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO profils (exercice, siren, nom, population, profil, maj_le) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", modifies
+                )
+        return len(modifies)
+
+
+class IndexPairs:
+    """KD-tree des profils normalisés d'un exercice"""
+
+    def __init__(self, profils: Dict[str, Dict[str, Any]], poids_population: float = POIDS_POPULATION):
+        spatial = _scipy_spatial()
+        self.sirens = sorted(s for s, p in profils.items() if p.get("population") and p["population"] > 0)
+        if not self.sirens:
+            raise ValueError("Aucun profil de commune avec population pour cet exercice")
+        self.index_sirens = {siren: i for i, siren in enumerate(self.sirens)}
+        self.noms = [profils[s].get("nom") for s in self.sirens]
+        self.populations = np.array([profils[s]["population"] for s in self.sirens], dtype=float)
+        self.par_hab = np.array(
+            [[profils[s]["profil"].get(agregat, np.nan) for agregat in AGREGATS_PROFIL] for s in self.sirens],
+            dtype=float
+        )
+
+        # Agrégat absent : valeur médiane de l'exercice (ni rapproche ni éloigne)
+        transformes = np.arcsinh(self.par_hab / ECHELLE_EUROS_HAB)
+        medianes = np.nan_to_num(np.nanmedian(transformes, axis=0))
+        transformes = np.where(np.isnan(transformes), medianes, transformes)
+        colonnes = np.column_stack([transformes, np.log10(self.populations)])
+
+        self.centre = colonnes.mean(axis=0)
+        ecarts = colonnes.std(axis=0)
+        self.echelle = np.where(ecarts > 0, ecarts, 1.0)
+        self.poids = np.ones(colonnes.shape[1])
+        self.poids[-1] = poids_population
+        self.vecteurs = (colonnes - self.centre) / self.echelle * self.poids
+        self.arbre = spatial.cKDTree(self.vecteurs)
+
+    def __len__(self):
+        return len(self.sirens)
+
+    def pairs(self, siren: str, k: int = K_PAIRS) -> List[Dict[str, Any]]:
+        """
+        Les k communes au profil le plus proche (la commune elle-même exclue)
+
+        Returns:
+            list: [{"siren", "nom", "population", "distance"}] par distance croissante
+
+        Raises:
+            KeyError: commune absente de l'index (pas de profil ou population nulle)
+        """
+        i = self.index_sirens[str(siren)]
+        distances, voisins = self.arbre.query(self.vecteurs[i], k=min(k + 1, len(self.sirens)))
+        distances, voisins = np.atleast_1d(distances), np.atleast_1d(voisins)
+        return [
+            {"siren": self.sirens[j], "nom": self.noms[j], "population": float(self.populations[j]),
+             "distance": float(d)}
+            for d, j in zip(distances.tolist(), voisins.tolist()) if j != i
+        ][:k]
+
+    def moyennes_pairs(self, pairs: List[Dict[str, Any]]) -> Dict[str, Optional[float]]:
+        """Moyenne par habitant de chaque agrégat sur un groupe de pairs (agrégats absents ignorés)"""
+        lignes = self.par_hab[[self.index_sirens[p["siren"]] for p in pairs]]
+        presents = ~np.isnan(lignes)
+        nb = presents.sum(axis=0)
+        sommes = np.where(presents, lignes, 0).sum(axis=0)
+        return {
+            agregat: (float(sommes[j] / nb[j]) if nb[j] else None)
+            for j, agregat in enumerate(AGREGATS_PROFIL)
+        }
+
+    def benchmark(self, siren: str, k: int = K_PAIRS) -> Dict[str, Any]:
+        """Groupe de pairs d'une commune et moyennes par habitant du groupe"""
+        pairs = self.pairs(siren, k)
+        return {"k": len(pairs), "communes": pairs, "moyennes_hab": self.moyennes_pairs(pairs)}
+
+
+class MoteurPairs:
+    """Index de pairs par exercice, reconstruit uniquement quand les profils de l'exercice changent"""
+
+    def __init__(self, store: Optional[StoreProfils] = None, poids_population: float = POIDS_POPULATION):
+        self.store = store or StoreProfils()
+        self.poids_population = poids_population
+        self._index: Dict[int, IndexPairs] = {}
+        self._verrou = threading.Lock()
+
+    def actualiser(self, exercice: int, profils: Dict[str, Dict[str, Any]]) -> int:
+        """Met à jour les profils d'un exercice ; l'index de cet exercice seul est invalidé si besoin"""
+        modifies = self.store.mettre_a_jour(exercice, profils)
+        if modifies:
+            with self._verrou:
+                self._index.pop(int(exercice), None)
+        return modifies
+
+    def index(self, exercice: int) -> IndexPairs:
+        with self._verrou:
+            if int(exercice) not in self._index:
+                self._index[int(exercice)] = IndexPairs(self.store.lire(exercice), self.poids_population)
+            return self._index[int(exercice)]
+
+
+def benchmark_commune(siren: str, exercice: int, k: int = K_PAIRS, moteur: Optional[MoteurPairs] = None,
+                      profils: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Groupe de pairs d'une commune pour un exercice, profils OFGL mis à jour au préalable
+
+    Args:
+        siren: SIREN de la commune
+        exercice: Exercice des profils comparés
+        k: Nombre de pairs
+        moteur: MoteurPairs à utiliser (défaut: store des profils par défaut, cf. PROFILS_CACHE)
+        profils: Profils de l'exercice déjà récupérés (défaut: export OFGL, profils enregistrés
+                 utilisés si l'API ne répond pas)
+
+    Returns:
+        dict: {"k", "communes", "moyennes_hab"} (IndexPairs.benchmark), ou None si la commune
+        n'a pas de profil pour cet exercice
+    """
+    moteur = moteur or MoteurPairs()
+    if profils is None:
+        try:
+            profils = recuperer_profils_ofgl(exercice)
+        except requests.exceptions.RequestException as e:
+            print(f"ERREUR profils OFGL (profils déjà enregistrés utilisés): {e}")
+    if profils is not None:
+        modifies = moteur.actualiser(exercice, profils)
+        print(f"Profils OFGL {exercice}: {modifies} nouveaux ou modifiés")
+
+    try:
+        return moteur.index(exercice).benchmark(siren, k)
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,184 @@
+"""
+Panel colonnaire des bilans multi-années : une matrice année × métrique construite une seule fois
+Chaque chemin pointé du JSON enrichi ("fonctionnement.produits.total.montant_k") est résolu une
+fois à la construction et associé à une colonne ; les séries, évolutions, moyennes et séries de
+graphiques deviennent des opérations sur les colonnes au lieu d'un parcours du JSON par appel.
+
+Deux matrices partagent la même table chemin → colonne :
+    - valeurs : float64, NaN si absent ou non numérique (calculs vectorisés)
+    - brutes  : objets, valeurs telles qu'elles figurent dans le JSON (None si absent),
+                pour les sorties qui doivent rester identiques au JSON (séries, comparaisons)
+
+Usage:
+    from analysis.panel_bilans import PanelBilans
+
+    panel = PanelBilans(bilans)                      # ou DonneesMultiAnnees.panel
+    panel.serie('autofinancement.caf_brute.montant_k')
+    panel.par_habitant('endettement.encours_total.montant_k')
+    panel.evolution_moyenne('fonctionnement.charges.total.montant_k')
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+CHEMIN_POPULATION = 'metadata.population'
+
+
+def _aplatir(noeud: Dict, prefixe: str, feuilles: Dict):
+    """Feuilles d'un JSON imbriqué : {chemin pointé: valeur}"""
+    for cle, valeur in noeud.items():
+        chemin = f"{prefixe}{cle}"
+        if isinstance(valeur, dict):
+            _aplatir(valeur, f"{chemin}.", feuilles)
+        else:
+            feuilles[chemin] = valeur
+
+
+def _suivre(data, cles):
+    for cle in cles:
+        if isinstance(data, dict) and cle in data:
+            data = data[cle]
+        else:
+            return None
+    return data
+
+
+def _est_numerique(valeur) -> bool:
+    return isinstance(valeur, (int, float, np.number)) and not isinstance(valeur, bool)
+
+
+class PanelBilans:
+    """Matrice année × métrique des bilans annuels ({'annee', 'data', ...}, triés par année)"""
+
+    def __init__(self, bilans: List[Dict], chemins: Optional[Iterable[str]] = None):
+        """
+        Args:
+            bilans: Liste des bilans annuels
+            chemins: Chemins à retenir (par défaut toutes les feuilles des JSON) ;
+                     la population est toujours retenue pour les valeurs par habitant
+        """
+        self.annees = [b['annee'] for b in bilans]
+
+        if chemins is None:
+            lignes = []
+            for bilan in bilans:
+                feuilles = {}
+                _aplatir(bilan['data'], '', feuilles)
+                lignes.append(feuilles)
+            chemins = dict.fromkeys(chemin for feuilles in lignes for chemin in feuilles)
+        else:
+            chemins = dict.fromkeys([CHEMIN_POPULATION, *chemins])
+            cles = [(chemin, tuple(chemin.split('.'))) for chemin in chemins]
+            lignes = [{chemin: _suivre(bilan['data'], c) for chemin, c in cles} for bilan in bilans]
+
+        self.colonnes = {chemin: j for j, chemin in enumerate(chemins)}
+        self.brutes = np.full((len(bilans), len(self.colonnes)), None, dtype=object)
+        self.valeurs = np.full((len(bilans), len(self.colonnes)), np.nan)
+        for i, feuilles in enumerate(lignes):
+            for chemin, valeur in feuilles.items():
+                j = self.colonnes[chemin]
+                self.brutes[i, j] = valeur
+                if _est_numerique(valeur):
+                    self.valeurs[i, j] = valeur
+
+    @classmethod
+    def depuis(cls, source, chemins: Optional[Iterable[str]] = None) -> "PanelBilans":
+        """Panel tel quel, ou construit depuis une liste de bilans (limité aux chemins demandés)"""
+        if isinstance(source, cls):
+            return source
+        return cls(source, chemins)
+
+    def __len__(self):
+        return len(self.annees)
+
+    # --- Colonnes ---
+
+    def colonne(self, chemin: str) -> np.ndarray:
+        """Valeurs numériques d'une métrique (NaN si absente)"""
+        j = self.colonnes.get(chemin)
+        if j is None:
+            return np.full(len(self), np.nan)
+        return self.valeurs[:, j]
+
+    def colonne_brute(self, chemin: str) -> List:
+        """Valeurs du JSON pour une métrique (None si absente)"""
+        j = self.colonnes.get(chemin)
+        if j is None:
+            return [None] * len(self)
+        return self.brutes[:, j].tolist()
+
+    def valeur(self, indice: int, chemin: str):
+        """Valeur du JSON pour l'année d'indice donné (None si absente)"""
+        j = self.colonnes.get(chemin)
+        return None if j is None else self.brutes[indice, j]
+
+    def serie(self, chemin: str) -> Dict:
+        """Série temporelle {annee: valeur ou None} (valeurs du JSON)"""
+        return dict(zip(self.annees, self.colonne_brute(chemin)))
+
+    def valeurs_ou_zero(self, chemin: str) -> np.ndarray:
+        """Valeurs numériques, absentes remplacées par 0 (séries des graphiques)"""
+        return np.nan_to_num(self.colonne(chemin), nan=0.0)
+
+    def par_habitant(self, chemin: str) -> np.ndarray:
+        """Montants k€ convertis en €/hab (0 si population absente ou nulle)"""
+        population = self.colonne(CHEMIN_POPULATION)
+        montants = self.valeurs_ou_zero(chemin)
+        resultat = np.zeros(len(self))
+        valide = population > 0
+        resultat[valide] = montants[valide] * 1000 / population[valide]
+        return resultat
+
+    def dataframe(self, chemins: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """DataFrame année × métrique (toutes les colonnes ou celles demandées)"""
+        chemins = list(self.colonnes) if chemins is None else list(chemins)
+        return pd.DataFrame({c: self.colonne(c) for c in chemins}, index=pd.Index(self.annees, name='annee'))
+
+    # --- Évolutions ---
+
+    def evolutions_pct(self, chemin: str) -> np.ndarray:
+        """Évolutions N-1 → N en % (longueur n-1, NaN si une valeur manque ou si N-1 vaut 0)"""
+        valeurs = self.colonne(chemin)
+        precedentes = valeurs[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            evolutions = (valeurs[1:] - precedentes) / np.abs(precedentes) * 100
+        evolutions[precedentes == 0] = np.nan
+        return evolutions
+
+    def evolution_moyenne(self, chemin: str) -> Optional[float]:
+        """
+        Évolution moyenne annuelle en % : moyenne des évolutions entre valeurs présentes
+        successives, chacune arrondie à 1 décimale (années sans valeur ignorées)
+        """
+        valeurs = self.colonne(chemin)
+        valeurs = valeurs[~np.isnan(valeurs)]
+        if len(valeurs) < 2:
+            return None
+        precedentes = valeurs[:-1]
+        valides = precedentes != 0
+        evolutions = (valeurs[1:][valides] - precedentes[valides]) / np.abs(precedentes[valides]) * 100
+        if not len(evolutions):
+            return None
+        # Arrondi de round() sur chaque évolution, comme calculer_evolution
+        arrondies = [round(e, 1) for e in evolutions.tolist()]
+        return round(sum(arrondies) / len(arrondies), 1)
+
+    def taux_croissance_annuel_moyen(self, chemin: str) -> Optional[float]:
+        """
+        TCAM (CAGR) en % entre la première et la dernière valeur présentes
+
+        Returns:
+            None si moins de deux valeurs, ou si une des bornes n'est pas strictement positive
+        """
+        valeurs = self.colonne(chemin)
+        presentes = np.flatnonzero(~np.isnan(valeurs))
+        if len(presentes) < 2:
+            return None
+        debut, fin = presentes[0], presentes[-1]
+        if valeurs[debut] <= 0 or valeurs[fin] <= 0:
+            return None
+        nb_annees = self.annees[fin] - self.annees[debut]
+        return round(float((valeurs[fin] / valeurs[debut]) ** (1 / nb_annees) - 1) * 100, 1)
@@ -0,0 +1,322 @@
+"""
+Tendances et anomalies vectorisées sur une matrice commune × année × poste
+Alternative à detecter_tendances_et_anomalies (seuils sur l'évolution première/dernière année) :
+tous les indicateurs sont calculés en une passe NumPy pour tous les postes de toutes les communes,
+ce qui permet le criblage d'un département entier sur 20 exercices.
+
+Indicateurs par (commune, poste) :
+    - pente des moindres carrés (k€/an) et pente relative (% de la moyenne par an)
+    - TCAM entre la première et la dernière valeur présentes (bornes strictement positives)
+    - volatilité glissante : écart-type des évolutions annuelles sur FENETRE_VOLATILITE années
+    - rupture structurelle : changement de moyenne des évolutions annuelles ; la statistique F
+      du meilleur point de coupure est comparée à SEUIL_RUPTURE
+    - anomalies : écart de chaque croissance annuelle aux autres années du poste (hors année
+      testée), converti en z-score de même probabilité que le t de Student correspondant,
+      |z| >= SEUIL_ZSCORE ; en option, z-score par rapport aux autres communes
+
+Valeurs absentes : NaN (années sans bilan, postes manquants) ; elles sont ignorées des calculs.
+
+Usage:
+    from analysis.tendances_vectorisees import AnalyseTendances
+
+    analyse = AnalyseTendances.depuis_panels({"200053395": bilans, ...})
+    analyse.synthese()            # une ligne par (commune, poste)
+    analyse.liste_anomalies()     # une ligne par évolution annuelle anormale
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.analyseur_multi_annees import POSTES_CLES
+from analysis.panel_bilans import PanelBilans
+
+
+FENETRE_VOLATILITE = 3
+SEUIL_ZSCORE = 3.0
+# Autres années nécessaires au z-score d'une évolution (moyenne et écart-type hors année testée)
+MIN_AUTRES_ZSCORE = 6
+SEUIL_RUPTURE = 10.0
+MIN_SEGMENT_RUPTURE = 2
+
+
+def _scipy_special():
+    try:
+        from scipy import special
+    except ImportError:
+        raise ImportError(
+            "La bibliothèque 'scipy' n'est pas installée. "
+            "Installez-la avec : pip install scipy"
+        )
+    return special
+
+
+def _sommes_cumulees(valeurs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sommes cumulées le long des années (avec 0 en tête) des valeurs, de leurs carrés et des présences"""
+    masque = ~np.isnan(valeurs)
+    valeurs = np.where(masque, valeurs, 0.0)
+    zeros = np.zeros((valeurs.shape[0], 1, valeurs.shape[2]))
+    return (
+        np.concatenate([zeros, np.cumsum(valeurs, axis=1)], axis=1),
+        np.concatenate([zeros, np.cumsum(valeurs ** 2, axis=1)], axis=1),
+        np.concatenate([zeros, np.cumsum(masque, axis=1)], axis=1),
+    )
+
+
+def _derniere_valeur(valeurs: np.ndarray) -> np.ndarray:
+    """Dernière valeur présente le long des années (NaN si aucune)"""
+    masque = ~np.isnan(valeurs)
+    dernier = valeurs.shape[1] - 1 - masque[:, ::-1].argmax(axis=1)
+    resultat = np.take_along_axis(valeurs, dernier[:, None, :], axis=1)[:, 0]
+    return np.where(masque.any(axis=1), resultat, np.nan)
+
+
+def evolutions_pct(valeurs: np.ndarray) -> np.ndarray:
+    """Évolutions N-1 → N en % (axe des années réduit d'un ; NaN si une valeur manque ou si N-1 vaut 0)"""
+    precedentes = valeurs[:, :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        evolutions = (valeurs[:, 1:] - precedentes) / np.abs(precedentes) * 100
+    evolutions[precedentes == 0] = np.nan
+    return evolutions
+
+
+def croissances_log(valeurs: np.ndarray) -> np.ndarray:
+    """
+    Croissances N-1 → N servant aux anomalies temporelles : log(N / N-1) pour les séries
+    strictement positives, variation N - (N-1) sinon (un % rapporté à une valeur proche de 0
+    ou de signe opposé n'a pas de loi exploitable)
+    """
+    positives = (np.nan_to_num(valeurs, nan=1.0) > 0).all(axis=1, keepdims=True)
+    series = np.where(positives, np.log(np.where(positives, valeurs, 1.0)), valeurs)
+    return series[:, 1:] - series[:, :-1]
+
+
+def pente_moindres_carres(valeurs: np.ndarray, annees: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pente de la droite des moindres carrés par (commune, poste), sur les années présentes
+
+    Returns:
+        (pente par an, moyenne des valeurs) ; NaN si moins de deux années
+    """
+    x = np.asarray(list(annees), dtype=float)[None, :, None]
+    masque = ~np.isnan(valeurs)
+    nb = masque.sum(axis=1)
+    y = np.where(masque, valeurs, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_moyen = (masque * x).sum(axis=1) / nb
+        y_moyen = y.sum(axis=1) / nb
+        ecarts_x = np.where(masque, x - x_moyen[:, None, :], 0.0)
+        pente = (ecarts_x * (y - y_moyen[:, None, :])).sum(axis=1) / (ecarts_x ** 2).sum(axis=1)
+    pente[nb < 2] = np.nan
+    return pente, y_moyen
+
+
+def taux_croissance_annuel_moyen(valeurs: np.ndarray, annees: Iterable[int]) -> np.ndarray:
+    """TCAM en % entre la première et la dernière valeur présentes (NaN si une borne n'est pas positive)"""
+    annees = np.asarray(list(annees), dtype=float)
+    masque = ~np.isnan(valeurs)
+    premier = masque.argmax(axis=1)
+    dernier = valeurs.shape[1] - 1 - masque[:, ::-1].argmax(axis=1)
+    debut = np.take_along_axis(valeurs, premier[:, None, :], axis=1)[:, 0]
+    fin = np.take_along_axis(valeurs, dernier[:, None, :], axis=1)[:, 0]
+    duree = annees[dernier] - annees[premier]
+    valide = (masque.sum(axis=1) >= 2) & (debut > 0) & (fin > 0) & (duree > 0)
+    tcam = np.full(debut.shape, np.nan)
+    tcam[valide] = ((fin[valide] / debut[valide]) ** (1 / duree[valide]) - 1) * 100
+    return tcam
+
+
+def volatilite_glissante(evolutions: np.ndarray, fenetre: int = FENETRE_VOLATILITE) -> np.ndarray:
+    """
+    Écart-type (ddof=1) des évolutions annuelles sur les `fenetre` dernières années
+
+    Returns:
+        Matrice alignée sur les années (commune × année × poste) : valeur à l'année de fin de
+        fenêtre, NaN si la fenêtre contient moins de deux évolutions
+    """
+    nb_communes, nb_evolutions, nb_postes = evolutions.shape
+    volatilite = np.full((nb_communes, nb_evolutions + 1, nb_postes), np.nan)
+    if nb_evolutions < fenetre:
+        return volatilite
+    sommes, carres, presences = _sommes_cumulees(evolutions)
+    s1 = sommes[:, fenetre:] - sommes[:, :-fenetre]
+    s2 = carres[:, fenetre:] - carres[:, :-fenetre]
+    nb = presences[:, fenetre:] - presences[:, :-fenetre]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.maximum(s2 - s1 ** 2 / nb, 0) / (nb - 1)
+    variance[nb < 2] = np.nan
+    # Fenêtre finissant à l'évolution j : année d'indice j + 1
+    volatilite[:, fenetre:] = np.sqrt(variance)
+    return volatilite
+
+
+def ruptures_structurelles(evolutions: np.ndarray,
+                           min_segment: int = MIN_SEGMENT_RUPTURE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Meilleur point de coupure de la moyenne des évolutions annuelles (deux segments)
+
+    Pour chaque coupure, la somme des carrés intra-segments (SCR) est comparée à celle d'une
+    moyenne unique (SCT) : F = (SCT - SCR) / (SCR / (n - 2)).
+
+    Returns:
+        (statistique F maximale, indice de la première évolution du second segment) ;
+        NaN / -1 si la série est trop courte ou constante
+    """
+    sommes, carres, presences = _sommes_cumulees(evolutions)
+    nb_evolutions = evolutions.shape[1]
+    total_s, total_q, total_n = sommes[:, -1:], carres[:, -1:], presences[:, -1:]
+
+    # Coupure k : premier segment = évolutions d'indice < k
+    n1 = presences[:, 1:nb_evolutions]
+    n2 = total_n - n1
+    s1 = sommes[:, 1:nb_evolutions]
+    s2 = total_s - s1
+    q1 = carres[:, 1:nb_evolutions]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scr = np.maximum(q1 - s1 ** 2 / n1, 0) + np.maximum(total_q - q1 - s2 ** 2 / n2, 0)
+        sct = np.maximum(total_q - total_s ** 2 / total_n, 0)
+        statistique = (sct - scr) / (scr / (total_n - 2))
+    # Série constante (aux erreurs d'arrondi près) : pas de rupture
+    constante = sct <= 1e-9 * np.maximum(total_q, 1)
+    valide = (n1 >= min_segment) & (n2 >= min_segment) & ~constante
+    statistique = np.where(valide & ~np.isnan(statistique), statistique, -np.inf)
+
+    if statistique.shape[1] == 0:
+        forme = (evolutions.shape[0], evolutions.shape[2])
+        return np.full(forme, np.nan), np.full(forme, -1)
+    meilleure = statistique.argmax(axis=1)
+    stat_max = np.take_along_axis(statistique, meilleure[:, None, :], axis=1)[:, 0]
+    trouvee = stat_max > -np.inf
+    return np.where(trouvee, stat_max, np.nan), np.where(trouvee, meilleure + 1, -1)
+
+
+def zscores_temporels(croissances: np.ndarray, min_autres: int = MIN_AUTRES_ZSCORE) -> np.ndarray:
+    """
+    z-score de chaque croissance annuelle par rapport aux autres années du même poste
+
+    La moyenne et l'écart-type excluent l'année testée : une évolution isolée n'écrase pas sa
+    propre référence. Avec n autres années, l'écart (x - moyenne) / (écart-type × √(1 + 1/n))
+    suit une loi de Student à n - 1 degrés de liberté ; il est converti en z-score de la loi
+    normale de même probabilité, si bien que |z| >= SEUIL_ZSCORE garde le taux de fausses
+    alertes de 3 σ (0,27 %) quelle que soit la longueur de la série.
+    """
+    special = _scipy_special()
+    masque = ~np.isnan(croissances)
+    e = np.where(masque, croissances, 0.0)
+    s1 = e.sum(axis=1, keepdims=True)
+    s2 = (e ** 2).sum(axis=1, keepdims=True)
+    nb_autres = masque.sum(axis=1, keepdims=True) - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moyenne = (s1 - e) / nb_autres
+        variance = np.maximum(s2 - e ** 2 - (s1 - e) ** 2 / nb_autres, 0) / (nb_autres - 1)
+        t = (e - moyenne) / np.sqrt(variance * (1 + 1 / nb_autres))
+    # Écart nul à une référence constante : pas d'anomalie
+    t[np.isnan(t)] = 0.0
+    ddl = np.broadcast_to(np.maximum(nb_autres - 1, 1), t.shape).astype(float)
+    zscores = -np.sign(t) * special.ndtri(special.stdtr(ddl, -np.abs(t)))
+    zscores[~masque | (nb_autres < min_autres)] = np.nan
+    return zscores
+
+
+def zscores_transversaux(evolutions: np.ndarray, min_communes: int = MIN_AUTRES_ZSCORE + 1) -> np.ndarray:
+    """z-score de chaque évolution par rapport aux autres communes, même année et même poste"""
+    masque = ~np.isnan(evolutions)
+    e = np.where(masque, evolutions, 0.0)
+    nb = masque.sum(axis=0, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moyenne = e.sum(axis=0, keepdims=True) / nb
+        ecart_type = np.sqrt((np.where(masque, e - moyenne, 0.0) ** 2).sum(axis=0, keepdims=True) / (nb - 1))
+        zscores = (evolutions - moyenne) / ecart_type
+    zscores[np.broadcast_to((nb < min_communes) | (ecart_type == 0), zscores.shape)] = np.nan
+    return zscores
+
+
+class AnalyseTendances:
+    """Indicateurs de tendance de toutes les communes et de tous les postes d'une matrice"""
+
+    def __init__(self, valeurs, annees: Iterable[int], postes: Iterable[str],
+                 communes: Optional[Iterable] = None, fenetre_volatilite: int = FENETRE_VOLATILITE):
+        """
+        Args:
+            valeurs: Matrice commune × année × poste (ou année × poste pour une seule commune), NaN si absent
+            annees: Années de l'axe 1, croissantes
+            postes: Noms des postes de l'axe 2
+            communes: Identifiants des communes de l'axe 0 (par défaut leur indice)
+        """
+        valeurs = np.asarray(valeurs, dtype=float)
+        if valeurs.ndim == 2:
+            valeurs = valeurs[None]
+        self.valeurs = valeurs
+        self.annees = list(annees)
+        self.postes = list(postes)
+        self.communes = list(communes) if communes is not None else list(range(valeurs.shape[0]))
+
+        self.evolutions_pct = evolutions_pct(valeurs)
+        self.pente, moyenne = pente_moindres_carres(valeurs, self.annees)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.pente_pct = np.where(moyenne != 0, self.pente / np.abs(moyenne) * 100, np.nan)
+        self.tcam_pct = taux_croissance_annuel_moyen(valeurs, self.annees)
+        self.volatilite_pct = volatilite_glissante(self.evolutions_pct, fenetre_volatilite)
+
+        self.stat_rupture, indice_rupture = ruptures_structurelles(self.evolutions_pct)
+        # Première année du nouveau régime : fin de la première évolution du second segment
+        annees_fin = np.asarray(self.annees[1:] + [np.nan], dtype=float)
+        self.annee_rupture = np.where(self.stat_rupture >= SEUIL_RUPTURE, annees_fin[indice_rupture], np.nan)
+
+        self.zscores = zscores_temporels(croissances_log(valeurs))
+        self.anomalies = np.abs(np.nan_to_num(self.zscores)) >= SEUIL_ZSCORE
+
+    @classmethod
+    def depuis_panels(cls, panels: Dict, postes: Optional[Dict[str, str]] = None,
+                      **options) -> "AnalyseTendances":
+        """
+        Matrice construite depuis les bilans de plusieurs communes
+
+        Args:
+            panels: {commune: PanelBilans ou liste de bilans}
+            postes: {libellé: chemin} des postes suivis (par défaut POSTES_CLES)
+        """
+        postes = POSTES_CLES if postes is None else postes
+        chemins = list(postes.values())
+        panels = {commune: PanelBilans.depuis(p, chemins) for commune, p in panels.items()}
+        annees = sorted({annee for panel in panels.values() for annee in panel.annees})
+        position = {annee: i for i, annee in enumerate(annees)}
+
+        valeurs = np.full((len(panels), len(annees), len(chemins)), np.nan)
+        for i, panel in enumerate(panels.values()):
+            lignes = [position[annee] for annee in panel.annees]
+            valeurs[i, lignes] = np.column_stack([panel.colonne(chemin) for chemin in chemins])
+        return cls(valeurs, annees, postes.keys(), panels.keys(), **options)
+
+    def synthese(self) -> pd.DataFrame:
+        """Une ligne par (commune, poste) : pente, TCAM, volatilité récente, rupture, nombre d'anomalies"""
+        index = pd.MultiIndex.from_product([self.communes, self.postes], names=['commune', 'poste'])
+        colonnes = {
+            'pente_k_par_an': self.pente,
+            'pente_pct': self.pente_pct,
+            'tcam_pct': self.tcam_pct,
+            'volatilite_pct': _derniere_valeur(self.volatilite_pct),
+            'stat_rupture': self.stat_rupture,
+            'annee_rupture': self.annee_rupture,
+            'nb_anomalies': self.anomalies.sum(axis=1),
+        }
+        return pd.DataFrame({nom: valeurs.reshape(-1) for nom, valeurs in colonnes.items()}, index=index)
+
+    def liste_anomalies(self, transversales: bool = False, seuil: float = SEUIL_ZSCORE) -> pd.DataFrame:
+        """
+        Évolutions annuelles anormales, une ligne par (commune, poste, année)
+
+        Args:
+            transversales: z-score par rapport aux autres communes au lieu des autres années
+            seuil: |z| à partir duquel l'évolution est signalée
+        """
+        zscores = zscores_transversaux(self.evolutions_pct) if transversales else self.zscores
+        communes, evolutions, postes = np.nonzero(np.abs(np.nan_to_num(zscores)) >= seuil)
+        return pd.DataFrame({
+            'commune': [self.communes[i] for i in communes],
+            'poste': [self.postes[j] for j in postes],
+            'annee': [self.annees[k + 1] for k in evolutions],
+            'evolution_pct': self.evolutions_pct[communes, evolutions, postes],
+            'zscore': zscores[communes, evolutions, postes],
+        })
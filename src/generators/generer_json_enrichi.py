@@ -11,6 +11,25 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from parsers.parser_budget_v2_complet import ParserBudget
+from parsers.cache_bilans import CacheBilans, empreinte_sources, hash_fichier, obtenir_cache_par_defaut
+
+
+# Code de construction du JSON enrichi : toute modification de ce module invalide les
+# JSON enrichis en cache (en plus de l'empreinte du parser)
+EMPREINTE_CODE_JSON_ENRICHI = empreinte_sources(__file__)
+
+# Postes du JSON enrichi comparés au groupe de pairs (agrégat OFGL -> chemin dans le JSON)
+POSTES_PAIRS = {
+    "Recettes de fonctionnement": ("fonctionnement", "produits", "total"),
+    "Dépenses de fonctionnement": ("fonctionnement", "charges", "total"),
+    "Impôts locaux": ("fonctionnement", "produits", "impots_locaux"),
+    "Dotation globale de fonctionnement": ("fonctionnement", "produits", "dgf"),
+    "Frais de personnel": ("fonctionnement", "charges", "charges_personnel"),
+    "Achats et charges externes": ("fonctionnement", "charges", "achats_charges_externes"),
+    "Dépenses d'équipement": ("investissement", "emplois", "depenses_equipement"),
+    "Encours de dette": ("endettement", "encours_total"),
+    "Epargne brute": ("autofinancement", "caf_brute"),
+}
 
 
 def calculer_ecart_absolu_et_pct(valeur_commune, valeur_strate):
@@ -24,7 +43,7 @@ def calculer_ecart_absolu_et_pct(valeur_commune, valeur_strate):
     return ecart_absolu, ecart_pct
 
 
-def formater_comparaison_texte(valeur_commune, valeur_strate, unite="€/hab"):
+def formater_comparaison_texte(valeur_commune, valeur_strate, unite="€/hab", reference="Moyenne de la strate"):
     """Génère le texte de comparaison formaté"""
     if valeur_commune is None or valeur_strate is None:
         return None
@@ -46,19 +65,84 @@ def formater_comparaison_texte(valeur_commune, valeur_strate, unite="€/hab"):
         niveau = "inférieur à"
 
     return {
-        "texte": f"{valeur_commune}{unite} commune – {valeur_strate}{unite} Moyenne de la strate",
+        "texte": f"{valeur_commune}{unite} commune – {valeur_strate}{unite} {reference}",
         "ecart_absolu": ecart_abs,
         "ecart_pct": ecart_pct,
         "niveau": niveau
     }
 
 
-def generer_json_enrichi(fichier_pdf):
-    """Génère JSON enrichi avec TOUS les ratios et comparaisons"""
+def generer_json_enrichi(fichier_pdf, utiliser_cache=True, cache=None):
+    """
+    Génère JSON enrichi avec TOUS les ratios et comparaisons
+
+    Args:
+        fichier_pdf: Chemin du bilan PDF
+        utiliser_cache: Réutiliser les résultats déjà calculés pour un PDF au contenu identique
+        cache: CacheBilans à utiliser (défaut: cache partagé, cf. BILANS_CACHE)
+
+    Le groupe de pairs, qui dépend du SIREN et de l'exercice lu dans le PDF, est ajouté
+    ensuite par ajouter_benchmark_pairs (cf. generer_json_initial.py)
+    """
+    if utiliser_cache and cache is None:
+        cache = obtenir_cache_par_defaut()
+
+    parser = ParserBudget(cache=cache)
+
+    cle_cache = None
+    hash_pdf = None
+    if cache is not None:
+        hash_pdf = hash_fichier(fichier_pdf)
+        cle_cache = CacheBilans.cle(hash_pdf, 'json_enrichi', f"{parser.empreinte_config}-{EMPREINTE_CODE_JSON_ENRICHI}")
+        json_data = cache.lire(cle_cache)
+        if json_data is not None:
+            return json_data
 
     # Parser les données avec le nouveau parser
-    parser = ParserBudget()
-    budget = parser.parser_bilan_pdf(fichier_pdf)
+    budget = parser.parser_bilan_pdf(fichier_pdf, hash_pdf=hash_pdf)
+    json_data = construire_json_enrichi(budget)
+
+    if cle_cache is not None:
+        cache.ecrire(cle_cache, json_data)
+
+    return json_data
+
+
+def ajouter_benchmark_pairs(json_data, benchmark_pairs):
+    """
+    Ajoute la comparaison au groupe de pairs (moyenne_pairs_hab, comparaison_pairs) aux postes
+    de POSTES_PAIRS et la liste des pairs dans metadata.pairs
+
+    Args:
+        json_data: JSON enrichi (modifié sur place)
+        benchmark_pairs: {"k", "communes": [{"siren", "nom", "population", "distance"}], "moyennes_hab"}
+    """
+    json_data["metadata"]["pairs"] = {
+        "k": benchmark_pairs["k"],
+        "libelle": f"{benchmark_pairs['k']} communes au profil budgétaire le plus proche",
+        "communes": [
+            {"siren": p["siren"], "nom": p["nom"], "population": p["population"]}
+            for p in benchmark_pairs["communes"]
+        ]
+    }
+
+    for agregat, chemin in POSTES_PAIRS.items():
+        moyenne = benchmark_pairs["moyennes_hab"].get(agregat)
+        poste = json_data
+        for cle in chemin:
+            poste = poste.get(cle) if isinstance(poste, dict) else None
+        if poste is None or moyenne is None:
+            continue
+        poste["moyenne_pairs_hab"] = round(moyenne)
+        poste["comparaison_pairs"] = formater_comparaison_texte(
+            poste.get("par_hab"), round(moyenne), reference="Moyenne des pairs"
+        )
+
+    return json_data
+
+
+def construire_json_enrichi(budget):
+    """Construit le JSON enrichi à partir des données extraites par ParserBudget"""
 
     # Extraire les infos de base depuis budget
     nom_commune = budget.get('commune', 'CHAMPAGNAC')
@@ -8,6 +8,8 @@ import matplotlib.patches as mpatches
 from typing import List, Dict, Optional
 import os
 
+from analysis.panel_bilans import PanelBilans
+
 
 def configurer_style_graphique():
     """Configure le style visuel des graphiques"""
@@ -34,7 +36,7 @@ def generer_graphique_evolution_poste(
     Génère un graphique d'évolution pour un poste spécifique
 
     Args:
-        bilans: Liste des bilans avec années
+        bilans: Liste des bilans avec années (ou PanelBilans)
         chemin_poste: Chemin vers la valeur (ex: "fonctionnement.produits.total.montant_k")
         titre: Titre du graphique
         unite: Unité d'affichage
@@ -46,33 +48,13 @@ def generer_graphique_evolution_poste(
     """
     configurer_style_graphique()
 
-    # Extraire les données
-    annees = [b['annee'] for b in bilans]
-    valeurs = []
-
-    for bilan in bilans:
-        keys = chemin_poste.split('.')
-        valeur = bilan['data']
-
-        for key in keys:
-            if isinstance(valeur, dict) and key in valeur:
-                valeur = valeur[key]
-            else:
-                valeur = None
-                break
-
-        valeur_finale = valeur if valeur is not None else 0
-
-        # Normaliser par habitant si demandé
-        if par_habitant:
-            population = bilan['data'].get('metadata', {}).get('population')
-            if population and population > 0:
-                # Convertir k€ en €/hab (1 k€ = 1000 €)
-                valeur_finale = (valeur_finale * 1000) / population
-            else:
-                valeur_finale = 0
-
-        valeurs.append(valeur_finale)
+    # Extraire les données (une colonne du panel, k€ -> €/hab si demandé)
+    panel = PanelBilans.depuis(bilans, [chemin_poste])
+    annees = panel.annees
+    if par_habitant:
+        valeurs = panel.par_habitant(chemin_poste).tolist()
+    else:
+        valeurs = panel.valeurs_ou_zero(chemin_poste).tolist()
 
     # Créer le graphique
     fig, ax = plt.subplots(figsize=(10, 5))
@@ -137,7 +119,7 @@ def generer_graphique_comparaison_multiple(
     Génère un graphique avec plusieurs courbes pour comparer plusieurs postes
 
     Args:
-        bilans: Liste des bilans
+        bilans: Liste des bilans (ou PanelBilans)
         postes_config: Liste de dicts avec {
             'chemin': str,
             'label': str,
@@ -155,7 +137,8 @@ def generer_graphique_comparaison_multiple(
 
     couleurs_defaut = ['#2c3e50', '#e74c3c', '#3498db', '#2ecc71', '#f39c12', '#9b59b6']
 
-    annees = [b['annee'] for b in bilans]
+    panel = PanelBilans.depuis(bilans, [config['chemin'] for config in postes_config])
+    annees = panel.annees
 
     fig, ax = plt.subplots(figsize=(12, 6))
 
@@ -164,29 +147,11 @@ def generer_graphique_comparaison_multiple(
         label = config['label']
         couleur = config.get('couleur', couleurs_defaut[idx % len(couleurs_defaut)])
 
-        valeurs = []
-        for bilan in bilans:
-            keys = chemin.split('.')
-            valeur = bilan['data']
-
-            for key in keys:
-                if isinstance(valeur, dict) and key in valeur:
-                    valeur = valeur[key]
-                else:
-                    valeur = None
-                    break
-
-            valeur_finale = valeur if valeur is not None else 0
-
-            # Normaliser par habitant si demandé
-            if par_habitant:
-                population = bilan['data'].get('metadata', {}).get('population')
-                if population and population > 0:
-                    valeur_finale = (valeur_finale * 1000) / population
-                else:
-                    valeur_finale = 0
-
-            valeurs.append(valeur_finale)
+        # Normaliser par habitant si demandé
+        if par_habitant:
+            valeurs = panel.par_habitant(chemin).tolist()
+        else:
+            valeurs = panel.valeurs_ou_zero(chemin).tolist()
 
         ax.plot(annees, valeurs, marker='o', linewidth=2, markersize=6,
                color=couleur, label=label)
@@ -301,7 +266,7 @@ def generer_graphique_barres_empilees(
     Génère un graphique en barres empilées pour comparer la structure budgétaire
 
     Args:
-        bilans: Liste des bilans
+        bilans: Liste des bilans (ou PanelBilans)
         postes: Liste de dicts avec {'chemin': str, 'label': str, 'couleur': str}
         titre: Titre du graphique
         fichier_sortie: Chemin de sauvegarde
@@ -311,26 +276,13 @@ def generer_graphique_barres_empilees(
     """
     configurer_style_graphique()
 
-    annees = [b['annee'] for b in bilans]
+    panel = PanelBilans.depuis(bilans, [config['chemin'] for config in postes])
+    annees = panel.annees
     donnees_postes = {}
 
     for config in postes:
-        valeurs = []
-        for bilan in bilans:
-            keys = config['chemin'].split('.')
-            valeur = bilan['data']
-
-            for key in keys:
-                if isinstance(valeur, dict) and key in valeur:
-                    valeur = valeur[key]
-                else:
-                    valeur = None
-                    break
-
-            valeurs.append(valeur if valeur is not None else 0)
-
         donnees_postes[config['label']] = {
-            'valeurs': valeurs,
+            'valeurs': panel.valeurs_ou_zero(config['chemin']).tolist(),
             'couleur': config.get('couleur', '#3498db')
         }
 
@@ -367,17 +319,23 @@ def generer_tous_graphiques_standard(bilans: List[Dict], ratios_par_annee: List[
     """
     Génère tous les graphiques standards pour un rapport multi-années
 
+    Args:
+        bilans: Liste des bilans ou PanelBilans (déjà construit, il est réutilisé)
+        ratios_par_annee: Ratios par année (calculer_ratios_evolutifs)
+
     Returns:
         Dict avec {nom_graphique: chemin_fichier}
     """
     graphiques_generes = {}
+    # Un seul panel année × métrique pour toutes les séries
+    panel = PanelBilans.depuis(bilans)
 
     print("\nGénération des graphiques...")
 
     # 1. Produits et Charges de fonctionnement (par habitant)
     print("  • Produits et Charges de fonctionnement (par habitant)")
     graphiques_generes['produits_charges'] = generer_graphique_comparaison_multiple(
-        bilans,
+        panel,
         [
             {'chemin': 'fonctionnement.produits.total.montant_k', 'label': 'Produits', 'couleur': '#2ecc71'},
             {'chemin': 'fonctionnement.charges.total.montant_k', 'label': 'Charges', 'couleur': '#e74c3c'}
@@ -391,7 +349,7 @@ def generer_tous_graphiques_standard(bilans: List[Dict], ratios_par_annee: List[
     # 2. Résultat de fonctionnement (par habitant)
     print("  • Résultat de fonctionnement (par habitant)")
     graphiques_generes['resultat'] = generer_graphique_evolution_poste(
-        bilans,
+        panel,
         'fonctionnement.resultat.montant_k',
         'Résultat de fonctionnement',
         '€/hab',
@@ -402,7 +360,7 @@ def generer_tous_graphiques_standard(bilans: List[Dict], ratios_par_annee: List[
     # 3. CAF brute et nette (par habitant)
     print("  • CAF brute et nette (par habitant)")
     graphiques_generes['caf'] = generer_graphique_comparaison_multiple(
-        bilans,
+        panel,
         [
             {'chemin': 'autofinancement.caf_brute.montant_k', 'label': 'CAF brute', 'couleur': '#3498db'},
             {'chemin': 'autofinancement.caf_nette.montant_k', 'label': 'CAF nette', 'couleur': '#9b59b6'}
@@ -416,7 +374,7 @@ def generer_tous_graphiques_standard(bilans: List[Dict], ratios_par_annee: List[
     # 4. Encours de la dette (par habitant)
     print("  • Encours de la dette (par habitant)")
     graphiques_generes['dette'] = generer_graphique_evolution_poste(
-        bilans,
+        panel,
         'endettement.encours_total.montant_k',
         'Encours de la dette',
         '€/hab',
@@ -438,7 +396,7 @@ def generer_tous_graphiques_standard(bilans: List[Dict], ratios_par_annee: List[
     # 6. Dépenses d'équipement (par habitant)
     print("  • Dépenses d'équipement (par habitant)")
     graphiques_generes['depenses_equip'] = generer_graphique_evolution_poste(
-        bilans,
+        panel,
         'investissement.emplois.depenses_equipement.montant_k',
         'Dépenses d\'équipement',
         '€/hab',
@@ -473,7 +431,7 @@ def generer_graphique_evolution_structure_100pct(
     Génère un graphique en barres empilées à 100% pour voir l'évolution de la structure
 
     Args:
-        bilans: Liste des bilans
+        bilans: Liste des bilans (ou PanelBilans)
         postes_chemins: Liste de dicts avec {'chemin': str (ex: 'fonctionnement.produits.impots_locaux.pct_produits_caf'),
                                              'label': str,
                                              'couleur': str}
@@ -485,28 +443,15 @@ def generer_graphique_evolution_structure_100pct(
     """
     configurer_style_graphique()
 
-    annees = [b['annee'] for b in bilans]
+    panel = PanelBilans.depuis(bilans, [config['chemin'] for config in postes_chemins])
+    annees = panel.annees
     categories = [str(a) for a in annees]
 
     # Extraire les données pour chaque poste
     data_postes = {}
     for config in postes_chemins:
-        valeurs = []
-        for bilan in bilans:
-            keys = config['chemin'].split('.')
-            valeur = bilan['data']
-
-            for key in keys:
-                if isinstance(valeur, dict) and key in valeur:
-                    valeur = valeur[key]
-                else:
-                    valeur = None
-                    break
-
-            valeurs.append(valeur if valeur is not None else 0)
-
         data_postes[config['label']] = {
-            'valeurs': valeurs,
+            'valeurs': panel.valeurs_ou_zero(config['chemin']).tolist(),
             'couleur': config.get('couleur', '#3498db')
         }
 
@@ -0,0 +1,250 @@
+"""
+Backends d'extraction de texte PDF pour le parser de bilans
+Permet de changer de bibliothèque (pdfplumber, PyMuPDF, pypdfium2) sans toucher aux ChampConfig :
+les backends autres que pdfplumber reconstruisent les lignes à partir de la position des caractères,
+comme pdfplumber (regroupement par ordonnée, tri de gauche à droite, espaces entre les mots).
+
+Configuration via variable d'environnement :
+    BILANS_BACKEND_PDF=pdfplumber|pymupdf|pypdfium2   (défaut: pdfplumber)
+
+Dépendances optionnelles (seul pdfplumber est requis) :
+    pip install pymupdf pypdfium2
+
+Usage:
+    from parsers.backends_pdf import ouvrir_document_pdf
+
+    with ouvrir_document_pdf("bilan.pdf") as document:
+        for numero in range(document.nb_pages):
+            texte = document.texte_page(numero)
+"""
+
+import os
+import unicodedata
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional, Tuple
+
+
+BACKEND_DEFAUT = "pdfplumber"
+
+# Tolérances de regroupement (en points), identiques aux valeurs par défaut de pdfplumber
+TOLERANCE_Y = 3
+TOLERANCE_X = 3
+
+# Caractère positionné dans le repère de la page affichée : (x0, x1, haut, caractère)
+Caractere = Tuple[float, float, float, str]
+
+
+def normaliser_texte(texte: str) -> str:
+    """Forme Unicode composée, espaces insécables et retours chariot normalisés"""
+    texte = unicodedata.normalize('NFC', texte)
+    return texte.replace('\u00a0', ' ').replace('\u202f', ' ').replace('\r', '')
+
+
+def reconstruire_lignes(caracteres: Iterable[Caractere]) -> str:
+    """
+    Reconstruit le texte d'une page à partir des caractères positionnés, comme pdfplumber :
+    regroupement en lignes par ordonnée (tolérance TOLERANCE_Y), tri par abscisse,
+    une espace entre deux mots (blanc dans le PDF ou écart > TOLERANCE_X).
+    """
+    lignes: List[List[Caractere]] = []
+    haut_precedent = None
+    for caractere in sorted(caracteres, key=lambda c: c[2]):
+        if haut_precedent is None or caractere[2] - haut_precedent > TOLERANCE_Y:
+            lignes.append([])
+        haut_precedent = caractere[2]
+        lignes[-1].append(caractere)
+
+    resultat = []
+    for ligne in lignes:
+        morceaux = []
+        fin_precedente = None
+        separation = False
+        for x0, x1, _, texte in sorted(ligne, key=lambda c: c[0]):
+            if texte.isspace():
+                separation = True
+                continue
+            if morceaux and (separation or x0 - fin_precedente > TOLERANCE_X):
+                morceaux.append(' ')
+            morceaux.append(texte)
+            fin_precedente = x1
+            separation = False
+        if morceaux:
+            resultat.append(''.join(morceaux))
+
+    return normaliser_texte('\n'.join(resultat))
+
+
+class DocumentPdfBase(ABC):
+    """Document PDF ouvert par un backend"""
+
+    nom = ""
+
+    def __init__(self, fichier_pdf: str):
+        self.fichier_pdf = fichier_pdf
+
+    @property
+    @abstractmethod
+    def nb_pages(self) -> int:
+        """Nombre de pages du document"""
+        pass
+
+    @abstractmethod
+    def texte_page(self, numero: int) -> str:
+        """Texte d'une page (chaîne vide si la page n'a pas de texte)"""
+        pass
+
+    @abstractmethod
+    def fermer(self):
+        """Libère le document"""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+class DocumentPdfplumber(DocumentPdfBase):
+    """Backend de référence (utilisé pour mettre au point les ChampConfig)"""
+
+    nom = "pdfplumber"
+
+    def __init__(self, fichier_pdf: str):
+        super().__init__(fichier_pdf)
+        import pdfplumber
+        self.pdf = pdfplumber.open(fichier_pdf)
+
+    @property
+    def nb_pages(self) -> int:
+        return len(self.pdf.pages)
+
+    def texte_page(self, numero: int) -> str:
+        page = self.pdf.pages[numero]
+        texte = page.extract_text() or ''
+        # Libérer les objets de mise en page de la page
+        page.close()
+        return texte
+
+    def fermer(self):
+        self.pdf.close()
+
+
+class DocumentPymupdf(DocumentPdfBase):
+    """Backend PyMuPDF (MuPDF) : caractères positionnés via page.get_text('rawdict')"""
+
+    nom = "pymupdf"
+
+    def __init__(self, fichier_pdf: str):
+        super().__init__(fichier_pdf)
+        try:
+            import pymupdf as fitz
+        except ImportError:
+            try:
+                import fitz  # PyMuPDF < 1.24.3
+            except ImportError:
+                raise ImportError(
+                    "La bibliothèque 'PyMuPDF' n'est pas installée. "
+                    "Installez-la avec : pip install pymupdf"
+                )
+        self.document = fitz.open(fichier_pdf)
+
+    @property
+    def nb_pages(self) -> int:
+        return self.document.page_count
+
+    def texte_page(self, numero: int) -> str:
+        page = self.document[numero]
+        # Boîtes des caractères ramenées dans le repère de la page affichée (pages tournées)
+        a, b, c, d, e, f = page.rotation_matrix
+        caracteres = []
+        for bloc in page.get_text('rawdict')['blocks']:
+            for ligne in bloc.get('lines', []):
+                for span in ligne['spans']:
+                    for caractere in span['chars']:
+                        x0, y0, x1, y1 = caractere['bbox']
+                        xa, xb = a * x0 + c * y0 + e, a * x1 + c * y1 + e
+                        ya, yb = b * x0 + d * y0 + f, b * x1 + d * y1 + f
+                        caracteres.append((min(xa, xb), max(xa, xb), min(ya, yb), caractere['c']))
+        return reconstruire_lignes(caracteres)
+
+    def fermer(self):
+        self.document.close()
+
+
+class DocumentPypdfium2(DocumentPdfBase):
+    """Backend pypdfium2 (PDFium) : caractères positionnés de la page"""
+
+    nom = "pypdfium2"
+
+    def __init__(self, fichier_pdf: str):
+        super().__init__(fichier_pdf)
+        try:
+            import pypdfium2
+        except ImportError:
+            raise ImportError(
+                "La bibliothèque 'pypdfium2' n'est pas installée. "
+                "Installez-la avec : pip install pypdfium2"
+            )
+        self._raw = pypdfium2.raw
+        self.document = pypdfium2.PdfDocument(fichier_pdf)
+
+    @property
+    def nb_pages(self) -> int:
+        return len(self.document)
+
+    def texte_page(self, numero: int) -> str:
+        page = self.document[numero]
+        page_texte = page.get_textpage()
+        rotation = page.get_rotation()
+        largeur, hauteur = page.get_width(), page.get_height()
+        if rotation in (90, 270):
+            # get_width/get_height tiennent compte de la rotation
+            largeur, hauteur = hauteur, largeur
+
+        caracteres = []
+        for i in range(page_texte.count_chars()):
+            # Espaces et sauts de ligne ajoutés par PDFium : sans position réelle
+            if self._raw.FPDFText_IsGenerated(page_texte, i) == 1:
+                continue
+            texte = chr(self._raw.FPDFText_GetUnicode(page_texte, i))
+            # Boîte "large" (hauteur de la police) comme pdfplumber, ordonnée depuis le bas de la page non tournée
+            gauche, bas, droite, haut = page_texte.get_charbox(i, loose=True)
+            if rotation == 90:
+                x0, x1, y = bas, haut, gauche
+            elif rotation == 180:
+                x0, x1, y = largeur - droite, largeur - gauche, bas
+            elif rotation == 270:
+                x0, x1, y = hauteur - haut, hauteur - bas, largeur - droite
+            else:
+                x0, x1, y = gauche, droite, hauteur - haut
+            caracteres.append((x0, x1, y, texte))
+
+        page_texte.close()
+        page.close()
+        return reconstruire_lignes(caracteres)
+
+    def fermer(self):
+        self.document.close()
+
+
+BACKENDS = {
+    DocumentPdfplumber.nom: DocumentPdfplumber,
+    DocumentPymupdf.nom: DocumentPymupdf,
+    DocumentPypdfium2.nom: DocumentPypdfium2,
+}
+
+
+def nom_backend(backend: Optional[str] = None) -> str:
+    """Nom du backend demandé, sinon celui de BILANS_BACKEND_PDF"""
+    nom = (backend or os.getenv("BILANS_BACKEND_PDF", BACKEND_DEFAUT)).lower()
+    if nom == "fitz":
+        nom = DocumentPymupdf.nom
+    if nom not in BACKENDS:
+        raise ValueError(f"Backend PDF inconnu: {nom}. Backends disponibles: {', '.join(BACKENDS)}")
+    return nom
+
+
+def ouvrir_document_pdf(fichier_pdf: str, backend: Optional[str] = None) -> DocumentPdfBase:
+    """Ouvre un PDF avec le backend demandé (à utiliser comme gestionnaire de contexte)"""
+    return BACKENDS[nom_backend(backend)](fichier_pdf)
@@ -0,0 +1,178 @@
+"""
+Cache disque des bilans parsés, adressé par le contenu du PDF
+La clé combine le hash SHA-256 des octets du PDF, une empreinte de la configuration
+d'extraction et une empreinte du code source qui produit la valeur : un PDF déjà vu n'est
+plus re-parsé tant que ni les ChampConfig ni ce code ne changent, quel que soit son nom
+ou son emplacement.
+
+Stockage SQLite avec taille maximale et éviction LRU (entrées les moins récemment lues).
+
+Configuration via variables d'environnement :
+    BILANS_CACHE=chemin/vers/cache.sqlite   (ou "off" pour désactiver)
+    BILANS_CACHE_TAILLE_MO=256
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+CHEMIN_CACHE_DEFAUT = Path(__file__).resolve().parents[2] / "output" / "cache" / "bilans.sqlite"
+TAILLE_MAX_DEFAUT_MO = 256
+
+
+def hash_fichier(fichier: str, taille_bloc: int = 1 << 20) -> str:
+    """Hash SHA-256 du contenu d'un fichier"""
+    h = hashlib.sha256()
+    with open(fichier, 'rb') as f:
+        for bloc in iter(lambda: f.read(taille_bloc), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def empreinte_configuration(configs: List[Any], *extras: Any) -> str:
+    """
+    Empreinte de version d'une liste de ChampConfig
+    Toute modification d'un pattern, d'une clé de sortie, d'un type ou d'une option
+    change l'empreinte et invalide donc les entrées correspondantes.
+    """
+    h = hashlib.sha256()
+    for c in configs:
+        h.update(repr((
+            c.nom, c.pattern, list(c.cles_sortie), [t.__name__ for t in c.types],
+            c.traitement_special, c.occurrence, c.flags_regex
+        )).encode('utf-8'))
+    for extra in extras:
+        h.update(repr(extra).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def empreinte_sources(*fichiers: str) -> str:
+    """
+    Empreinte du code source des modules qui produisent une valeur en cache
+    Toute modification de l'un de ces fichiers change l'empreinte, sans version à incrémenter.
+    """
+    h = hashlib.sha256()
+    for fichier in fichiers:
+        h.update(Path(fichier).read_bytes())
+    return h.hexdigest()[:16]
+
+
+class CacheBilans:
+    """Cache SQLite clé -> JSON avec taille maximale et éviction LRU"""
+
+    def __init__(self, chemin: Optional[str] = None, taille_max_mo: float = TAILLE_MAX_DEFAUT_MO):
+        self.chemin = Path(chemin) if chemin else CHEMIN_CACHE_DEFAUT
+        self.taille_max = int(taille_max_mo * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        with self._connexion() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entrees (
+                    cle TEXT PRIMARY KEY,
+                    espace TEXT NOT NULL,
+                    valeur TEXT NOT NULL,
+                    taille INTEGER NOT NULL,
+                    cree_le REAL NOT NULL,
+                    utilise_le REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entrees_utilise_le ON entrees (utilise_le)")
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion courte (commit + fermeture) : plusieurs processus partagent le même fichier"""
+        conn = sqlite3.connect(str(self.chemin), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def cle(hash_pdf: str, espace: str, empreinte: str) -> str:
+        """Clé d'une entrée : espace (budget, json_enrichi...) + hash du PDF (hash_fichier) + version"""
+        return f"{espace}:{hash_pdf}:{empreinte}"
+
+    def lire(self, cle: str) -> Optional[Dict]:
+        """Retourne la valeur en cache (et la marque comme récemment utilisée) ou None"""
+        with self._connexion() as conn:
+            ligne = conn.execute("SELECT valeur FROM entrees WHERE cle = ?", (cle,)).fetchone()
+            if ligne is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entrees SET utilise_le = ? WHERE cle = ?", (time.time(), cle))
+
+        self.hits += 1
+        return json.loads(ligne[0])
+
+    def ecrire(self, cle: str, valeur: Dict) -> None:
+        """Enregistre une valeur puis évince les entrées les plus anciennes si la taille max est dépassée"""
+        texte = json.dumps(valeur, ensure_ascii=False)
+        maintenant = time.time()
+        espace = cle.split(':', 1)[0]
+
+        with self._connexion() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entrees (cle, espace, valeur, taille, cree_le, utilise_le) VALUES (?, ?, ?, ?, ?, ?)",
+                (cle, espace, texte, len(texte.encode('utf-8')), maintenant, maintenant)
+            )
+            self._evincer(conn)
+
+    def _evincer(self, conn: sqlite3.Connection) -> None:
+        """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous la taille max"""
+        total = conn.execute("SELECT COALESCE(SUM(taille), 0) FROM entrees").fetchone()[0]
+        if total <= self.taille_max:
+            return
+
+        a_supprimer = []
+        for cle, taille in conn.execute("SELECT cle, taille FROM entrees ORDER BY utilise_le ASC"):
+            if total <= self.taille_max:
+                break
+            a_supprimer.append((cle,))
+            total -= taille
+
+        conn.executemany("DELETE FROM entrees WHERE cle = ?", a_supprimer)
+
+    def vider(self) -> None:
+        """Supprime toutes les entrées"""
+        with self._connexion() as conn:
+            conn.execute("DELETE FROM entrees")
+
+    def statistiques(self) -> Dict[str, Any]:
+        """Nombre d'entrées, taille occupée et compteurs hits/misses de la session"""
+        with self._connexion() as conn:
+            nb, taille = conn.execute("SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM entrees").fetchone()
+        return {
+            "chemin": str(self.chemin),
+            "nb_entrees": nb,
+            "taille_mo": round(taille / 1024 / 1024, 2),
+            "taille_max_mo": round(self.taille_max / 1024 / 1024, 2),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+_cache_defaut = None
+
+
+def obtenir_cache_par_defaut() -> Optional[CacheBilans]:
+    """Cache partagé configuré par BILANS_CACHE / BILANS_CACHE_TAILLE_MO (None si désactivé)"""
+    global _cache_defaut
+
+    chemin = os.getenv("BILANS_CACHE", "")
+    if chemin.lower() in ("off", "0", "false", "non"):
+        return None
+
+    if _cache_defaut is None:
+        taille_mo = float(os.getenv("BILANS_CACHE_TAILLE_MO", TAILLE_MAX_DEFAUT_MO))
+        _cache_defaut = CacheBilans(chemin or None, taille_mo)
+    return _cache_defaut
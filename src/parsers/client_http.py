@@ -0,0 +1,297 @@
+"""
+Client HTTP partagé par les récupérations API (data.economie.gouv.fr, data.ofgl.fr)
+Une seule session requests (pool de connexions réutilisées) et un cache SQLite des réponses JSON,
+adressé par l'URL et les paramètres de la requête.
+
+Durée de vie des réponses :
+    - exercice clos (exercice du jeu de données ou du filtre <= année courante - 2) : jamais expirée,
+      les comptes d'un exercice clos ne changent plus
+    - sinon TTL du jeu de données (TTL_PAR_DATASET), par défaut HTTP_CACHE_TTL_HEURES
+
+Les requêtes réseau (pas les lectures du cache) peuvent être limitées en débit (LimiteurDebit).
+
+Configuration via variables d'environnement :
+    HTTP_CACHE=chemin/vers/http.sqlite   (ou "off" pour désactiver)
+    HTTP_CACHE_TTL_HEURES=24
+    HTTP_DEBIT_MAX=10   (requêtes réseau par seconde, 0 pour ne pas limiter)
+
+Usage:
+    from parsers.client_http import obtenir_client_http
+
+    data = obtenir_client_http().get_json(url, params={"where": "siren=200053395"})
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+CHEMIN_CACHE_DEFAUT = Path(__file__).resolve().parents[2] / "output" / "cache" / "http.sqlite"
+TTL_DEFAUT_HEURES = 24
+TAILLE_POOL = 16
+TIMEOUT = 30
+DEBIT_MAX_DEFAUT = 10
+
+# Un exercice N est clos (compte administratif voté, données publiées) à partir de N + 2
+ANNEES_AVANT_CLOTURE = 2
+
+# TTL spécifiques (en secondes) des jeux de données mis à jour plus rarement
+TTL_PAR_DATASET = {
+    "ofgl-base-communes": 7 * 24 * 3600,
+    "ofgl-base-communes-consolidee": 7 * 24 * 3600,
+}
+
+# Valeur du paramètre ttl : appliquer la politique du jeu de données
+TTL_DATASET = "dataset"
+
+_REGEX_DATASET = re.compile(r'/datasets/([^/?]+)')
+_REGEX_EXERCICE_DATASET = re.compile(r'-(\d{4})$')
+_REGEX_EXERCICE_FILTRE = re.compile(r'exer\W{0,4}(\d{4})')
+
+
+def nom_dataset(url: str) -> str:
+    """Nom du jeu de données OpenDataSoft d'une URL d'API (ou l'URL sans paramètres)"""
+    m = _REGEX_DATASET.search(url)
+    return m.group(1) if m else url.split('?', 1)[0]
+
+
+def exercice_requete(url: str, params: Any = None) -> Optional[int]:
+    """Exercice ciblé par une requête : suffixe du jeu de données (...-en-2023) ou filtre sur exer"""
+    m = _REGEX_EXERCICE_DATASET.search(nom_dataset(url))
+    if m:
+        return int(m.group(1))
+
+    textes = [url]
+    if params:
+        valeurs = params.values() if isinstance(params, dict) else [v for _, v in params]
+        textes.extend(str(v) for v in valeurs)
+    annees = {int(a) for texte in textes for a in _REGEX_EXERCICE_FILTRE.findall(texte)}
+    # Plusieurs exercices demandés : le plus récent décide
+    return max(annees) if annees else None
+
+
+def ttl_requete(url: str, params: Any = None, ttl_defaut: float = TTL_DEFAUT_HEURES * 3600) -> Optional[float]:
+    """Durée de vie d'une réponse en secondes, None si elle n'expire jamais (exercice clos)"""
+    exercice = exercice_requete(url, params)
+    if exercice is not None and date.today().year - exercice >= ANNEES_AVANT_CLOTURE:
+        return None
+    return TTL_PAR_DATASET.get(nom_dataset(url), ttl_defaut)
+
+
+class LimiteurDebit:
+    """
+    Seau à jetons partagé entre threads : au plus `debit` requêtes par seconde en moyenne,
+    avec des rafales de `capacite` requêtes
+    """
+
+    def __init__(self, debit: float, capacite: Optional[float] = None,
+                 horloge: Callable[[], float] = time.monotonic, attendre: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            debit: Requêtes par seconde
+            capacite: Taille maximale d'une rafale (défaut: debit, au moins 1)
+            horloge, attendre: Horloge et attente (remplaçables pour les tests)
+        """
+        self.debit = debit
+        self.capacite = capacite if capacite is not None else max(1.0, debit)
+        self.jetons = self.capacite
+        self.horloge = horloge
+        self.attendre = attendre
+        self.dernier = horloge()
+        self._verrou = threading.Lock()
+
+    def acquerir(self) -> None:
+        """Consomme un jeton, en attendant qu'il soit disponible"""
+        with self._verrou:
+            maintenant = self.horloge()
+            self.jetons = min(self.capacite, self.jetons + (maintenant - self.dernier) * self.debit)
+            self.dernier = maintenant
+            # Jeton réservé tout de suite (solde négatif) : l'attente se fait hors du verrou
+            self.jetons -= 1
+            attente = -self.jetons / self.debit if self.jetons < 0 else 0
+        if attente > 0:
+            self.attendre(attente)
+
+
+def url_complete(url: str, params: Any = None) -> str:
+    """URL effectivement demandée (paramètres encodés)"""
+    return requests.Request('GET', url, params=params).prepare().url
+
+
+def cle_requete(url: str, params: Any = None) -> str:
+    """Clé de cache : URL + paramètres triés (l'ordre des paramètres ne change pas la réponse)"""
+    if isinstance(params, dict):
+        params = list(params.items())
+    canonique = url_complete(url, sorted((str(k), str(v)) for k, v in params or []))
+    return hashlib.sha256(canonique.encode('utf-8')).hexdigest()
+
+
+class CacheHTTP:
+    """Cache SQLite des réponses JSON avec date d'expiration par entrée"""
+
+    def __init__(self, chemin: Optional[str] = None, horloge: Callable[[], float] = time.time):
+        """
+        Args:
+            chemin: Fichier SQLite (défaut: CHEMIN_CACHE_DEFAUT)
+            horloge: Heure courante en secondes, pour les dates d'expiration (remplaçable pour les tests)
+        """
+        self.chemin = Path(chemin) if chemin else CHEMIN_CACHE_DEFAUT
+        self.horloge = horloge
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        with self._connexion() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reponses (
+                    cle TEXT PRIMARY KEY,
+                    dataset TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    valeur TEXT NOT NULL,
+                    cree_le REAL NOT NULL,
+                    expire_le REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reponses_dataset ON reponses (dataset)")
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion courte (commit + fermeture) : plusieurs threads et processus partagent le fichier"""
+        conn = sqlite3.connect(str(self.chemin), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lire(self, cle: str) -> Optional[Any]:
+        """Réponse en cache non expirée, ou None"""
+        with self._connexion() as conn:
+            ligne = conn.execute("SELECT valeur, expire_le FROM reponses WHERE cle = ?", (cle,)).fetchone()
+        if ligne is None or (ligne[1] is not None and ligne[1] < self.horloge()):
+            return None
+        return json.loads(ligne[0])
+
+    def ecrire(self, cle: str, dataset: str, url: str, valeur: Any, ttl: Optional[float]) -> None:
+        maintenant = self.horloge()
+        expire_le = maintenant + ttl if ttl is not None else None
+        with self._connexion() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reponses (cle, dataset, url, valeur, cree_le, expire_le) VALUES (?, ?, ?, ?, ?, ?)",
+                (cle, dataset, url, json.dumps(valeur, ensure_ascii=False), maintenant, expire_le)
+            )
+
+    def purger(self) -> int:
+        """Supprime les entrées expirées, retourne leur nombre"""
+        with self._connexion() as conn:
+            return conn.execute("DELETE FROM reponses WHERE expire_le < ?", (self.horloge(),)).rowcount
+
+    def vider(self, dataset: Optional[str] = None) -> None:
+        """Supprime toutes les entrées (ou celles d'un jeu de données)"""
+        with self._connexion() as conn:
+            if dataset:
+                conn.execute("DELETE FROM reponses WHERE dataset = ?", (dataset,))
+            else:
+                conn.execute("DELETE FROM reponses")
+
+    def nb_entrees(self) -> int:
+        with self._connexion() as conn:
+            return conn.execute("SELECT COUNT(*) FROM reponses").fetchone()[0]
+
+
+class ClientHTTP:
+    """Session requests partagée + cache des réponses JSON"""
+
+    def __init__(self, cache: Optional[CacheHTTP] = None, ttl_defaut_heures: float = TTL_DEFAUT_HEURES,
+                 taille_pool: int = TAILLE_POOL, limiteur: Optional[LimiteurDebit] = None):
+        self.cache = cache
+        self.limiteur = limiteur
+        self.ttl_defaut = ttl_defaut_heures * 3600
+        self.hits = 0
+        self.misses = 0
+        self._verrou = threading.Lock()
+
+        self.session = requests.Session()
+        adaptateur = HTTPAdapter(pool_connections=taille_pool, pool_maxsize=taille_pool)
+        self.session.mount("https://", adaptateur)
+        self.session.mount("http://", adaptateur)
+
+    def get_json(self, url: str, params: Any = None, timeout: float = TIMEOUT, ttl: Any = TTL_DATASET,
+                 forcer: bool = False) -> Any:
+        """
+        Réponse JSON d'une requête GET, depuis le cache si elle y est encore valide
+
+        Args:
+            url: URL de l'API
+            params: Paramètres (dict ou liste de tuples pour les clés répétées)
+            timeout: Timeout réseau en secondes
+            ttl: Durée de vie en secondes, None pour ne jamais expirer,
+                TTL_DATASET pour la politique du jeu de données (exercices clos), 0 pour ne pas cacher
+            forcer: Ignorer la réponse en cache et la remplacer par celle du réseau
+
+        Raises:
+            requests.exceptions.RequestException: erreur réseau, HTTP ou réponse non JSON
+        """
+        cle = None
+        if self.cache is not None and ttl != 0:
+            cle = cle_requete(url, params)
+            valeur = None if forcer else self.cache.lire(cle)
+            if valeur is not None:
+                with self._verrou:
+                    self.hits += 1
+                return valeur
+
+        with self._verrou:
+            self.misses += 1
+        if self.limiteur is not None:
+            self.limiteur.acquerir()
+        response = self.session.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        valeur = response.json()
+
+        if cle is not None:
+            if ttl == TTL_DATASET:
+                ttl = ttl_requete(url, params, self.ttl_defaut)
+            self.cache.ecrire(cle, nom_dataset(url), response.url, valeur, ttl)
+        return valeur
+
+    def statistiques(self) -> Dict[str, Any]:
+        """Compteurs hits/misses de la session et taille du cache"""
+        total = self.hits + self.misses
+        return {
+            "cache": str(self.cache.chemin) if self.cache is not None else None,
+            "nb_entrees": self.cache.nb_entrees() if self.cache is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "taux_hits": round(self.hits / total, 3) if total else 0
+        }
+
+    def fermer(self):
+        self.session.close()
+
+
+_client_defaut = None
+_verrou_defaut = threading.Lock()
+
+
+def obtenir_client_http() -> ClientHTTP:
+    """Client partagé configuré par HTTP_CACHE / HTTP_CACHE_TTL_HEURES / HTTP_DEBIT_MAX"""
+    global _client_defaut
+
+    with _verrou_defaut:
+        if _client_defaut is None:
+            chemin = os.getenv("HTTP_CACHE", "")
+            cache = None if chemin.lower() in ("off", "0", "false", "non") else CacheHTTP(chemin or None)
+            ttl_heures = float(os.getenv("HTTP_CACHE_TTL_HEURES", TTL_DEFAUT_HEURES))
+            debit = float(os.getenv("HTTP_DEBIT_MAX", DEBIT_MAX_DEFAUT))
+            _client_defaut = ClientHTTP(cache, ttl_heures, limiteur=LimiteurDebit(debit) if debit > 0 else None)
+        return _client_defaut
@@ -3,9 +3,20 @@ Module pour récupérer les données financières depuis l'API OFGL
 Alternative au parsing PDF, utilise l'API publique data.ofgl.fr
 """
 
+import os
+import sys
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.client_http import obtenir_client_http
+
+
+# Années récupérées simultanément (le débit reste limité par le client HTTP partagé)
+WORKERS_API = 8
+
 
 def construire_url_api(code_insee: str, annee: int, budget_type: str = "Budget principal") -> str:
     """
@@ -40,10 +51,8 @@ def recuperer_donnees_ofgl(code_insee: str, annee: int, budget_type: str = "Budg
     url = construire_url_api(code_insee, annee, budget_type)
 
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-
-        data = response.json()
+        # Session partagée + cache : un exercice clos n'est demandé qu'une fois
+        data = obtenir_client_http().get_json(url, timeout=30)
 
         if 'results' not in data or not data['results']:
             return None
@@ -240,13 +249,14 @@ def convertir_api_vers_json_enrichi(code_insee: str, annee: int) -> Optional[Dic
     return json_enrichi
 
 
-def recuperer_donnees_multi_annees(code_insee: str, annees: List[int]) -> List[Dict]:
+def recuperer_donnees_multi_annees(code_insee: str, annees: List[int], workers: int = WORKERS_API) -> List[Dict]:
     """
-    Récupère les données pour plusieurs années
+    Récupère les données pour plusieurs années (requêtes en parallèle, résultats dans l'ordre des années)
 
     Args:
         code_insee: Code INSEE de la commune
         annees: Liste des années à récupérer
+        workers: Années récupérées simultanément
 
     Returns:
         Liste de dicts avec structure:
@@ -258,11 +268,11 @@ def recuperer_donnees_multi_annees(code_insee: str, annees: List[int]) -> List[D
     """
     bilans = []
 
-    for annee in annees:
-        print(f"  Récupération des données {annee} depuis l'API OFGL...")
-
-        json_data = convertir_api_vers_json_enrichi(code_insee, annee)
+    print(f"  Récupération des données {', '.join(str(a) for a in annees)} depuis l'API OFGL...")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(annees)))) as executor:
+        resultats = list(executor.map(lambda annee: convertir_api_vers_json_enrichi(code_insee, annee), annees))
 
+    for annee, json_data in zip(annees, resultats):
         if json_data:
             bilans.append({
                 'annee': annee,
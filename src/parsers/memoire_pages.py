@@ -0,0 +1,122 @@
+"""
+Mémoire des pages où se trouvent les champs de chaque maquette DGFiP
+Une maquette est identifiée par l'exercice et le nombre de pages de l'édition :
+après quelques lectures complètes, le parser en mode flux n'ouvre plus que les pages
+où les champs ont déjà été trouvés (les autres pages sont des tableaux annexes).
+
+Stockage SQLite (comme le cache des bilans) : chaque lecture complète est enregistrée
+dans une transaction, sans perte quand plusieurs processus du pool écrivent en même temps.
+
+Configuration via variable d'environnement :
+    BILANS_MEMOIRE_PAGES=chemin/vers/pages_maquettes.sqlite   (ou "off" pour désactiver)
+"""
+
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+
+CHEMIN_MEMOIRE_DEFAUT = Path(__file__).resolve().parents[2] / "output" / "cache" / "pages_maquettes.sqlite"
+
+# Nombre de lectures complètes d'une maquette avant de cibler les pages
+LECTURES_MIN = 3
+
+_REGEX_EXERCICE = re.compile(r'Exercice\s+(\d{4})')
+
+
+class MemoirePages:
+    """Pages où chaque champ a été trouvé, par maquette (fichier SQLite partagé entre processus)"""
+
+    def __init__(self, chemin: Optional[str] = None, lectures_min: int = LECTURES_MIN):
+        self.chemin = Path(chemin) if chemin else CHEMIN_MEMOIRE_DEFAUT
+        self.lectures_min = lectures_min
+
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        with self._connexion() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS maquettes (
+                    maquette TEXT PRIMARY KEY,
+                    lectures_completes INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    maquette TEXT NOT NULL,
+                    champ TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    PRIMARY KEY (maquette, champ, page)
+                )
+            """)
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion courte (commit + fermeture) : plusieurs processus partagent le même fichier"""
+        conn = sqlite3.connect(str(self.chemin), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def maquette(texte_premiere_page: str, nb_pages: int) -> str:
+        """Identifiant de maquette : exercice de l'édition + nombre de pages"""
+        m = _REGEX_EXERCICE.search(texte_premiere_page or '')
+        exercice = m.group(1) if m else 'inconnu'
+        return f"{exercice}-{nb_pages}p"
+
+    def lectures_completes(self, maquette: str) -> int:
+        """Nombre de lectures complètes enregistrées pour une maquette"""
+        with self._connexion() as conn:
+            ligne = conn.execute(
+                "SELECT lectures_completes FROM maquettes WHERE maquette = ?", (maquette,)
+            ).fetchone()
+        return ligne[0] if ligne else 0
+
+    def pages_champs(self, maquette: str) -> Optional[Dict[str, Set[int]]]:
+        """
+        Pages connues de chaque champ pour une maquette,
+        ou None tant que la maquette n'a pas été lue entièrement assez de fois
+        """
+        with self._connexion() as conn:
+            ligne = conn.execute(
+                "SELECT lectures_completes FROM maquettes WHERE maquette = ?", (maquette,)
+            ).fetchone()
+            if not ligne or ligne[0] < self.lectures_min:
+                return None
+            pages: Dict[str, Set[int]] = {}
+            for champ, page in conn.execute("SELECT champ, page FROM pages WHERE maquette = ?", (maquette,)):
+                pages.setdefault(champ, set()).add(page)
+        return pages
+
+    def enregistrer(self, maquette: str, pages_par_champ: Dict[str, Iterable[int]]) -> None:
+        """Ajoute le résultat d'une lecture complète (une transaction : compteur et pages ensemble)"""
+        with self._connexion() as conn:
+            conn.execute("INSERT OR IGNORE INTO maquettes (maquette, lectures_completes) VALUES (?, 0)", (maquette,))
+            conn.execute(
+                "UPDATE maquettes SET lectures_completes = lectures_completes + 1 WHERE maquette = ?", (maquette,)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO pages (maquette, champ, page) VALUES (?, ?, ?)",
+                [(maquette, nom, int(page)) for nom, pages in pages_par_champ.items() for page in pages]
+            )
+
+
+_memoire_defaut = None
+
+
+def obtenir_memoire_par_defaut() -> Optional[MemoirePages]:
+    """Mémoire partagée configurée par BILANS_MEMOIRE_PAGES (None si désactivée)"""
+    global _memoire_defaut
+
+    chemin = os.getenv("BILANS_MEMOIRE_PAGES", "")
+    if chemin.lower() in ("off", "0", "false", "non"):
+        return None
+
+    if _memoire_defaut is None:
+        _memoire_defaut = MemoirePages(chemin or None)
+    return _memoire_defaut
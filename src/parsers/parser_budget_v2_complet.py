@@ -1,10 +1,24 @@
-import pdfplumber
+import bisect
 import re
 from fpdf import FPDF
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 import logging
+import time
 from datetime import datetime
+import os
+import sys
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers import backends_pdf
+from parsers.backends_pdf import nom_backend, ouvrir_document_pdf
+from parsers.cache_bilans import CacheBilans, empreinte_configuration, empreinte_sources, hash_fichier
+from parsers.memoire_pages import MemoirePages, obtenir_memoire_par_defaut
+
+# Code de l'extraction : toute modification invalide les budgets en cache
+EMPREINTE_CODE_PARSER = empreinte_sources(__file__, backends_pdf.__file__)
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -492,22 +506,422 @@ class ConfigurationBudget:
         ]
 
 
+class MoteurExtraction:
+    """
+    Moteur d'extraction compilé : un seul balayage du texte pour tous les champs.
+
+    Chaque ChampConfig est indexé par son ancre, c'est-à-dire le plus long libellé
+    littéral obligatoire de son pattern (ex: "TOTAL DES PRODUITS DE FONCTIONNEMENT = A").
+    Une alternance unique de toutes les ancres localise les libellés en une passe,
+    puis le pattern complet n'est évalué que dans une fenêtre de quelques lignes
+    autour de chaque ancre trouvée.
+
+    Les sémantiques `occurrence` et `flags_regex` sont conservées ; les champs sans
+    ancre exploitable repassent par la recherche classique, reprise là où l'appel
+    précédent s'était arrêté (seules les dernières lignes sont réexaminées).
+    """
+
+    LONGUEUR_MIN_ANCRE = 6
+    LIGNES_AVANT = 1   # Libellé pouvant déborder sur la ligne précédente (ex: "PRODUITS\nDE FONCTIONNEMENT CAF")
+    LIGNES_APRES = 3   # Valeurs pouvant être sur les lignes suivantes (allocations compensatrices)
+    LIGNES_RECOUVREMENT = 2  # Champs sans ancre : fin du texte réexaminée avec la page suivante
+    FLAGS_INCOMPATIBLES = re.IGNORECASE | re.DOTALL | re.VERBOSE
+
+    def __init__(self, configs: List[ChampConfig]):
+        self.configs = configs
+        self.patterns = [re.compile(c.pattern, c.flags_regex) for c in configs]
+
+        # Ancre de chaque champ (None = recherche classique)
+        self.ancres = [self.extraire_ancre(c.pattern, c.flags_regex) for c in configs]
+        self.champs_par_ancre: Dict[str, List[int]] = {}
+        for i, ancre in enumerate(self.ancres):
+            if ancre is not None:
+                self.champs_par_ancre.setdefault(ancre, []).append(i)
+
+        # Alternance unique, les ancres les plus longues d'abord
+        ancres_triees = sorted(self.champs_par_ancre, key=len, reverse=True)
+        self.scanner = re.compile('|'.join(re.escape(a) for a in ancres_triees)) if ancres_triees else None
+
+        # Une ancre préfixe d'une autre est présente à la même position
+        self.prefixes_ancre = {
+            a: [b for b in ancres_triees if b != a and a.startswith(b)]
+            for a in ancres_triees
+        }
+
+    @classmethod
+    def extraire_ancre(cls, pattern: str, flags: int = 0) -> Optional[str]:
+        """
+        Retourne le plus long segment littéral obligatoire du pattern (hors groupes),
+        ou None si le pattern n'en contient pas d'assez long.
+        """
+        if flags & cls.FLAGS_INCOMPATIBLES:
+            return None
+
+        segments = []
+        courant = []
+        profondeur = 0
+        i = 0
+        n = len(pattern)
+
+        def cloturer():
+            if courant:
+                segments.append(''.join(courant))
+                courant.clear()
+
+        while i < n:
+            c = pattern[i]
+
+            if c == '\\':
+                suivant = pattern[i + 1] if i + 1 < n else ''
+                i += 2
+                if profondeur > 0:
+                    continue
+                if suivant and not suivant.isalnum():
+                    # Ponctuation échappée : caractère littéral (\' \( \) \= ...)
+                    courant.append(suivant)
+                else:
+                    # Classe (\d, \s...) ou séquence spéciale
+                    cloturer()
+                    continue
+            elif c == '[':
+                # Classe de caractères : sauter jusqu'au ']' fermant
+                cloturer()
+                i += 1
+                if i < n and pattern[i] == '^':
+                    i += 1
+                if i < n and pattern[i] == ']':
+                    i += 1
+                while i < n and pattern[i] != ']':
+                    i += 2 if pattern[i] == '\\' else 1
+                i += 1
+                continue
+            elif c == '(':
+                cloturer()
+                profondeur += 1
+                i += 1
+                continue
+            elif c == ')':
+                profondeur -= 1
+                i += 1
+                continue
+            elif c == '|':
+                if profondeur == 0:
+                    # Alternance au premier niveau : aucun littéral n'est obligatoire
+                    return None
+                i += 1
+                continue
+            elif c in '.^$':
+                cloturer()
+                i += 1
+                continue
+            elif c in '*+?{':
+                # Quantificateur après un groupe ou une classe (déjà clôturés)
+                cloturer()
+                if c == '{':
+                    fin = pattern.find('}', i)
+                    i = fin + 1 if fin != -1 else n
+                else:
+                    i += 1
+                continue
+            else:
+                i += 1
+                if profondeur > 0:
+                    continue
+                courant.append(c)
+
+            # Un quantificateur porte sur le dernier caractère littéral
+            if i < n and pattern[i] in '*?{':
+                courant.pop()
+                cloturer()
+            elif i < n and pattern[i] == '+':
+                cloturer()
+
+        cloturer()
+
+        if not segments:
+            return None
+        ancre = max(segments, key=len)
+        return ancre if len(ancre) >= cls.LONGUEUR_MIN_ANCRE else None
+
+    def localiser_ancres(self, texte: str, debut: int = 0) -> List[Tuple[int, str]]:
+        """Balaye le texte une seule fois (à partir de `debut`) et retourne les (position, ancre) trouvées"""
+        trouvees: List[Tuple[int, str]] = []
+        if self.scanner is None:
+            return trouvees
+
+        pos = debut
+        while True:
+            m = self.scanner.search(texte, pos)
+            if not m:
+                break
+            ancre = m.group(0)
+            trouvees.append((m.start(), ancre))
+            for prefixe in self.prefixes_ancre[ancre]:
+                trouvees.append((m.start(), prefixe))
+            # Reprendre au caractère suivant pour ne pas manquer une ancre chevauchante
+            pos = m.start() + 1
+
+        return trouvees
+
+    def _fenetre(self, texte: str, debut_ancre: int, fin_ancre: int) -> Tuple[int, int, bool]:
+        """
+        Bornes (début de ligne, fin de ligne) de la zone à examiner autour d'une ancre.
+        Le booléen indique si la fenêtre est complète (False si elle bute sur la fin du texte).
+        """
+        debut = debut_ancre
+        for _ in range(self.LIGNES_AVANT + 1):
+            nl = texte.rfind('\n', 0, debut)
+            if nl == -1:
+                debut = 0
+                break
+            debut = nl
+        else:
+            debut += 1
+
+        fin = fin_ancre
+        complete = True
+        for _ in range(self.LIGNES_APRES + 1):
+            nl = texte.find('\n', fin)
+            if nl == -1:
+                fin = len(texte)
+                complete = False
+                break
+            fin = nl + 1
+        else:
+            fin -= 1
+
+        return debut, fin, complete
+
+    def nouvel_etat(self) -> 'EtatExtraction':
+        """État d'une extraction incrémentale (texte alimenté page par page)"""
+        return EtatExtraction(len(self.configs))
+
+    def alimenter(self, etat: 'EtatExtraction', texte: str, final: bool = False) -> None:
+        """
+        Traite les ancres apparues depuis le dernier appel dans `texte` (texte cumulé).
+        Les ancres dont la fenêtre déborde de la fin du texte sont différées jusqu'à
+        l'appel suivant, sauf si `final` est vrai.
+        """
+        for position, ancre in self.localiser_ancres(texte, etat.pos_scan):
+            debut, fin, complete = self._fenetre(texte, position, position + len(ancre))
+            if not complete and not final:
+                # La suite de la fenêtre arrivera avec la page suivante
+                etat.pos_scan = position
+                break
+
+            for index in self.champs_par_ancre[ancre]:
+                if (debut, fin) in etat.fenetres[index]:
+                    continue
+                etat.fenetres[index].add((debut, fin))
+                for m in self.patterns[index].finditer(texte, debut, fin):
+                    etat.candidats[index].setdefault(m.span(), m)
+            etat.pos_scan = position + 1
+        else:
+            etat.pos_scan = len(texte)
+
+        # Champs sans ancre : recherche classique reprise à la position de l'appel précédent.
+        # Les correspondances commençant dans les dernières lignes peuvent encore changer
+        # avec la page suivante : elles sont recherchées de nouveau au prochain appel.
+        limite = len(texte) if final else self._debut_dernieres_lignes(texte, self.LIGNES_RECOUVREMENT)
+        for index, ancre in enumerate(self.ancres):
+            if ancre is not None or etat.pos_sans_ancre[index] is None:
+                continue
+            pos = etat.pos_sans_ancre[index]
+            for m in self.patterns[index].finditer(texte, pos):
+                if m.start() >= limite:
+                    break
+                etat.candidats[index].setdefault(m.span(), m)
+                pos = m.end()
+                if self.configs[index].occurrence == 0:
+                    # Première occurrence trouvée : définitive (équivalent de re.search)
+                    pos = None
+                    break
+            etat.pos_sans_ancre[index] = pos if pos is None else max(pos, limite)
+
+    @staticmethod
+    def _debut_dernieres_lignes(texte: str, nb_lignes: int) -> int:
+        """Position du début des `nb_lignes` dernières lignes du texte"""
+        debut = len(texte)
+        for _ in range(nb_lignes):
+            nl = texte.rfind('\n', 0, debut)
+            if nl == -1:
+                return 0
+            debut = nl
+        return debut + 1
+
+    def occurrences(self, etat: 'EtatExtraction') -> List[List[tuple]]:
+        """Occurrences ordonnées de chaque champ, enchaînées sans chevauchement comme re.findall"""
+        resultats: List[List[tuple]] = []
+
+        for index, config in enumerate(self.configs):
+            occurrences = []
+            fin_precedente = -1
+            for (debut, fin), m in sorted(etat.candidats[index].items()):
+                if debut < fin_precedente:
+                    continue
+                occurrences.append(m.groups() if config.occurrence == 0 else m.groups(default=''))
+                fin_precedente = fin
+                if config.occurrence == 0:
+                    break
+            resultats.append(occurrences)
+
+        return resultats
+
+    def trouver_occurrences(self, texte: str) -> List[List[tuple]]:
+        """
+        Retourne, pour chaque champ, la liste ordonnée de ses occurrences (groupes capturés).
+        Équivalent à re.search (occurrence=0) ou re.findall (sinon) sur tout le texte.
+        """
+        etat = self.nouvel_etat()
+        self.alimenter(etat, texte, final=True)
+        return self.occurrences(etat)
+
+
+class EtatExtraction:
+    """Correspondances accumulées par MoteurExtraction au fil des pages"""
+
+    def __init__(self, nb_champs: int):
+        self.candidats: List[Dict[Tuple[int, int], Any]] = [{} for _ in range(nb_champs)]
+        self.fenetres: List[set] = [set() for _ in range(nb_champs)]
+        self.pos_scan = 0
+        # Position de reprise de la recherche des champs sans ancre (None : recherche terminée)
+        self.pos_sans_ancre: List[Optional[int]] = [0] * nb_champs
+        # Position de début dans le texte cumulé et numéro de chaque page lue
+        self.debuts_pages: List[int] = []
+        self.numeros_pages: List[int] = []
+
+    def ajouter_page(self, debut: int, numero: int) -> None:
+        self.debuts_pages.append(debut)
+        self.numeros_pages.append(numero)
+
+    def pages(self, index: int) -> set:
+        """Numéros des pages où le champ a des correspondances"""
+        return {
+            self.numeros_pages[bisect.bisect_right(self.debuts_pages, debut) - 1]
+            for debut, _ in self.candidats[index]
+        }
+
+
 class ParserBudget:
     """Parser de budget configurable et maintenable - Version 2 COMPLETE"""
 
-    def __init__(self):
+    def __init__(self, cache: Optional[CacheBilans] = None, mode_flux: Optional[bool] = None,
+                 memoire: Optional[MemoirePages] = None, backend: Optional[str] = None):
+        """
+        Args:
+            cache: Cache des bilans parsés (None = pas de cache)
+            backend: Bibliothèque d'extraction du texte : pdfplumber, pymupdf ou pypdfium2
+                     (défaut: variable d'environnement BILANS_BACKEND_PDF, sinon pdfplumber)
+            mode_flux: Extraction page par page avec arrêt anticipé
+                       (défaut: variable d'environnement BILANS_MODE_FLUX)
+            memoire: Mémoire des pages par maquette pour le mode flux (défaut: BILANS_MEMOIRE_PAGES)
+        """
         self.config = ConfigurationBudget.obtenir_configuration()
+        self.moteur = MoteurExtraction(self.config)
+        self.cache = cache
+        self.backend = nom_backend(backend)
+        self.empreinte_config = empreinte_configuration(self.config, self.backend, EMPREINTE_CODE_PARSER)
+
+        if mode_flux is None:
+            mode_flux = os.getenv("BILANS_MODE_FLUX", "").lower() in ("1", "true", "oui", "on")
+        self.mode_flux = mode_flux
+        self.memoire = memoire if memoire is not None or not mode_flux else obtenir_memoire_par_defaut()
+        self.derniere_lecture: Dict[str, Any] = {}
 
     def extraire_texte_pdf(self, fichier_pdf: str) -> str:
         """Extrait le texte complet du PDF"""
         texte_complet = []
-        with pdfplumber.open(fichier_pdf) as pdf:
-            for page in pdf.pages:
-                texte = page.extract_text()
+        with ouvrir_document_pdf(fichier_pdf, self.backend) as document:
+            for numero in range(document.nb_pages):
+                texte = document.texte_page(numero)
                 if texte:
                     texte_complet.append(texte)
         return '\n'.join(texte_complet)
 
+    def _champs_resolus(self, etat: EtatExtraction, pages_champs: Dict[str, set], page_lue: int) -> bool:
+        """
+        Vrai si tous les champs attendus dans la maquette ont leur valeur définitive.
+        Un champ 'dernière occurrence' n'est résolu qu'une fois sa dernière page connue lue.
+        """
+        for config, occurrences in zip(self.config, self.moteur.occurrences(etat)):
+            pages = pages_champs.get(config.nom)
+            if not pages:
+                continue
+            if config.occurrence == -1:
+                if page_lue < max(pages):
+                    return False
+            elif len(occurrences) <= config.occurrence:
+                return False
+        return True
+
+    def _lire_pages(self, document, numeros: List[int], texte_premiere_page: str,
+                    pages_champs: Optional[Dict[str, set]] = None) -> Tuple[EtatExtraction, int]:
+        """
+        Extrait les pages demandées une à une en alimentant le moteur au fur et à mesure.
+        Si pages_champs est fourni, s'arrête dès que tous les champs attendus sont résolus.
+
+        Returns:
+            (état du moteur, nombre de pages ouvertes)
+        """
+        etat = self.moteur.nouvel_etat()
+        texte = ''
+        nb_lues = 0
+
+        for numero in numeros:
+            texte_page = texte_premiere_page if numero == 0 else document.texte_page(numero)
+            nb_lues += 1
+            if texte_page:
+                if texte:
+                    texte += '\n'
+                etat.ajouter_page(len(texte), numero)
+                texte += texte_page
+                self.moteur.alimenter(etat, texte)
+
+            if pages_champs is not None and self._champs_resolus(etat, pages_champs, numero):
+                break
+        else:
+            self.moteur.alimenter(etat, texte, final=True)
+
+        return etat, nb_lues
+
+    def extraire_occurrences_flux(self, fichier_pdf: str) -> List[List[tuple]]:
+        """
+        Mode flux : les pages sont extraites paresseusement et les champs recherchés à mesure.
+        Tant que la maquette (exercice + nombre de pages) n'a pas été lue entièrement
+        MemoirePages.lectures_min fois, toutes les pages sont lues et leur contenu mémorisé ;
+        ensuite seules les pages connues sont ouvertes, avec arrêt dès que tout est résolu.
+        Si un champ attendu manque, retour à une lecture complète.
+        """
+        with ouvrir_document_pdf(fichier_pdf, self.backend) as document:
+            nb_pages = document.nb_pages
+            texte_premiere_page = document.texte_page(0) if nb_pages else ''
+            maquette = MemoirePages.maquette(texte_premiere_page, nb_pages)
+            pages_champs = self.memoire.pages_champs(maquette) if self.memoire else None
+
+            if pages_champs is not None:
+                pages_cibles = sorted({0}.union(*pages_champs.values()))
+                etat, nb_lues = self._lire_pages(document, pages_cibles, texte_premiere_page, pages_champs)
+                if self._champs_resolus(etat, pages_champs, pages_cibles[-1]):
+                    self.derniere_lecture = {"maquette": maquette, "nb_pages": nb_pages,
+                                             "pages_lues": nb_lues, "ciblee": True}
+                    logger.info(f"📄 Maquette {maquette} : {nb_lues}/{nb_pages} pages lues")
+                    return self.moteur.occurrences(etat)
+                logger.warning(f"⚠️  Maquette {maquette} : champs absents des pages connues, lecture complète")
+
+            etat, nb_lues = self._lire_pages(document, list(range(nb_pages)), texte_premiere_page)
+
+        if self.memoire is not None:
+            self.memoire.enregistrer(maquette, {
+                config.nom: etat.pages(index)
+                for index, config in enumerate(self.config)
+                if etat.candidats[index]
+            })
+
+        self.derniere_lecture = {"maquette": maquette, "nb_pages": nb_pages,
+                                 "pages_lues": nb_lues, "ciblee": False}
+        logger.info(f"📄 Maquette {maquette} : lecture complète ({nb_pages} pages)")
+        return self.moteur.occurrences(etat)
+
     def _convertir_valeur(self, valeur: str, type_cible: type, gerer_tiret: bool = False) -> Any:
         """Convertit une valeur extraite dans le type approprié"""
         # Gérer les tirets
@@ -529,36 +943,32 @@ class ParserBudget:
             logger.warning(f"Impossible de convertir '{valeur}' en {type_cible.__name__}")
             return None
 
-    def extraire_champ(self, texte: str, config: ChampConfig) -> Dict[str, Any]:
-        """Extrait un champ selon sa configuration"""
+    def _occurrences_regex(self, texte: str, config: ChampConfig) -> List[tuple]:
+        """Occurrences d'un champ par recherche regex indépendante sur tout le texte"""
+        if config.occurrence != 0:
+            matches = re.findall(config.pattern, texte, flags=config.flags_regex)
+            return [match if isinstance(match, tuple) else (match,) for match in matches]
+
+        match_obj = re.search(config.pattern, texte, flags=config.flags_regex)
+        return [match_obj.groups()] if match_obj else []
+
+    def _extraire_depuis_occurrences(self, config: ChampConfig, occurrences: List[tuple]) -> Dict[str, Any]:
+        """Sélectionne l'occurrence demandée et convertit les valeurs capturées"""
         resultat = {}
 
         try:
-            # Recherche du pattern
-            if config.occurrence != 0:
-                # Plusieurs occurrences possibles
-                matches = re.findall(config.pattern, texte, flags=config.flags_regex)
-                if not matches:
-                    logger.warning(f"❌ '{config.nom}' : pattern non trouvé")
-                    return resultat
-
-                # Sélectionner l'occurrence souhaitée
-                if config.occurrence == -1:
-                    match = matches[-1]  # Dernière
-                elif config.occurrence < len(matches):
-                    match = matches[config.occurrence]
-                else:
-                    logger.warning(f"❌ '{config.nom}' : occurrence {config.occurrence} non trouvée (trouvé {len(matches)} occurrences)")
-                    return resultat
-
-                groupes = match if isinstance(match, tuple) else (match,)
+            if not occurrences:
+                logger.warning(f"❌ '{config.nom}' : pattern non trouvé")
+                return resultat
+
+            # Sélectionner l'occurrence souhaitée
+            if config.occurrence == -1:
+                groupes = occurrences[-1]  # Dernière
+            elif config.occurrence < len(occurrences):
+                groupes = occurrences[config.occurrence]
             else:
-                # Première occurrence
-                match_obj = re.search(config.pattern, texte, flags=config.flags_regex)
-                if not match_obj:
-                    logger.warning(f"❌ '{config.nom}' : pattern non trouvé")
-                    return resultat
-                groupes = match_obj.groups()
+                logger.warning(f"❌ '{config.nom}' : occurrence {config.occurrence} non trouvée (trouvé {len(occurrences)} occurrences)")
+                return resultat
 
             # Conversion des valeurs
             gerer_tiret = config.traitement_special == 'gerer_tiret'
@@ -575,24 +985,27 @@ class ParserBudget:
 
         return resultat
 
-    def parser_bilan_pdf(self, fichier_pdf: str) -> Dict[str, Any]:
-        """
-        Parse le PDF et extrait toutes les données selon la configuration
-        """
-        logger.info(f"\n{'='*60}")
-        logger.info(f"📄 DEBUT DU PARSING DE {fichier_pdf}")
-        logger.info(f"{'='*60}\n")
+    def extraire_champ(self, texte: str, config: ChampConfig) -> Dict[str, Any]:
+        """Extrait un champ selon sa configuration (recherche indépendante sur tout le texte)"""
+        try:
+            occurrences = self._occurrences_regex(texte, config)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de l'extraction de '{config.nom}' : {e}")
+            return {}
+        return self._extraire_depuis_occurrences(config, occurrences)
 
-        # Extraction du texte
-        texte = self.extraire_texte_pdf(fichier_pdf)
+    def extraire_champs(self, texte: str) -> Dict[str, Any]:
+        """Extrait tous les champs en un seul balayage du texte (MoteurExtraction)"""
+        return self._construire_budget(self.moteur.trouver_occurrences(texte))
 
-        # Extraction de tous les champs
+    def _construire_budget(self, occurrences_par_champ: List[List[tuple]]) -> Dict[str, Any]:
+        """Convertit les occurrences de chaque champ en dictionnaire de valeurs"""
         budget = {}
         champs_ok = 0
         champs_ko = 0
 
-        for config_champ in self.config:
-            donnees = self.extraire_champ(texte, config_champ)
+        for config_champ, occurrences in zip(self.config, occurrences_par_champ):
+            donnees = self._extraire_depuis_occurrences(config_champ, occurrences)
             budget.update(donnees)
 
             if donnees:
@@ -607,6 +1020,81 @@ class ParserBudget:
 
         return budget
 
+    def parser_bilan_pdf(self, fichier_pdf: str, hash_pdf: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Parse le PDF et extrait toutes les données selon la configuration
+
+        Args:
+            fichier_pdf: Chemin du PDF
+            hash_pdf: Hash du contenu du PDF s'il est déjà connu (évite de le relire pour le cache)
+        """
+        cle_cache = None
+        if self.cache is not None:
+            cle_cache = CacheBilans.cle(hash_pdf or hash_fichier(fichier_pdf), 'budget', self.empreinte_config)
+            budget = self.cache.lire(cle_cache)
+            if budget is not None:
+                logger.info(f"📦 {fichier_pdf} : données lues depuis le cache")
+                return budget
+
+        logger.info(f"\n{'='*60}")
+        logger.info(f"📄 DEBUT DU PARSING DE {fichier_pdf}")
+        logger.info(f"{'='*60}\n")
+
+        if self.mode_flux:
+            # Extraction page par page avec arrêt anticipé
+            budget = self._construire_budget(self.extraire_occurrences_flux(fichier_pdf))
+        else:
+            # Extraction du texte
+            texte = self.extraire_texte_pdf(fichier_pdf)
+
+            # Extraction de tous les champs
+            budget = self.extraire_champs(texte)
+
+        if cle_cache is not None:
+            self.cache.ecrire(cle_cache, budget)
+
+        return budget
+
+    def comparer_moteurs(self, texte: str, repetitions: int = 20) -> Dict[str, Any]:
+        """
+        Mesure le gain du MoteurExtraction par rapport à la boucle champ par champ
+        et vérifie que les deux méthodes trouvent les mêmes occurrences.
+
+        Returns:
+            dict: temps moyens (ms), accélération et champs divergents
+        """
+        debut = time.perf_counter()
+        for _ in range(repetitions):
+            occurrences_boucle = [self._occurrences_regex(texte, c) for c in self.config]
+        temps_boucle = (time.perf_counter() - debut) / repetitions
+
+        debut = time.perf_counter()
+        for _ in range(repetitions):
+            occurrences_moteur = self.moteur.trouver_occurrences(texte)
+        temps_moteur = (time.perf_counter() - debut) / repetitions
+
+        divergences = [
+            config.nom
+            for config, boucle, moteur in zip(self.config, occurrences_boucle, occurrences_moteur)
+            if boucle != moteur
+        ]
+
+        resultat = {
+            "temps_boucle_ms": round(temps_boucle * 1000, 3),
+            "temps_moteur_ms": round(temps_moteur * 1000, 3),
+            "acceleration": round(temps_boucle / temps_moteur, 1) if temps_moteur else None,
+            "champs_sans_ancre": sum(1 for a in self.moteur.ancres if a is None),
+            "divergences": divergences
+        }
+
+        logger.info(f"⏱️  Boucle par champ : {resultat['temps_boucle_ms']} ms | "
+                    f"Moteur compilé : {resultat['temps_moteur_ms']} ms | "
+                    f"Accélération x{resultat['acceleration']}")
+        if divergences:
+            logger.warning(f"⚠️  Divergences moteur/boucle : {', '.join(divergences)}")
+
+        return resultat
+
     def valider_budget(self, budget: Dict[str, Any]) -> bool:
         """Valide la cohérence des données extraites"""
         logger.info(f"\n{'='*60}")
@@ -707,6 +1195,9 @@ if __name__ == "__main__":
     # Validation
     parser.valider_budget(budget)
 
+    # Gain du moteur compilé par rapport à la boucle champ par champ
+    parser.comparer_moteurs(parser.extraire_texte_pdf('docs/bilan.pdf'))
+
     # Génération du rapport PDF
     parser.generer_rapport_pdf(budget)
 
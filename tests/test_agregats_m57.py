@@ -0,0 +1,122 @@
+"""
+Tests du moteur d'agrégats M57 (api_M57/agregats_m57.py)
+Sur des balances synthétiques, la table des cumuls par préfixe et le programme d'agrégats
+doivent donner les mêmes montants que les sommes compte par compte des anciens helpers somme_*.
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api_M57'))
+
+from agregats_m57 import DEFINITIONS_AGREGATS_M57, PROGRAMME_AGREGATS_M57, TableCumulsPrefixes
+
+MESURES_RECORD = {
+    'obnetcre': lambda r: r['obnetcre'],
+    'obnetdeb': lambda r: r['obnetdeb'],
+    'flux': lambda r: r['obnetcre'] - r['obnetdeb'],
+    'sd': lambda r: r['sd'],
+    'sc': lambda r: r['sc'],
+}
+
+
+def prefixes_definitions():
+    """Préfixes et exclusions cités par les définitions, pour tirer des comptes qui les touchent"""
+    prefixes = set()
+    for definition in DEFINITIONS_AGREGATS_M57:
+        for terme in definition['termes']:
+            if terme[1] == 'agregat':
+                continue
+            for valeurs in terme[2:]:
+                prefixes.update([valeurs] if isinstance(valeurs, str) else valeurs)
+    return sorted(prefixes)
+
+
+def balance_synthetique(rng, nb_records=800):
+    """Enregistrements de balance : comptes imbriqués, doublons, montants manquants ou nuls"""
+    prefixes = prefixes_definitions()
+    records = []
+    for _ in range(nb_records):
+        compte = rng.choice(prefixes) + ''.join(rng.choice('0123456789') for _ in range(rng.randint(0, 3)))
+        records.append({
+            'compte': compte,
+            **{champ: rng.choice([None, 0, round(rng.uniform(-500, 200000), 2)])
+               for champ in ('obnetcre', 'obnetdeb', 'sd', 'sc')}
+        })
+    records.append({'compte': '', 'obnetcre': 1000, 'obnetdeb': 0, 'sd': 0, 'sc': 0})
+    return records
+
+
+def somme_par_compte(records, mesure, prefixes, exclusions=None):
+    """Ancienne somme : parcours de chaque compte, test des préfixes puis des exclusions"""
+    prefixes = [prefixes] if isinstance(prefixes, str) else list(prefixes)
+    exclusions = [] if exclusions is None else [exclusions] if isinstance(exclusions, str) else list(exclusions)
+    total = 0
+    for record in records:
+        compte = str(record.get('compte', ''))
+        if not compte:
+            continue
+        if any(compte.startswith(p) for p in prefixes) and not any(compte.startswith(e) for e in exclusions):
+            valeurs = {champ: record.get(champ, 0) or 0 for champ in ('obnetcre', 'obnetdeb', 'sd', 'sc')}
+            total += MESURES_RECORD[mesure](valeurs)
+    return round(total, 2)
+
+
+def agregats_par_compte(records):
+    """Agrégats évalués terme par terme avec les sommes compte par compte"""
+    montants = {}
+    for definition in DEFINITIONS_AGREGATS_M57:
+        total = None
+        for signe, mesure, *reste in definition['termes']:
+            if mesure == 'agregat':
+                valeur = montants[reste[0]]
+            else:
+                valeur = somme_par_compte(records, mesure, *reste)
+            if total is None:
+                total = valeur if signe == '+' else -valeur
+            else:
+                total = total + valeur if signe == '+' else total - valeur
+        montants[definition['chemin'].split('.')[-1]] = total
+    return montants
+
+
+def test_sommes_table_identiques_aux_sommes_par_compte():
+    rng = random.Random(6)
+    prefixes = prefixes_definitions()
+    nb_sommes = 0
+    for _ in range(20):
+        records = balance_synthetique(rng)
+        table = TableCumulsPrefixes(records)
+        for _ in range(100):
+            inclus = rng.sample(prefixes, rng.randint(1, 4))
+            # Exclusions plus fines, plus larges ou sans rapport avec les préfixes inclus
+            exclus = rng.sample(prefixes, rng.randint(0, 3)) + [p + rng.choice('0123456789') for p in inclus[:1]]
+            for mesure in MESURES_RECORD:
+                attendu = somme_par_compte(records, mesure, inclus, exclus)
+                # Arrondi à 2 décimales de sommes additionnées dans un autre ordre : au plus 1 centime
+                assert abs(table.somme(mesure, inclus, exclus) - attendu) <= 0.01 + 1e-9, (mesure, inclus, exclus)
+                nb_sommes += 1
+    print(f"[OK] {nb_sommes} sommes par préfixe identiques aux sommes compte par compte")
+
+
+def test_programme_identique_aux_sommes_par_compte():
+    rng = random.Random(7)
+    for _ in range(20):
+        records = balance_synthetique(rng)
+        attendus = agregats_par_compte(records)
+        obtenus = PROGRAMME_AGREGATS_M57.evaluer(records)
+        assert obtenus.keys() == attendus.keys()
+        for nom, attendu in attendus.items():
+            assert abs(obtenus[nom] - attendu) < 1e-6, nom
+    print(f"[OK] {len(DEFINITIONS_AGREGATS_M57)} agrégats identiques aux sommes compte par compte (20 balances)")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU MOTEUR D'AGRÉGATS M57")
+    print("=" * 60)
+    test_sommes_table_identiques_aux_sommes_par_compte()
+    test_programme_identique_aux_sommes_par_compte()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,109 @@
+"""
+Tests du mode ajout du JSON consolidé multi-années (generer_json_multi_annees.py)
+Ajouter un exercice à un JSON existant ne doit parser que ce nouvel exercice et produire
+le même fichier qu'une génération complète sur toute la période.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import analysis.analyseur_multi_annees as analyseur
+from analysis.donnees_multi_annees import DonneesMultiAnnees
+from enrichir_json_avec_ratios import enrichir_fichier_json
+from generer_json_multi_annees import ajouter_exercice_json_multi_annees, generer_json_multi_annees_consolide
+from ratios_financiers import calculer_tous_ratios_multi_annees
+from test_panel_bilans import bilans_multi_annees
+
+
+def generer(bilans, chemin):
+    generer_json_multi_annees_consolide(DonneesMultiAnnees(bilans), chemin)
+    with open(chemin, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_ajout_identique_a_generation_complete():
+    rng = random.Random(25)
+    with tempfile.TemporaryDirectory() as dossier:
+        fichier_ajout = os.path.join(dossier, 'ajout.json')
+        fichier_complet = os.path.join(dossier, 'complet.json')
+        for _ in range(30):
+            bilans = bilans_multi_annees(rng, list(range(2010, 2010 + rng.randint(4, 12))))
+            generer(bilans[:-2], fichier_ajout)
+            ajouter_exercice_json_multi_annees(bilans[-2], fichier_ajout)
+            ajouter_exercice_json_multi_annees(bilans[-1], fichier_ajout)
+            with open(fichier_ajout, 'r', encoding='utf-8') as f:
+                assert f.read() == generer(bilans, fichier_complet)
+    print("[OK] Deux exercices ajoutés : fichier identique à une génération complète (30 historiques)")
+
+
+def test_seul_le_nouveau_pdf_est_parse():
+    rng = random.Random(26)
+    bilans = bilans_multi_annees(rng, list(range(2015, 2024)))
+    fichiers_parses = []
+
+    def parser_pdf(chemin):
+        # Remplace le parsing pdfplumber : compte les appels
+        fichiers_parses.append(os.path.basename(chemin))
+        return bilans[-1]['data']
+
+    parser_origine = analyseur.generer_json_enrichi
+    analyseur.generer_json_enrichi = parser_pdf
+    try:
+        with tempfile.TemporaryDirectory() as dossier:
+            fichier_json = os.path.join(dossier, 'donnees_multi_annees.json')
+            fichier_complet = os.path.join(dossier, 'complet.json')
+            generer(bilans[:-1], fichier_json)
+            # Ratios déjà présents : seul le nouvel exercice est calculé
+            assert enrichir_fichier_json(fichier_json)
+
+            ajouter_exercice_json_multi_annees(os.path.join(dossier, "Edition commune TEST - Exercice 2023.pdf"),
+                                               fichier_json)
+            assert fichiers_parses == ["Edition commune TEST - Exercice 2023.pdf"]
+
+            with open(fichier_json, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            generer(bilans, fichier_complet)
+            with open(fichier_complet, 'r', encoding='utf-8') as f:
+                attendu = json.load(f)
+            ratios = data.pop('ratios_financiers')
+            assert data == attendu
+            ratios_attendus = calculer_tous_ratios_multi_annees(attendu)
+            assert ratios['ratios_par_annee'] == ratios_attendus['ratios_par_annee']
+            assert ratios['evolutions'] == ratios_attendus['evolutions']
+            assert not os.path.exists(f"{fichier_json}.tmp")
+    finally:
+        analyseur.generer_json_enrichi = parser_origine
+    print("[OK] Mode ajout : un seul PDF parsé, tendances et ratios à jour")
+
+
+def test_exercice_deja_present():
+    rng = random.Random(27)
+    bilans = bilans_multi_annees(rng, list(range(2016, 2023)))
+    with tempfile.TemporaryDirectory() as dossier:
+        fichier_json = os.path.join(dossier, 'donnees_multi_annees.json')
+        generer(bilans, fichier_json)
+
+        # Exercice 2018 corrigé : recalcul des tendances depuis les bilans du JSON
+        bilans[2] = bilans_multi_annees(rng, [2018])[0]
+        ajouter_exercice_json_multi_annees(bilans[2], fichier_json)
+        with open(fichier_json, 'r', encoding='utf-8') as f:
+            assert f.read() == generer(bilans, os.path.join(dossier, 'complet.json'))
+    print("[OK] Exercice déjà présent remplacé, tendances recalculées sans parsing")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU MODE AJOUT DU JSON MULTI-ANNÉES")
+    print("=" * 60)
+    test_ajout_identique_a_generation_complete()
+    test_seul_le_nouveau_pdf_est_parse()
+    test_exercice_deja_present()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,55 @@
+"""
+Tests des backends d'extraction de texte PDF (src/parsers/backends_pdf.py)
+Sur les bilans de docs/, chaque backend installé (PyMuPDF, pypdfium2) doit produire
+exactement le même budget que pdfplumber, backend de référence des ChampConfig.
+Un backend dont la bibliothèque n'est pas installée est ignoré.
+"""
+
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from parsers.backends_pdf import BACKENDS, BACKEND_DEFAUT, ouvrir_document_pdf
+from parsers.parser_budget_v2_complet import ParserBudget
+
+DOSSIER_DOCS = os.path.join(os.path.dirname(__file__), '..', 'docs')
+BILANS = sorted(glob.glob(os.path.join(DOSSIER_DOCS, 'bilan*.pdf'))
+                + glob.glob(os.path.join(DOSSIER_DOCS, 'bilans_multi_annees', '*.pdf')))
+
+
+def backend_disponible(backend):
+    """Vrai si la bibliothèque du backend est installée"""
+    try:
+        with ouvrir_document_pdf(BILANS[0], backend):
+            return True
+    except ImportError as e:
+        print(f"[SKIP] Backend {backend} : {e}")
+        return False
+
+
+def test_backends_identiques_a_pdfplumber():
+    assert BILANS, "Aucun bilan PDF dans docs/"
+    reference = ParserBudget(backend=BACKEND_DEFAUT, mode_flux=False)
+    budgets = {fichier: reference.parser_bilan_pdf(fichier) for fichier in BILANS}
+    assert all(budgets.values())
+
+    testes = []
+    for backend in BACKENDS:
+        if backend == BACKEND_DEFAUT or not backend_disponible(backend):
+            continue
+        parser = ParserBudget(backend=backend, mode_flux=False)
+        for fichier in BILANS:
+            assert parser.parser_bilan_pdf(fichier) == budgets[fichier], (backend, os.path.basename(fichier))
+        testes.append(backend)
+    print(f"[OK] Backends identiques à pdfplumber sur {len(BILANS)} bilans : {', '.join(testes) or 'aucun installé'}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DES BACKENDS PDF")
+    print("=" * 60)
+    test_backends_identiques_a_pdfplumber()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,140 @@
+"""
+Tests du cache disque des bilans parsés (src/parsers/cache_bilans.py)
+La clé dépend du contenu du PDF, de la configuration d'extraction, du backend et du code
+qui produit la valeur ; le cache est borné en taille avec éviction des entrées les moins
+récemment lues.
+"""
+
+import dataclasses
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import parsers.cache_bilans as cache_bilans
+from generators.generer_json_enrichi import generer_json_enrichi
+from parsers.cache_bilans import CacheBilans, empreinte_configuration, empreinte_sources, hash_fichier
+from parsers.parser_budget_v2_complet import EMPREINTE_CODE_PARSER, ConfigurationBudget, ParserBudget
+
+BILAN = os.path.join(os.path.dirname(__file__), '..', 'docs', 'bilan.pdf')
+
+
+class HorlogeCompteur:
+    """Remplace le module time du cache : chaque lecture de l'heure avance d'une seconde"""
+
+    def __init__(self):
+        self.instant = 0.0
+
+    def time(self):
+        self.instant += 1
+        return self.instant
+
+
+def test_composition_cle():
+    config = ConfigurationBudget.obtenir_configuration()
+    reference = empreinte_configuration(config, 'pdfplumber')
+    assert empreinte_configuration(ConfigurationBudget.obtenir_configuration(), 'pdfplumber') == reference
+
+    # Pattern, clé de sortie ou backend modifiés : autre empreinte
+    modifiee = [dataclasses.replace(config[0], pattern=config[0].pattern + ' ')] + config[1:]
+    assert empreinte_configuration(modifiee, 'pdfplumber') != reference
+    modifiee = [dataclasses.replace(config[0], cles_sortie=['autre'])] + config[1:]
+    assert empreinte_configuration(modifiee, 'pdfplumber') != reference
+    assert empreinte_configuration(config, 'pymupdf') != reference
+    assert ParserBudget(backend='pymupdf').empreinte_config != ParserBudget().empreinte_config
+
+    with tempfile.TemporaryDirectory() as dossier:
+        # Code source modifié : autre empreinte, sans version à incrémenter
+        module = os.path.join(dossier, 'module.py')
+        with open(module, 'w', encoding='utf-8') as f:
+            f.write("def construire(budget):\n    return budget\n")
+        avant = empreinte_sources(module)
+        assert empreinte_sources(module) == avant
+        with open(module, 'a', encoding='utf-8') as f:
+            f.write("# correction\n")
+        assert empreinte_sources(module) != avant
+
+        # Même contenu sous un autre nom : même hash
+        copie = os.path.join(dossier, 'autre nom.pdf')
+        shutil.copyfile(BILAN, copie)
+        assert hash_fichier(copie) == hash_fichier(BILAN)
+
+    assert CacheBilans.cle('abc', 'budget', 'v1') == 'budget:abc:v1'
+    assert CacheBilans.cle('abc', 'budget', 'v1') != CacheBilans.cle('abc', 'json_enrichi', 'v1')
+    print("[OK] Clé : contenu du PDF, configuration, backend et code source")
+
+
+def test_hits_et_misses():
+    with tempfile.TemporaryDirectory() as dossier:
+        cache = CacheBilans(os.path.join(dossier, 'cache.sqlite'))
+        parser = ParserBudget(cache=cache)
+        budget = parser.parser_bilan_pdf(BILAN)
+        assert (cache.hits, cache.misses) == (0, 1)
+        assert parser.parser_bilan_pdf(BILAN) == budget
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # PDF renommé : toujours en cache
+        copie = os.path.join(dossier, 'Edition commune - copie.pdf')
+        shutil.copyfile(BILAN, copie)
+        assert ParserBudget(cache=cache).parser_bilan_pdf(copie) == budget
+        assert (cache.hits, cache.misses) == (2, 1)
+
+        # Autre backend ou configuration modifiée : entrée absente
+        hash_pdf = hash_fichier(BILAN)
+        assert cache.lire(CacheBilans.cle(hash_pdf, 'budget', ParserBudget(backend='pypdfium2').empreinte_config)) is None
+        config = ConfigurationBudget.obtenir_configuration()
+        assert empreinte_configuration(config, 'pdfplumber', EMPREINTE_CODE_PARSER) == parser.empreinte_config
+        config[0] = dataclasses.replace(config[0], pattern=config[0].pattern + ' ')
+        empreinte = empreinte_configuration(config, 'pdfplumber', EMPREINTE_CODE_PARSER)
+        assert cache.lire(CacheBilans.cle(hash_pdf, 'budget', empreinte)) is None
+        assert (cache.hits, cache.misses) == (2, 3)
+
+        # JSON enrichi : calculé une fois (budget relu du cache), puis relu tel quel
+        json_data = generer_json_enrichi(BILAN, cache=cache)
+        assert (cache.hits, cache.misses) == (3, 4)
+        assert generer_json_enrichi(copie, cache=cache) == json_data
+        assert (cache.hits, cache.misses) == (4, 4)
+        assert cache.statistiques()['nb_entrees'] == 2
+    print("[OK] Hits et misses : PDF renommé relu, autre backend ou configuration recalculé")
+
+
+def test_eviction_lru():
+    horloge_origine = cache_bilans.time
+    cache_bilans.time = HorlogeCompteur()
+    try:
+        with tempfile.TemporaryDirectory() as dossier:
+            valeur = {'texte': 'x' * 1000}
+            taille_entree = len(json.dumps(valeur).encode('utf-8'))
+            # Place pour 3 entrées
+            cache = CacheBilans(os.path.join(dossier, 'cache.sqlite'), taille_max_mo=3.5 * taille_entree / 1024 / 1024)
+            for nom in 'abc':
+                cache.ecrire(nom, valeur)
+            assert cache.statistiques()['nb_entrees'] == 3
+
+            # 'a' relue : 'b' devient la moins récemment utilisée
+            assert cache.lire('a') == valeur
+            cache.ecrire('d', valeur)
+            assert cache.lire('b') is None
+            assert all(cache.lire(nom) == valeur for nom in 'acd')
+
+            # Entrée plus grande que deux entrées : les deux moins récemment lues partent
+            cache.ecrire('e', {'texte': 'x' * 2 * taille_entree})
+            assert [nom for nom in 'acde' if cache.lire(nom) is not None] == ['d', 'e']
+            assert cache.statistiques()['nb_entrees'] == 2
+    finally:
+        cache_bilans.time = horloge_origine
+    print("[OK] Éviction LRU : les entrées les moins récemment lues partent à la taille max")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU CACHE DES BILANS PARSÉS")
+    print("=" * 60)
+    test_composition_cle()
+    test_hits_et_misses()
+    test_eviction_lru()
+    print()
+    print("Tous les tests sont passés")
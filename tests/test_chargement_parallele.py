@@ -0,0 +1,99 @@
+"""
+Tests du chargement parallèle des bilans multi-années (src/analysis/analyseur_multi_annees.py)
+Les PDFs (pool de processus) et les années de l'API (pool de threads) sont traités simultanément :
+chaque appel simulé attend que tous les autres aient commencé (un chargement séquentiel échouerait),
+et l'ordre des années et l'ignorance des fichiers en erreur doivent être ceux du chargement séquentiel.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import analysis.analyseur_multi_annees as analyseur
+
+DELAI_RENDEZ_VOUS = 30
+
+
+def rendez_vous(dossier, nom):
+    """
+    Attend que le parsing de tous les PDFs du dossier ait commencé (barrière entre processus :
+    un fichier témoin par PDF). Lève TimeoutError si les appels ne sont pas simultanés.
+    """
+    nb_pdfs = sum(1 for f in os.listdir(dossier) if f.endswith('.pdf'))
+    open(os.path.join(dossier, f"{nom}.commence"), 'w').close()
+    limite = time.monotonic() + DELAI_RENDEZ_VOUS
+    while sum(1 for f in os.listdir(dossier) if f.endswith('.commence')) < nb_pdfs:
+        if time.monotonic() > limite:
+            raise TimeoutError("Parsing des PDFs non simultané")
+        time.sleep(0.01)
+
+
+def parser_pdf_simultane(chemin):
+    """Parsing simulé (fonction de module : sérialisable vers les processus du pool)"""
+    rendez_vous(os.path.dirname(chemin), os.path.basename(chemin))
+    if 'corrompu' in chemin:
+        raise ValueError("PDF illisible")
+    annee = analyseur.extraire_annee_depuis_nom_fichier(os.path.basename(chemin))
+    return {"metadata": {"commune": "COMMUNE TEST", "exercice": annee}}
+
+
+ANNEES_API = list(range(2024, 2014, -1))
+BARRIERE_API = threading.Barrier(len(ANNEES_API), timeout=DELAI_RENDEZ_VOUS)
+
+
+def api_simultanee(code_insee, annee):
+    """Appel API simulé : attend que toutes les années aient été demandées"""
+    BARRIERE_API.wait()
+    if annee == 2019:
+        raise ConnectionError("API indisponible")
+    if annee == 2020:
+        return None
+    return {"metadata": {"commune": f"COMMUNE {code_insee}", "exercice": annee}}
+
+
+def test_pdfs_en_parallele():
+    with tempfile.TemporaryDirectory() as dossier:
+        noms = [f"Edition commune TEST - Exercice {annee}.pdf" for annee in (2024, 2018, 2021, 2019, 2023, 2020)]
+        noms.append("Edition commune TEST - Exercice 2022 corrompu.pdf")
+        for nom in noms:
+            open(os.path.join(dossier, nom), 'wb').close()
+
+        # Parsing simulé transmis aux processus du pool (fonctionne aussi sans fork)
+        bilans = analyseur.charger_bilans_multi_annees(dossier, workers=len(noms), parser_pdf=parser_pdf_simultane)
+        # Tous les parsings ont franchi le rendez-vous, y compris celui du PDF corrompu
+        assert sum(1 for f in os.listdir(dossier) if f.endswith('.commence')) == len(noms)
+
+    # Un parsing bloqué au rendez-vous (TimeoutError) aurait retiré son année
+    assert [b['annee'] for b in bilans] == [2018, 2019, 2020, 2021, 2023, 2024]
+    assert all(b['source'] == 'PDF' and b['fichier'].endswith(f"{b['annee']}.pdf") for b in bilans)
+    print(f"[OK] {len(noms)} PDFs parsés simultanément, PDF corrompu ignoré")
+
+
+def test_api_en_parallele():
+    api_origine = analyseur.convertir_api_vers_json_enrichi
+    analyseur.convertir_api_vers_json_enrichi = api_simultanee
+    try:
+        bilans = analyseur.charger_bilans_depuis_api("07154", ANNEES_API, workers=len(ANNEES_API))
+    finally:
+        analyseur.convertir_api_vers_json_enrichi = api_origine
+
+    # Barrière franchie par toutes les années : aucune BrokenBarrierError ne les a retirées
+    assert not BARRIERE_API.broken
+    assert [b['annee'] for b in bilans] == [2015, 2016, 2017, 2018, 2021, 2022, 2023, 2024]
+    print(f"[OK] {len(ANNEES_API)} années de l'API demandées simultanément, années en erreur ou vides ignorées")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU CHARGEMENT PARALLÈLE DES BILANS")
+    print("=" * 60)
+    test_pdfs_en_parallele()
+    test_api_en_parallele()
+    print()
+    print("Tous les tests sont passés")
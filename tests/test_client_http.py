@@ -0,0 +1,202 @@
+"""
+Tests du client HTTP partagé et de son cache de réponses (src/parsers/client_http.py)
+Un serveur HTTP local compte les requêtes reçues : une réponse en cache ne doit pas
+repasser par le réseau, sauf expiration de son TTL.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import requests
+
+from parsers.client_http import CacheHTTP, ClientHTTP, LimiteurDebit, cle_requete, exercice_requete, ttl_requete
+
+
+class ServeurJSON:
+    """Renvoie les paramètres reçus et le numéro de la requête ; /erreur répond 500"""
+
+    def __init__(self):
+        self.nb_requetes = 0
+        serveur = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                serveur.nb_requetes += 1
+                if self.path.startswith('/erreur'):
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                donnees = json.dumps({
+                    'params': parse_qsl(urlparse(self.path).query),
+                    'numero': serveur.nb_requetes
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(donnees)))
+                self.end_headers()
+                self.wfile.write(donnees)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def test_hits_misses():
+    with tempfile.TemporaryDirectory() as dossier, ServeurJSON() as serveur:
+        client = ClientHTTP(CacheHTTP(os.path.join(dossier, 'http.sqlite')))
+        url = f"{serveur.url}/catalog/datasets/balances-comptables-des-communes-en-2021/records"
+
+        premiere = client.get_json(url, params={'where': 'siren=1', 'limit': 100})
+        # Même requête, paramètres dans un autre ordre : servie par le cache
+        seconde = client.get_json(url, params=[('limit', 100), ('where', 'siren=1')])
+        autre = client.get_json(url, params={'where': 'siren=2', 'limit': 100})
+
+        assert premiere == seconde
+        assert autre['numero'] == 2
+        assert serveur.nb_requetes == 2
+        assert (client.hits, client.misses) == (1, 2)
+
+        # Nouveau client (nouvelle exécution du script) sur le même fichier de cache
+        client2 = ClientHTTP(CacheHTTP(os.path.join(dossier, 'http.sqlite')))
+        assert client2.get_json(url, params={'where': 'siren=1', 'limit': 100}) == premiere
+        assert serveur.nb_requetes == 2
+        assert client2.statistiques()['nb_entrees'] == 2
+    print("[OK] Réponses servies par le cache entre deux exécutions, compteurs hits/misses")
+
+
+class HorlogeFigee:
+    """Horloge de test : le temps n'avance que sur demande, les attentes sont enregistrées"""
+
+    def __init__(self):
+        self.maintenant = 0.0
+        self.attentes = []
+        self.verrou = threading.Lock()
+
+    def __call__(self):
+        return self.maintenant
+
+    def attendre(self, duree):
+        with self.verrou:
+            self.attentes.append(duree)
+
+
+def test_ttl():
+    annee = date.today().year
+    assert exercice_requete("https://x/catalog/datasets/balances-comptables-des-communes-en-2022/records") == 2022
+    assert exercice_requete("https://x/datasets/ofgl-base-communes/records", [("refine", 'exer:"2021"')]) == 2021
+    assert exercice_requete("https://x/datasets/ofgl-base-communes/records?where=year(exer)=2019") == 2019
+    assert exercice_requete("https://x/datasets/ofgl-base-communes/records", {"where": "siren=1"}) is None
+
+    # Exercice clos : jamais expiré ; exercice en cours : TTL du jeu de données
+    assert ttl_requete("https://x/datasets/balances-comptables-des-communes-en-2019/records") is None
+    assert ttl_requete(f"https://x/datasets/balances-comptables-des-communes-en-{annee}/records", ttl_defaut=60) == 60
+    assert ttl_requete("https://x/datasets/ofgl-base-communes/records", [("refine", f"exer:{annee}")]) == 7 * 24 * 3600
+
+    with tempfile.TemporaryDirectory() as dossier, ServeurJSON() as serveur:
+        horloge = HorlogeFigee()
+        client = ClientHTTP(CacheHTTP(os.path.join(dossier, 'http.sqlite'), horloge=horloge))
+        url = f"{serveur.url}/records"
+        client.get_json(url, params={'a': 1}, ttl=60)
+        horloge.maintenant += 59
+        client.get_json(url, params={'a': 1}, ttl=60)
+        assert serveur.nb_requetes == 1
+        horloge.maintenant += 2
+        client.get_json(url, params={'a': 1}, ttl=60)
+        assert serveur.nb_requetes == 2
+
+        # ttl=0 : pas de cache
+        client.get_json(url, params={'b': 1}, ttl=0)
+        client.get_json(url, params={'b': 1}, ttl=0)
+        assert serveur.nb_requetes == 4
+
+        # Entrée expirée purgée, réponse d'un exercice clos conservée
+        client.get_json(url, params={'c': 1}, ttl=None)
+        horloge.maintenant += 61
+        assert client.cache.purger() == 1
+        assert client.cache.nb_entrees() == 1
+    print("[OK] TTL : exercices clos permanents, expiration des autres réponses")
+
+
+def test_erreurs_non_cachees():
+    with tempfile.TemporaryDirectory() as dossier, ServeurJSON() as serveur:
+        client = ClientHTTP(CacheHTTP(os.path.join(dossier, 'http.sqlite')))
+        for _ in range(2):
+            try:
+                client.get_json(f"{serveur.url}/erreur")
+                raise AssertionError("HTTPError attendue")
+            except requests.exceptions.HTTPError:
+                pass
+        assert serveur.nb_requetes == 2
+        assert client.cache.nb_entrees() == 0
+    print("[OK] Réponses en erreur jamais mises en cache")
+
+
+def test_cle_requete():
+    url = "https://x/records"
+    assert cle_requete(url, {'a': 1, 'b': 2}) == cle_requete(url, [('b', '2'), ('a', '1')])
+    assert cle_requete(url, {'a': 1}) != cle_requete(url, {'a': 2})
+    assert cle_requete(url + "?a=1") != cle_requete(url)
+    print("[OK] Clé de cache : URL + paramètres triés")
+
+
+def test_limiteur_debit():
+    """20 requêtes à 20/s avec rafale de 5, depuis plusieurs threads : 5 immédiates, puis une tous les 1/20 s"""
+    horloge = HorlogeFigee()
+    limiteur = LimiteurDebit(20, capacite=5, horloge=horloge, attendre=horloge.attendre)
+    threads = [threading.Thread(target=lambda: [limiteur.acquerir() for _ in range(5)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Chaque jeton manquant est réservé à son rang : attentes de 1/20 à 15/20 s
+    assert sorted(horloge.attentes) == [k / 20 for k in range(1, 16)]
+    assert limiteur.jetons == -15
+
+    # Une seconde plus tard, les 15 jetons empruntés sont rendus et la rafale est de nouveau disponible
+    horloge.maintenant += 1.0
+    horloge.attentes.clear()
+    for _ in range(5):
+        limiteur.acquerir()
+    assert horloge.attentes == [] and limiteur.jetons == 0
+
+    # Les réponses en cache ne consomment pas de jetons
+    horloge = HorlogeFigee()
+    limiteur = LimiteurDebit(2, capacite=1, horloge=horloge, attendre=horloge.attendre)
+    with tempfile.TemporaryDirectory() as dossier, ServeurJSON() as serveur:
+        client = ClientHTTP(CacheHTTP(os.path.join(dossier, 'http.sqlite')), limiteur=limiteur)
+        client.get_json(f"{serveur.url}/records")
+        for _ in range(10):
+            client.get_json(f"{serveur.url}/records")
+    assert limiteur.jetons == 0 and horloge.attentes == []
+    print("[OK] Seau à jetons : rafale de 5 puis 1/20 s par requête, lectures du cache non limitées")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU CLIENT HTTP ET DU CACHE DE RÉPONSES")
+    print("=" * 60)
+    test_hits_misses()
+    test_ttl()
+    test_erreurs_non_cachees()
+    test_cle_requete()
+    test_limiteur_debit()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,207 @@
+"""
+Tests de la récupération paginée concurrente (api_M57/client_ods.py)
+Un serveur HTTP local imite l'endpoint records d'OpenDataSoft (limit, offset, total_count)
+avec une latence par page pour vérifier l'ordre et les cas limites ; la concurrence est
+vérifiée par une barrière que les pages suivant la première doivent franchir ensemble.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api_M57'))
+
+import requests
+
+from client_ods import recuperer_balance, recuperer_records_pagines
+from parsers.client_http import ClientHTTP
+
+
+LATENCE = 0.05
+
+# Mesurer le réseau, pas le cache de réponses
+SANS_CACHE = ClientHTTP(cache=None)
+
+
+class ServeurODS:
+    """Serveur local : balances synthétiques de plusieurs communes, filtrables par where siren=..."""
+
+    def __init__(self, records, annoncer_total=True, pages_en_erreur=(), barriere=None):
+        """
+        Args:
+            barriere: Nombre de requêtes (hors première page) qui doivent être en cours
+                      simultanément pour être servies ; sinon la page répond 500
+        """
+        self.records = records
+        self.annoncer_total = annoncer_total
+        self.pages_en_erreur = set(pages_en_erreur)
+        self.en_cours = 0
+        self.max_en_cours = 0
+        self.nb_requetes = 0
+        self.verrou = threading.Lock()
+        self.barriere = threading.Barrier(barriere, timeout=10) if barriere else None
+
+        serveur = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                serveur.traiter(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/records"
+
+    def traiter(self, handler):
+        with self.verrou:
+            self.en_cours += 1
+            self.nb_requetes += 1
+            self.max_en_cours = max(self.max_en_cours, self.en_cours)
+        try:
+            params = parse_qs(urlparse(handler.path).query)
+            limit = int(params['limit'][0])
+            offset = int(params['offset'][0])
+            where = params.get('where', [''])[0]
+
+            records = self.records
+            if where.startswith('siren='):
+                siren = where.split('=', 1)[1].split(' ')[0]
+                records = [r for r in records if r['siren'] == siren]
+            if "cbudg='1'" in where:
+                records = [r for r in records if r['cbudg'] == '1']
+
+            if self.barriere is not None and offset > 0:
+                try:
+                    self.barriere.wait()
+                except threading.BrokenBarrierError:
+                    handler.send_response(500)
+                    handler.end_headers()
+                    return
+            else:
+                # Latence décroissante : les dernières pages arrivent avant les premières
+                time.sleep(LATENCE * (1 + 1 / (1 + offset // limit)))
+
+            if offset in self.pages_en_erreur:
+                handler.send_response(500)
+                handler.end_headers()
+                return
+
+            corps = {'results': records[offset:offset + limit]}
+            if self.annoncer_total:
+                corps['total_count'] = len(records)
+            donnees = json.dumps(corps).encode('utf-8')
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'application/json')
+            handler.send_header('Content-Length', str(len(donnees)))
+            handler.end_headers()
+            handler.wfile.write(donnees)
+        finally:
+            with self.verrou:
+                self.en_cours -= 1
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def balance_synthetique(siren, nb_lignes):
+    return [
+        {'siren': siren, 'cbudg': '1' if i % 5 else '2', 'compte': str(60000 + i), 'obnetdeb': float(i)}
+        for i in range(nb_lignes)
+    ]
+
+
+def test_ordre_deterministe():
+    """Les pages arrivent dans le désordre mais les records sont remis dans l'ordre des offsets"""
+    records = balance_synthetique('200000001', 1234)
+    with ServeurODS(records) as serveur:
+        resultat = recuperer_records_pagines(serveur.url, {'where': 'siren=200000001'}, concurrence=8, client=SANS_CACHE)
+    assert resultat == records
+    assert serveur.nb_requetes == 13
+    print("[OK] Ordre des records identique à une lecture séquentielle")
+
+
+def test_limite_concurrence():
+    """Les pages sont demandées par vagues de la taille de la limite, jamais au-delà"""
+    # 18 pages après la première : 6 vagues de 3 requêtes simultanées
+    records = balance_synthetique('200000001', 1900)
+    with ServeurODS(records, barriere=3) as serveur:
+        resultat = recuperer_records_pagines(serveur.url, {}, concurrence=3, client=SANS_CACHE)
+    assert resultat == records
+    assert serveur.max_en_cours == 3, serveur.max_en_cours
+    print(f"[OK] Concurrence maximale observée : {serveur.max_en_cours} (limite 3)")
+
+
+def test_requetes_simultanees():
+    """Avec concurrence=8, 8 pages sont en cours en même temps (barrière de 8 franchie)"""
+    # 16 pages après la première : 2 vagues de 8 requêtes simultanées
+    records = balance_synthetique('200000001', 1700)
+    with ServeurODS(records) as serveur:
+        sequentiel = recuperer_records_pagines(serveur.url, {}, concurrence=1, client=SANS_CACHE)
+    assert serveur.max_en_cours == 1
+
+    with ServeurODS(records, barriere=8) as serveur:
+        parallele = recuperer_records_pagines(serveur.url, {}, concurrence=8, client=SANS_CACHE)
+    assert parallele == sequentiel == records
+    assert serveur.max_en_cours == 8, serveur.max_en_cours
+    print(f"[OK] Concurrence 8 : {serveur.max_en_cours} requêtes simultanées, résultat identique au séquentiel")
+
+
+def test_cas_limites():
+    """Résultat vide, une seule page, multiple exact de la taille de page, total non annoncé"""
+    for nb in (0, 1, 100, 300, 301):
+        records = balance_synthetique('200000001', nb)
+        with ServeurODS(records) as serveur:
+            assert recuperer_records_pagines(serveur.url, {}, client=SANS_CACHE) == records
+            assert serveur.nb_requetes == max(1, -(-nb // 100)), (nb, serveur.nb_requetes)
+
+    records = balance_synthetique('200000001', 250)
+    with ServeurODS(records, annoncer_total=False) as serveur:
+        assert recuperer_records_pagines(serveur.url, {}, client=SANS_CACHE) == records
+    print("[OK] Cas limites (0, 1, 100, 300, 301 records, sans total_count)")
+
+
+def test_erreur_page():
+    """Une page en erreur fait échouer la récupération (pas de résultat partiel silencieux)"""
+    records = balance_synthetique('200000001', 500)
+    with ServeurODS(records, pages_en_erreur=[300]) as serveur:
+        try:
+            recuperer_records_pagines(serveur.url, {}, client=SANS_CACHE)
+        except requests.exceptions.HTTPError:
+            print("[OK] Erreur HTTP d'une page propagée")
+            return
+    raise AssertionError("HTTPError attendue")
+
+
+def test_filtre_balance():
+    """recuperer_balance filtre la commune et, sur demande, le budget principal"""
+    records = balance_synthetique('200000001', 420) + balance_synthetique('200000002', 80)
+    with ServeurODS(records) as serveur:
+        tous = recuperer_balance('200 000 001', 2024, url=serveur.url, client=SANS_CACHE)
+        principal = recuperer_balance('200000001', 2024, budget_principal=True, url=serveur.url, client=SANS_CACHE)
+    assert tous == records[:420]
+    assert principal == [r for r in records[:420] if r['cbudg'] == '1']
+    print("[OK] Filtres siren et budget principal")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DE LA RÉCUPÉRATION PAGINÉE CONCURRENTE")
+    print("=" * 60)
+    test_ordre_deterministe()
+    test_limite_concurrence()
+    test_requetes_simultanees()
+    test_cas_limites()
+    test_erreur_page()
+    test_filtre_balance()
+    print()
+    print("Tous les tests sont passés")
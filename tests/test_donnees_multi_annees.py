@@ -0,0 +1,63 @@
+"""
+Tests du jeu de bilans multi-années partagé (src/analysis/donnees_multi_annees.py)
+Chaque PDF ne doit être parsé qu'une fois, le JSON consolidé doit pouvoir resservir de source
+sans parsing, et un jeu déjà chargé doit être réutilisé tel quel.
+"""
+
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis.donnees_multi_annees import DonneesMultiAnnees
+from generer_json_multi_annees import generer_json_multi_annees_consolide
+from test_ratios_vectorises import bilan_synthetique
+
+
+def test_parsing_unique():
+    rng = random.Random(12)
+    fichiers_parses = []
+
+    def parser_pdf(chemin):
+        # Remplace le parsing pdfplumber : compte les appels
+        fichiers_parses.append(os.path.basename(chemin))
+        annee = int(chemin[-8:-4])
+        data = bilan_synthetique(rng)
+        data["metadata"] = {"commune": "COMMUNE TEST", "exercice": annee, "population": 1000 + annee, "strate": "500-2000"}
+        return data
+
+    with tempfile.TemporaryDirectory() as dossier:
+        for annee in (2023, 2020, 2022, 2021):
+            open(os.path.join(dossier, f"Edition commune TEST - Exercice {annee}.pdf"), 'wb').close()
+
+        # Parsing dans le processus courant : les appels au parseur simulé restent comptés ici
+        donnees = DonneesMultiAnnees.depuis_dossier(dossier, workers=1, parser_pdf=parser_pdf)
+        fichier_json = os.path.join(dossier, 'donnees_multi_annees.json')
+        json_consolide = generer_json_multi_annees_consolide(donnees, fichier_json)
+
+        # Les étapes suivantes (rapports PDF et Word) reçoivent le même jeu : aucun nouveau parsing
+        assert DonneesMultiAnnees.charger(donnees) is donnees
+        assert DonneesMultiAnnees.charger(donnees).bilans is donnees.bilans
+        assert sorted(fichiers_parses) == sorted(f for f in os.listdir(dossier) if f.endswith('.pdf'))
+        assert donnees.json_consolide is json_consolide
+        assert donnees.annees == [2020, 2021, 2022, 2023]
+
+        # Le JSON consolidé resert de source sans parsing
+        relu = DonneesMultiAnnees.charger(fichier_json)
+        assert len(fichiers_parses) == 4
+        assert relu.annees == donnees.annees and relu.commune == "COMMUNE TEST"
+        assert [b['data'] for b in relu.bilans] == [b['data'] for b in donnees.bilans]
+    print(f"[OK] {len(fichiers_parses)} PDFs parsés une seule fois, JSON consolidé réutilisable comme source")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU JEU DE BILANS MULTI-ANNÉES PARTAGÉ")
+    print("=" * 60)
+    test_parsing_unique()
+    print()
+    print("Tous les tests sont passés")
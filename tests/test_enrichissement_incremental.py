@@ -0,0 +1,76 @@
+"""
+Tests de l'enrichissement incrémental des JSON multi-années (enrichir_json_avec_ratios.py)
+Un second passage sans changement ne doit pas réécrire le fichier, et l'ajout d'un exercice
+ne doit recalculer que celui-ci ; le résultat reste celui d'un calcul complet.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from enrichir_json_avec_ratios import enrichir_fichier_json
+from ratios_financiers import actualiser_ratios_multi_annees, calculer_tous_ratios_multi_annees
+from test_ratios_vectorises import bilan_synthetique
+
+
+def json_multi_annees(rng, annees):
+    return {
+        "metadata": {"commune": "COMMUNE TEST", "periode_debut": annees[0], "periode_fin": annees[-1]},
+        "tendances_globales": {},
+        "bilans_annuels": {str(annee): bilan_synthetique(rng) for annee in annees},
+    }
+
+
+def test_enrichissement_incremental():
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, 'donnees_multi_annees.json')
+        with open(chemin, 'w', encoding='utf-8') as f:
+            json.dump(json_multi_annees(rng, list(range(2010, 2024))), f)
+
+        assert enrichir_fichier_json(chemin)
+        with open(chemin, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        attendu = calculer_tous_ratios_multi_annees(data)
+        assert data['ratios_financiers']['ratios_par_annee'] == attendu['ratios_par_annee']
+        assert data['ratios_financiers']['evolutions'] == attendu['evolutions']
+
+        # Aucun changement : le fichier n'est pas réécrit
+        date_modification = os.stat(chemin).st_mtime_ns
+        assert enrichir_fichier_json(chemin)
+        assert os.stat(chemin).st_mtime_ns == date_modification
+
+        # Un exercice ajouté : seul celui-ci est recalculé
+        data['bilans_annuels']['2024'] = bilan_synthetique(rng)
+        _, annees_recalculees = actualiser_ratios_multi_annees(data)
+        assert annees_recalculees == ['2024']
+
+        # Un agrégat modifié sur une année passée : seule cette année est recalculée
+        data['bilans_annuels']['2015']['autofinancement']['caf_brute'] = {"montant_k": 12345}
+        _, annees_recalculees = actualiser_ratios_multi_annees(data)
+        assert annees_recalculees == ['2015', '2024']
+
+        with open(chemin, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        assert enrichir_fichier_json(chemin)
+        with open(chemin, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        attendu = calculer_tous_ratios_multi_annees(data)
+        assert data['ratios_financiers']['ratios_par_annee'] == attendu['ratios_par_annee']
+        assert data['ratios_financiers']['evolutions'] == attendu['evolutions']
+        assert sorted(data['ratios_financiers']['empreintes_agregats']) == [str(a) for a in range(2010, 2025)]
+    print("[OK] Enrichissement incrémental : fichier inchangé non réécrit, seules les années modifiées recalculées")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DE L'ENRICHISSEMENT INCRÉMENTAL")
+    print("=" * 60)
+    test_enrichissement_incremental()
+    print()
+    print("Tous les tests sont passés")
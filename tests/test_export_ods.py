@@ -0,0 +1,141 @@
+"""
+Tests de la lecture des exports complets des balances (api_M57/export_ods.py)
+Un export synthétique (plusieurs communes, budgets principal et annexes) est écrit
+en CSV, JSON, JSONL et Parquet : chaque format doit donner les mêmes enregistrements
+que l'API et les mêmes agrégats M57.
+"""
+
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api_M57'))
+
+from export_ods import charger_balance_export, iterer_blocs_export, regrouper_balances_export
+from fetch_balance_m57_v2 import calculer_agregats_m57, clean_balance_data
+
+
+COLONNES = ['exer', 'siren', 'lbudg', 'cbudg', 'ctype', 'cstyp', 'compte', 'obnetdeb', 'obnetcre', 'sd', 'sc', 'secteur']
+COMPTES = ['60611', '6411', '64111', '6541', '66111', '6811', '7011', '73111', '74111', '7411', '775',
+           '1021', '10222', '1641', '2031', '21311', '2313', '1391', '4581', '165']
+
+
+def export_synthetique(nb_communes=40, graine=7):
+    """Records au format de l'API records : identifiants texte, montants numériques"""
+    rng = random.Random(graine)
+    records = []
+    for c in range(nb_communes):
+        siren = str(200000000 + c)
+        for cbudg in ('1', '2'):
+            for compte in COMPTES:
+                records.append({
+                    'exer': '2024', 'siren': siren, 'lbudg': f"COMMUNE {c}", 'cbudg': cbudg,
+                    'ctype': '101', 'cstyp': '00', 'compte': compte,
+                    'obnetdeb': round(rng.uniform(0, 1e5), 2) * rng.randint(0, 1),
+                    'obnetcre': round(rng.uniform(0, 1e5), 2) * rng.randint(0, 1),
+                    'sd': round(rng.uniform(0, 1e5), 2) * rng.randint(0, 1),
+                    'sc': round(rng.uniform(0, 1e5), 2) * rng.randint(0, 1),
+                    'secteur': None,
+                })
+    rng.shuffle(records)
+    return records
+
+
+def ecrire_exports(records, dossier):
+    """Écrit l'export dans chaque format disponible, retourne {format: chemin}"""
+    chemins = {}
+
+    chemin = os.path.join(dossier, 'balances.csv')
+    with open(chemin, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(COLONNES)
+        for r in records:
+            writer.writerow(['' if r[c] is None else r[c] for c in COLONNES])
+    chemins['csv'] = chemin
+
+    chemin = os.path.join(dossier, 'balances.json')
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+    chemins['json'] = chemin
+
+    chemin = os.path.join(dossier, 'balances.jsonl')
+    with open(chemin, 'w', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+    chemins['jsonl'] = chemin
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist([dict(r, siren=int(r['siren'])) for r in records])
+        chemin = os.path.join(dossier, 'balances.parquet')
+        pq.write_table(table, chemin, row_group_size=300)
+        chemins['parquet'] = chemin
+    except ImportError:
+        print("[--] pyarrow non installé : format Parquet non testé")
+
+    return chemins
+
+
+def test_formats():
+    records = export_synthetique()
+    attendu = [r for r in records if r['siren'] == '200000003']
+
+    with tempfile.TemporaryDirectory() as dossier:
+        chemins = ecrire_exports(records, dossier)
+        for fmt, chemin in chemins.items():
+            resultat = charger_balance_export(chemin, '200 000 003')
+            assert resultat == attendu, fmt
+
+            principal = charger_balance_export(chemin, '200000003', budget_principal=True)
+            assert principal == [r for r in attendu if r['cbudg'] == '1'], fmt
+
+            assert charger_balance_export(chemin, '200000003', exercice=2023) == [], fmt
+            print(f"[OK] {fmt:8s} : {len(resultat)} lignes, mêmes champs et types que l'API")
+
+
+def test_lecture_par_blocs():
+    """Blocs bornés et lecture JSON par petits morceaux (objets coupés entre deux lectures)"""
+    records = export_synthetique()
+    with tempfile.TemporaryDirectory() as dossier:
+        chemins = ecrire_exports(records, dossier)
+        for fmt, chemin in chemins.items():
+            blocs = list(iterer_blocs_export(chemin, taille_bloc=97, taille_lecture=61))
+            assert all(len(b) <= 97 for b in blocs), fmt
+            tous = [r for b in blocs for r in b]
+            assert len(tous) == len(records), fmt
+            assert [r['compte'] for r in tous] == [r['compte'] for r in records], fmt
+    print("[OK] Lecture par blocs de 97 lignes, JSON lu par tranches de 61 caractères")
+
+
+def test_agregats_identiques():
+    """Les balances lues dans l'export donnent les mêmes agrégats et le même JSON nettoyé"""
+    records = export_synthetique()
+    with tempfile.TemporaryDirectory() as dossier:
+        chemins = ecrire_exports(records, dossier)
+        sirens = ['200000001', '200000011', '200000021']
+        reference = {s: [r for r in records if r['siren'] == s] for s in sirens}
+
+        for fmt, chemin in chemins.items():
+            balances = regrouper_balances_export(chemin, sirens)
+            assert sorted(balances) == sirens, fmt
+            for siren in sirens:
+                principal = [r for r in reference[siren] if r['cbudg'] == '1']
+                assert calculer_agregats_m57([r for r in balances[siren] if r['cbudg'] == '1']) == \
+                    calculer_agregats_m57(principal), (fmt, siren)
+                assert clean_balance_data(balances[siren]) == clean_balance_data(reference[siren]), (fmt, siren)
+    print("[OK] Agrégats M57 et balance nettoyée identiques à ceux des records de l'API")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DE LA LECTURE DES EXPORTS COMPLETS")
+    print("=" * 60)
+    test_formats()
+    test_lecture_par_blocs()
+    test_agregats_identiques()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,100 @@
+"""
+Tests de la génération des JSON enrichis par lot (generer_json_par_lot.py)
+Sur un petit dossier de bilans : ordre des comptes rendus, arborescence des sorties,
+PDF illisible compté en échec, et résumé écrit même si un processus du pool meurt.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from generer_json_par_lot import FICHIER_RESUME, generer_lot, lister_bilans_dossier
+from generators.generer_json_enrichi import generer_json_enrichi
+
+DOSSIER_DOCS = os.path.join(os.path.dirname(__file__), '..', 'docs')
+
+
+def traitement_interrompu(tache):
+    """Traitement du pool qui tue son processus sur un PDF marqué (comme un arrêt par manque de mémoire)"""
+    fichier_pdf, fichier_sortie = tache
+    if 'crash' in os.path.basename(fichier_pdf):
+        os._exit(1)
+    return {"fichier": fichier_pdf, "sortie": fichier_sortie, "statut": "ok",
+            "commune": "COMMUNE TEST", "exercice": 2023, "duree_s": 0.0}
+
+
+def test_lot_dossier():
+    cache_origine = os.environ.get("BILANS_CACHE")
+    os.environ["BILANS_CACHE"] = "off"  # hérité par les processus du pool
+    try:
+        with tempfile.TemporaryDirectory() as dossier:
+            source = os.path.join(dossier, 'bilans')
+            os.makedirs(os.path.join(source, 'a'))
+            os.makedirs(os.path.join(source, 'b', 'sous'))
+            shutil.copyfile(os.path.join(DOSSIER_DOCS, 'bilan.pdf'), os.path.join(source, 'a', 'bilan.pdf'))
+            shutil.copyfile(os.path.join(DOSSIER_DOCS, 'bilan2.pdf'), os.path.join(source, 'b', 'sous', 'bilan2.pdf'))
+            with open(os.path.join(source, 'a', 'corrompu.pdf'), 'wb') as f:
+                f.write(b'pas un PDF')
+
+            fichiers = lister_bilans_dossier(source)
+            assert [os.path.relpath(f, source) for f in fichiers] == [
+                os.path.join('a', 'bilan.pdf'), os.path.join('a', 'corrompu.pdf'), os.path.join('b', 'sous', 'bilan2.pdf')
+            ]
+
+            sortie = os.path.join(dossier, 'sortie')
+            resume = generer_lot(fichiers, sortie, racine=source, workers=2, chunksize=1)
+
+            assert (resume['nb_fichiers'], resume['nb_succes'], resume['nb_echecs']) == (3, 2, 1)
+            # Comptes rendus dans l'ordre des fichiers, arborescence reproduite sous la sortie
+            assert [c['fichier'] for c in resume['succes']] == [str(fichiers[0]), str(fichiers[2])]
+            assert [c['sortie'] for c in resume['succes']] == [
+                os.path.join(sortie, 'a', 'bilan.json'), os.path.join(sortie, 'b', 'sous', 'bilan2.json')
+            ]
+            assert resume['echecs'][0]['fichier'] == str(fichiers[1])
+            assert resume['echecs'][0]['statut'] == 'erreur' and resume['echecs'][0]['erreur']
+            assert not os.path.exists(os.path.join(sortie, 'a', 'corrompu.json'))
+
+            for compte_rendu in resume['succes']:
+                with open(compte_rendu['sortie'], 'r', encoding='utf-8') as f:
+                    json_data = json.load(f)
+                assert json_data == generer_json_enrichi(compte_rendu['fichier'], utiliser_cache=False)
+                assert compte_rendu['commune'] == json_data['metadata']['commune']
+                assert compte_rendu['exercice'] == json_data['metadata']['exercice']
+
+            with open(os.path.join(sortie, FICHIER_RESUME), 'r', encoding='utf-8') as f:
+                assert json.load(f) == resume
+    finally:
+        if cache_origine is None:
+            os.environ.pop("BILANS_CACHE", None)
+        else:
+            os.environ["BILANS_CACHE"] = cache_origine
+    print("[OK] Lot : ordre des fichiers, arborescence des JSON, PDF illisible en échec, résumé écrit")
+
+
+def test_processus_interrompu():
+    with tempfile.TemporaryDirectory() as dossier:
+        fichiers = [os.path.join(dossier, nom) for nom in ('1.pdf', '2_crash.pdf', '3.pdf')]
+        resume = generer_lot(fichiers, dossier, workers=1, chunksize=1, traitement=traitement_interrompu)
+
+        assert [c['fichier'] for c in resume['succes']] == fichiers[:1]
+        assert [c['fichier'] for c in resume['echecs']] == fichiers[1:]
+        assert all(c['erreur'].startswith('BrokenProcessPool') for c in resume['echecs'])
+        with open(os.path.join(dossier, FICHIER_RESUME), 'r', encoding='utf-8') as f:
+            assert json.load(f)['nb_echecs'] == 2
+    print("[OK] Processus du pool interrompu : PDFs non terminés en échec, résumé écrit")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DE LA GÉNÉRATION PAR LOT")
+    print("=" * 60)
+    test_lot_dossier()
+    test_processus_interrompu()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,94 @@
+"""
+Tests de la reprise d'un calcul de strate (api_M57/journal_strate.py, calculer_moyennes_strate)
+Un premier passage échoue sur une partie des communes : la reprise ne doit redemander que
+celles-ci, et les statistiques finales doivent être celles d'un calcul sans interruption.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api_M57'))
+
+from comparer_avec_strate import calculer_moyennes_strate
+from journal_strate import JournalStrate
+from parsers.client_http import ClientHTTP
+from test_store_strate import ServeurBalances, statistiques_reference, strate_synthetique, verifier_statistiques
+
+
+def test_reprise_apres_echecs():
+    communes, records = strate_synthetique(nb_communes=60)
+    client = ClientHTTP(cache=None)
+
+    with tempfile.TemporaryDirectory() as dossier, ServeurBalances(records) as serveur:
+        journal = JournalStrate.pour_strate('5', 2024, dossier)
+        en_erreur = {c['siren'] for c in communes[10:25]}
+        serveur.sirens_en_erreur = set(en_erreur)
+
+        calculer_moyennes_strate(communes, 2024, journal=journal, url=serveur.url, client=client)
+        assert set(journal.lire()) == {c['siren'] for c in communes} - en_erreur
+
+        # Reprise : seules les communes en échec sont redemandées
+        serveur.sirens_en_erreur.clear()
+        serveur.balances_demandees.clear()
+        stats = calculer_moyennes_strate(communes, 2024, journal=journal, url=serveur.url, client=client)
+        journal.fermer()
+
+        assert sorted(serveur.balances_demandees) == sorted(en_erreur)
+        verifier_statistiques(stats, statistiques_reference(communes, records))
+    print(f"[OK] Reprise : {len(en_erreur)} communes redemandées sur {len(communes)}, statistiques complètes")
+
+
+def test_journal_identique_au_calcul_sans_journal():
+    communes, records = strate_synthetique(nb_communes=40)
+    client = ClientHTTP(cache=None)
+
+    with tempfile.TemporaryDirectory() as dossier, ServeurBalances(records) as serveur:
+        sans_journal = calculer_moyennes_strate(communes, 2024, url=serveur.url, client=client)
+
+        # Commune journalisée deux fois (reprise concurrente) et commune hors de la strate
+        journal = JournalStrate.pour_strate('5', 2024, dossier)
+        premiere = calculer_moyennes_strate(communes[:5], 2024, journal=journal, url=serveur.url, client=client)
+        for siren, flux_nets in list(journal.parcourir())[:2]:
+            journal.ajouter(siren, flux_nets)
+        journal.ajouter('219999999', {'6061': 1e9})
+
+        serveur.balances_demandees.clear()
+        avec_journal = calculer_moyennes_strate(communes, 2024, journal=journal, url=serveur.url, client=client)
+        journal.fermer()
+
+        assert premiere
+        assert len(serveur.balances_demandees) == len(communes) - 5
+        verifier_statistiques(avec_journal, sans_journal)
+    print("[OK] Statistiques avec journal identiques au calcul sans journal (doublons et hors strate ignorés)")
+
+
+def test_ligne_tronquee():
+    with tempfile.TemporaryDirectory() as dossier:
+        journal = JournalStrate(os.path.join(dossier, 'strate.jsonl'))
+        journal.ajouter('210000001', {'6061': 12.5})
+        journal.fermer()
+
+        # Arrêt brutal pendant l'écriture d'une ligne
+        with open(journal.chemin, 'a', encoding='utf-8') as f:
+            f.write('{"siren": "210000002", "flux_ne')
+
+        assert journal.lire() == {'210000001': {'6061': 12.5}}
+        journal.ajouter('210000003', {})
+        journal.fermer()
+        assert journal.lire() == {'210000001': {'6061': 12.5}, '210000003': {}}
+
+        journal.reinitialiser()
+        assert journal.lire() == {}
+    print("[OK] Ligne tronquée par un arrêt brutal ignorée, journal réutilisable")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DE LA REPRISE DES CALCULS DE STRATE")
+    print("=" * 60)
+    test_reprise_apres_echecs()
+    test_journal_identique_au_calcul_sans_journal()
+    test_ligne_tronquee()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,113 @@
+"""
+Tests du moteur matriciel de strate (api_M57/matrice_strate.py) et du tableau comparatif vectorisé
+Les statistiques de la matrice creuse doivent être celles de AccumulateurStrate, et le tableau
+celui de la boucle d'origine compte par compte.
+"""
+
+import math
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api_M57'))
+
+from comparer_avec_strate import creer_tableau_comparatif
+from matrice_strate import MatriceStrate
+from stats_strate import AccumulateurStrate
+
+
+def strate_synthetique(nb_communes=150, graine=3):
+    """Communes sans population ou avec flux nuls incluses"""
+    rng = random.Random(graine)
+    comptes = [str(6000 + i) for i in range(120)]
+    communes = []
+    for i in range(nb_communes):
+        commune = {"siren": str(210000000 + i), "population": rng.choice([None, 0, rng.randint(200, 5000)])}
+        flux = {c: round(rng.uniform(-5e5, 5e5), 2) * rng.randint(0, 3) for c in rng.sample(comptes, 40)}
+        communes.append((commune, flux))
+    return communes
+
+
+def test_statistiques_matrice():
+    communes = strate_synthetique()
+    accumulateur = AccumulateurStrate()
+    for commune, flux in communes:
+        accumulateur.ajouter(commune['population'], flux)
+    reference = accumulateur.statistiques()
+
+    matrice = MatriceStrate.construire(communes)
+    stats = matrice.statistiques()
+
+    assert matrice.nb_communes == accumulateur.nb_communes
+    assert list(stats) == list(reference)
+    for compte, attendu in reference.items():
+        for cle, valeur in attendu.items():
+            if isinstance(valeur, float):
+                assert math.isclose(stats[compte][cle], valeur, rel_tol=1e-9, abs_tol=1e-9), (compte, cle)
+            else:
+                assert stats[compte][cle] == valeur, (compte, cle)
+    print(f"[OK] Statistiques de la matrice ({matrice.flux.nnz} valeurs) identiques à l'accumulateur")
+
+
+def tableau_reference(balance_locale, stats_strate, population):
+    """Boucle d'origine de creer_tableau_comparatif"""
+    rows = []
+    for compte_data in balance_locale['comptes_details']:
+        flux_net = compte_data['flux_net']
+        stats = stats_strate.get(compte_data['compte'], {})
+        moyenne_strate = stats.get('moyenne', 0)
+        moyenne_par_hab_strate = stats.get('moyenne_par_hab', 0)
+        flux_par_hab = flux_net / population if population else 0
+        ecart_absolu = flux_net - moyenne_strate
+        ecart_par_hab = flux_par_hab - moyenne_par_hab_strate
+        rows.append({
+            "Compte": compte_data['compte'],
+            "Libellé": compte_data.get('libelle_compte', compte_data.get('libelle_officiel', '')),
+            "Écart absolu": ecart_absolu,
+            "Écart %": (ecart_absolu / moyenne_strate * 100) if moyenne_strate != 0 else 0,
+            "Écart % par hab": (ecart_par_hab / moyenne_par_hab_strate * 100) if moyenne_par_hab_strate != 0 else 0,
+            "Nb communes strate": stats.get('nb_communes', 0),
+        })
+    return sorted(rows, key=lambda r: -abs(r["Écart absolu"]))
+
+
+def test_tableau_comparatif():
+    communes = strate_synthetique()
+    stats_strate = MatriceStrate.construire(communes).statistiques()
+
+    rng = random.Random(8)
+    details = []
+    for compte in [str(6000 + i) for i in range(0, 140, 3)]:
+        detail = {"compte": compte, "flux_net": round(rng.uniform(-1e6, 1e6), 2)}
+        if rng.random() < 0.8:
+            detail["libelle_compte"] = f"Compte {compte}"
+        else:
+            detail["libelle_officiel"] = f"Libellé officiel {compte}"
+        details.append(detail)
+    balance_locale = {"comptes_details": details}
+    info_commune = {"population": 1234}
+
+    with tempfile.TemporaryDirectory() as dossier:
+        df = creer_tableau_comparatif(balance_locale, stats_strate, info_commune, os.path.join(dossier, 't.xlsx'))
+
+    attendu = tableau_reference(balance_locale, stats_strate, info_commune['population'])
+    lignes = df.to_dict('records')
+    assert len(lignes) == len(attendu)
+    for ligne, ref in zip(lignes, attendu):
+        for cle, valeur in ref.items():
+            if isinstance(valeur, float):
+                assert math.isclose(ligne[cle], valeur, rel_tol=1e-12, abs_tol=1e-9), (ref["Compte"], cle)
+            else:
+                assert ligne[cle] == valeur, (ref["Compte"], cle)
+    print(f"[OK] Tableau comparatif vectorisé identique à la boucle d'origine ({len(lignes)} comptes)")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU MOTEUR MATRICIEL DE STRATE")
+    print("=" * 60)
+    test_statistiques_matrice()
+    test_tableau_comparatif()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,130 @@
+"""
+Tests du moteur d'extraction compilé (MoteurExtraction de parser_budget_v2_complet.py)
+Sur les bilans de docs/, le balayage par ancres doit trouver les mêmes champs que la
+recherche regex champ par champ sur tout le texte, y compris en mode flux page par page.
+La mémoire des pages par maquette ne perd aucune lecture quand plusieurs processus écrivent.
+"""
+
+import glob
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from parsers.memoire_pages import MemoirePages
+from parsers.parser_budget_v2_complet import ChampConfig, MoteurExtraction, ParserBudget
+
+DOSSIER_DOCS = os.path.join(os.path.dirname(__file__), '..', 'docs')
+BILANS = sorted(glob.glob(os.path.join(DOSSIER_DOCS, 'bilan*.pdf'))
+                + glob.glob(os.path.join(DOSSIER_DOCS, 'bilans_multi_annees', '*.pdf')))
+
+
+def enregistrer_lectures(args):
+    """Lectures complètes enregistrées par un processus du pool"""
+    chemin, numero_processus, nb_lectures = args
+    memoire = MemoirePages(chemin)
+    for lecture in range(nb_lectures):
+        memoire.enregistrer('2023-40p', {'Total produits': [2], f'Champ {numero_processus}': [10 + lecture]})
+    return numero_processus
+
+
+def budget_reference(parser, texte):
+    """Budget de l'ancienne boucle : une recherche regex indépendante par champ"""
+    return parser._construire_budget([parser._occurrences_regex(texte, c) for c in parser.config])
+
+
+def test_moteur_identique_a_la_boucle_par_champ():
+    assert BILANS, "Aucun bilan PDF dans docs/"
+    parser = ParserBudget(mode_flux=False)
+    for fichier in BILANS:
+        texte = parser.extraire_texte_pdf(fichier)
+        comparaison = parser.comparer_moteurs(texte, repetitions=1)
+        assert comparaison['divergences'] == [], (os.path.basename(fichier), comparaison['divergences'])
+
+        reference = budget_reference(parser, texte)
+        assert reference, os.path.basename(fichier)
+        assert parser.extraire_champs(texte) == reference, os.path.basename(fichier)
+        assert parser.parser_bilan_pdf(fichier) == reference, os.path.basename(fichier)
+    print(f"[OK] Moteur compilé identique à la boucle par champ sur {len(BILANS)} bilans")
+
+
+def test_mode_flux_identique_a_la_boucle_par_champ():
+    parser = ParserBudget(mode_flux=False)
+    references = {fichier: budget_reference(parser, parser.extraire_texte_pdf(fichier)) for fichier in BILANS}
+
+    with tempfile.TemporaryDirectory() as dossier:
+        memoire = MemoirePages(os.path.join(dossier, 'memoire_pages.sqlite'), lectures_min=1)
+        parser_flux = ParserBudget(mode_flux=True, memoire=memoire)
+        # 1er passage : lecture complète page par page (maquettes inconnues)
+        # 2e passage : pages mémorisées seules avec arrêt anticipé, ou retour à la
+        # lecture complète si un champ attendu dans la maquette manque
+        nb_ciblees = 0
+        for passage in (1, 2):
+            for fichier in BILANS:
+                assert parser_flux.parser_bilan_pdf(fichier) == references[fichier], (passage, os.path.basename(fichier))
+                if passage == 2:
+                    nb_ciblees += parser_flux.derniere_lecture['ciblee']
+        assert nb_ciblees > 0
+    print(f"[OK] Mode flux identique à la boucle par champ sur {len(BILANS)} bilans "
+          f"({nb_ciblees} lectures ciblées)")
+
+
+def test_champs_sans_ancre_incrementaux():
+    configs = [
+        ChampConfig("Premier montant", r'(\d+) €', ["premier"], [int]),
+        ChampConfig("Dernier montant", r'(\d+) EUR', ["dernier"], [int], occurrence=-1, flags_regex=re.IGNORECASE),
+    ]
+    moteur = MoteurExtraction(configs)
+    assert moteur.ancres == [None, None]
+
+    lignes = [f"ligne {i} : {i * 37} € soit {i * 41} eur" if i % 3 else f"ligne {i} sans montant" for i in range(1, 60)]
+    texte_complet = '\n'.join(lignes)
+    premier = re.search(configs[0].pattern, texte_complet)
+    derniers = re.finditer(configs[1].pattern, texte_complet, re.IGNORECASE)
+    reference = [[premier.groups()], [m.groups(default='') for m in derniers]]
+
+    # Texte alimenté par morceaux coupés au milieu des montants
+    etat = moteur.nouvel_etat()
+    for fin in range(11, len(texte_complet), 23):
+        texte = texte_complet[:fin]
+        moteur.alimenter(etat, texte)
+        # Seules les dernières lignes restent à réexaminer
+        limite = moteur._debut_dernieres_lignes(texte, moteur.LIGNES_RECOUVREMENT)
+        assert etat.pos_sans_ancre[0] is None or etat.pos_sans_ancre[0] >= limite
+        assert etat.pos_sans_ancre[1] >= limite
+    moteur.alimenter(etat, texte_complet, final=True)
+
+    assert moteur.occurrences(etat) == reference
+    assert moteur.trouver_occurrences(texte_complet) == reference
+    print("[OK] Champs sans ancre : recherche reprise page par page, mêmes occurrences que re.findall")
+
+
+def test_memoire_pages_processus_concurrents():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, 'memoire_pages.sqlite')
+        nb_processus, nb_lectures = 4, 10
+        with ProcessPoolExecutor(max_workers=nb_processus) as executor:
+            list(executor.map(enregistrer_lectures, [(chemin, n, nb_lectures) for n in range(nb_processus)]))
+
+        memoire = MemoirePages(chemin, lectures_min=nb_processus * nb_lectures)
+        assert memoire.lectures_completes('2023-40p') == nb_processus * nb_lectures
+        pages = memoire.pages_champs('2023-40p')
+        assert pages['Total produits'] == {2}
+        assert all(pages[f'Champ {n}'] == set(range(10, 10 + nb_lectures)) for n in range(nb_processus))
+        assert MemoirePages(chemin, lectures_min=nb_processus * nb_lectures + 1).pages_champs('2023-40p') is None
+    print(f"[OK] Mémoire des pages : {nb_processus * nb_lectures} lectures de {nb_processus} processus conservées")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU MOTEUR D'EXTRACTION COMPILÉ")
+    print("=" * 60)
+    test_moteur_identique_a_la_boucle_par_champ()
+    test_mode_flux_identique_a_la_boucle_par_champ()
+    test_champs_sans_ancre_incrementaux()
+    test_memoire_pages_processus_concurrents()
+    print()
+    print("Tous les tests sont passés")
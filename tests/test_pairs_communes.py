@@ -0,0 +1,128 @@
+"""
+Tests des groupes de pairs (src/analysis/pairs_communes.py)
+35 000 communes synthétiques : les voisins du KD-tree doivent être ceux d'une recherche
+exhaustive, et une mise à jour des profils ne doit reconstruire que l'index de l'exercice concerné.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analysis.pairs_communes import (
+    AGREGATS_PROFIL,
+    IndexPairs,
+    MoteurPairs,
+    StoreProfils,
+    benchmark_commune,
+    profils_depuis_records,
+)
+from generators.generer_json_enrichi import ajouter_benchmark_pairs
+
+
+def profils_synthetiques(nb_communes=35000, graine=1):
+    """Profils log-normaux, 5 % d'agrégats manquants, quelques communes sans population"""
+    rng = random.Random(graine)
+    profils = {}
+    for i in range(nb_communes):
+        profils[str(210000000 + i)] = {
+            "nom": f"COMMUNE {i}",
+            "population": int(10 ** rng.uniform(1.5, 5.5)) if rng.random() > 0.001 else None,
+            "profil": {a: round(rng.lognormvariate(6, 1), 2) for a in AGREGATS_PROFIL if rng.random() > 0.05}
+        }
+    return profils
+
+
+def test_pairs_exacts_et_rapides():
+    profils = profils_synthetiques()
+    debut = time.perf_counter()
+    index = IndexPairs(profils)
+    duree_construction = time.perf_counter() - debut
+    assert len(index) == sum(1 for p in profils.values() if p["population"])
+
+    echantillon = random.Random(2).sample(index.sirens, 200)
+    debut = time.perf_counter()
+    resultats = {siren: index.pairs(siren, k=20) for siren in echantillon}
+    duree_requete = (time.perf_counter() - debut) / len(echantillon)
+
+    for siren in echantillon[:20]:
+        i = index.index_sirens[siren]
+        distances = np.linalg.norm(index.vecteurs - index.vecteurs[i], axis=1)
+        distances[i] = np.inf
+        attendus = np.sort(distances)[:20]
+        obtenus = [p["distance"] for p in resultats[siren]]
+        assert siren not in [p["siren"] for p in resultats[siren]]
+        assert np.allclose(obtenus, attendus), siren
+
+    print(f"[OK] Index de {len(index)} communes en {duree_construction:.2f}s, "
+          f"{duree_requete * 1000:.2f} ms par recherche de 20 pairs (identiques à la recherche exhaustive)")
+
+
+def test_actualisation_incrementale():
+    profils = profils_synthetiques(nb_communes=2000)
+    with tempfile.TemporaryDirectory() as dossier:
+        moteur = MoteurPairs(StoreProfils(os.path.join(dossier, 'profils.sqlite')))
+        assert moteur.actualiser(2022, profils) == len(profils)
+        assert moteur.actualiser(2023, profils) == len(profils)
+        index_2022 = moteur.index(2022)
+        index_2023 = moteur.index(2023)
+
+        # Mêmes profils : rien n'est réécrit, les index restent en place
+        assert moteur.actualiser(2023, profils) == 0
+        assert moteur.index(2023) is index_2023
+
+        # Une commune modifiée en 2023 : seul l'index 2023 est reconstruit
+        siren = next(iter(profils))
+        profils[siren] = dict(profils[siren], profil=dict(profils[siren]["profil"], **{"Impôts locaux": 9999.0}))
+        assert moteur.actualiser(2023, profils) == 1
+        assert moteur.index(2022) is index_2022
+        assert moteur.index(2023) is not index_2023
+        assert moteur.index(2023).par_hab[moteur.index(2023).index_sirens[siren]][
+            AGREGATS_PROFIL.index("Impôts locaux")] == 9999.0
+    print("[OK] Mise à jour des profils : seules les communes modifiées et l'index de l'exercice concerné")
+
+
+def test_benchmark_json_enrichi():
+    records = []
+    for i, (population, base) in enumerate([(1000, 500), (1100, 560), (1000, 490), (90000, 2000)]):
+        for agregat in AGREGATS_PROFIL:
+            records.append({"siren": str(210000000 + i), "com_name": f"C{i}", "ptot": population,
+                            "agregat": agregat, "montant": base * population, "euros_par_habitant": None})
+    profils = profils_depuis_records(records)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        moteur = MoteurPairs(StoreProfils(os.path.join(dossier, 'profils.sqlite')))
+        benchmark = benchmark_commune("210000000", 2023, k=2, moteur=moteur, profils=profils)
+        assert benchmark == IndexPairs(profils).benchmark("210000000", k=2)
+        # Commune sans profil pour l'exercice : pas de benchmark
+        assert benchmark_commune("219999999", 2023, k=2, moteur=moteur, profils=profils) is None
+    assert [p["siren"] for p in benchmark["communes"]] == ["210000002", "210000001"]
+    assert benchmark["moyennes_hab"]["Frais de personnel"] == 525.0
+
+    json_data = {
+        "metadata": {"commune": "C0"},
+        "fonctionnement": {"charges": {"charges_personnel": {"par_hab": 630, "moyenne_strate_hab": 450}}},
+    }
+    ajouter_benchmark_pairs(json_data, benchmark)
+    poste = json_data["fonctionnement"]["charges"]["charges_personnel"]
+    assert poste["moyenne_pairs_hab"] == 525
+    assert poste["comparaison_pairs"]["ecart_pct"] == 20.0
+    assert "Moyenne des pairs" in poste["comparaison_pairs"]["texte"]
+    assert json_data["metadata"]["pairs"]["k"] == 2
+    print("[OK] Groupe de pairs et comparaison ajoutés au JSON enrichi")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DES GROUPES DE PAIRS")
+    print("=" * 60)
+    test_pairs_exacts_et_rapides()
+    test_actualisation_incrementale()
+    test_benchmark_json_enrichi()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,144 @@
+"""
+Tests du panel colonnaire des bilans multi-années (src/analysis/panel_bilans.py)
+Séries, évolutions moyennes, comparaisons, ratios évolutifs et séries de graphiques calculés
+sur le panel doivent être ceux du parcours des chemins pointés bilan par bilan.
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analysis.analyseur_multi_annees import (
+    calculer_ratios_evolutifs,
+    comparer_bilans_annee_par_annee,
+    extraire_valeur_poste,
+)
+from analysis.panel_bilans import PanelBilans
+from generer_json_multi_annees import calculer_evolution
+
+POSTES = [
+    'fonctionnement.produits.total', 'fonctionnement.produits.impots_locaux', 'fonctionnement.produits.dgf',
+    'fonctionnement.charges.total', 'fonctionnement.charges.charges_personnel', 'fonctionnement.resultat',
+    'autofinancement.caf_brute', 'autofinancement.caf_nette', 'endettement.encours_total',
+    'investissement.emplois.depenses_equipement', 'investissement.ressources.emprunts',
+    'investissement.ressources.subventions_recues',
+]
+
+
+def bilans_multi_annees(rng, annees):
+    """Bilans annuels {'annee', 'data'} avec zéros, montants flottants et postes manquants"""
+    bilans = []
+    for annee in annees:
+        data = {"metadata": {"commune": "COMMUNE TEST", "exercice": annee, "strate": "500-2000",
+                             "population": rng.choice([0, None, rng.randint(100, 80000), rng.randint(100, 80000)])}}
+        for chemin in POSTES:
+            if rng.random() < 0.05:
+                continue
+            noeud = data
+            for cle in chemin.split('.'):
+                noeud = noeud.setdefault(cle, {})
+            noeud["montant_k"] = rng.choice([0, rng.randint(-200, 5000), round(rng.uniform(1, 5000), 1)])
+            noeud["par_hab"] = rng.choice([None, rng.randint(0, 2000)])
+        data.setdefault("endettement", {})["ratios"] = {
+            "capacite_desendettement_annees": rng.choice([None, round(rng.uniform(0, 20), 1)])
+        }
+        bilans.append({"annee": annee, "source": "PDF", "data": data})
+    return bilans
+
+
+def evolution_moyenne_reference(bilans, chemin):
+    valeurs = [v for v in (extraire_valeur_poste(b['data'], chemin) for b in bilans) if v is not None]
+    if len(valeurs) < 2:
+        return None
+    evolutions = [e for e in (calculer_evolution(valeurs[i], valeurs[i-1]) for i in range(1, len(valeurs)))
+                  if e is not None]
+    return round(sum(evolutions) / len(evolutions), 1) if evolutions else None
+
+
+def ratios_evolutifs_reference(bilans):
+    ratios_par_annee = []
+    for bilan in bilans:
+        v = {cle: extraire_valeur_poste(bilan['data'], chemin) or 0 for cle, chemin in {
+            'produits': 'fonctionnement.produits.total.montant_k',
+            'charges': 'fonctionnement.charges.total.montant_k',
+            'personnel': 'fonctionnement.charges.charges_personnel.montant_k',
+            'caf': 'autofinancement.caf_brute.montant_k',
+            'dette': 'endettement.encours_total.montant_k',
+            'equip': 'investissement.emplois.depenses_equipement.montant_k',
+        }.items()}
+        ratios_par_annee.append({
+            'annee': bilan['annee'],
+            'taux_epargne_brute': round((v['caf'] / v['produits'] * 100), 2) if v['produits'] else 0,
+            'rigidite_structurelle': round((v['personnel'] / v['charges'] * 100), 2) if v['charges'] else 0,
+            'taux_endettement': round((v['dette'] / v['produits'] * 100), 2) if v['produits'] else 0,
+            'capacite_desendettement': round(v['dette'] / v['caf'], 2) if v['caf'] else None,
+            'taux_equipement': round((v['equip'] / v['produits'] * 100), 2) if v['produits'] else 0,
+            'ratio_caf_depenses_equip': round((v['caf'] / v['equip'] * 100), 2) if v['equip'] else None
+        })
+    return ratios_par_annee
+
+
+def test_series_et_evolutions():
+    rng = random.Random(23)
+    nb_series = 0
+    for _ in range(200):
+        bilans = bilans_multi_annees(rng, list(range(2015, 2015 + rng.randint(2, 9))))
+        panel = PanelBilans(bilans)
+        for poste in POSTES + ['endettement.ratios.capacite_desendettement']:
+            for chemin in (f'{poste}.montant_k', f'{poste}.par_hab', 'endettement.ratios.capacite_desendettement_annees'):
+                serie = {b['annee']: extraire_valeur_poste(b['data'], chemin) for b in bilans}
+                assert panel.serie(chemin) == serie
+                assert [type(v) for v in panel.serie(chemin).values()] == [type(v) for v in serie.values()]
+                assert panel.evolution_moyenne(chemin) == evolution_moyenne_reference(bilans, chemin)
+                nb_series += 1
+        assert panel.serie('poste.inexistant') == {b['annee']: None for b in bilans}
+    print(f"[OK] {nb_series} séries et évolutions moyennes identiques au parcours des chemins")
+
+
+def test_comparaisons_ratios_et_graphiques():
+    rng = random.Random(24)
+    for _ in range(200):
+        bilans = bilans_multi_annees(rng, list(range(2018, 2018 + rng.randint(2, 7))))
+        panel = PanelBilans(bilans)
+        # Panel complet partagé ou panel restreint construit à la demande : mêmes résultats
+        assert comparer_bilans_annee_par_annee(panel) == comparer_bilans_annee_par_annee(bilans)
+        assert calculer_ratios_evolutifs(panel)['ratios_par_annee'] == ratios_evolutifs_reference(bilans)
+        assert calculer_ratios_evolutifs(bilans) == calculer_ratios_evolutifs(panel)
+
+        comparaisons = comparer_bilans_annee_par_annee(panel)
+        synthese = comparaisons['synthese_globale']['postes']['CAF brute']
+        assert synthese['valeur_debut'] == extraire_valeur_poste(bilans[0]['data'], 'autofinancement.caf_brute.montant_k')
+        assert synthese['valeur_fin'] == extraire_valeur_poste(bilans[-1]['data'], 'autofinancement.caf_brute.montant_k')
+
+        # Séries des graphiques : absent -> 0, k€ -> €/hab (0 sans population)
+        for bilan, valeur_hab in zip(bilans, panel.par_habitant('endettement.encours_total.montant_k')):
+            valeur = extraire_valeur_poste(bilan['data'], 'endettement.encours_total.montant_k') or 0
+            population = bilan['data']['metadata']['population']
+            assert valeur_hab == ((valeur * 1000) / population if population and population > 0 else 0)
+    print("[OK] Comparaisons, ratios évolutifs et séries de graphiques identiques sur 200 communes")
+
+
+def test_taux_croissance_annuel_moyen():
+    bilans = [{"annee": annee, "data": {"caf": {"montant_k": montant}}}
+              for annee, montant in ((2019, 1000), (2020, None), (2021, 1100), (2023, 1464.1))]
+    panel = PanelBilans(bilans)
+    assert panel.taux_croissance_annuel_moyen('caf.montant_k') == 10.0
+    assert panel.dataframe(['caf.montant_k']).loc[2023, 'caf.montant_k'] == 1464.1
+
+    bilans[0]['data']['caf']['montant_k'] = -50
+    assert PanelBilans(bilans).taux_croissance_annuel_moyen('caf.montant_k') is None
+    print("[OK] TCAM sur les valeurs présentes, absent si une borne n'est pas positive")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU PANEL DES BILANS MULTI-ANNÉES")
+    print("=" * 60)
+    test_series_et_evolutions()
+    test_comparaisons_ratios_et_graphiques()
+    test_taux_croissance_annuel_moyen()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,141 @@
+"""
+Tests du moteur de ratios vectorisé (ratios_vectorises.py)
+Sur un panel synthétique (dénominateurs nuls, agrégats absents), chaque ratio doit être celui
+des fonctions scalaires de ratios_financiers.py et ratios_supplementaires_futurs.py.
+"""
+
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ratios_supplementaires_futurs as sup
+from ratios_financiers import calculer_tous_les_ratios
+from ratios_vectorises import agregats_depuis_bilans, calculer_ratios_vectorises, ratios_en_dicts
+
+
+def bilan_synthetique(rng):
+    """JSON enrichi réduit aux postes utilisés par les ratios, avec zéros et postes manquants"""
+    def montant():
+        return rng.choice([0, round(rng.uniform(-200, 5000), 0), round(rng.uniform(1, 5000), 0)])
+
+    def poste():
+        return {"montant_k": montant()} if rng.random() > 0.05 else {}
+
+    return {
+        "metadata": {"population": rng.choice([0, None, rng.randint(100, 80000)])},
+        "fonctionnement": {
+            "produits": {"produits_caf": poste(), "impots_locaux": poste(), "dgf": poste()},
+            "charges": {"charges_caf": poste(), "charges_personnel": poste(),
+                        "achats_charges_externes": poste(), "charges_financieres": poste()},
+            "resultat": poste(),
+        },
+        "autofinancement": {"caf_brute": poste(), "caf_nette": poste()},
+        "investissement": {
+            "emplois": {"total_k": montant(), "depenses_equipement": poste(), "remboursement_emprunts": poste()},
+            "ressources": {"emprunts": poste(), "subventions_recues": poste()},
+        },
+        "endettement": {"encours_total": poste(), "annuite": poste(), "fonds_roulement": poste()},
+    }
+
+
+def ratios_supplementaires_reference(data):
+    """Ratios de ratios_supplementaires_futurs.py pour un JSON (postes absents : None)"""
+    f, i, e = data["fonctionnement"], data["investissement"], data["endettement"]
+
+    def m(noeud):
+        return noeud.get("montant_k")
+
+    produits_caf, charges_caf = m(f["produits"]["produits_caf"]) or 0, m(f["charges"]["charges_caf"]) or 0
+    impots, personnel = m(f["produits"]["impots_locaux"]) or 0, m(f["charges"]["charges_personnel"]) or 0
+    depenses_equipement = m(i["emplois"]["depenses_equipement"]) or 0
+    encours, remboursement = m(e["encours_total"]) or 0, m(i["emplois"]["remboursement_emprunts"]) or 0
+    population = data["metadata"]["population"]
+
+    def ou_none(fonction, *args):
+        # Les fonctions scalaires échouent sur un numérateur None : ratio absent
+        try:
+            return fonction(*args)
+        except TypeError:
+            return None
+
+    return {
+        'ratio_dependance_dotations_pct': ou_none(sup.calculer_ratio_dependance_dotations, m(f["produits"]["dgf"]), produits_caf),
+        'ratio_pression_fiscale_eur_hab': sup.calculer_ratio_pression_fiscale(impots, population),
+        'ratio_productivite_personnel_eur_hab': sup.calculer_ratio_productivite_personnel(personnel, population),
+        'ratio_charges_gestion_pct': sup.calculer_ratio_charges_gestion(m(f["charges"]["achats_charges_externes"]) or 0, produits_caf),
+        'taux_subventionnement_investissement_pct': ou_none(
+            sup.calculer_taux_subventionnement_investissement, m(i["ressources"]["subventions_recues"]), depenses_equipement),
+        'ratio_investissement_par_habitant_eur_hab': sup.calculer_ratio_investissement_par_habitant(depenses_equipement, population),
+        'ratio_financement_externe_investissement_pct': sup.calculer_ratio_financement_externe_investissement(
+            m(i["ressources"]["emprunts"]), m(i["ressources"]["subventions_recues"]), depenses_equipement),
+        'taux_interet_moyen_dette_pct': sup.calculer_taux_interet_moyen_dette(m(f["charges"]["charges_financieres"]) or 0, encours),
+        'ratio_annuite_dette_pct': ou_none(sup.calculer_ratio_annuite_dette, m(e["annuite"]), produits_caf),
+        'duree_moyenne_vie_dette_annees': sup.calculer_duree_moyenne_vie_dette(encours, remboursement),
+        'ratio_liquidite_pct': None,
+        'ratio_fonds_roulement_pct': ou_none(sup.calculer_ratio_fonds_roulement, m(e["fonds_roulement"]), charges_caf),
+        'marge_autofinancement_brute_pct': sup.calculer_marge_autofinancement_brute(
+            m(data["autofinancement"]["caf_brute"]) or 0, produits_caf),
+        'ratio_resultat_fonctionnement_pct': ou_none(sup.calculer_ratio_resultat_fonctionnement, m(f["resultat"]), produits_caf),
+        'ratio_reversement_intercommunalite_pct': None,
+        'ratio_integration_fiscale_pct': None,
+    }
+
+
+def verifier_ratio(obtenu, attendu, contexte):
+    if attendu is None:
+        assert obtenu is None, contexte
+    else:
+        # Arrondi NumPy contre round() : au plus une unité du dernier chiffre
+        decimales = 2 if contexte[1] == 'taux_interet_moyen_dette_pct' else (0 if contexte[1].endswith('_eur_hab') else 1)
+        assert obtenu is not None and math.isclose(obtenu, attendu, abs_tol=10 ** -decimales + 1e-9), (contexte, obtenu, attendu)
+
+
+def test_ratios_identiques_au_calcul_scalaire():
+    rng = random.Random(4)
+    bilans = {(str(210000000 + c), annee): bilan_synthetique(rng) for c in range(300) for annee in range(2015, 2025)}
+
+    debut = time.perf_counter()
+    ratios = calculer_ratios_vectorises(agregats_depuis_bilans(bilans, supplementaires=True), supplementaires=True)
+    duree = time.perf_counter() - debut
+    resultats = ratios_en_dicts(ratios)
+
+    exacts = total = 0
+    for cle, data in bilans.items():
+        attendus = dict(calculer_tous_les_ratios(data), **ratios_supplementaires_reference(data))
+        assert set(resultats[cle]) == set(attendus)
+        for nom, attendu in attendus.items():
+            verifier_ratio(resultats[cle][nom], attendu, (cle, nom))
+            exacts += resultats[cle][nom] == attendu
+            total += 1
+    assert exacts / total > 0.999
+    print(f"[OK] {len(bilans)} bilans x {ratios.shape[1]} ratios en {duree:.2f}s, "
+          f"{exacts}/{total} valeurs identiques au calcul scalaire")
+
+
+def test_tableaux_numpy():
+    agregats = {
+        'produits_caf_k': [1000, 0, None],
+        'caf_brute_k': [150, 10, 20],
+        'encours_dette_k': [900, 50, 60],
+    }
+    ratios = calculer_ratios_vectorises(agregats)
+    assert list(ratios['taux_epargne_brute_pct'].isna()) == [False, True, True]
+    assert ratios['taux_epargne_brute_pct'][0] == 15.0
+    assert list(ratios['capacite_desendettement_annees']) == [6.0, 5.0, 3.0]
+    # Agrégats non fournis : ratios absents
+    assert ratios['part_charges_personnel_pct'].isna().all()
+    print("[OK] Panel en tableaux NumPy, dénominateurs nuls ou absents")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU MOTEUR DE RATIOS VECTORISÉ")
+    print("=" * 60)
+    test_ratios_identiques_au_calcul_scalaire()
+    test_tableaux_numpy()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,174 @@
+"""
+Tests du registre de ratios (registre_ratios.py)
+Le moteur doit rendre les ratios de calculer_tous_les_ratios, ne calculer que ce qui est demandé,
+et après rechargement ne recalculer que les ratios dépendant d'un agrégat modifié.
+"""
+
+import copy
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from enrichir_json_avec_ratios import enrichir_fichier_json
+from ratios_financiers import calculer_tous_les_ratios, calculer_tous_ratios_multi_annees
+from registre_ratios import REGISTRE_RATIOS, MoteurRatios, RegistreRatios, obtenir_moteur_par_defaut
+from test_ratios_vectorises import bilan_synthetique
+
+
+def test_ratios_identiques():
+    rng = random.Random(5)
+    moteur = MoteurRatios()
+    for i in range(500):
+        data = bilan_synthetique(rng)
+        moteur.charger_bilan(str(210000000 + i), 2023, data)
+        assert moteur.ratios(str(210000000 + i), 2023) == calculer_tous_les_ratios(data)
+    print("[OK] Ratios du registre identiques à calculer_tous_les_ratios sur 500 bilans")
+
+
+def test_evaluation_paresseuse_et_invalidation():
+    data = bilan_synthetique(random.Random(6))
+    data["autofinancement"]["caf_brute"] = {"montant_k": 400}
+    data["endettement"]["encours_total"] = {"montant_k": 2000}
+    moteur = MoteurRatios()
+    moteur.charger_bilan("210000001", 2023, data)
+
+    # Seul le ratio demandé est calculé
+    assert moteur.valeur("210000001", 2023, "capacite_desendettement_annees") == 5.0
+    assert moteur.nb_evaluations == 1
+    # Dépendance : l'ancien nom réutilise le taux de couverture déjà calculé
+    moteur.valeur("210000001", 2023, "taux_couverture_depenses_equipement_pct")
+    moteur.valeur("210000001", 2023, "taux_couverture_investissement_pct")
+    assert moteur.nb_evaluations == 3
+
+    moteur.ratios("210000001", 2023)
+    nb_complet = moteur.nb_evaluations
+    moteur.ratios("210000001", 2023)
+    assert moteur.nb_evaluations == nb_complet
+
+    # Mêmes agrégats : rien n'est invalidé
+    assert moteur.charger_bilan("210000001", 2023, copy.deepcopy(data)) == set()
+
+    # CAF brute modifiée : seuls les ratios qui l'utilisent sont recalculés
+    data["autofinancement"]["caf_brute"] = {"montant_k": 500}
+    invalides = moteur.charger_bilan("210000001", 2023, data)
+    assert invalides == {"taux_epargne_brute_pct", "capacite_desendettement_annees", "coefficient_mobilisation_caf_pct"}
+    assert moteur.ratios("210000001", 2023) == calculer_tous_les_ratios(data)
+    assert moteur.nb_evaluations == nb_complet + len(invalides)
+    print(f"[OK] Évaluation à la demande, {len(invalides)} ratios recalculés après modification de la CAF brute")
+
+
+def test_multi_annees_avec_moteur():
+    rng = random.Random(7)
+    data_multi = {
+        "metadata": {"commune": "COMMUNE TEST"},
+        "bilans_annuels": {str(annee): bilan_synthetique(rng) for annee in range(2014, 2025)},
+    }
+    moteur = MoteurRatios()
+    assert (calculer_tous_ratios_multi_annees(data_multi, moteur, "commune_test.json")
+            == calculer_tous_ratios_multi_annees(data_multi))
+
+    # Nouvelle année : seuls ses ratios sont calculés
+    nb_avant = moteur.nb_evaluations
+    data_multi["bilans_annuels"]["2025"] = bilan_synthetique(rng)
+    attendu = calculer_tous_ratios_multi_annees(data_multi)
+    assert calculer_tous_ratios_multi_annees(data_multi, moteur, "commune_test.json") == attendu
+    assert moteur.nb_evaluations - nb_avant <= len(REGISTRE_RATIOS.ratios)
+    print(f"[OK] Multi-années : ajout d'un exercice = {moteur.nb_evaluations - nb_avant} évaluations")
+
+
+def test_communes_sans_nom_distinctes():
+    rng = random.Random(8)
+    # Deux communes sans nom dans les métadonnées : identifiées par leur fichier, pas par le nom
+    communes = {
+        chemin: {"metadata": {"commune": None},
+                 "bilans_annuels": {str(annee): bilan_synthetique(rng) for annee in range(2020, 2024)}}
+        for chemin in ("a/donnees_multi_annees.json", "b/donnees_multi_annees.json")
+    }
+    moteur = MoteurRatios()
+    for passage in range(2):
+        nb_avant = moteur.nb_evaluations
+        for chemin, data_multi in communes.items():
+            assert (calculer_tous_ratios_multi_annees(data_multi, moteur, chemin)
+                    == calculer_tous_ratios_multi_annees(data_multi))
+        # 2e passage : chaque commune retrouve ses propres ratios mémorisés
+        assert passage == 0 or moteur.nb_evaluations == nb_avant
+
+    try:
+        calculer_tous_ratios_multi_annees(communes["a/donnees_multi_annees.json"], moteur)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("moteur partagé utilisé sans identifiant de commune")
+    print("[OK] Communes sans nom distinctes dans le moteur, identifiant requis")
+
+
+def test_enrichissement_par_moteur_partage():
+    rng = random.Random(9)
+    moteur = obtenir_moteur_par_defaut()
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, 'donnees_multi_annees.json')
+        data_multi = {
+            "metadata": {"commune": None, "periode_debut": 2016, "periode_fin": 2023},
+            "tendances_globales": {},
+            "bilans_annuels": {str(annee): bilan_synthetique(rng) for annee in range(2016, 2024)},
+        }
+        with open(chemin, 'w', encoding='utf-8') as f:
+            json.dump(data_multi, f)
+        nb_avant = moteur.nb_evaluations
+        assert enrichir_fichier_json(chemin)
+        nb_complet = moteur.nb_evaluations - nb_avant
+        assert nb_complet > 0
+
+        # Ratios d'une année relus du fichier effacés : recalculés sans évaluation
+        with open(chemin, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        del data['ratios_financiers']['ratios_par_annee']['2018']
+        with open(chemin, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        nb_avant = moteur.nb_evaluations
+        assert enrichir_fichier_json(chemin)
+        assert moteur.nb_evaluations == nb_avant
+
+        # CAF brute modifiée : seuls les ratios qui l'utilisent sont réévalués
+        data['bilans_annuels']['2018']['autofinancement']['caf_brute'] = {"montant_k": 4321}
+        with open(chemin, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        nb_avant = moteur.nb_evaluations
+        assert enrichir_fichier_json(chemin)
+        assert 0 < moteur.nb_evaluations - nb_avant < nb_complet / len(data['bilans_annuels'])
+
+        with open(chemin, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        attendu = calculer_tous_ratios_multi_annees(data)
+        assert data['ratios_financiers']['ratios_par_annee'] == attendu['ratios_par_annee']
+    print(f"[OK] Enrichissement par le moteur partagé : {nb_complet} évaluations puis seuls les ratios modifiés")
+
+
+def test_dependance_inconnue():
+    registre = RegistreRatios()
+    try:
+        registre.declarer("ratio_b", lambda a: a, dependances=("ratio_a",))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("dépendance non déclarée acceptée")
+    print("[OK] Dépendance non déclarée refusée")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU REGISTRE DE RATIOS")
+    print("=" * 60)
+    test_ratios_identiques()
+    test_evaluation_paresseuse_et_invalidation()
+    test_multi_annees_avec_moteur()
+    test_communes_sans_nom_distinctes()
+    test_enrichissement_par_moteur_partage()
+    test_dependance_inconnue()
+    print()
+    print("Tous les tests sont passés")
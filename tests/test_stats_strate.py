@@ -0,0 +1,145 @@
+"""
+Tests des statistiques de strate alimentées au fil de l'eau (api_M57/stats_strate.py)
+Les communes arrivent dans un ordre quelconque (pool de workers) : les statistiques
+doivent être celles du calcul d'origine, commune par commune dans l'ordre de la strate.
+"""
+
+import bisect
+import math
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api_M57'))
+
+from stats_strate import QUANTILES, AccumulateurStrate, SketchQuantiles, SuiviProgression
+
+
+def statistiques_reference(comptes_par_commune):
+    """Calcul d'origine de calculer_moyennes_strate (toutes les communes en mémoire)"""
+    tous_comptes = set()
+    for data in comptes_par_commune:
+        tous_comptes.update(data['flux_nets'].keys())
+
+    stats_comptes = {}
+    for compte in tous_comptes:
+        valeurs = []
+        valeurs_par_hab = []
+        for data in comptes_par_commune:
+            flux = data['flux_nets'].get(compte, 0)
+            pop = data['population']
+            if flux != 0:
+                valeurs.append(flux)
+                if pop and pop > 0:
+                    valeurs_par_hab.append(flux / pop)
+        if valeurs:
+            stats_comptes[compte] = {
+                "moyenne": sum(valeurs) / len(valeurs),
+                "mediane": sorted(valeurs)[len(valeurs) // 2] if valeurs else 0,
+                "nb_communes": len(valeurs),
+                "moyenne_par_hab": sum(valeurs_par_hab) / len(valeurs_par_hab) if valeurs_par_hab else 0
+            }
+    return stats_comptes
+
+
+def strate_synthetique(nb_communes=300, graine=3):
+    rng = random.Random(graine)
+    comptes = [str(c) for c in (6061, 6411, 6413, 6451, 73111, 7411, 2313, 1641, 775, 675)]
+    communes = []
+    for _ in range(nb_communes):
+        flux = {c: round(rng.uniform(-5e5, 5e5), 2) * rng.randint(0, 1) for c in rng.sample(comptes, 7)}
+        communes.append({"population": rng.choice([None, 0, rng.randint(200, 5000)]), "flux_nets": flux})
+    return communes
+
+
+def test_statistiques_independantes_de_l_ordre():
+    communes = strate_synthetique()
+    reference = statistiques_reference(communes)
+
+    for graine in range(5):
+        ordre = communes[:]
+        random.Random(graine).shuffle(ordre)
+        accumulateur = AccumulateurStrate()
+        for commune in ordre:
+            accumulateur.ajouter(commune['population'], commune['flux_nets'])
+        stats = accumulateur.statistiques()
+
+        assert sorted(stats) == sorted(reference)
+        for compte, attendu in reference.items():
+            assert stats[compte]['nb_communes'] == attendu['nb_communes']
+            assert stats[compte]['mediane'] == attendu['mediane']
+            for cle in ('moyenne', 'moyenne_par_hab'):
+                assert abs(stats[compte][cle] - attendu[cle]) <= 1e-9 * max(1, abs(attendu[cle])), (compte, cle)
+    print(f"[OK] Statistiques identiques au calcul d'origine pour 5 ordres d'arrivée ({len(reference)} comptes)")
+
+
+def test_fusion_morceaux():
+    """Strate traitée en 4 morceaux fusionnés : mêmes statistiques que d'un seul tenant"""
+    communes = strate_synthetique()
+    complet = AccumulateurStrate()
+    morceaux = [AccumulateurStrate() for _ in range(4)]
+    for i, commune in enumerate(communes):
+        complet.ajouter(commune['population'], commune['flux_nets'])
+        morceaux[i % 4].ajouter(commune['population'], commune['flux_nets'])
+    fusion = morceaux[0]
+    for morceau in morceaux[1:]:
+        fusion.fusionner(morceau)
+
+    attendu = complet.statistiques()
+    stats = fusion.statistiques()
+    assert fusion.nb_communes == complet.nb_communes
+    for compte, a in attendu.items():
+        valeurs = [c['flux_nets'][compte] for c in communes if c['flux_nets'].get(compte)]
+        for cle in ('moyenne', 'mediane', 'nb_communes', 'moyenne_par_hab') + tuple(f"p{p}" for p in QUANTILES):
+            assert stats[compte][cle] == a[cle], (compte, cle)
+        # Quantiles exacts en dessous de K_SKETCH valeurs
+        for p in QUANTILES:
+            assert a[f"p{p}"] == sorted(valeurs)[int(p / 100 * len(valeurs))]
+        assert math.isclose(stats[compte]['ecart_type'], statistics.stdev(valeurs), rel_tol=1e-9)
+    print(f"[OK] Fusion de 4 morceaux identique au calcul d'un seul tenant ({len(attendu)} comptes)")
+
+
+def test_sketch_grande_strate():
+    """200 000 valeurs : mémoire bornée, erreur de rang des quantiles < 1 %"""
+    rng = random.Random(1)
+    valeurs = [rng.lognormvariate(10, 2) * rng.choice((-1, 1)) for _ in range(200000)]
+    morceaux = [SketchQuantiles() for _ in range(8)]
+    for i, x in enumerate(valeurs):
+        morceaux[i % 8].ajouter(x)
+    sketch = morceaux[0]
+    for morceau in morceaux[1:]:
+        sketch.fusionner(morceau)
+
+    triees = sorted(valeurs)
+    taille = sum(len(niveau) for niveau in sketch.niveaux)
+    assert sketch.n == len(valeurs)
+    assert taille < 4 * sketch.k, taille
+    for p in QUANTILES:
+        rang = bisect.bisect_left(triees, sketch.quantile(p / 100)) / len(triees)
+        assert abs(rang - p / 100) < 0.01, (p, rang)
+    print(f"[OK] Sketch de {taille} valeurs pour {len(valeurs)} flux, quantiles à moins de 1 % en rang")
+
+
+def test_suivi_progression():
+    suivi = SuiviProgression(4, intervalle=3600)
+    suivi.succes()
+    suivi.vide()
+    suivi.echec({"siren": "200000001", "nom": "COMMUNE A"}, "HTTP 500")
+    suivi.succes()
+    assert (suivi.traitees, suivi.reussies, len(suivi.echecs)) == (4, 2, 1)
+    assert suivi.echecs[0]["siren"] == "200000001"
+    suivi.resume()
+    print("[OK] Suivi de progression et des échecs")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DES STATISTIQUES DE STRATE")
+    print("=" * 60)
+    test_statistiques_independantes_de_l_ordre()
+    test_fusion_morceaux()
+    test_sketch_grande_strate()
+    test_suivi_progression()
+    print()
+    print("Tous les tests sont passés")
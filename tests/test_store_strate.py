@@ -0,0 +1,209 @@
+"""
+Tests du store des statistiques de strate (api_M57/store_strate.py) et de son rafraîchissement
+incrémental (comparer_avec_strate.rafraichir_strate).
+Un serveur HTTP local sert les balances commune par commune et les signatures group_by siren :
+un second rafraîchissement ne doit télécharger que les communes modifiées ou manquantes.
+"""
+
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api_M57'))
+
+from comparer_avec_strate import rafraichir_strate
+from stats_strate import AccumulateurStrate
+from store_strate import StoreStrate
+from parsers.client_http import ClientHTTP
+
+
+_REGEX_AGREGAT = re.compile(r'(sum|count)\((\w+|\*)\)\s+as\s+(\w+)')
+
+
+class ServeurBalances:
+    """Endpoint records : balance d'une commune (where siren=X) ou signatures (group_by siren)"""
+
+    def __init__(self, records):
+        self.records = records
+        self.balances_demandees = []
+        # Balances de ces communes en erreur 500
+        self.sirens_en_erreur = set()
+        serveur = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                reponse = serveur.repondre(parse_qs(urlparse(self.path).query))
+                if reponse is None:
+                    self.send_response(500)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                donnees = json.dumps(reponse).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(donnees)))
+                self.end_headers()
+                self.wfile.write(donnees)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/records"
+
+    def repondre(self, params):
+        where = params['where'][0]
+        records = [r for r in self.records if r['cbudg'] == '1']
+        limit = int(params['limit'][0])
+        offset = int(params['offset'][0])
+
+        if 'group_by' not in params:
+            siren = re.search(r'siren=(\d+)', where).group(1)
+            if offset == 0:
+                self.balances_demandees.append(siren)
+            if siren in self.sirens_en_erreur:
+                return None
+            lignes = [r for r in records if r['siren'] == siren]
+            return {'total_count': len(lignes), 'results': lignes[offset:offset + limit]}
+
+        sirens = set(re.findall(r'siren="(\d+)"', where))
+        groupes = defaultdict(list)
+        for r in records:
+            if r['siren'] in sirens:
+                groupes[r['siren']].append(r)
+        resultats = []
+        for siren in sorted(groupes):
+            ligne = {'siren': siren}
+            for fonction, champ, alias in _REGEX_AGREGAT.findall(params['select'][0]):
+                ligne[alias] = len(groupes[siren]) if fonction == 'count' else sum(r[champ] for r in groupes[siren])
+            resultats.append(ligne)
+        return {'results': resultats[offset:offset + limit]}
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def strate_synthetique(nb_communes=40, graine=5):
+    """Balances synthétiques (budget principal et annexe) ; les 3 dernières communes n'ont pas de balance"""
+    rng = random.Random(graine)
+    comptes = [str(6000 + i) for i in range(80)]
+    communes = []
+    records = []
+    for c in range(nb_communes):
+        siren = str(210000000 + c)
+        communes.append({"siren": siren, "nom": f"COMMUNE {c}", "population": rng.randint(1000, 2000)})
+        if c >= nb_communes - 3:
+            continue
+        for cbudg in ('1', '2'):
+            for compte in rng.sample(comptes, 30):
+                records.append({
+                    'siren': siren, 'cbudg': cbudg, 'compte': compte,
+                    'obnetcre': round(rng.uniform(0, 1e5), 2), 'obnetdeb': round(rng.uniform(0, 1e5), 2),
+                    'sd': 0, 'sc': 0,
+                })
+    return communes, records
+
+
+def statistiques_reference(communes, records):
+    accumulateur = AccumulateurStrate()
+    for commune in communes:
+        flux_nets = defaultdict(float)
+        for r in records:
+            if r['siren'] == commune['siren'] and r['cbudg'] == '1':
+                flux_nets[r['compte']] += r['obnetcre'] - r['obnetdeb']
+        if flux_nets:
+            accumulateur.ajouter(commune['population'], flux_nets)
+    return accumulateur.statistiques()
+
+
+def verifier_statistiques(stats, reference):
+    """Mêmes comptes et effectifs ; valeurs égales à l'arrondi flottant près (ordre de sommation)"""
+    assert sorted(stats) == sorted(reference)
+    for compte, attendu in reference.items():
+        for cle, valeur in attendu.items():
+            if isinstance(valeur, float):
+                assert math.isclose(stats[compte][cle], valeur, rel_tol=1e-9, abs_tol=1e-9), (compte, cle)
+            else:
+                assert stats[compte][cle] == valeur, (compte, cle)
+
+
+def test_rafraichissement_incremental():
+    communes, records = strate_synthetique()
+    client = ClientHTTP(cache=None)
+
+    with tempfile.TemporaryDirectory() as dossier, ServeurBalances(records) as serveur:
+        store = StoreStrate(os.path.join(dossier, 'strates.sqlite'))
+        assert store.lire_statistiques(2024, '5') is None
+
+        # Premier rafraîchissement : toutes les communes avec balance sont téléchargées
+        stats = rafraichir_strate(store, communes, 2024, '5', workers=4, url=serveur.url, client=client)
+        verifier_statistiques(stats, statistiques_reference(communes, records))
+        assert len(serveur.balances_demandees) == len(communes) - 3
+
+        # Rien n'a changé : aucune balance téléchargée
+        serveur.balances_demandees.clear()
+        assert rafraichir_strate(store, communes, 2024, '5', url=serveur.url, client=client) == stats
+        assert serveur.balances_demandees == []
+
+        # Une balance modifiée, une commune ajoutée à la strate
+        modifiee = communes[7]['siren']
+        for r in records:
+            if r['siren'] == modifiee and r['cbudg'] == '1':
+                r['obnetcre'] += 1000
+                break
+        nouvelle = {"siren": "219999999", "nom": "NOUVELLE", "population": 1500}
+        records.append({'siren': nouvelle['siren'], 'cbudg': '1', 'compte': '6001',
+                        'obnetcre': 500.0, 'obnetdeb': 0, 'sd': 0, 'sc': 0})
+        communes.append(nouvelle)
+
+        stats = rafraichir_strate(store, communes, 2024, '5', url=serveur.url, client=client)
+        assert sorted(serveur.balances_demandees) == sorted([modifiee, nouvelle['siren']])
+        verifier_statistiques(stats, statistiques_reference(communes, records))
+
+        infos = store.infos_strate(2024, '5')
+        assert infos['nb_communes_strate'] == len(communes)
+        assert infos['nb_communes'] == len(communes) - 3
+    print("[OK] Rafraîchissement : seules les communes modifiées ou manquantes sont téléchargées")
+
+
+def test_lecture_store():
+    communes, records = strate_synthetique(nb_communes=60)
+
+    with tempfile.TemporaryDirectory() as dossier, ServeurBalances(records) as serveur:
+        chemin = os.path.join(dossier, 'strates.sqlite')
+        stats = rafraichir_strate(StoreStrate(chemin), communes, 2024, '5', url=serveur.url,
+                                  client=ClientHTTP(cache=None))
+
+        # Nouvelle exécution du script : lecture seule, sans réseau
+        debut = time.perf_counter()
+        relues = StoreStrate(chemin).lire_statistiques(2024, '5')
+        duree = time.perf_counter() - debut
+
+        assert relues == stats
+        assert StoreStrate(chemin).lire_statistiques(2024, '6') is None
+        assert StoreStrate(chemin).lire_statistiques(2023, '5') is None
+    print(f"[OK] {len(relues)} comptes relus depuis le store en {duree * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DU STORE DES STATISTIQUES DE STRATE")
+    print("=" * 60)
+    test_rafraichissement_incremental()
+    test_lecture_store()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,220 @@
+"""
+Tests de l'agrégation des moyennes de strate côté serveur (api_M57/strate_serveur.py)
+Un serveur HTTP local implémente le sous-ensemble ODSQL utilisé : select avec sum/avg/count,
+where (cbudg, mouvement, liste de siren), group_by sur un ou plusieurs champs, limit/offset.
+Les moyennes obtenues doivent être celles du calcul commune par commune.
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api_M57'))
+
+import client_ods
+import strate_serveur
+from stats_strate import AccumulateurStrate
+from comparer_avec_strate import calculer_flux_nets_par_compte
+from strate_serveur import TAILLE_LOT_COMPTES, calculer_moyennes_strate_serveur
+from parsers.client_http import ClientHTTP
+
+
+_REGEX_AGREGAT = re.compile(r'(sum|avg|count)\((\w+|\*)\)\s+as\s+(\w+)')
+
+
+class ServeurGroupBy:
+    """Endpoint records avec group_by sur des balances synthétiques"""
+
+    def __init__(self, records):
+        self.records = records
+        self.nb_requetes = 0
+        serveur = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                serveur.nb_requetes += 1
+                donnees = json.dumps(serveur.repondre(parse_qs(urlparse(self.path).query))).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(donnees)))
+                self.end_headers()
+                self.wfile.write(donnees)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/records"
+
+    def repondre(self, params):
+        where = params.get('where', [''])[0]
+        records = self.records
+        if "cbudg='1'" in where:
+            records = [r for r in records if r['cbudg'] == '1']
+        if "obnetcre != 0 OR obnetdeb != 0" in where:
+            records = [r for r in records if r['obnetcre'] != 0 or r['obnetdeb'] != 0]
+        sirens = set(re.findall(r'siren="(\d+)"', where))
+        if sirens:
+            records = [r for r in records if r['siren'] in sirens]
+
+        champs = [champ.strip() for champ in params['group_by'][0].split(',')]
+        groupes = defaultdict(list)
+        for r in records:
+            groupes[tuple(r[champ] for champ in champs)].append(r)
+
+        resultats = []
+        for cle in sorted(groupes):
+            lignes = groupes[cle]
+            ligne = dict(zip(champs, cle))
+            for fonction, champ, alias in _REGEX_AGREGAT.findall(params['select'][0]):
+                if fonction == 'count':
+                    ligne[alias] = len(lignes)
+                elif fonction == 'sum':
+                    ligne[alias] = sum(r[champ] for r in lignes)
+                else:
+                    ligne[alias] = sum(r[champ] for r in lignes) / len(lignes)
+            resultats.append(ligne)
+
+        # Comme OpenDataSoft : pas de total_count pour une requête group_by
+        limit = int(params['limit'][0])
+        offset = int(params['offset'][0])
+        return {'results': resultats[offset:offset + limit]}
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def strate_synthetique(nb_communes=250, graine=11, population=None):
+    """Balances synthétiques : une ligne par compte et par budget, 10 % de comptes sans mouvement"""
+    rng = random.Random(graine)
+    comptes = [str(6000 + i) for i in range(150)]
+    communes = []
+    records = []
+    for c in range(nb_communes):
+        siren = str(210000000 + c)
+        communes.append({"siren": siren, "nom": f"COMMUNE {c}", "population": population or rng.randint(1000, 2000)})
+        for cbudg in ('1', '2'):
+            for compte in rng.sample(comptes, 60):
+                mouvement = rng.random() > 0.1
+                records.append({
+                    'siren': siren, 'cbudg': cbudg, 'compte': compte,
+                    'obnetcre': round(rng.uniform(0, 1e5), 2) if mouvement else 0,
+                    'obnetdeb': round(rng.uniform(0, 1e5), 2) if mouvement else 0,
+                })
+    return communes, records
+
+
+def statistiques_reference(communes, records):
+    """Calcul commune par commune (calculer_moyennes_strate)"""
+    accumulateur = AccumulateurStrate()
+    for commune in communes:
+        balance = [r for r in records if r['siren'] == commune['siren'] and r['cbudg'] == '1']
+        accumulateur.ajouter(commune['population'], calculer_flux_nets_par_compte(balance))
+    return accumulateur.statistiques()
+
+
+def verifier_identiques(stats, reference):
+    assert sorted(stats) == sorted(reference)
+    for compte, attendu in reference.items():
+        assert stats[compte]['nb_communes'] == attendu['nb_communes'], compte
+        assert abs(stats[compte]['moyenne'] - attendu['moyenne']) < 1e-6, compte
+        assert stats[compte]['mediane'] is None
+
+
+def test_moyennes_identiques():
+    communes, records = strate_synthetique()
+    reference = statistiques_reference(communes, records)
+
+    with ServeurGroupBy(records) as serveur:
+        stats = calculer_moyennes_strate_serveur(communes, 2024, url=serveur.url, client=ClientHTTP(cache=None))
+
+    verifier_identiques(stats, reference)
+
+    # 250 communes -> 17 lots de (siren, compte) avec mouvement, lus page par page
+    nb_lots = -(-len(communes) // TAILLE_LOT_COMPTES)
+    assert nb_lots <= serveur.nb_requetes < len(communes), serveur.nb_requetes
+    print(f"[OK] Moyennes de {len(stats)} comptes identiques au calcul commune par commune "
+          f"en {serveur.nb_requetes} requêtes (au lieu d'au moins {len(communes)})")
+
+
+def test_lignes_negatives_et_compensees():
+    """Corrections négatives, plusieurs lignes par compte, lignes qui s'annulent"""
+    rng = random.Random(12)
+    comptes = [str(7000 + i) for i in range(20)]
+    communes = []
+    records = []
+    for c in range(40):
+        siren = str(220000000 + c)
+        communes.append({"siren": siren, "nom": f"COMMUNE {c}", "population": rng.randint(1000, 2000)})
+        for compte in rng.sample(comptes, 12):
+            montant = float(rng.randint(1, 50000))
+            cas = rng.choice(['negatif', 'plusieurs', 'compense', 'annulation'])
+            if cas == 'negatif':
+                lignes = [(-montant, 0.0)] if rng.random() < 0.5 else [(0.0, -montant)]
+            elif cas == 'plusieurs':
+                lignes = [(montant, 0.0), (0.0, montant / 4), (montant / 2, 0.0)]
+            elif cas == 'compense':
+                # Mandat puis annulation : flux net nul, la commune ne compte pas pour ce compte
+                lignes = [(0.0, montant), (montant, 0.0)]
+            else:
+                lignes = [(montant, 0.0), (-montant, 0.0)]
+            records.extend({'siren': siren, 'cbudg': '1', 'compte': compte, 'obnetcre': credit, 'obnetdeb': debit}
+                           for credit, debit in lignes)
+    reference = statistiques_reference(communes, records)
+
+    with ServeurGroupBy(records) as serveur:
+        stats = calculer_moyennes_strate_serveur(communes, 2024, url=serveur.url, client=ClientHTTP(cache=None))
+
+    verifier_identiques(stats, reference)
+    print(f"[OK] Lignes négatives et compensées : {len(stats)} comptes identiques au calcul commune par commune")
+
+
+def test_lot_tronque_redecoupe():
+    """Lot dont le résultat dépasse la limite d'offset de l'API records : coupé en deux"""
+    communes, records = strate_synthetique(nb_communes=30)
+    reference = statistiques_reference(communes, records)
+    limites = client_ods.OFFSET_MAX, strate_serveur.OFFSET_MAX
+    client_ods.OFFSET_MAX = strate_serveur.OFFSET_MAX = 500
+    try:
+        with ServeurGroupBy(records) as serveur:
+            stats = calculer_moyennes_strate_serveur(communes, 2024, url=serveur.url, client=ClientHTTP(cache=None))
+    finally:
+        client_ods.OFFSET_MAX, strate_serveur.OFFSET_MAX = limites
+    verifier_identiques(stats, reference)
+    print("[OK] Lots tronqués par la limite d'offset redécoupés, moyennes identiques")
+
+
+def test_moyenne_par_habitant():
+    """Moyenne par habitant approchée : exacte quand les communes ont la même population"""
+    communes, records = strate_synthetique(population=1500)
+    reference = statistiques_reference(communes, records)
+
+    with ServeurGroupBy(records) as serveur:
+        stats = calculer_moyennes_strate_serveur(communes, 2024, url=serveur.url, client=ClientHTTP(cache=None))
+
+    for compte, attendu in reference.items():
+        assert abs(stats[compte]['moyenne_par_hab'] - attendu['moyenne_par_hab']) < 1e-9, compte
+    print("[OK] Moyenne par habitant exacte pour une strate de population homogène")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DE L'AGRÉGATION CÔTÉ SERVEUR")
+    print("=" * 60)
+    test_moyennes_identiques()
+    test_lignes_negatives_et_compensees()
+    test_lot_tronque_redecoupe()
+    test_moyenne_par_habitant()
+    print()
+    print("Tous les tests sont passés")
@@ -0,0 +1,175 @@
+"""
+Tests des tendances et anomalies vectorisées (src/analysis/tendances_vectorisees.py)
+Chaque indicateur doit être celui d'un calcul série par série, les ruptures et anomalies
+construites doivent être retrouvées, et un département entier doit tenir en une passe.
+"""
+
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from scipy import stats
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis.analyseur_multi_annees import POSTES_CLES
+from analysis.tendances_vectorisees import SEUIL_RUPTURE, AnalyseTendances
+from test_panel_bilans import bilans_multi_annees
+
+
+def proche(a, b):
+    if a is None or (isinstance(a, float) and math.isnan(a)):
+        return b is None or math.isnan(b)
+    return b is not None and not math.isnan(b) and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def reference_serie(annees, serie, fenetre=3):
+    """Indicateurs d'une série calculés année par année (None si non défini)"""
+    presents = [(a, v) for a, v in zip(annees, serie) if not math.isnan(v)]
+    pente = tcam = None
+    if len(presents) >= 2:
+        pente = float(np.polyfit([a for a, _ in presents], [v for _, v in presents], 1)[0])
+        (a0, v0), (a1, v1) = presents[0], presents[-1]
+        if v0 > 0 and v1 > 0:
+            tcam = ((v1 / v0) ** (1 / (a1 - a0)) - 1) * 100
+
+    evolutions = [(serie[i] - serie[i-1]) / abs(serie[i-1]) * 100 if serie[i-1] != 0 else math.nan
+                  for i in range(1, len(serie))]
+    volatilites = [None] * len(serie)
+    for j in range(fenetre - 1, len(evolutions)):
+        fenetre_evo = [e for e in evolutions[j - fenetre + 1:j + 1] if not math.isnan(e)]
+        if len(fenetre_evo) >= 2:
+            volatilites[j + 1] = float(np.std(fenetre_evo, ddof=1))
+
+    # Anomalies : log(N / N-1) si la série est strictement positive, N - (N-1) sinon ;
+    # t de Student hors année testée converti en z-score de même probabilité
+    if all(v > 0 for v in serie if not math.isnan(v)):
+        croissances = [math.log(serie[i] / serie[i-1]) for i in range(1, len(serie))]
+    else:
+        croissances = [serie[i] - serie[i-1] for i in range(1, len(serie))]
+    zscores = [None] * len(croissances)
+    for j, e in enumerate(croissances):
+        autres = [x for k, x in enumerate(croissances) if k != j and not math.isnan(x)]
+        if not math.isnan(e) and len(autres) >= 6:
+            ecart_type = float(np.std(autres, ddof=1)) * math.sqrt(1 + 1 / len(autres))
+            t = (e - np.mean(autres)) / ecart_type if ecart_type > 0 else 0.0
+            zscores[j] = math.copysign(stats.norm.isf(stats.t.sf(abs(t), len(autres) - 1)), t)
+
+    presentes = [e for e in evolutions if not math.isnan(e)]
+    meilleure = None
+    if len(presentes) > 1 and float(np.var(presentes)) > 1e-9:
+        sct = float(np.sum((np.array(presentes) - np.mean(presentes)) ** 2))
+        for k in range(1, len(evolutions)):
+            seg1 = [e for e in evolutions[:k] if not math.isnan(e)]
+            seg2 = [e for e in evolutions[k:] if not math.isnan(e)]
+            if len(seg1) < 2 or len(seg2) < 2:
+                continue
+            scr = sum(float(np.sum((np.array(s) - np.mean(s)) ** 2)) for s in (seg1, seg2))
+            stat = (sct - scr) / (scr / (len(presentes) - 2)) if scr > 0 else math.inf
+            if meilleure is None or stat > meilleure:
+                meilleure = stat
+    return pente, tcam, volatilites, zscores, meilleure
+
+
+def test_indicateurs_identiques_au_calcul_par_serie():
+    rng = np.random.default_rng(31)
+    annees = list(range(2010, 2022))
+    valeurs = rng.normal(1000, 300, (40, len(annees), 4)).round(0)
+    valeurs[rng.random(valeurs.shape) < 0.1] = np.nan
+    valeurs[rng.random(valeurs.shape) < 0.03] = 0
+    valeurs[:2] = np.nan  # communes sans données
+    analyse = AnalyseTendances(valeurs, annees, ['a', 'b', 'c', 'd'])
+
+    for c in range(valeurs.shape[0]):
+        for p in range(valeurs.shape[2]):
+            pente, tcam, volatilites, zscores, stat = reference_serie(annees, valeurs[c, :, p].tolist())
+            assert proche(pente, analyse.pente[c, p]), (c, p)
+            assert proche(tcam, analyse.tcam_pct[c, p]), (c, p)
+            for attendu, obtenu in zip(volatilites, analyse.volatilite_pct[c, :, p]):
+                assert proche(attendu, obtenu) or math.isclose(attendu, obtenu, abs_tol=1e-6), (c, p)
+            for attendu, obtenu in zip(zscores, analyse.zscores[c, :, p]):
+                assert proche(attendu, obtenu) or math.isclose(attendu, obtenu, rel_tol=1e-6, abs_tol=1e-6), (c, p)
+            assert proche(stat, analyse.stat_rupture[c, p]) or math.isclose(stat, analyse.stat_rupture[c, p], rel_tol=1e-6)
+    print(f"[OK] Pente, TCAM, volatilité, z-scores et ruptures identiques sur {valeurs.shape[0] * valeurs.shape[2]} séries")
+
+
+def test_rupture_et_anomalie_construites():
+    annees = list(range(2005, 2025))
+    # Croissance de 2 %/an puis de 10 %/an à partir de 2015 ; dette stable avec un pic en 2019
+    croissance = [1000.0]
+    for annee in annees[1:]:
+        croissance.append(croissance[-1] * (1.10 if annee >= 2015 else 1.02) * (1 + 0.002 * (annee % 3)))
+    dette = [5000.0 * (1 + 0.01 * ((annee * 7) % 5)) for annee in annees]
+    dette[annees.index(2019)] *= 1.8
+
+    analyse = AnalyseTendances(np.column_stack([croissance, dette]), annees, ['Charges', 'Encours dette'],
+                               communes=['COMMUNE TEST'])
+    synthese = analyse.synthese()
+    assert synthese.loc[('COMMUNE TEST', 'Charges'), 'annee_rupture'] == 2015
+    assert synthese.loc[('COMMUNE TEST', 'Charges'), 'stat_rupture'] >= SEUIL_RUPTURE
+    assert synthese.loc[('COMMUNE TEST', 'Charges'), 'nb_anomalies'] == 0
+    assert math.isclose(synthese.loc[('COMMUNE TEST', 'Charges'), 'tcam_pct'],
+                        ((croissance[-1] / croissance[0]) ** (1 / 19) - 1) * 100)
+
+    # En croissance log, la hausse de 2019 et le retour de 2020 sont aussi atypiques l'un que l'autre
+    anomalies = analyse.liste_anomalies()
+    dette_anormale = anomalies[anomalies['poste'] == 'Encours dette']
+    assert list(dette_anormale['annee']) == [2019, 2020]
+    assert list(np.sign(dette_anormale['zscore'])) == [1, -1]
+    assert (anomalies['zscore'].abs() >= 3).all()
+    print(f"[OK] Rupture de croissance en 2015 et pic de dette 2019 détectés")
+
+
+def test_bruit_sans_anomalies():
+    # Séries sans anomalie construite : les signalements doivent rester au niveau de 3 σ (0,27 %)
+    rng = np.random.default_rng(34)
+    bruits = {
+        'normal': rng.normal(1000, 100, (200, 12, 5)),
+        'uniforme': rng.uniform(100, 2000, (200, 12, 5)),
+        'lognormal': rng.lognormal(7, 0.3, (200, 12, 5)),
+        'marche aléatoire': 1000 * np.exp(np.cumsum(rng.normal(0, 0.05, (200, 12, 5)), axis=1)),
+        'signe variable': rng.normal(50, 300, (200, 12, 5)),
+    }
+    for nom, valeurs in bruits.items():
+        analyse = AnalyseTendances(valeurs, range(2013, 2025), ['a', 'b', 'c', 'd', 'e'])
+        taux = len(analyse.liste_anomalies()) / np.isfinite(analyse.zscores).sum()
+        assert taux < 0.01, (nom, taux)
+    print(f"[OK] Bruit seul : moins de 1 % d'évolutions signalées ({len(bruits)} lois)")
+
+
+def test_criblage_departement():
+    rng = random.Random(32)
+    # Historiques de longueurs différentes : la matrice est alignée sur l'union des années
+    panels = {str(210000000 + c): bilans_multi_annees(rng, list(range(2015 + c % 3, 2024))) for c in range(60)}
+    analyse = AnalyseTendances.depuis_panels(panels)
+    assert analyse.valeurs.shape == (60, 9, len(POSTES_CLES))
+    assert analyse.synthese().shape[0] == 60 * len(POSTES_CLES)
+    assert np.isnan(analyse.valeurs[1, 0]).all() and np.isnan(analyse.valeurs[2, :2]).all()
+
+    # Département : 3 000 communes x 20 exercices x postes clés en une passe
+    valeurs = np.random.default_rng(33).lognormal(7, 1, (3000, 20, len(POSTES_CLES)))
+    debut = time.perf_counter()
+    analyse = AnalyseTendances(valeurs, range(2005, 2025), POSTES_CLES.keys())
+    synthese = analyse.synthese()
+    transversales = analyse.liste_anomalies(transversales=True)
+    duree = time.perf_counter() - debut
+    assert synthese.shape[0] == 3000 * len(POSTES_CLES)
+    print(f"[OK] {synthese.shape[0]} séries de 20 ans analysées en {duree:.2f}s "
+          f"({len(transversales)} évolutions atypiques par rapport aux autres communes)")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("TEST DES TENDANCES ET ANOMALIES VECTORISÉES")
+    print("=" * 60)
+    test_indicateurs_identiques_au_calcul_par_serie()
+    test_rupture_et_anomalie_construites()
+    test_bruit_sans_anomalies()
+    test_criblage_departement()
+    print()
+    print("Tous les tests sont passés")
@@ -112,7 +112,16 @@ def workflow_multi_annees():
     afficher_etape(1, 5, "Génération du JSON multi-années")
 
     from generer_json_multi_annees import main as generer_json_multi
-    if not executer_avec_gestion_erreur(generer_json_multi, "Génération du JSON multi-années"):
+    from analysis.donnees_multi_annees import DonneesMultiAnnees, DOSSIER_BILANS_MULTI_ANNEES
+
+    # Les PDFs sont parsés une seule fois : le même jeu de bilans sert au JSON, au PDF et au Word
+    donnees = {}
+
+    def generer_json():
+        donnees['bilans'] = DonneesMultiAnnees.depuis_dossier(DOSSIER_BILANS_MULTI_ANNEES)
+        generer_json_multi(donnees['bilans'])
+
+    if not executer_avec_gestion_erreur(generer_json, "Génération du JSON multi-années"):
         return False
 
     # Étape 2 : Générer les prompts enrichis (inclut le multi-années)
@@ -137,14 +146,14 @@ def workflow_multi_annees():
     afficher_etape(4, 5, "Génération du rapport PDF multi-années")
 
     from generer_rapport_multi_annees import generer_rapport_pdf as generer_rapport_pdf_multi
-    if not executer_avec_gestion_erreur(generer_rapport_pdf_multi, "Génération du PDF"):
+    if not executer_avec_gestion_erreur(lambda: generer_rapport_pdf_multi(donnees['bilans']), "Génération du PDF"):
         return False
 
     # Étape 5 : Générer le rapport Word multi-années
     afficher_etape(5, 5, "Génération du rapport Word multi-années")
 
     from generer_rapport_multi_annees_word import generer_rapport_word as generer_rapport_word_multi
-    if not executer_avec_gestion_erreur(generer_rapport_word_multi, "Génération du Word"):
+    if not executer_avec_gestion_erreur(lambda: generer_rapport_word_multi(donnees['bilans']), "Génération du Word"):
         return False
 
     return True